@@ -0,0 +1 @@
+"""Offline benchmarks for the download pipeline (no network, no Telegram)."""
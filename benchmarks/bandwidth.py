@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Download throughput against a throttled local server.
+
+``connections`` downloads one large stream with an increasing number of
+parallel range connections from a server that throttles every connection,
+like YouTube's CDN does. ``sharing`` runs several concurrent video downloads
+under a global bandwidth limit and starts an audio download midway, showing
+how the scheduler splits the bandwidth between download classes.
+
+Runs the downloader's real download path (_download_format_sync) through
+the stub extractor; the served files are random bytes, nothing is encoded.
+
+Usage:
+    python -m benchmarks.bandwidth connections --per-connection-mbps 16
+    python -m benchmarks.bandwidth sharing --limit-mbps 80 --videos 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+WORK_DIR = Path(tempfile.mkdtemp(prefix="sft-bandwidth-"))
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "0:benchmark")
+os.environ["TEMP_DIR"] = str(WORK_DIR / "temp")
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+
+from benchmarks.media import MediaServer, install_stub_extractor
+from benchmarks.report import git_commit
+from config import settings
+from services import downloader
+from services.bandwidth import bandwidth
+
+URL = "https://www.youtube.com/watch?v=bandwidth01"
+VIDEO_FORMAT = "136"
+AUDIO_FORMAT = "140"
+
+
+def mbps(size: int, seconds: float) -> float:
+    return round(size * 8 / 1e6 / max(seconds, 1e-6), 1)
+
+
+def download(info: dict[str, Any], format_id: str, kind: str, name: str) -> dict[str, Any]:
+    started = time.perf_counter()
+    path = downloader._download_format_sync(info, format_id, WORK_DIR / "out" / name, None, kind)
+    seconds = time.perf_counter() - started
+    size = path.stat().st_size
+    path.unlink()
+    return {"kind": kind, "seconds": round(seconds, 2), "mbps": mbps(size, seconds)}
+
+
+def run_connections(info: dict[str, Any], args: argparse.Namespace) -> dict[str, Any]:
+    bandwidth.limit = 0
+    results = {}
+    for connections in args.connections:
+        settings.download_connections = connections
+        results[str(connections)] = download(info, VIDEO_FORMAT, "video", f"c{connections}")
+    return results
+
+
+def run_sharing(info: dict[str, Any], args: argparse.Namespace) -> dict[str, Any]:
+    settings.download_bandwidth_mbps = args.limit_mbps
+    bandwidth.limit = args.limit_mbps * 1_000_000 / 8
+    downloader.clear_ydl_cache()
+
+    samples: list[dict[str, Any]] = []
+    done = threading.Event()
+
+    def sample() -> None:
+        while not done.wait(0.5):
+            flows = bandwidth.active()
+            samples.append({
+                "kinds": [f["kind"] for f in flows],
+                "allocated_mbps": [round(f["rate"] * 8 / 1e6, 1) for f in flows],
+            })
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    with ThreadPoolExecutor(max_workers=args.videos + 1) as executor:
+        videos = [
+            executor.submit(download, info, VIDEO_FORMAT, "video", f"v{i}")
+            for i in range(args.videos)
+        ]
+        time.sleep(args.audio_delay)
+        audio = executor.submit(download, info, AUDIO_FORMAT, "audio", "a")
+        results: dict[str, Any] = {"audio": audio.result(), "videos": [v.result() for v in videos]}
+    done.set()
+
+    # Allocation while the audio download was running
+    with_audio = [s for s in samples if "audio" in s["kinds"]]
+    results["allocation_with_audio"] = with_audio[len(with_audio) // 2] if with_audio else None
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("scenario", choices=["connections", "sharing"])
+    parser.add_argument("--video-mb", type=int, default=48, help="size of the video stream")
+    parser.add_argument("--audio-mb", type=int, default=6, help="size of the audio stream")
+    parser.add_argument(
+        "--per-connection-mbps", type=float, default=16,
+        help="server throttle per connection (0 = unlimited)",
+    )
+    parser.add_argument(
+        "--connections", type=int, nargs="+", default=[1, 2, 4, 8],
+        help="parallel connections to compare (connections)",
+    )
+    parser.add_argument("--limit-mbps", type=float, default=80, help="global limit (sharing)")
+    parser.add_argument("--videos", type=int, default=3, help="concurrent videos (sharing)")
+    parser.add_argument(
+        "--audio-delay", type=float, default=2.0, help="seconds before the audio starts (sharing)"
+    )
+    parser.add_argument("--output", type=Path, help="write JSON results to this file")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    media = WORK_DIR / "media"
+    media.mkdir(parents=True)
+    (media / "video_720p.mp4").write_bytes(os.urandom(args.video_mb * 1024 * 1024))
+    (media / "audio.m4a").write_bytes(os.urandom(args.audio_mb * 1024 * 1024))
+    (media / "progressive_360p.mp4").write_bytes(os.urandom(1024 * 1024))
+
+    rate_limit = int(args.per_connection_mbps * 1_000_000 / 8) or None
+    server = MediaServer(media, rate_limit=rate_limit)
+    server.start()
+    install_stub_extractor(server, media, duration=300)
+    try:
+        info = downloader._extract_info_sync(URL, downloader._get_primary_ydl_opts())
+        if args.scenario == "connections":
+            results = run_connections(info, args)
+        else:
+            results = run_sharing(info, args)
+    finally:
+        server.stop()
+
+    text = json.dumps({
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": vars(args),
+        "results": results,
+    }, indent=2, default=str)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
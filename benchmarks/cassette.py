@@ -0,0 +1,228 @@
+"""Record and replay of the HTTP exchanges yt-dlp makes during extraction."""
+
+from __future__ import annotations
+
+import base64
+import gzip
+import hashlib
+import io
+import json
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import yt_dlp
+from yt_dlp.networking import Request
+from yt_dlp.networking.common import Response
+from yt_dlp.networking.exceptions import HTTPError, TransportError
+
+# Query parameters that change on every request and must not affect matching
+VOLATILE_PARAMS = frozenset({"cpn", "rn", "rbuf", "t", "_"})
+# Response headers that are stale after decoding or must not end up in fixtures
+DROPPED_HEADERS = frozenset({"content-encoding", "content-length", "transfer-encoding",
+                             "set-cookie"})
+
+
+def request_key(method: str, url: str) -> str:
+    """Method and URL with volatile query parameters removed and the rest sorted."""
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query) if k not in VOLATILE_PARAMS)
+    return f"{method} {urlunsplit(parts._replace(query=urlencode(query), fragment=''))}"
+
+
+def _body_hash(data: Any) -> str | None:
+    if not data:
+        return None
+    if isinstance(data, str):
+        data = data.encode()
+    # Streamed bodies can't be read without consuming them
+    return hashlib.sha1(data).hexdigest() if isinstance(data, bytes) else "stream"
+
+
+@dataclass
+class Exchange:
+    """A recorded request and its response (status 0 = transport error)."""
+
+    method: str
+    url: str
+    body_hash: str | None
+    status: int
+    reason: str
+    final_url: str
+    headers: dict[str, str]
+    body: bytes
+    latency: float
+
+    @property
+    def key(self) -> str:
+        return request_key(self.method, self.url)
+
+    def to_response(self) -> Response:
+        return Response(
+            io.BytesIO(self.body), self.final_url, self.headers, self.status, self.reason
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "method": self.method,
+            "url": self.url,
+            "body_hash": self.body_hash,
+            "status": self.status,
+            "reason": self.reason,
+            "final_url": self.final_url,
+            "headers": self.headers,
+            "body": base64.b64encode(self.body).decode("ascii"),
+            "latency": round(self.latency, 4),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> Exchange:
+        return cls(**{**data, "body": base64.b64decode(data["body"])})
+
+
+class Cassette:
+    """
+    Ordered list of exchanges, replayed by request key.
+
+    Requests are matched on method, normalized URL and body hash, falling back
+    to method and URL only (request bodies can carry per-session values).
+    Repeated requests get the recorded responses in order; once they run out
+    the last one is served again.
+    """
+
+    def __init__(self, exchanges: list[Exchange] | None = None,
+                 meta: dict[str, Any] | None = None) -> None:
+        self.exchanges: list[Exchange] = exchanges or []
+        self.meta: dict[str, Any] = meta or {}
+        self.stats: Counter[str] = Counter()
+        self._served: Counter[tuple[str, str | None]] = Counter()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: Path) -> Cassette:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls([Exchange.from_dict(e) for e in data["exchanges"]], data.get("meta"))
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"meta": self.meta, "exchanges": [e.to_dict() for e in self.exchanges]}
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    def add(self, exchange: Exchange) -> None:
+        with self._lock:
+            self.exchanges.append(exchange)
+            self._count(exchange)
+
+    def match(self, method: str, url: str, body_hash: str | None) -> Exchange | None:
+        key = request_key(method, url)
+        with self._lock:
+            for wanted in ((key, body_hash), (key, None)):
+                candidates = [
+                    e for e in self.exchanges
+                    if e.key == key and (wanted[1] is None or e.body_hash == wanted[1])
+                ]
+                if candidates:
+                    index = min(self._served[wanted], len(candidates) - 1)
+                    self._served[wanted] += 1
+                    self._count(candidates[index])
+                    return candidates[index]
+            self.stats["misses"] += 1
+            return None
+
+    def reset(self) -> None:
+        """Start replaying from the first exchange of every request again."""
+        with self._lock:
+            self._served.clear()
+
+    def _count(self, exchange: Exchange) -> None:
+        self.stats["requests"] += 1
+        self.stats["bytes"] += len(exchange.body)
+
+
+def _clean_headers(headers: Any) -> dict[str, str]:
+    return {k: v for k, v in headers.items() if k.lower() not in DROPPED_HEADERS}
+
+
+def install(
+    cassette: Cassette, mode: str, latency_scale: float = 1.0
+) -> Callable[[], None]:
+    """
+    Route the HTTP requests of YoutubeDL instances created by the downloader
+    through a cassette.
+
+    Args:
+        cassette: Cassette to record into or replay from
+        mode: "record" (real network) or "replay" (no network)
+        latency_scale: Multiplier for recorded latencies in replay mode
+
+    Returns:
+        Function restoring the original YoutubeDL factory
+    """
+    from services import downloader
+
+    original = downloader._new_ydl
+
+    def new_ydl(ydl_opts: dict[str, Any]) -> yt_dlp.YoutubeDL:
+        # The on-disk player JS cache would make request counts depend on earlier runs
+        ydl = original({**ydl_opts, "cachedir": False})
+        real_urlopen = ydl.urlopen
+
+        def record(req: Request | str) -> Response:
+            req = req if isinstance(req, Request) else Request(req)
+            body_hash = _body_hash(req.data)
+            started = time.perf_counter()
+            error: Exception | None = None
+            try:
+                response = real_urlopen(req)
+            except HTTPError as e:
+                response, error = e.response, e
+            except TransportError as e:
+                cassette.add(Exchange(
+                    req.method, req.url, body_hash, 0, str(e), req.url, {}, b"",
+                    time.perf_counter() - started,
+                ))
+                raise
+
+            body = response.read()
+            exchange = Exchange(
+                req.method, req.url, body_hash, response.status,
+                response.reason or "", response.url, _clean_headers(response.headers), body,
+                time.perf_counter() - started,
+            )
+            cassette.add(exchange)
+            if error is not None:
+                raise HTTPError(exchange.to_response()) from error
+            return exchange.to_response()
+
+        def replay(req: Request | str) -> Response:
+            req = req if isinstance(req, Request) else Request(req)
+            exchange = cassette.match(req.method, req.url, _body_hash(req.data))
+            if exchange is None:
+                raise TransportError(f"No recorded response for {req.method} {req.url}")
+
+            # Runs in an executor thread, like the real network call
+            time.sleep(exchange.latency * latency_scale)
+            if exchange.status == 0:
+                raise TransportError(exchange.reason)
+            if exchange.status >= 400:
+                raise HTTPError(exchange.to_response())
+            return exchange.to_response()
+
+        ydl.urlopen = record if mode == "record" else replay
+        return ydl
+
+    downloader._new_ydl = new_ydl
+    downloader.clear_ydl_cache()
+
+    def uninstall() -> None:
+        downloader._new_ydl = original
+        downloader.clear_ydl_cache()
+
+    return uninstall
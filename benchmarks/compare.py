@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Compare two benchmark result files.
+
+Usage:
+    python -m benchmarks.compare benchmarks/results/abc1234.json benchmarks/results/def5678.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+from typing import Any
+
+# Metrics where a larger value is an improvement
+HIGHER_IS_BETTER = {"jobs_per_minute", "updates_per_second"}
+
+
+def _flatten(results: dict[str, Any], prefix: str = "") -> dict[str, float]:
+    flat: dict[str, float] = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = float(value)
+    return flat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark JSON files")
+    parser.add_argument("before", type=Path)
+    parser.add_argument("after", type=Path)
+    args = parser.parse_args()
+
+    before = json.loads(args.before.read_text(encoding="utf-8"))
+    after = json.loads(args.after.read_text(encoding="utf-8"))
+    old, new = _flatten(before["results"]), _flatten(after["results"])
+
+    header = f"{before.get('commit', '?'):>12} {after.get('commit', '?'):>12}"
+    print(f"{'metric':<48} {header} {'change':>9}")
+    for name in sorted(old.keys() & new.keys()):
+        if name.endswith(".count"):
+            continue
+        change = (new[name] - old[name]) / old[name] * 100 if old[name] else 0.0
+        better = change > 0 if name.rsplit(".", 1)[-1] in HIGHER_IS_BETTER else change < 0
+        marker = "" if abs(change) < 5 else (" +" if better else " -")
+        print(f"{name:<48} {old[name]:>12.3f} {new[name]:>12.3f} {change:>8.1f}%{marker}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Extraction benchmark per player client strategy, on recorded HTTP traffic.
+
+``record`` runs the real extraction against YouTube once per video and
+client configuration and stores every HTTP exchange yt-dlp makes, with its
+latency, in a cassette. ``replay`` runs the same extraction offline against
+the cassette and reports extraction time, CPU time, request counts and which
+client (primary or fallback) ended up succeeding.
+
+A client configuration is "default" or a list of fields, e.g.
+"primary=web;fallbacks=ios,tv_embedded;preview=android". Fallback clients
+must be known to _get_fallback_ydl_opts (ios, android, mweb, tv_embedded).
+
+Usage:
+    python -m benchmarks.extraction record --urls videos.txt --config default --config primary=web
+    python -m benchmarks.extraction replay --config default --config primary=web --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "0:benchmark")
+os.environ.setdefault("SLOW_JOB_SECONDS", "1e9")
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import yt_dlp
+from loguru import logger
+
+from benchmarks.cassette import Cassette, install
+from benchmarks.report import git_commit, summarize
+from services import downloader
+from services.tracing import start_trace
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "extractor"
+MODES = ("preview", "full")
+
+
+@dataclass
+class ClientConfig:
+    """Player clients for the primary, fallback and preview extraction."""
+
+    name: str
+    primary: list[str]
+    fallbacks: list[str]
+    preview: list[str]
+
+    @classmethod
+    def parse(cls, text: str) -> ClientConfig:
+        fields = {
+            "primary": list(downloader.PRIMARY_CLIENTS),
+            "fallbacks": list(downloader.FALLBACK_CLIENTS),
+            "preview": list(downloader.PREVIEW_CLIENTS),
+        }
+        if text != "default":
+            for item in text.split(";"):
+                key, _, value = item.partition("=")
+                if key not in fields:
+                    raise ValueError(f"Unknown client config field: {key}")
+                fields[key] = [c for c in value.split(",") if c]
+        return cls(name=text, **fields)
+
+    @property
+    def slug(self) -> str:
+        return re.sub(r"[^\w,=-]+", "_", self.name)
+
+    @contextmanager
+    def apply(self) -> Iterator[None]:
+        saved = (downloader.PRIMARY_CLIENTS, downloader.FALLBACK_CLIENTS,
+                 downloader.PREVIEW_CLIENTS)
+        downloader.PRIMARY_CLIENTS = self.primary
+        downloader.FALLBACK_CLIENTS = self.fallbacks
+        downloader.PREVIEW_CLIENTS = self.preview
+        downloader.clear_ydl_cache()
+        try:
+            yield
+        finally:
+            (downloader.PRIMARY_CLIENTS, downloader.FALLBACK_CLIENTS,
+             downloader.PREVIEW_CLIENTS) = saved
+            downloader.clear_ydl_cache()
+
+
+async def extract(url: str, mode: str, cassette: Cassette) -> dict[str, Any]:
+    """Run one extraction and describe its cost and outcome."""
+    downloader._unavailable_videos.clear()
+    before = cassette.stats.copy()
+    trace = start_trace("extraction", url=url, mode=mode)
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    error = None
+    try:
+        if mode == "preview":
+            await downloader.get_video_preview(url)
+        else:
+            await downloader.resolve_formats(url)
+    except Exception as e:  # noqa: BLE001 - failed runs are reported with their error
+        error = str(e)
+
+    attempts = [s for s in trace.spans if s.name.startswith("extract:")]
+    winner = next((s.name for s in reversed(attempts) if s.error is None), None)
+    after = cassette.stats
+    return {
+        "seconds": time.perf_counter() - started,
+        "cpu_seconds": time.process_time() - cpu_started,
+        "requests": after["requests"] - before["requests"],
+        "bytes": after["bytes"] - before["bytes"],
+        "misses": after["misses"] - before["misses"],
+        "attempts": len(attempts),
+        "winner": winner.removeprefix("extract:") if error is None and winner else "failed",
+        "error": error,
+    }
+
+
+def summarize_runs(runs: list[dict[str, Any]]) -> dict[str, Any]:
+    ok = [r for r in runs if r["error"] is None]
+    return {
+        "extractions": len(runs),
+        "success_rate": round(len(ok) / max(len(runs), 1), 4),
+        "seconds": summarize([r["seconds"] for r in runs]),
+        "cpu_seconds": summarize([r["cpu_seconds"] for r in runs]),
+        "requests_per_extraction": round(sum(r["requests"] for r in runs) / len(runs), 2),
+        "kb_per_extraction": round(sum(r["bytes"] for r in runs) / len(runs) / 1024, 1),
+        "attempts_per_extraction": round(sum(r["attempts"] for r in runs) / len(runs), 2),
+        "unmatched_requests": sum(r["misses"] for r in runs),
+        "winners": dict(Counter(r["winner"] for r in runs)),
+        "errors": sorted({r["error"] for r in runs if r["error"]})[:5],
+    }
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    modes = MODES if args.mode == "both" else (args.mode,)
+    results: dict[str, Any] = {}
+
+    for config in map(ClientConfig.parse, args.config):
+        path = args.fixtures / f"{config.slug}.json.gz"
+        if args.command == "record":
+            urls = [line.strip() for line in args.urls.read_text().splitlines()
+                    if line.strip() and not line.startswith("#")]
+            cassette = Cassette(meta={
+                "config": config.name,
+                "urls": urls,
+                "yt_dlp_version": yt_dlp.version.__version__,
+                "recorded_at": datetime.now().isoformat(timespec="seconds"),
+            })
+            repeat = 1
+        else:
+            cassette = Cassette.load(path)
+            urls = cassette.meta["urls"]
+            repeat = args.repeat
+
+        uninstall = install(cassette, args.command, args.latency_scale)
+        try:
+            with config.apply():
+                results[config.name] = {}
+                for mode in modes:
+                    runs = []
+                    for _ in range(repeat):
+                        cassette.reset()
+                        for url in urls:
+                            runs.append(await extract(url, mode, cassette))
+                    results[config.name][mode] = summarize_runs(runs)
+        finally:
+            uninstall()
+
+        if args.command == "record":
+            cassette.save(path)
+            logger.warning(f"Recorded {len(cassette.exchanges)} exchanges to {path}")
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "yt_dlp_version": yt_dlp.version.__version__,
+        "config": {k: v for k, v in vars(args).items() if k != "urls"},
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("command", choices=["record", "replay"])
+    parser.add_argument(
+        "--config", action="append", default=None, help="client configuration (repeatable)"
+    )
+    parser.add_argument("--urls", type=Path, help="file with one video URL per line (record)")
+    parser.add_argument("--mode", choices=[*MODES, "both"], default="both")
+    parser.add_argument("--repeat", type=int, default=3, help="passes over the videos (replay)")
+    parser.add_argument(
+        "--latency-scale", type=float, default=1.0,
+        help="multiplier for recorded latencies, 0 measures CPU cost only (replay)",
+    )
+    parser.add_argument("--fixtures", type=Path, default=FIXTURES_DIR, help="cassette directory")
+    parser.add_argument("--output", type=Path, help="write JSON results to this file")
+    args = parser.parse_args()
+    args.config = args.config or ["default"]
+    if args.command == "record" and not args.urls:
+        parser.error("record needs --urls")
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    result = asyncio.run(run(args))
+    text = json.dumps(result, indent=2, ensure_ascii=False, default=str)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Extraction under injected YouTube failures, with and without breakers.
+
+A local server stands in for YouTube's player API: during an outage
+window it answers every request of the throttled clients with 429, and
+at any time a share of requests with 503 or a bot check. Jobs arrive at a
+fixed rate and run the downloader's real extraction path
+(get_video_info: fallback clients, retries, circuit breakers) through a
+stub extractor that makes one request to the server.
+
+``baseline`` disables retries and breakers (every job tries every client
+right away); ``resilient`` uses the configured policy. Compare how many
+requests hit the server during the outage, how many jobs failed and how
+long they took.
+
+Usage:
+    python -m benchmarks.faults --rate 5 --duration 30 --outage-start 5 --outage-seconds 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, ClassVar
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "0:benchmark")
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import yt_dlp
+from aiohttp import web
+from loguru import logger
+from yt_dlp.extractor.common import InfoExtractor
+from yt_dlp.utils import ExtractorError
+
+from benchmarks.report import git_commit, summarize
+from config import settings
+from services import downloader, resilience
+from services.metrics import CIRCUIT_TRANSITIONS, REQUEST_FAILURES, REQUEST_RETRIES
+
+BOT_CHECK = "Sign in to confirm you're not a bot"
+
+
+class FaultServer:
+    """
+    Player API stand-in injecting failures, running on its own event loop thread.
+
+    Requests carry the player clients of the extraction (``client``
+    parameter); all requests and those answered with an error are counted,
+    separately for the outage window.
+    """
+
+    def __init__(
+        self,
+        outage_start: float,
+        outage_seconds: float,
+        throttled_clients: set[str],
+        error_rate: float,
+        bot_check_rate: float,
+        latency: float,
+    ) -> None:
+        self.outage_start = outage_start
+        self.outage_seconds = outage_seconds
+        self.throttled_clients = throttled_clients
+        self.error_rate = error_rate
+        self.bot_check_rate = bot_check_rate
+        self.latency = latency
+        self.port = 0
+        self.started = time.monotonic()
+        self.counts: dict[str, int] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._runner: web.AppRunner | None = None
+        self._thread: threading.Thread | None = None
+        self._ready = threading.Event()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def reset(self) -> None:
+        """Restart the clock of the outage window and the counters."""
+        self.started = time.monotonic()
+        self.counts = {}
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="fault-server", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def stop(self) -> None:
+        if self._loop and self._runner:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self._start_app())
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _start_app(self) -> None:
+        app = web.Application()
+        app.router.add_get("/player", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]  # type: ignore[union-attr]
+
+    def _count(self, key: str, outage: bool) -> None:
+        self.counts[key] = self.counts.get(key, 0) + 1
+        if outage:
+            self.counts[f"{key}_during_outage"] = self.counts.get(f"{key}_during_outage", 0) + 1
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        await asyncio.sleep(self.latency)
+        elapsed = time.monotonic() - self.started
+        outage = self.outage_start <= elapsed < self.outage_start + self.outage_seconds
+        clients = set(request.query.get("client", "").split(","))
+        self._count("requests", outage)
+
+        if outage and ("all" in self.throttled_clients or clients & self.throttled_clients):
+            self._count("rejected", outage)
+            return web.Response(status=429, text="Too Many Requests")
+        roll = random.random()
+        if roll < self.error_rate:
+            self._count("rejected", outage)
+            return web.Response(status=503, text="Service Unavailable")
+        if roll < self.error_rate + self.bot_check_rate:
+            self._count("rejected", outage)
+            return web.json_response({"error": BOT_CHECK})
+        return web.json_response({"title": f"Fault test {request.query.get('v')}"})
+
+
+class PlayerIE(InfoExtractor):  # type: ignore[misc]
+    """Extractor making one player request per extraction, with the request's clients."""
+
+    IE_NAME = "stub:player"
+    _VALID_URL = r"https?://(?:www\.)?youtube\.com/watch\?v=(?P<id>[\w-]{11})"
+    base_url: ClassVar[str] = ""
+
+    def _real_extract(self, url: str) -> dict[str, Any]:
+        video_id = self._match_id(url)
+        clients = ",".join(self._configuration_arg("player_client", ie_key="youtube"))
+        data = self._download_json(
+            f"{self.base_url}/player", video_id, query={"client": clients, "v": video_id}
+        )
+        if "error" in data:
+            raise ExtractorError(data["error"], expected=True)
+        return {
+            "id": video_id,
+            "title": data["title"],
+            "duration": 60,
+            "formats": [{
+                "format_id": "18", "url": f"{self.base_url}/media", "ext": "mp4",
+                "vcodec": "avc1.42001E", "acodec": "mp4a.40.2", "width": 640, "height": 360,
+            }],
+        }
+
+
+def install_player_extractor(server: FaultServer) -> None:
+    PlayerIE.base_url = server.base_url
+
+    def new_ydl(ydl_opts: dict[str, Any]) -> yt_dlp.YoutubeDL:
+        ydl = yt_dlp.YoutubeDL({**ydl_opts, "logger": _SilentLogger()}, auto_init=False)
+        ydl.add_info_extractor(PlayerIE())
+        return ydl
+
+    downloader._new_ydl = new_ydl
+    downloader.clear_ydl_cache()
+
+
+class _SilentLogger:
+    """Keeps yt-dlp from printing every injected error."""
+
+    def debug(self, msg: str) -> None:
+        pass
+
+    warning = error = info = debug
+
+
+def configure(policy: str, args: argparse.Namespace) -> None:
+    if policy == "baseline":
+        settings.retry_attempts = 1
+        settings.breaker_failure_threshold = 10**9
+        settings.breaker_max_wait_seconds = 0
+    else:
+        settings.retry_attempts = args.retries
+        settings.retry_backoff_seconds = args.backoff
+        settings.breaker_failure_threshold = args.threshold
+        settings.breaker_reset_seconds = args.reset
+        settings.breaker_max_reset_seconds = args.reset * 8
+        settings.breaker_max_wait_seconds = args.max_wait
+    resilience.breakers.clear()
+
+
+async def run_policy(
+    policy: str, server: FaultServer, args: argparse.Namespace
+) -> dict[str, Any]:
+    configure(policy, args)
+    failures_before = dict(REQUEST_FAILURES._values)
+    retries_before = sum(REQUEST_RETRIES._values.values())
+    transitions_before = dict(CIRCUIT_TRANSITIONS._values)
+    server.reset()
+
+    latencies: list[float] = []
+    failed = 0
+
+    async def job(index: int) -> None:
+        nonlocal failed
+        # Distinct IDs: the negative cache doesn't hide anything
+        url = f"https://www.youtube.com/watch?v={policy[:2]}{index:09d}"
+        start = time.perf_counter()
+        try:
+            await downloader.get_video_info(url)
+            latencies.append(time.perf_counter() - start)
+        except downloader.DownloadError:
+            failed += 1
+
+    tasks = []
+    total = int(args.rate * args.duration)
+    for index in range(total):
+        tasks.append(asyncio.create_task(job(index)))
+        await asyncio.sleep(1 / args.rate)
+    await asyncio.gather(*tasks)
+
+    failures = {
+        key[0]: value - failures_before.get(key, 0)
+        for key, value in REQUEST_FAILURES._values.items()
+    }
+    transitions = {
+        ":".join(key): value - transitions_before.get(key, 0)
+        for key, value in CIRCUIT_TRANSITIONS._values.items()
+        if value - transitions_before.get(key, 0)
+    }
+    return {
+        "jobs": total,
+        "failed_jobs": failed,
+        "failed_share": round(failed / total, 4) if total else 0,
+        "job_seconds": summarize(latencies) if latencies else None,
+        "server": dict(server.counts),
+        "requests_per_job": round(server.counts.get("requests", 0) / total, 2) if total else 0,
+        "failures_by_class": {k: v for k, v in failures.items() if v},
+        "retries": sum(REQUEST_RETRIES._values.values()) - retries_before,
+        "circuit_transitions": transitions,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--rate", type=float, default=5, help="jobs started per second")
+    parser.add_argument("--duration", type=float, default=30, help="seconds jobs keep arriving")
+    parser.add_argument("--outage-start", type=float, default=5, help="seconds into the run")
+    parser.add_argument("--outage-seconds", type=float, default=10, help="length of the outage")
+    parser.add_argument(
+        "--throttle", default="all",
+        help="clients answered with 429 during the outage, comma-separated, or 'all'",
+    )
+    parser.add_argument("--error-rate", type=float, default=0.05, help="share of 503 answers")
+    parser.add_argument("--bot-check-rate", type=float, default=0.0, help="share of bot checks")
+    parser.add_argument("--latency", type=float, default=0.05, help="server response time")
+    parser.add_argument(
+        "--policy", choices=["baseline", "resilient"], nargs="+",
+        default=["baseline", "resilient"],
+    )
+    parser.add_argument("--retries", type=int, default=3, help="RETRY_ATTEMPTS (resilient)")
+    parser.add_argument("--backoff", type=float, default=0.5, help="RETRY_BACKOFF_SECONDS")
+    parser.add_argument("--threshold", type=int, default=5, help="BREAKER_FAILURE_THRESHOLD")
+    parser.add_argument("--reset", type=float, default=2.0, help="BREAKER_RESET_SECONDS")
+    parser.add_argument("--max-wait", type=float, default=20.0, help="BREAKER_MAX_WAIT_SECONDS")
+    parser.add_argument("--output", type=Path, help="write JSON results to this file")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+
+    server = FaultServer(
+        outage_start=args.outage_start,
+        outage_seconds=args.outage_seconds,
+        throttled_clients=set(args.throttle.split(",")),
+        error_rate=args.error_rate,
+        bot_check_rate=args.bot_check_rate,
+        latency=args.latency,
+    )
+    server.start()
+    install_player_extractor(server)
+    try:
+        results = {policy: asyncio.run(run_policy(policy, server, args)) for policy in args.policy}
+    finally:
+        server.stop()
+
+    text = json.dumps({
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": vars(args),
+        "results": results,
+    }, indent=2, default=str)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
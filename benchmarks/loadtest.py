@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Bot load test against a fake Telegram Bot API.
+
+Runs the real Dispatcher from main.py with a stubbed downloader. Synthetic
+users paste YouTube links, wait for the preview card and click its format
+buttons with lognormal think times. Reports event loop lag, update
+handling latency, user-perceived latencies and error rates.
+
+Usage:
+    python -m benchmarks.loadtest --users 200 --sessions 3
+    python -m benchmarks.loadtest --mode webhook --output benchmarks/results/load.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+# Settings are read at import time, so point them at a scratch directory first
+WORK_DIR = Path(os.environ.get("BENCH_WORK_DIR", Path(tempfile.gettempdir()) / "sft-bench"))
+BOT_TOKEN = "123456:load-test"
+os.environ["TELEGRAM_BOT_TOKEN"] = BOT_TOKEN
+os.environ["TEMP_DIR"] = str(WORK_DIR / "loadtest")
+os.environ.setdefault("SLOW_JOB_SECONDS", "1e9")
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import TelegramObject, Update
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+from loguru import logger
+
+from benchmarks.report import git_commit, summarize
+from benchmarks.telegram import BotCall, FakeTelegramServer
+from services.downloader import DownloadError
+
+# How long a user waits for the bot before giving up on a step
+STEP_TIMEOUT = 120.0
+
+
+class StubDownloader:
+    """DownloaderService stand-in with configurable latencies and failures."""
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+
+    def _latency(self, median: float) -> float:
+        return random.lognormvariate(0, 0.5) * median if median > 0 else 0.0
+
+    async def get_video_preview(self, url: str) -> dict[str, Any]:
+        await asyncio.sleep(self._latency(self.args.extract_latency))
+        video_id = url.rsplit("=", 1)[-1]
+        return {
+            "id": video_id,
+            "title": f"Load test <{video_id}>",
+            "duration": 213,
+            "thumbnail": "",
+            "uploader": "load test",
+            "view_count": 0,
+        }
+
+    async def get_video_info(self, url: str) -> dict[str, Any]:
+        return await self.get_video_preview(url)
+
+    async def resolve_formats(self, url: str) -> dict[str, Any]:
+        return {**await self.get_video_preview(url), "formats": []}
+
+    async def download_video(
+        self, url: str, output_path: Path, info: dict[str, Any] | None = None,
+        progress_hook: Callable[[dict[str, Any]], None] | None = None,
+        clip: tuple[float, float | None] | None = None, quality: str | None = None,
+    ) -> Path:
+        return await self._download(output_path / "video.mp4")
+
+    async def download_audio(
+        self, url: str, output_path: Path, info: dict[str, Any] | None = None,
+        progress_hook: Callable[[dict[str, Any]], None] | None = None,
+        clip: tuple[float, float | None] | None = None,
+    ) -> Path:
+        return await self._download(output_path / "audio.mp3")
+
+    async def _download(self, path: Path) -> Path:
+        await asyncio.sleep(self._latency(self.args.download_latency))
+        if random.random() < self.args.fail_rate:
+            raise DownloadError("Injected download failure")
+        # Unique name per job, users can have several jobs in flight
+        path = path.with_name(f"{time.perf_counter_ns()}_{path.name}")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(os.urandom(self.args.file_kb * 1024))
+        return path
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up a sleeping task."""
+
+    def __init__(self, interval: float = 0.05) -> None:
+        self.interval = interval
+        self.samples: list[float] = []
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(time.perf_counter() - started - self.interval)
+
+
+class Stats:
+    """Latencies and error counters collected during the run."""
+
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: Counter[str] = Counter()
+        self.sessions = 0
+        self.handler_errors = 0
+
+    def observe(self, name: str, value: float) -> None:
+        self.latencies.setdefault(name, []).append(value)
+
+    def count_handler_error(self) -> None:
+        self.handler_errors += 1
+
+
+class SyntheticUser:
+    """A user pasting links and clicking format buttons. Runs on the server loop."""
+
+    def __init__(
+        self, server: FakeTelegramServer, user_id: int, args: argparse.Namespace, stats: Stats
+    ) -> None:
+        self.server = server
+        self.user_id = user_id
+        self.args = args
+        self.stats = stats
+        self.inbox = server.subscribe(user_id)
+
+    async def run(self) -> None:
+        for _ in range(self.args.sessions):
+            await asyncio.sleep(self._think())
+            try:
+                await self._session()
+            except TimeoutError:
+                self.stats.errors["timeout"] += 1
+            self.stats.sessions += 1
+
+    async def _session(self) -> None:
+        video_id = f"load{random.randrange(self.args.distinct):07d}"
+        sent = time.perf_counter()
+        await self.server.push_update({"message": {
+            **self._message(self.server.new_message_id(), ""),
+            "text": f"https://www.youtube.com/watch?v={video_id}",
+        }})
+
+        status = await self._wait(lambda c: c.method == "sendMessage")
+        self.stats.observe("first_response", status.at - sent)
+
+        card = await self._wait(lambda c: c.method in ("editMessageText", "sendMessage"))
+        self.stats.observe("preview", card.at - sent)
+        buttons = [data for data in card.callback_data() if data.startswith("dl:")]
+        if not buttons:
+            self.stats.errors["preview_failed"] += 1
+            return
+
+        await asyncio.sleep(self._think())
+        kind = "audio" if random.random() < self.args.audio_share else "video"
+        data = next((b for b in buttons if b.startswith(f"dl:{kind}:")), buttons[0])
+        message_id = int(card.params["message_id"])
+        clicked = time.perf_counter()
+        await self.server.push_update({"callback_query": {
+            "id": str(self.server.new_message_id()),
+            "from": self._user(),
+            "message": self._message(message_id, card.text),
+            "chat_instance": str(self.user_id),
+            "data": data,
+        }})
+
+        ack = await self._wait(lambda c: c.method == "answerCallbackQuery")
+        self.stats.observe("callback_ack", ack.at - clicked)
+
+        def finished(call: BotCall) -> bool:
+            if call.method in ("sendVideo", "sendAudio"):
+                return True
+            return call.method == "editMessageText" and call.text.startswith(("❌", "⌛"))
+
+        result = await self._wait(finished)
+        if result.method.startswith("send"):
+            self.stats.observe("delivery", result.at - clicked)
+        else:
+            self.stats.errors["download_failed"] += 1
+
+    async def _wait(self, predicate: Callable[[BotCall], bool]) -> BotCall:
+        """Skip bot requests until one matches, e.g. progress edits before the result."""
+        async def receive() -> BotCall:
+            while True:
+                call = await self.inbox.get()
+                if predicate(call):
+                    return call
+
+        return await asyncio.wait_for(receive(), STEP_TIMEOUT)
+
+    def _think(self) -> float:
+        # Lognormal think time with the configured median
+        return random.lognormvariate(0, 0.6) * float(self.args.think)
+
+    def _user(self) -> dict[str, Any]:
+        return {"id": self.user_id, "is_bot": False, "first_name": f"User {self.user_id}"}
+
+    def _message(self, message_id: int, text: str) -> dict[str, Any]:
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": self.user_id, "type": "private"},
+            "from": self._user(),
+            "text": text,
+        }
+
+
+def _timing_middleware(stats: Stats) -> Callable[..., Awaitable[Any]]:
+    """Outer update middleware measuring how long the dispatcher handles each update."""
+    async def middleware(
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            if isinstance(event, Update):
+                stats.observe(f"update:{event.event_type}", time.perf_counter() - started)
+
+    return middleware
+
+
+async def _run_users(server: FakeTelegramServer, args: argparse.Namespace, stats: Stats) -> None:
+    users = [SyntheticUser(server, 1000 + i, args, stats) for i in range(args.users)]
+
+    async def delayed(user: SyntheticUser, delay: float) -> None:
+        await asyncio.sleep(delay)
+        await user.run()
+
+    await asyncio.gather(*(
+        delayed(user, args.ramp_up * i / max(len(users), 1)) for i, user in enumerate(users)
+    ))
+
+
+async def run_loadtest(args: argparse.Namespace) -> dict[str, Any]:
+    import main
+    from bot.handlers import download
+
+    stub = StubDownloader(args)
+    download.downloader = stub  # type: ignore[assignment]
+    download.speculative.downloader = stub  # type: ignore[assignment]
+
+    stats = Stats()
+    dispatcher: Dispatcher = main.create_dispatcher()
+    dispatcher.update.outer_middleware(_timing_middleware(stats))
+
+    # Handler errors are logged by the bot, count them
+    sink = logger.add(lambda _: stats.count_handler_error(), level="ERROR")
+
+    server = FakeTelegramServer(BOT_TOKEN)
+    server.start()
+    bot = Bot(
+        token=BOT_TOKEN,
+        session=AiohttpSession(api=TelegramAPIServer.from_base(server.base_url)),
+    )
+
+    polling: asyncio.Task[None] | None = None
+    webhook: web.AppRunner | None = None
+    if args.mode == "webhook":
+        app = web.Application()
+        SimpleRequestHandler(dispatcher, bot).register(app, path="/webhook")
+        setup_application(app, dispatcher, bot=bot)
+        webhook = web.AppRunner(app, access_log=None)
+        await webhook.setup()
+        site = web.TCPSite(webhook, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]  # type: ignore[union-attr]
+        server.webhook_url = f"http://127.0.0.1:{port}/webhook"
+    else:
+        polling = asyncio.create_task(
+            dispatcher.start_polling(bot, handle_signals=False, polling_timeout=1)
+        )
+
+    lag = LoopLagMonitor()
+    lag.start()
+    started = time.perf_counter()
+    assert server.loop is not None
+    await asyncio.wrap_future(
+        asyncio.run_coroutine_threadsafe(_run_users(server, args, stats), server.loop)
+    )
+    wall = time.perf_counter() - started
+    lag.stop()
+
+    if polling is not None:
+        await dispatcher.stop_polling()
+        await polling
+    if webhook is not None:
+        await webhook.cleanup()
+        await bot.session.close()
+    server.stop()
+    logger.remove(sink)
+
+    updates = sum(len(v) for k, v in stats.latencies.items() if k.startswith("update:"))
+    failed = sum(stats.errors.values())
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": vars(args),
+        "results": {
+            "sessions": stats.sessions,
+            "failed_sessions": failed,
+            "error_rate": round(failed / max(stats.sessions, 1), 4),
+            "errors": dict(stats.errors),
+            "handler_errors": stats.handler_errors,
+            "api_errors": dict(server.api_errors),
+            "api_calls": dict(server.calls),
+            "wall_seconds": round(wall, 3),
+            "updates_per_second": round(updates / wall, 2) if wall else 0,
+            "loop_lag": summarize(lag.samples) | {"max": round(max(lag.samples), 4)},
+            "latency": {
+                name: summarize(values) for name, values in sorted(stats.latencies.items())
+            },
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--users", type=int, default=50, help="number of synthetic users")
+    parser.add_argument("--sessions", type=int, default=3, help="links sent by every user")
+    parser.add_argument("--mode", choices=["polling", "webhook"], default="polling")
+    parser.add_argument("--think", type=float, default=2.0, help="median think time, seconds")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="seconds to start all users")
+    parser.add_argument("--audio-share", type=float, default=0.4, help="share of audio clicks")
+    parser.add_argument("--distinct", type=int, default=1_000_000, help="distinct video IDs")
+    parser.add_argument(
+        "--extract-latency", type=float, default=0.5, help="median stub preview time, seconds"
+    )
+    parser.add_argument(
+        "--download-latency", type=float, default=2.0, help="median stub download time, seconds"
+    )
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of failed downloads")
+    parser.add_argument("--file-kb", type=int, default=256, help="size of delivered files, KiB")
+    parser.add_argument("--output", type=Path, help="write JSON results to this file")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="CRITICAL")
+
+    result = asyncio.run(run_loadtest(args))
+    text = json.dumps(result, indent=2, ensure_ascii=False, default=str)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
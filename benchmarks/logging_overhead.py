@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Per-job cost of logging for different sink setups.
+
+Replays the log calls of a video download job (preview, extraction,
+download and encode in worker threads, upload, cleanup) for many concurrent
+jobs and measures the time the callers spend inside logger calls, on the
+event loop and on worker threads. Console output goes to a file in a scratch
+directory so the terminal doesn't skew the numbers.
+
+Setups:
+    none         no sinks, the cost of the calls themselves
+    legacy       what main.py did before: loguru's default DEBUG console sink
+                 and a text file sink, both written synchronously
+    enqueue      the legacy sinks with loguru's enqueue=True
+    queued-text  services.logs.setup_logging() with a text log file
+    queued-json  services.logs.setup_logging() with a JSON log file
+
+Usage:
+    python -m benchmarks.logging_overhead --jobs 500 --concurrency 16
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, TextIO
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "0:benchmark")
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+
+from benchmarks.report import git_commit, summarize
+from config import settings
+from services.logs import setup_logging
+from services.tracing import start_trace
+
+SETUPS = ("none", "legacy", "enqueue", "queued-text", "queued-json")
+
+URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+OUTPUT = "temp/123456789/dQw4w9WgXcQ_1729300000.mp4"
+FFMPEG = (
+    "ffmpeg -i temp/source_cache/dQw4w9WgXcQ.137.mp4 -i temp/source_cache/dQw4w9WgXcQ.140.m4a "
+    "-map 0:v:0 -map 1:a:0 -c:v libx264 -preset fast -crf 23 -c:a aac -b:a 192k "
+    f"-movflags +faststart -pix_fmt yuv420p -y {OUTPUT}"
+)
+
+# (level, message) of a job, in order; "thread" steps run in a worker thread
+JOB = [
+    ("loop", [
+        ("DEBUG", f"Extracting preview for: {URL}"),
+        ("INFO", "Extracted preview for: Rick Astley - Never Gonna Give You Up"),
+        ("DEBUG", f"Starting video download from: {URL} to {OUTPUT}"),
+        ("DEBUG", f"Extracting video info from: {URL}"),
+        ("INFO", "Successfully extracted info for: Rick Astley - Never Gonna Give You Up"),
+    ]),
+    ("thread", [
+        ("DEBUG", "Downloading format 137 of dQw4w9WgXcQ"),
+        ("DEBUG", "Downloading format 140 of dQw4w9WgXcQ"),
+        ("DEBUG", "Source cached: dQw4w9WgXcQ.137.mp4 (52.3 MB)"),
+        ("DEBUG", "Source cached: dQw4w9WgXcQ.140.m4a (3.3 MB)"),
+    ]),
+    ("thread", [
+        ("DEBUG", f"FFmpeg command: {FFMPEG}"),
+        ("DEBUG", "Video re-encoded: 48.1 MB"),
+    ]),
+    ("loop", [
+        ("INFO", f"Successfully processed video to: {OUTPUT}"),
+        ("DEBUG", f"Video downloaded: {OUTPUT}"),
+        ("DEBUG", "Video metadata: 1280x720, duration: 213s"),
+        ("INFO", "Video sent to user 123456789"),
+        ("DEBUG", f"Cleaning up: {OUTPUT}"),
+        ("DEBUG", f"Successfully deleted file: {OUTPUT}"),
+        ("DEBUG", f"Cleaned up temp file: {OUTPUT}"),
+    ]),
+]
+
+
+def configure(setup: str, directory: Path, console: TextIO) -> None:
+    logger.remove()
+    if setup in ("legacy", "enqueue"):
+        enqueue = setup == "enqueue"
+        logger.configure(extra={}, patcher=None)
+        logger.add(console, level="DEBUG", enqueue=enqueue)
+        logger.add(
+            directory / "bot.log",
+            level="INFO",
+            format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}",
+            rotation="10 MB",
+            enqueue=enqueue,
+        )
+    elif setup.startswith("queued"):
+        settings.log_level = "INFO"
+        settings.log_json = setup == "queued-json"
+        settings.log_file = directory / ("bot.jsonl" if settings.log_json else "bot.log")
+        setup_logging(console)
+
+
+def emit(lines: list[tuple[str, str]]) -> float:
+    started = time.perf_counter()
+    for level, message in lines:
+        logger.log(level, message)
+    return time.perf_counter() - started
+
+
+async def run_job(semaphore: asyncio.Semaphore, costs: dict[str, list[float]]) -> None:
+    async with semaphore:
+        start_trace("job", user_id=123456789, url=URL)
+        loop_seconds = thread_seconds = 0.0
+        for where, lines in JOB:
+            if where == "loop":
+                loop_seconds += emit(lines)
+            else:
+                thread_seconds += await asyncio.to_thread(emit, lines)
+            await asyncio.sleep(0)
+        costs["loop"].append(loop_seconds)
+        costs["thread"].append(thread_seconds)
+        costs["total"].append(loop_seconds + thread_seconds)
+
+
+async def measure(setup: str, args: argparse.Namespace) -> dict[str, Any]:
+    directory = Path(tempfile.mkdtemp(prefix=f"sft-logs-{setup}-"))
+    costs: dict[str, list[float]] = {"loop": [], "thread": [], "total": []}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    # Blocking, but done before the timed part starts
+    with open(directory / "console.log", "a", encoding="utf-8") as console:  # noqa: ASYNC230
+        configure(setup, directory, console)
+        started = time.perf_counter()
+        await asyncio.gather(*(run_job(semaphore, costs) for _ in range(args.jobs)))
+        wall = time.perf_counter() - started
+        # Queued sinks are still writing: that's the work moved off the callers
+        await logger.complete()
+        flushed = time.perf_counter() - started
+        logger.remove()
+
+    micro = {k: [v * 1e6 for v in values] for k, values in costs.items()}
+    return {
+        "caller_us_per_job": summarize(micro["total"]),
+        "event_loop_us_per_job": summarize(micro["loop"]),
+        "worker_thread_us_per_job": summarize(micro["thread"]),
+        "wall_seconds": round(wall, 3),
+        "flushed_seconds": round(flushed, 3),
+        "bytes_written": sum(p.stat().st_size for p in directory.iterdir()),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    results = {setup: await measure(setup, args) for setup in args.setup}
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {**vars(args), "lines_per_job": sum(len(lines) for _, lines in JOB)},
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--jobs", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--setup", action="append", choices=SETUPS, help="sink setup (repeatable, default all)"
+    )
+    parser.add_argument("--output", type=Path, help="write JSON results to this file")
+    args = parser.parse_args()
+    args.setup = args.setup or list(SETUPS)
+
+    result = asyncio.run(run(args))
+    text = json.dumps(result, indent=2, ensure_ascii=False, default=str)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""Local media fixtures: generated sample files, an HTTP server and a stub extractor."""
+
+from __future__ import annotations
+
+import asyncio
+import subprocess
+import threading
+from pathlib import Path
+from typing import Any, ClassVar
+
+import yt_dlp
+from aiohttp import web
+from loguru import logger
+from yt_dlp.extractor.common import InfoExtractor
+
+# name -> (ffmpeg arguments producing the file, yt-dlp format fields)
+FIXTURES: dict[str, tuple[list[str], dict[str, Any]]] = {
+    "video_720p.mp4": (
+        ["-f", "lavfi", "-i", "testsrc2=size=1280x720:rate=30",
+         "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", "-an"],
+        {"format_id": "136", "ext": "mp4", "vcodec": "avc1.4d401f", "acodec": "none",
+         "width": 1280, "height": 720, "fps": 30},
+    ),
+    "audio.m4a": (
+        ["-f", "lavfi", "-i", "sine=frequency=440:sample_rate=44100",
+         "-c:a", "aac", "-b:a", "128k", "-vn"],
+        {"format_id": "140", "ext": "m4a", "vcodec": "none", "acodec": "mp4a.40.2", "abr": 128},
+    ),
+    "progressive_360p.mp4": (
+        ["-f", "lavfi", "-i", "testsrc2=size=640x360:rate=30",
+         "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=44100",
+         "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+         "-c:a", "aac", "-b:a", "96k", "-shortest"],
+        {"format_id": "18", "ext": "mp4", "vcodec": "avc1.42001E", "acodec": "mp4a.40.2",
+         "width": 640, "height": 360, "fps": 30},
+    ),
+}
+
+
+def generate_fixtures(directory: Path, duration: int) -> Path:
+    """
+    Generate sample media with FFmpeg (skipped if already generated).
+
+    Args:
+        directory: Base directory for fixtures
+        duration: Length of every sample in seconds
+
+    Returns:
+        Directory containing the fixtures for this duration
+    """
+    target = directory / f"{duration}s"
+    target.mkdir(parents=True, exist_ok=True)
+
+    for name, (args, _) in FIXTURES.items():
+        path = target / name
+        if path.exists():
+            continue
+        logger.info(f"Generating fixture {path}")
+        subprocess.run(
+            ["ffmpeg", "-v", "error", *args, "-t", str(duration), "-y", str(path)],
+            check=True,
+        )
+    return target
+
+
+class MediaServer:
+    """
+    HTTP server for fixtures, running on its own event loop thread.
+
+    Supports Range headers, googlevideo's ``range`` URL parameter and an
+    optional per-connection rate limit, so it can stand in for throttled
+    YouTube CDN servers.
+    """
+
+    def __init__(self, directory: Path, rate_limit: int | None = None) -> None:
+        """
+        Args:
+            directory: Directory with files to serve
+            rate_limit: Bytes per second per response (None = unlimited)
+        """
+        self.directory = directory
+        self.rate_limit = rate_limit
+        self.port = 0
+        self.requests = 0
+        self.bytes_sent = 0
+        self.connections: set[tuple[str, int]] = set()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._runner: web.AppRunner | None = None
+        self._ready = threading.Event()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="media-server", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def stop(self) -> None:
+        if self._loop and self._runner:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self._start_app())
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _start_app(self) -> None:
+        app = web.Application()
+        app.router.add_get("/{name}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]  # type: ignore[union-attr]
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        if request.transport:
+            self.connections.add(request.transport.get_extra_info("peername"))
+        path = self.directory / request.match_info["name"]
+        if not path.is_file():
+            raise web.HTTPNotFound()
+
+        size = path.stat().st_size
+        start, end = 0, size - 1
+        status = 200
+        if "range" in request.query:
+            # googlevideo answers ranges given in the URL with a plain 200
+            first, _, last = request.query["range"].partition("-")
+            start, end = int(first), min(int(last or size - 1), size - 1)
+        elif request.http_range.start is not None or request.http_range.stop is not None:
+            start = request.http_range.start or 0
+            end = min((request.http_range.stop or size) - 1, size - 1)
+            status = 206
+
+        response = web.StreamResponse(status=status)
+        response.content_type = "application/octet-stream"
+        response.content_length = end - start + 1
+        response.headers["Accept-Ranges"] = "bytes"
+        if status == 206:
+            response.headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        await response.prepare(request)
+
+        chunk_size = 64 * 1024
+        with path.open("rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                await response.write(chunk)
+                self.bytes_sent += len(chunk)
+                remaining -= len(chunk)
+                if self.rate_limit:
+                    await asyncio.sleep(len(chunk) / self.rate_limit)
+
+        await response.write_eof()
+        return response
+
+
+class StubYoutubeIE(InfoExtractor):  # type: ignore[misc]
+    """Extractor answering YouTube watch URLs with formats served by MediaServer."""
+
+    IE_NAME = "stub:youtube"
+    _VALID_URL = (
+        r"https?://(?:www\.|m\.)?(?:youtube\.com/(?:watch\?v=|shorts/)|youtu\.be/)"
+        r"(?P<id>[\w-]{11})"
+    )
+
+    base_url: ClassVar[str] = ""
+    fixtures_dir: ClassVar[Path] = Path()
+    duration: ClassVar[int] = 0
+
+    def _real_extract(self, url: str) -> dict[str, Any]:
+        video_id = self._match_id(url)
+        formats = []
+        for name, (_, fields) in FIXTURES.items():
+            path = self.fixtures_dir / name
+            formats.append({
+                **fields,
+                "url": f"{self.base_url}/{name}?v={video_id}",
+                "filesize": path.stat().st_size,
+                "tbr": path.stat().st_size * 8 / 1000 / max(self.duration, 1),
+                "protocol": "http",
+            })
+        return {
+            "id": video_id,
+            "title": f"Benchmark video {video_id}",
+            "duration": self.duration,
+            "uploader": "benchmark",
+            "view_count": 0,
+            "thumbnail": "",
+            "formats": formats,
+        }
+
+
+def install_stub_extractor(server: MediaServer, fixtures_dir: Path, duration: int) -> None:
+    """Make the downloader create YoutubeDL instances that only know the stub extractor."""
+    from services import downloader
+
+    StubYoutubeIE.base_url = server.base_url
+    StubYoutubeIE.fixtures_dir = fixtures_dir
+    StubYoutubeIE.duration = duration
+
+    def new_ydl(ydl_opts: dict[str, Any]) -> yt_dlp.YoutubeDL:
+        ydl = yt_dlp.YoutubeDL(ydl_opts, auto_init=False)
+        ydl.add_info_extractor(StubYoutubeIE())
+        return ydl
+
+    downloader._new_ydl = new_ydl
+    downloader.clear_ydl_cache()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+End-to-end pipeline benchmark, fully offline.
+
+Serves generated sample media from a local HTTP server through a stub
+yt-dlp extractor and runs the real DownloaderService (format resolution,
+source download, FFmpeg re-encode / MP3 conversion) at the given
+concurrency.
+
+Usage:
+    python -m benchmarks.pipeline --jobs 20 --concurrency 4 --kind mixed
+    python -m benchmarks.pipeline --output benchmarks/results/$(git rev-parse --short HEAD).json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Self
+
+# Settings are read at import time, so point them at a scratch directory first
+WORK_DIR = Path(os.environ.get("BENCH_WORK_DIR", Path(tempfile.gettempdir()) / "sft-bench"))
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "0:benchmark")
+os.environ["TEMP_DIR"] = str(WORK_DIR / "temp")
+os.environ.setdefault("SLOW_JOB_SECONDS", "1e9")
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+
+from benchmarks.media import MediaServer, generate_fixtures, install_stub_extractor
+from benchmarks.report import git_commit, summarize
+from services.downloader import DownloaderService
+from services.file_manager import cleanup_file, source_cache
+from services.tracing import Trace, span, start_trace
+
+
+def _rusage() -> tuple[resource.struct_rusage, resource.struct_rusage]:
+    """Resource usage of this process and of its finished children (FFmpeg)."""
+    return resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+
+
+class DiskSampler:
+    """Samples the size of a directory in the background and keeps the peak."""
+
+    def __init__(self, path: Path, interval: float = 0.25) -> None:
+        self.path = path
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> Self:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                size = sum(p.stat().st_size for p in self.path.rglob("*") if p.is_file())
+            except OSError:
+                continue
+            self.peak = max(self.peak, size)
+
+
+async def run_job(
+    downloader: DownloaderService,
+    index: int,
+    kind: str,
+    distinct_videos: int,
+    clip: tuple[float, float | None] | None = None,
+) -> Trace:
+    """Resolve, download and convert one video (or a clip of it), returning its trace."""
+    video_id = f"bench{index % distinct_videos:06d}"
+    url = f"https://www.youtube.com/watch?v={video_id}"
+    output = WORK_DIR / "temp" / "out" / f"{index}_{kind}"
+
+    trace = start_trace("benchmark", kind=kind, video_id=video_id)
+    try:
+        with span("job"):
+            info = await downloader.resolve_formats(url)
+            if kind == "audio":
+                path = await downloader.download_audio(url, output, info, clip=clip)
+            else:
+                path = await downloader.download_video(url, output, info, clip=clip)
+        trace.attributes["output_bytes"] = path.stat().st_size
+        await cleanup_file(path)
+    except Exception as e:  # noqa: BLE001 - failed runs are reported with their error
+        trace.attributes["error"] = str(e)
+    return trace
+
+
+async def run_benchmark(args: argparse.Namespace) -> dict[str, Any]:
+    fixtures = generate_fixtures(WORK_DIR / "fixtures", args.duration)
+    server = MediaServer(fixtures, rate_limit=args.rate_limit)
+    server.start()
+    install_stub_extractor(server, fixtures, args.duration)
+
+    await cleanup_file(WORK_DIR / "temp")
+    source_cache.clear()
+
+    downloader = DownloaderService()
+    kinds = ["video", "audio"] if args.kind == "mixed" else [args.kind]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    # Clips are taken from the middle of the sample, away from the first keyframe
+    clip = (args.duration / 4, args.duration / 4 + args.clip) if args.clip else None
+
+    async def limited(index: int) -> Trace:
+        async with semaphore:
+            return await run_job(
+                downloader, index, kinds[index % len(kinds)], args.distinct, clip
+            )
+
+    usage_before = _rusage()
+    started = time.perf_counter()
+    with DiskSampler(WORK_DIR / "temp") as disk:
+        traces = await asyncio.gather(*(limited(i) for i in range(args.jobs)))
+    wall = time.perf_counter() - started
+    usage_after = _rusage()
+    server.stop()
+
+    cpu_seconds = sum(
+        (after.ru_utime + after.ru_stime) - (before.ru_utime + before.ru_stime)
+        for before, after in zip(usage_before, usage_after)
+    )
+
+    stages: dict[str, list[float]] = {}
+    for trace in traces:
+        if "error" in trace.attributes:
+            continue
+        for item in trace.spans:
+            stages.setdefault(item.name, []).append(item.duration)
+
+    failed = [t.attributes["error"] for t in traces if "error" in t.attributes]
+    completed = len(traces) - len(failed)
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": vars(args),
+        "results": {
+            "jobs": len(traces),
+            "failed": len(failed),
+            "errors": sorted(set(failed))[:5],
+            "wall_seconds": round(wall, 3),
+            "jobs_per_minute": round(completed / wall * 60, 2) if wall else 0,
+            "cpu_seconds_per_job": round(cpu_seconds / max(completed, 1), 3),
+            # ru_maxrss is in kilobytes on Linux
+            "peak_rss_mb": round(usage_after[0].ru_maxrss / 1024, 1),
+            "peak_children_rss_mb": round(usage_after[1].ru_maxrss / 1024, 1),
+            "peak_disk_mb": round(disk.peak / 1024 / 1024, 1),
+            "media_requests": server.requests,
+            "media_mb_per_job": round(server.bytes_sent / 1024 / 1024 / max(completed, 1), 2),
+            "stages": {name: summarize(values) for name, values in sorted(stages.items())},
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--jobs", type=int, default=20, help="number of jobs to run")
+    parser.add_argument("--concurrency", type=int, default=4, help="jobs running at once")
+    parser.add_argument("--kind", choices=["video", "audio", "mixed"], default="mixed")
+    parser.add_argument("--duration", type=int, default=30, help="sample media length, seconds")
+    parser.add_argument(
+        "--distinct", type=int, default=1_000_000,
+        help="number of distinct video IDs (lower it to exercise the source cache)",
+    )
+    parser.add_argument("--rate-limit", type=int, default=None, help="server bytes/s per response")
+    parser.add_argument(
+        "--clip", type=float, default=0,
+        help="download clips of this many seconds (0 = whole video)",
+    )
+    parser.add_argument("--output", type=Path, help="write JSON results to this file")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    result = asyncio.run(run_benchmark(args))
+    text = json.dumps(result, indent=2, ensure_ascii=False, default=str)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
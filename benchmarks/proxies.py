@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Jobs spread over a pool of local forwarding proxies.
+
+Starts an origin server standing in for YouTube (a player API answering
+extractions and media files for downloads) and several forwarding HTTP
+proxies in front of it. Some proxies can be made unhealthy: ``--bad``
+proxies answer a share of requests with 429 themselves, ``--slow`` ones
+add latency. Jobs run the downloader's real path through the proxy pool:
+resolve_formats() (extraction) and then a download of the audio stream
+through the source cache, without encoding.
+
+Reports per proxy the requests, rejections and peak concurrency (which
+must stay within ``--max-concurrency``), health scores and quarantines,
+and the share of jobs whose download went out through the same proxy as
+their extraction (``sticky_share``, should be 1.0).
+
+Usage:
+    python -m benchmarks.proxies --proxies 3 --bad 1 --slow 1 --jobs 60 --concurrency 12
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, ClassVar
+
+WORK_DIR = Path(tempfile.mkdtemp(prefix="sft-proxies-"))
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "0:benchmark")
+os.environ["TEMP_DIR"] = str(WORK_DIR / "temp")
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import aiohttp
+import yt_dlp
+from aiohttp import web
+from loguru import logger
+from yt_dlp.extractor.common import InfoExtractor
+
+from benchmarks.report import git_commit, summarize
+from config import settings
+from services import downloader, proxies
+from services.metrics import PROXY_QUARANTINES
+
+PROXY_HEADER = "X-Benchmark-Proxy"
+
+
+class _Server:
+    """aiohttp application running on its own event loop thread."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.port = 0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._runner: web.AppRunner | None = None
+        self._thread: threading.Thread | None = None
+        self._ready = threading.Event()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def app(self) -> web.Application:
+        raise NotImplementedError
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def stop(self) -> None:
+        if self._loop and self._runner:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self._start_app())
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _start_app(self) -> None:
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]  # type: ignore[union-attr]
+
+
+class OriginServer(_Server):
+    """Player API and media files; remembers which proxy each request of a video came through."""
+
+    def __init__(self, media_bytes: int) -> None:
+        super().__init__("origin")
+        self.media = os.urandom(media_bytes)
+        # video ID -> proxies of its player requests / media requests
+        self.player_via: dict[str, list[str]] = {}
+        self.media_via: dict[str, list[str]] = {}
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/player", self._player)
+        app.router.add_get("/media/{id}", self._media)
+        return app
+
+    async def _player(self, request: web.Request) -> web.Response:
+        video_id = request.query.get("v", "")
+        self.player_via.setdefault(video_id, []).append(request.headers.get(PROXY_HEADER, ""))
+        return web.json_response({"title": f"Proxy test {video_id}"})
+
+    async def _media(self, request: web.Request) -> web.Response:
+        video_id = request.match_info["id"]
+        self.media_via.setdefault(video_id, []).append(request.headers.get(PROXY_HEADER, ""))
+        return web.Response(body=self.media, content_type="audio/mp4")
+
+
+class ForwardProxy(_Server):
+    """HTTP forwarding proxy that can reject requests or add latency, like a flaky exit."""
+
+    def __init__(self, index: int, fail_rate: float, latency: float) -> None:
+        super().__init__(f"proxy-{index}")
+        self.fail_rate = fail_rate
+        self.latency = latency
+        self.requests = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._session: aiohttp.ClientSession | None = None
+
+    @property
+    def url(self) -> str:
+        return self.base_url
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", self._forward)
+        app.on_cleanup.append(self._close_session)
+        return app
+
+    async def _close_session(self, app: web.Application) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+    async def _forward(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            if random.random() < self.fail_rate:
+                self.rejected += 1
+                return web.Response(status=429, text="Too Many Requests")
+            if self._session is None:
+                self._session = aiohttp.ClientSession()
+            # Forward requests carry the absolute URL as the target
+            headers = {k: v for k, v in request.headers.items() if k.lower() != "host"}
+            headers[PROXY_HEADER] = self.url
+            async with self._session.get(request.raw_path, headers=headers) as upstream:
+                response = web.StreamResponse(status=upstream.status)
+                response.content_type = upstream.content_type
+                if upstream.content_length is not None:
+                    response.content_length = upstream.content_length
+                await response.prepare(request)
+                async for chunk in upstream.content.iter_chunked(64 * 1024):
+                    await response.write(chunk)
+                await response.write_eof()
+                return response
+        finally:
+            self.in_flight -= 1
+
+
+class PlayerIE(InfoExtractor):  # type: ignore[misc]
+    """Extractor making one player request and returning one audio format on the origin."""
+
+    IE_NAME = "stub:player"
+    _VALID_URL = r"https?://(?:www\.)?youtube\.com/watch\?v=(?P<id>[\w-]{11})"
+    origin_url: ClassVar[str] = ""
+    media_bytes: ClassVar[int] = 0
+
+    def _real_extract(self, url: str) -> dict[str, Any]:
+        video_id = self._match_id(url)
+        data = self._download_json(f"{self.origin_url}/player", video_id, query={"v": video_id})
+        return {
+            "id": video_id,
+            "title": data["title"],
+            "duration": 60,
+            "formats": [{
+                "format_id": "140", "url": f"{self.origin_url}/media/{video_id}", "ext": "m4a",
+                "vcodec": "none", "acodec": "mp4a.40.2", "abr": 128,
+                "filesize": self.media_bytes, "protocol": "http",
+            }],
+        }
+
+
+class _SilentLogger:
+    """Keeps yt-dlp from printing every injected error."""
+
+    def debug(self, msg: str) -> None:
+        pass
+
+    warning = error = info = debug
+
+
+def install(
+    origin: OriginServer, forward: list[ForwardProxy], args: argparse.Namespace
+) -> proxies.ProxyPool:
+    PlayerIE.origin_url = origin.base_url
+    PlayerIE.media_bytes = len(origin.media)
+
+    def new_ydl(ydl_opts: dict[str, Any]) -> yt_dlp.YoutubeDL:
+        ydl = yt_dlp.YoutubeDL({**ydl_opts, "logger": _SilentLogger()}, auto_init=False)
+        ydl.add_info_extractor(PlayerIE())
+        return ydl
+
+    downloader._new_ydl = new_ydl
+    downloader.clear_ydl_cache()
+    settings.proxies = [p.url for p in forward]
+    settings.proxy_max_concurrency = args.max_concurrency
+    settings.proxy_quarantine_seconds = args.quarantine
+    settings.retry_backoff_seconds = 0.2
+    pool = proxies.ProxyPool.from_settings()
+    # Replaces the pool the downloader imported
+    downloader.proxy_pool = pool  # type: ignore[attr-defined]
+    return pool
+
+
+async def run_jobs(args: argparse.Namespace) -> dict[str, Any]:
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: list[float] = []
+    failed = 0
+
+    async def job(index: int) -> None:
+        nonlocal failed
+        url = f"https://www.youtube.com/watch?v=px{index:09d}"
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                info = await downloader.resolve_formats(url)
+                # Like download_audio(): extract again if the proxy was quarantined meanwhile
+                info = await downloader._info_for_download(url, info)
+                fmt = info["formats"][0]
+                async with downloader._lease_source(info, fmt, kind="audio"):
+                    pass
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:  # noqa: BLE001 - failed jobs are counted
+                logger.debug(f"Job {index} failed: {e}")
+                failed += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(job(i) for i in range(args.jobs)))
+    elapsed = time.perf_counter() - started
+    return {
+        "jobs": args.jobs,
+        "failed_jobs": failed,
+        "jobs_per_second": round(args.jobs / elapsed, 2),
+        "job_seconds": summarize(latencies) if latencies else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--proxies", type=int, default=3, help="forwarding proxies")
+    parser.add_argument("--bad", type=int, default=1, help="proxies rejecting requests")
+    parser.add_argument("--bad-fail-rate", type=float, default=0.7, help="429 share (bad)")
+    parser.add_argument("--slow", type=int, default=1, help="proxies adding latency")
+    parser.add_argument("--slow-latency", type=float, default=0.3, help="seconds (slow)")
+    parser.add_argument("--jobs", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, default=12, help="jobs running at once")
+    parser.add_argument("--max-concurrency", type=int, default=2, help="PROXY_MAX_CONCURRENCY")
+    parser.add_argument("--quarantine", type=float, default=30, help="PROXY_QUARANTINE_SECONDS")
+    parser.add_argument("--media-kb", type=int, default=256, help="size of the audio stream")
+    parser.add_argument("--output", type=Path, help="write JSON results to this file")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+
+    origin = OriginServer(args.media_kb * 1024)
+    forward = []
+    for i in range(args.proxies):
+        fail_rate = args.bad_fail_rate if i < args.bad else 0.0
+        latency = args.slow_latency if args.bad <= i < args.bad + args.slow else 0.0
+        forward.append(ForwardProxy(i, fail_rate, latency))
+    for server in (origin, *forward):
+        server.start()
+    proxy_pool = install(origin, forward, args)
+    try:
+        results = asyncio.run(run_jobs(args))
+    finally:
+        for server in (origin, *forward):
+            server.stop()
+
+    downloaded = [v for v in origin.media_via if v in origin.player_via]
+    sticky = [v for v in downloaded if origin.media_via[v][-1] == origin.player_via[v][-1]]
+    pool = {p["name"]: p for p in proxy_pool.status()}
+    results["sticky_share"] = round(len(sticky) / len(downloaded), 4) if downloaded else None
+    results["proxies"] = [
+        {
+            "url": p.url,
+            "fail_rate": p.fail_rate,
+            "latency": p.latency,
+            "requests": p.requests,
+            "rejected": p.rejected,
+            "peak_in_flight": p.peak_in_flight,
+            "pool": pool.get(p.url),
+        }
+        for p in forward
+    ]
+    results["quarantines"] = {
+        key[0]: value for key, value in PROXY_QUARANTINES._values.items()
+    }
+
+    text = json.dumps({
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": vars(args),
+        "results": results,
+    }, indent=2, default=str)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Bot cold start benchmark with an import-time breakdown.
+
+Starts fresh interpreters that import main and build the dispatcher, the
+work done before the first getUpdates request. Reports time to ready,
+the cost of the background downloader warm-up and, from `-X importtime`,
+the slowest modules and the import time per top-level package.
+
+Usage:
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --output benchmarks/results/startup-$(git rev-parse --short HEAD).json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from benchmarks.report import git_commit, summarize
+
+ROOT = Path(__file__).parent.parent
+
+# Modules that should only be loaded after the bot is ready
+HEAVY_MODULES = ("yt_dlp", "aiohttp.web")
+
+# Runs in the child interpreter and prints its measurements as JSON
+CHILD = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.create_dispatcher()
+ready = time.perf_counter()
+loaded = [name for name in {heavy!r} if name in sys.modules]
+from services.downloader import warm_up
+asyncio.run(warm_up())
+print(json.dumps({{
+    "import_main_seconds": imported - started,
+    "create_dispatcher_seconds": ready - imported,
+    "ready_seconds": ready - started,
+    "warm_up_seconds": time.perf_counter() - ready,
+    "heavy_modules_at_ready": loaded,
+}}))
+"""
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, float, float]]:
+    """Parse `-X importtime` output into (module, self seconds, cumulative seconds)."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = [part.strip() for part in line.removeprefix("import time:").split("|")]
+        if not fields[0].isdigit():
+            continue  # header line
+        modules.append((fields[2], int(fields[0]) / 1e6, int(fields[1]) / 1e6))
+    return modules
+
+
+def run_once(env: dict[str, str]) -> tuple[dict[str, Any], list[tuple[str, float, float]]]:
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD.format(heavy=HEAVY_MODULES)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    wall = time.perf_counter() - started
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+    # Includes interpreter startup, which the in-process timings miss
+    data["process_seconds"] = wall - data["warm_up_seconds"]
+    return data, parse_importtime(result.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--runs", type=int, default=5, help="number of cold starts")
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to list")
+    parser.add_argument("--output", type=Path, help="write JSON results to this file")
+    args = parser.parse_args()
+
+    env = {**os.environ, "TELEGRAM_BOT_TOKEN": os.environ.get("TELEGRAM_BOT_TOKEN", "0:bench")}
+    # The first run compiles bytecode, it's not a representative restart
+    run_once(env)
+
+    runs = []
+    self_times: dict[str, list[float]] = defaultdict(list)
+    for _ in range(args.runs):
+        data, modules = run_once(env)
+        runs.append(data)
+        for name, self_seconds, _ in modules:
+            self_times[name].append(self_seconds)
+
+    per_module = {name: sum(v) / len(v) for name, v in self_times.items()}
+    packages: dict[str, float] = defaultdict(float)
+    for name, seconds in per_module.items():
+        packages[name.split(".")[0]] += seconds
+
+    timings = ("process_seconds", "import_main_seconds", "create_dispatcher_seconds",
+               "ready_seconds", "warm_up_seconds")
+    result = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {"runs": args.runs, "python": sys.version.split()[0]},
+        "results": {
+            **{name: summarize([r[name] for r in runs]) for name in timings},
+            "heavy_modules_at_ready": runs[-1]["heavy_modules_at_ready"],
+            "packages_seconds": {
+                name: round(seconds, 4)
+                for name, seconds in sorted(packages.items(), key=lambda i: -i[1])[:args.top]
+            },
+            "slowest_modules_seconds": {
+                name: round(seconds, 4)
+                for name, seconds in sorted(per_module.items(), key=lambda i: -i[1])[:args.top]
+            },
+        },
+    }
+
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""Fake Telegram Bot API server for load tests."""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any
+
+import aiohttp
+from aiohttp import web
+from loguru import logger
+
+# Methods that create a new message in the chat
+SEND_METHODS = {
+    "sendMessage", "sendVideo", "sendAudio", "sendDocument", "sendPhoto", "sendAnimation",
+}
+# Methods that change an existing message
+EDIT_METHODS = {"editMessageText", "editMessageReplyMarkup", "editMessageCaption"}
+# Methods answered with a plain `true`
+TRUE_METHODS = {
+    "answerCallbackQuery", "deleteMessage", "sendChatAction", "deleteWebhook",
+    "setWebhook", "setMyCommands", "close", "logOut",
+}
+
+
+@dataclass
+class BotCall:
+    """A Bot API request made by the bot under test."""
+
+    method: str
+    params: dict[str, Any]
+    at: float = field(default_factory=time.perf_counter)
+
+    @property
+    def chat_id(self) -> int | None:
+        value = self.params.get("chat_id")
+        return int(value) if value is not None else None
+
+    @property
+    def text(self) -> str:
+        return str(self.params.get("text") or self.params.get("caption") or "")
+
+    def callback_data(self) -> list[str]:
+        """Callback data of the inline keyboard attached to the request."""
+        markup = self.params.get("reply_markup")
+        if not markup:
+            return []
+        keyboard = json.loads(markup).get("inline_keyboard", [])
+        return [button["callback_data"] for row in keyboard for button in row
+                if "callback_data" in button]
+
+
+class FakeTelegramServer:
+    """
+    Minimal Bot API implementation running on its own event loop thread.
+
+    Synthetic users push updates with ``push_update``; the bot receives them
+    through ``getUpdates`` long polling or, if ``webhook_url`` is set, as
+    webhook POSTs. Every request the bot makes is recorded and delivered to
+    the queue of the chat it targets.
+    """
+
+    def __init__(self, token: str, webhook_url: str | None = None) -> None:
+        """
+        Args:
+            token: Bot token the server accepts
+            webhook_url: Deliver updates to this URL instead of getUpdates
+        """
+        self.token = token
+        self.webhook_url = webhook_url
+        self.port = 0
+        self.calls: Counter[str] = Counter()
+        self.api_errors: Counter[str] = Counter()
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self._updates: list[dict[str, Any]] = []
+        self._updates_changed: asyncio.Event | None = None
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._chats: dict[int, asyncio.Queue[BotCall]] = {}
+        # Callback query ID -> chat, answerCallbackQuery doesn't carry the chat ID
+        self._callback_chats: dict[str, int] = {}
+        self._session: aiohttp.ClientSession | None = None
+        self._thread: threading.Thread | None = None
+        self._runner: web.AppRunner | None = None
+        self._ready = threading.Event()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="telegram-server", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def stop(self) -> None:
+        if self.loop and self._runner:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self._thread:
+            self._thread.join()
+
+    def subscribe(self, chat_id: int) -> asyncio.Queue[BotCall]:
+        """Get the queue of bot requests for a chat. Call from the server loop."""
+        return self._chats.setdefault(chat_id, asyncio.Queue())
+
+    def new_message_id(self) -> int:
+        return next(self._message_ids)
+
+    async def push_update(self, update: dict[str, Any]) -> None:
+        """Deliver an update to the bot. Call from the server loop."""
+        update = {"update_id": next(self._update_ids), **update}
+        if "callback_query" in update:
+            query = update["callback_query"]
+            self._callback_chats[query["id"]] = query["from"]["id"]
+
+        if self.webhook_url:
+            assert self._session is not None
+            async with self._session.post(self.webhook_url, json=update) as response:
+                if response.status >= 400:
+                    self.api_errors["webhook"] += 1
+            return
+
+        assert self._updates_changed is not None
+        self._updates.append(update)
+        self._updates_changed.set()
+
+    def _run(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.loop.run_until_complete(self._start_app())
+        self._ready.set()
+        self.loop.run_forever()
+
+    async def _start_app(self) -> None:
+        self._updates_changed = asyncio.Event()
+        self._session = aiohttp.ClientSession()
+        app = web.Application(client_max_size=2 * 1024**3)
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]  # type: ignore[union-attr]
+
+    async def _shutdown(self) -> None:
+        if self._session:
+            await self._session.close()
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        if request.match_info["token"] != self.token:
+            return _error(401, "Unauthorized")
+
+        form = await request.post()
+        # Uploaded files are drained by request.post(), only plain fields are kept
+        params = {key: value for key, value in form.items() if isinstance(value, str)}
+        self.calls[method] += 1
+
+        if method == "getUpdates":
+            return _ok(await self._get_updates(params))
+        if method == "getMe":
+            return _ok({"id": 1, "is_bot": True, "first_name": "Load test", "username": "load_bot"})
+        if method in TRUE_METHODS:
+            result: Any = True
+        elif method in SEND_METHODS:
+            result = self._message(params, self.new_message_id())
+        elif method in EDIT_METHODS:
+            result = self._message(params, int(params.get("message_id", 0)))
+        elif method == "sendMediaGroup":
+            media = json.loads(params.get("media", "[]"))
+            result = [self._message(params, self.new_message_id()) for _ in media]
+        else:
+            self.api_errors[method] += 1
+            logger.warning(f"Fake Bot API: unsupported method {method}")
+            return _error(404, "Not Found: method not found")
+
+        call = BotCall(method, params)
+        chat_id = call.chat_id
+        if method == "answerCallbackQuery":
+            chat_id = self._callback_chats.pop(params.get("callback_query_id", ""), None)
+        if chat_id is not None and chat_id in self._chats:
+            self._chats[chat_id].put_nowait(call)
+        return _ok(result)
+
+    async def _get_updates(self, params: dict[str, Any]) -> list[dict[str, Any]]:
+        assert self._updates_changed is not None
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", 100))
+        timeout = float(params.get("timeout", 0))
+
+        # Confirmed updates are dropped, as the real server does
+        self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        if not self._updates and timeout > 0:
+            self._updates_changed.clear()
+            try:
+                await asyncio.wait_for(self._updates_changed.wait(), timeout)
+            except TimeoutError:
+                pass
+        return self._updates[:limit]
+
+    @staticmethod
+    def _message(params: dict[str, Any], message_id: int) -> dict[str, Any]:
+        chat_id = int(params.get("chat_id", 0))
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": params.get("text") or params.get("caption") or "",
+        }
+
+
+def _ok(result: Any) -> web.Response:
+    return web.json_response({"ok": True, "result": result})
+
+
+def _error(code: int, description: str) -> web.Response:
+    return web.json_response(
+        {"ok": False, "error_code": code, "description": description}, status=code
+    )
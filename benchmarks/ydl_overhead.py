@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Per-request yt-dlp overhead with and without the YoutubeDL pool.
+
+Runs extractions through the downloader's real code path (options,
+YoutubeDL creation or checkout, extract_info) against a stub extractor that
+makes one HTTP request to a local server. Instances are created with all
+default extractors registered, like in production, so the numbers include
+option processing and extractor setup. Reports wall and CPU time per
+request and the number of TCP connections opened.
+
+Usage:
+    python -m benchmarks.ydl_overhead --requests 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "0:benchmark")
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import yt_dlp
+from loguru import logger
+from yt_dlp.extractor.common import InfoExtractor
+
+from benchmarks.media import MediaServer
+from benchmarks.report import git_commit, summarize
+from services import downloader
+
+
+class MetadataIE(InfoExtractor):  # type: ignore[misc]
+    """Extractor fetching video metadata as JSON from the local server."""
+
+    IE_NAME = "stub:metadata"
+    _VALID_URL = r"https?://(?:www\.)?youtube\.com/watch\?v=(?P<id>[\w-]{11})"
+    base_url = ""
+
+    def _real_extract(self, url: str) -> dict[str, Any]:
+        video_id = self._match_id(url)
+        data = self._download_json(f"{self.base_url}/video.json", video_id)
+        return {"id": video_id, "title": data["title"], "duration": data["duration"],
+                "formats": [{"url": f"{self.base_url}/video.json", "format_id": "18",
+                             "ext": "mp4"}]}
+
+
+def new_ydl(ydl_opts: dict[str, Any]) -> yt_dlp.YoutubeDL:
+    ydl = yt_dlp.YoutubeDL(ydl_opts)
+    # Put the stub in front of the ~1800 default extractors (the generic one matches anything)
+    stub = MetadataIE()
+    stub.set_downloader(ydl)
+    ydl._ies = {stub.ie_key(): stub, **ydl._ies}
+    ydl._ies_instances[stub.ie_key()] = stub
+    return ydl
+
+
+def measure(server: MediaServer, requests: int, max_idle: int) -> dict[str, Any]:
+    downloader.ydl_pool.max_idle = max_idle
+    downloader.clear_ydl_cache()
+    server.connections.clear()
+
+    url = "https://www.youtube.com/watch?v=benchmark01"
+    opts = downloader._get_primary_ydl_opts()
+    # Not measured: first import of extractor classes
+    downloader._extract_info_sync(url, opts)
+
+    wall, cpu = [], []
+    for _ in range(requests):
+        started, cpu_started = time.perf_counter(), time.process_time()
+        downloader._extract_info_sync(url, downloader._get_primary_ydl_opts())
+        wall.append(time.perf_counter() - started)
+        cpu.append(time.process_time() - cpu_started)
+
+    downloader.clear_ydl_cache()
+    return {
+        "seconds_per_request": summarize(wall),
+        "cpu_seconds_per_request": summarize(cpu),
+        "tcp_connections": len(server.connections),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--requests", type=int, default=200, help="extractions per mode")
+    parser.add_argument("--output", type=Path, help="write JSON results to this file")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    directory = Path(tempfile.mkdtemp(prefix="sft-ydl-"))
+    (directory / "video.json").write_text(json.dumps({"title": "Benchmark", "duration": 60}))
+    server = MediaServer(directory)
+    server.start()
+    MetadataIE.base_url = server.base_url
+    downloader._new_ydl = new_ydl
+
+    handlers = list(yt_dlp.YoutubeDL({"quiet": True})._request_director.handlers)
+    try:
+        results: dict[str, Any] = {
+            "http_handlers": handlers,
+            "new_instance": measure(server, args.requests, max_idle=0),
+            "pooled": measure(server, args.requests, max_idle=4),
+        }
+    finally:
+        server.stop()
+
+    before = results["new_instance"]["seconds_per_request"]["mean"]
+    after = results["pooled"]["seconds_per_request"]["mean"]
+    results["speedup"] = round(before / after, 2) if after else 0
+    text = json.dumps({
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": vars(args),
+        "results": results,
+    }, indent=2, default=str)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 """Bot handlers package."""
 
-from . import download, start
+from . import admin, batch, download, search, start
 
-__all__ = ["start", "download"]
+__all__ = ["start", "admin", "batch", "search", "download"]
@@ -0,0 +1,108 @@
+"""Admin commands: runtime diagnostics, usage statistics and settings reload."""
+
+from aiogram import F, Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+from loguru import logger
+from pydantic import ValidationError
+
+from config import reload_settings, settings
+from database import history
+from database.stats import Bucket
+from services.file_manager import format_file_size
+from services.tracing import PROFILING_MODES, get_profiling, set_profiling
+
+router = Router(name="admin")
+
+# Admin IDs are checked on every message, so changes to settings apply immediately
+router.message.filter(F.from_user.func(lambda user: user.id in settings.admin_ids))
+
+
+@router.message(Command("profile"))
+async def cmd_profile(message: Message, command: CommandObject) -> None:
+    """
+    Switch profiling of sampled jobs.
+
+    Usage:
+        /profile - show current mode
+        /profile off
+        /profile cprofile 0.1
+        /profile tracemalloc 0.05
+    """
+    args = (command.args or "").split()
+
+    if args:
+        mode = args[0].lower()
+        try:
+            rate = float(args[1]) if len(args) > 1 else 0.1
+            set_profiling(mode, rate)
+        except ValueError:
+            await message.answer(
+                "❌ Использование: /profile [off|cprofile|tracemalloc] [доля 0..1]"
+            )
+            return
+
+    mode, rate = get_profiling()
+    status = "выключено" if mode == "off" else f"{mode}, {rate:.0%} задач"
+    await message.answer(
+        f"🔬 <b>Профилирование:</b> {status}\n\n"
+        f"Режимы: {', '.join(PROFILING_MODES)}\n"
+        f"Профили сохраняются в <code>{settings.profile_dir}</code>",
+        parse_mode="HTML",
+    )
+
+
+@router.message(Command("stats"))
+async def cmd_stats(message: Message) -> None:
+    """Usage statistics, from the aggregates kept in memory (no database query)."""
+    if not history.enabled:
+        await message.answer("📊 История скачиваний выключена (DATABASE_PATH не задан)")
+        return
+
+    totals = history.stats.totals
+    lines = [
+        "📊 <b>Статистика</b>\n",
+        f"👥 Пользователей: {totals.users}",
+        f"⏬ Скачиваний: {totals.downloads} (✅ {totals.completed}, ❌ {totals.failed})",
+        f"💾 Отправлено: {format_file_size(totals.bytes)}",
+    ]
+    for title, hours in (("За 24 часа", 24), ("За 7 дней", 7 * 24)):
+        lines.append(f"\n<b>{title}:</b>\n{_format_window(history.stats.window(hours))}")
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
+
+@router.message(Command("reload"))
+async def cmd_reload(message: Message) -> None:
+    """Re-read the environment and .env and apply the changed settings (same as SIGHUP)."""
+    try:
+        applied, pending = await reload_settings()
+    except ValidationError as e:
+        logger.error(f"Settings reload rejected: {e}")
+        await message.answer(
+            f"❌ Настройки не применены, ошибка в значениях: {e.error_count()}\n"
+            "Подробности в логе"
+        )
+        return
+
+    # Only names: values such as proxy URLs may contain credentials
+    lines = ["🔄 <b>Настройки перечитаны</b>\n"]
+    if applied:
+        lines.append("Применено: " + ", ".join(f"<code>{name}</code>" for name in sorted(applied)))
+    else:
+        lines.append("Изменений нет")
+    if pending:
+        lines.append(
+            "Нужен перезапуск: " + ", ".join(f"<code>{name}</code>" for name in sorted(pending))
+        )
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
+
+def _format_window(bucket: Bucket) -> str:
+    average = f"{bucket.seconds / bucket.completed:.0f} с" if bucket.completed else "—"
+    return (
+        f"👥 Активных пользователей: {len(bucket.users)}\n"
+        f"⏬ Скачиваний: {bucket.downloads} (🎬 {bucket.video}, 🎵 {bucket.audio})\n"
+        f"✅ Успешно: {bucket.completed}, ❌ ошибок: {bucket.failed}\n"
+        f"💾 Отправлено: {format_file_size(bucket.bytes)}\n"
+        f"⏱ Среднее время: {average}"
+    )
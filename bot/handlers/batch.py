@@ -0,0 +1,204 @@
+"""Batch handler: several links or a playlist in one message."""
+
+import time
+from html import escape
+from typing import TYPE_CHECKING
+
+from aiogram import F, Router
+from aiogram.types import (
+    CallbackQuery,
+    FSInputFile,
+    InputMediaAudio,
+    InputMediaVideo,
+    Message,
+)
+from loguru import logger
+
+from bot.handlers.download import downloader, file_manager
+from bot.keyboards.inline import get_batch_keyboard
+from config import on_change, settings
+from services.batch import BatchItem, BatchJob, BatchPipeline
+from services.metrics import ACTIVE_JOBS, UPLOAD_SECONDS
+from services.tracing import finish_trace, pause_trace, span, start_trace, use_trace
+from services.validators import extract_youtube_urls, is_playlist_url
+
+if TYPE_CHECKING:
+    from aiogram.types import MediaUnion
+
+router = Router(name="batch")
+
+pipeline = BatchPipeline(downloader)
+
+
+@on_change("job_store_max_size", "job_ttl_seconds")
+def _resize_batch_store() -> None:
+    pipeline.resize(settings.job_store_max_size, settings.job_ttl_seconds)
+
+
+# Telegram limits message edits, the status is refreshed at most this often
+STATUS_INTERVAL = 3.0
+# Titles listed on the batch card
+CARD_TITLES = 10
+
+
+def is_batch_message(text: str) -> bool:
+    """Whether a message has several links or a playlist link."""
+    urls = extract_youtube_urls(text)
+    return len(urls) > 1 or any(is_playlist_url(url) for url in urls)
+
+
+@router.message(F.text.func(is_batch_message))
+async def handle_batch_message(message: Message) -> None:
+    """Collect the videos of a message and ask for the format of the whole batch."""
+    text = message.text or ""
+    user_id = message.from_user.id if message.from_user else message.chat.id
+    status_msg = await message.answer("🔍 Собираю список видео...")
+
+    trace = start_trace("batch", user_id=user_id)
+    with span("collect"):
+        items = await pipeline.collect(extract_youtube_urls(text))
+    if not items:
+        await finish_trace(trace)
+        await status_msg.edit_text(
+            "❌ Не удалось получить список видео\n\n"
+            "Проверь ссылки или попробуй позже"
+        )
+        return
+
+    batch = pipeline.create(user_id, items)
+    batch.trace = trace
+    trace.attributes["items"] = len(items)
+    # Until the format is chosen, which may never happen
+    pause_trace(trace)
+
+    lines = [
+        f"{i}. {escape(item.title or item.url)}"
+        for i, item in enumerate(items[:CARD_TITLES], 1)
+    ]
+    if len(items) > CARD_TITLES:
+        lines.append(f"… и ещё {len(items) - CARD_TITLES}")
+    await status_msg.edit_text(
+        f"📦 <b>Найдено видео: {len(items)}</b>\n\n"
+        + "\n".join(lines)
+        + "\n\nВыбери формат для всех:",
+        parse_mode="HTML",
+        reply_markup=get_batch_keyboard(batch.token),
+    )
+
+
+@router.callback_query(F.data.startswith("batch:"))
+async def handle_batch_download(callback: CallbackQuery) -> None:
+    """Download all videos of a batch in the chosen format."""
+    await callback.answer()
+    message = callback.message
+    if not isinstance(message, Message) or not callback.data:
+        return
+
+    _, kind, token = callback.data.split(":", 2)
+    batch = pipeline.get(token)
+    if batch is None or batch.kind is not None:
+        await message.edit_text("⌛ Список устарел. Отправь ссылки заново.")
+        return
+    user_id = callback.from_user.id
+    if pipeline.is_running(user_id):
+        await message.answer("⏳ Дождись окончания предыдущего списка")
+        return
+
+    use_trace(batch.trace)
+    last_update = 0.0
+
+    async def on_progress(batch: BatchJob) -> None:
+        nonlocal last_update
+        now = time.monotonic()
+        if now - last_update < STATUS_INTERVAL:
+            return
+        last_update = now
+        await message.edit_text(_format_status(batch))
+
+    async def deliver(items: list[BatchItem]) -> None:
+        with span("upload", items=len(items)), UPLOAD_SECONDS.time(kind=f"batch_{kind}"):
+            if len(items) == 1:
+                item = items[0]
+                if kind == "audio":
+                    await message.answer_audio(_input_file(item), title=item.title or None)
+                else:
+                    await message.answer_video(
+                        _input_file(item),
+                        caption=item.title or None,
+                        duration=item.duration or None,
+                        supports_streaming=True,
+                    )
+                return
+
+            media: list[MediaUnion]
+            if kind == "audio":
+                media = [
+                    InputMediaAudio(media=_input_file(item), title=item.title or None)
+                    for item in items
+                ]
+            else:
+                media = [
+                    InputMediaVideo(
+                        media=_input_file(item),
+                        caption=item.title or None,
+                        duration=item.duration or None,
+                        supports_streaming=True,
+                    )
+                    for item in items
+                ]
+            await message.answer_media_group(media)
+
+    ACTIVE_JOBS.inc(kind="batch")
+    try:
+        with span("batch", kind=kind):
+            await pipeline.run(
+                batch,
+                kind,
+                file_manager.get_user_temp_dir(user_id),
+                deliver,
+                on_progress,
+            )
+        await message.edit_text(_format_status(batch, final=True))
+        logger.info(
+            f"Batch {batch.token} sent to user {user_id}: "
+            f"{batch.count('done')}/{len(batch.items)} items"
+        )
+    except Exception as e:  # noqa: BLE001 - the user is told the batch failed
+        logger.error(f"Error running batch {batch.token}: {e}")
+        await message.edit_text(
+            "❌ Произошла ошибка при скачивании списка\n\n"
+            "Попробуй ещё раз позже"
+        )
+    finally:
+        ACTIVE_JOBS.dec(kind="batch")
+        if batch.trace:
+            await finish_trace(batch.trace)
+
+
+def _input_file(item: BatchItem) -> FSInputFile:
+    """Upload of a downloaded item."""
+    assert item.path is not None
+    return FSInputFile(item.path)
+
+
+def _format_status(batch: BatchJob, final: bool = False) -> str:
+    """Aggregated status of a batch, like "⏬ Скачиваю: 3 из 10 ▓▓▓░░░░░░░"."""
+    total = len(batch.items)
+    done = batch.count("done")
+    failed = batch.count("failed")
+    finished = done + failed
+
+    if final:
+        text = f"✅ Готово: {done} из {total}"
+    else:
+        filled = round(finished / total * 10) if total else 0
+        text = (
+            f"⏬ Скачиваю: {finished} из {total}\n"
+            f"{'▓' * filled}{'░' * (10 - filled)}"
+        )
+    if failed:
+        failed_titles = [item.title or item.url for item in batch.items if item.status == "failed"]
+        text += f"\n\n❌ Не удалось скачать ({failed}):\n" + "\n".join(
+            f"• {title}" for title in failed_titles[:CARD_TITLES]
+        )
+    return text
@@ -1,19 +1,60 @@
 """Download handler for processing YouTube URLs and downloading media."""
 
+import asyncio
+import json
+from html import escape
+from pathlib import Path
+from typing import Any
+
 from aiogram import F, Router
 from aiogram.types import CallbackQuery, FSInputFile, Message
 from loguru import logger
 
 from bot.keyboards.inline import get_format_keyboard
-from services.downloader import DownloaderService
+from config import on_change, settings
+from database import history
+from services.downloader import DownloaderService, VideoUnavailableError, parse_quality
 from services.file_manager import FileManager
-from services.validators import is_youtube_url
+from services.job_store import JobContext, JobStore
+from services.metrics import ACTIVE_JOBS, PROBE_SECONDS, UPLOAD_SECONDS
+from services.speculative import SpeculativeEngine
+from services.tracing import (
+    current_trace,
+    finish_trace,
+    pause_trace,
+    span,
+    start_trace,
+    use_trace,
+)
+from services.validators import extract_video_id, is_youtube_url, parse_clip
 
 router = Router(name="download")
 
 # Initialize services
 downloader = DownloaderService()
 file_manager = FileManager()
+job_store = JobStore()
+speculative = SpeculativeEngine(downloader)
+
+
+@on_change("job_store_max_size", "job_ttl_seconds")
+def _resize_job_store() -> None:
+    job_store.resize(settings.job_store_max_size, settings.job_ttl_seconds)
+
+
+@on_change("speculative_max_jobs")
+def _resize_speculative_executor() -> None:
+    speculative.resize_executor()
+
+
+# User-facing explanations of permanent failures (see services.downloader.classify_error)
+UNAVAILABLE_REASONS = {
+    "private": "🔒 Это приватное видео",
+    "removed": "🗑 Видео удалено или недоступно",
+    "age_restricted": "🔞 Видео с возрастным ограничением",
+    "geo_blocked": "🌍 Видео недоступно в нашем регионе",
+    "members_only": "💳 Видео доступно только спонсорам канала",
+}
 
 
 @router.message(F.text)
@@ -22,7 +63,8 @@ async def handle_text_message(message: Message) -> None:
     Handle text messages - check if it's a YouTube URL.
 
     If URL is valid, show video info and format selection buttons.
-    Otherwise, prompt user to send a YouTube link.
+    Otherwise, prompt user to send a YouTube link. Times after the URL
+    (or ``t=`` in it) request a clip instead of the whole video.
     """
     text = message.text or ""
 
@@ -40,29 +82,28 @@ async def handle_text_message(message: Message) -> None:
     # Show "processing" message
     status_msg = await message.answer("🔍 Получаю информацию о видео...")
 
+    url = text.split(maxsplit=1)[0]
+    user_id = message.from_user.id if message.from_user else message.chat.id
+    trace = start_trace("job", user_id=user_id, url=url)
+
     try:
-        # Get video info
-        video_info = await downloader.get_video_info(text)
-
-        # Format duration
-        duration_str = _format_duration(video_info.get("duration", 0))
-
-        # Prepare info message with hidden URL (using zero-width space)
-        info_text = (
-            f"📹 <b>{video_info.get('title', 'Без названия')}</b>\n\n"
-            f"⏱ Длительность: {duration_str}\n"
-            f"👤 Автор: {video_info.get('uploader', 'Неизвестно')}\n\n"
-            f"Выбери формат для скачивания:\n"
-            f"<span class='tg-spoiler'>{text}</span>"  # Hidden URL in spoiler
-        )
+        # Get basic video info, formats are resolved only when needed
+        with span("preview"):
+            video_info = await downloader.get_video_preview(url)
 
-        # Send info with format selection keyboard
-        await status_msg.edit_text(info_text, parse_mode="HTML", reply_markup=get_format_keyboard(text))
+        clip = _fit_clip(parse_clip(text), video_info.get("duration"))
+        await start_job(status_msg, url, user_id, video_info, clip)
 
-        # Store URL in callback data context (will be available in callback)
-        # For ULTRA-MVP we'll use message text to retrieve URL
+    except VideoUnavailableError as e:
+        await finish_trace(trace)
+        logger.info(f"Video unavailable ({e.reason}): {text}")
+        await status_msg.edit_text(
+            f"❌ {UNAVAILABLE_REASONS.get(e.reason, 'Видео недоступно')}\n\n"
+            "Попробуй другую ссылку"
+        )
 
     except Exception as e:
+        await finish_trace(trace)
         logger.error(f"Error getting video info: {e}")
         await status_msg.edit_text(
             "❌ Не удалось получить информацию о видео\n\n"
@@ -74,62 +115,110 @@ async def handle_text_message(message: Message) -> None:
         )
 
 
-@router.callback_query(F.data == "dl:video")
+async def start_job(
+    status_msg: Message,
+    url: str,
+    user_id: int,
+    video_info: dict[str, Any],
+    clip: tuple[float, float | None] | None = None,
+) -> JobContext:
+    """
+    Register a job for a previewed video and show its preview card.
+
+    Also used by other handlers that already have the video's metadata
+    (e.g. search results), which then skip the preview extraction.
+
+    Args:
+        status_msg: Bot message to turn into the preview card
+        url: YouTube video URL
+        user_id: Telegram user ID of the job owner
+        video_info: Preview metadata (see DownloaderService.get_video_preview())
+        clip: Part of the video to download, None for the whole video
+
+    Returns:
+        The new job
+    """
+    # Remember the resolved video so the buttons don't need to carry the URL
+    video_id = video_info.get("id") or extract_video_id(url) or ""
+    job = job_store.create(url, video_id, user_id, video_info)
+    job.trace = current_trace()
+    job.clip = clip
+    if settings.prefetch_formats:
+        job.info_task = asyncio.create_task(downloader.resolve_formats(url))
+        # Failures are reported by job.get_full_info() if the user clicks a button
+        job.info_task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    # Send info with format selection keyboard
+    await _show_preview(status_msg, job)
+
+    # Use the idle time until the click to fetch the most likely format
+    if job.clip is None:
+        speculative.start(job)
+    # Most cards are never clicked, their trace is never finished
+    pause_trace(job.trace)
+    return job
+
+
+@router.callback_query(F.data.startswith("dl:video:"))
 async def handle_video_download(callback: CallbackQuery) -> None:
-    """Handle video format selection and download."""
+    """
+    Handle video format selection and download.
+
+    Callback data is "dl:video:<token>" for the default quality or
+    "dl:video:<quality>:<token>" for a quality picked from the ladder.
+    """
     await callback.answer()
 
-    # Extract URL from message text (hidden in spoiler)
-    if not callback.message or not callback.message.text:
-        await callback.message.edit_text("❌ Не удалось найти ссылку. Отправь её заново.")
+    found = await _get_job(callback)
+    if not found:
         return
-    
-    # Extract URL from spoiler tag in message
-    import re
-    url_match = re.search(r'https?://[^\s<]+', callback.message.text)
-    if not url_match:
-        await callback.message.edit_text("❌ Не удалось найти ссылку. Отправь её заново.")
-        return
-    
-    url = url_match.group(0)
+    job, message = found
+
+    use_trace(job.trace)
+    url = job.url
     user_id = callback.from_user.id
+    parts = (callback.data or "").split(":")
+    quality = parts[2] if len(parts) == 4 else None
 
     # Update message to show download progress
-    await callback.message.edit_text("⏬ Скачиваю видео...\n\n⏳ Это может занять некоторое время")
+    await message.edit_text("⏬ Скачиваю видео...\n\n⏳ Это может занять некоторое время")
 
+    ACTIVE_JOBS.inc(kind="video")
+    download_id = history.start_download(
+        user_id, url, job.info, "video", quality or settings.default_quality
+    )
     temp_file = None
     try:
         # Create user temp directory
         user_temp_dir = file_manager.get_user_temp_dir(user_id)
 
-        # Download video
-        temp_file = await downloader.download_video(url, user_temp_dir)
-
-        logger.info(f"Video downloaded: {temp_file}")
+        # Download video (or pick up the speculative download)
+        speculative.record_choice(user_id, "video")
+        with span("download_video", quality=quality or settings.default_quality):
+            temp_file = None
+            if quality is None:
+                temp_file = await speculative.claim(job.token, "video")
+            else:
+                # Speculation fetches the default quality
+                speculative.cancel(job.token)
+            if temp_file is None:
+                full_info = await job.get_full_info()
+                temp_file = await downloader.download_video(
+                    url, user_temp_dir, full_info, clip=job.clip, quality=quality
+                )
+
+        logger.debug(f"Video downloaded: {temp_file}")
 
         # Update message
-        await callback.message.edit_text("📤 Отправляю видео...")
+        await message.edit_text("📤 Отправляю видео...")
+        file_size = await file_manager.get_file_size(temp_file)
+        history.update_download(download_id, "uploading", file_size_bytes=file_size)
 
         # Extract video metadata for Telegram
-        import subprocess
-        import json
         try:
-            ffprobe_result = subprocess.run(
-                [
-                    "ffprobe",
-                    "-v", "quiet",
-                    "-print_format", "json",
-                    "-show_format",
-                    "-show_streams",
-                    str(temp_file)
-                ],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                check=True
-            )
-            video_metadata = json.loads(ffprobe_result.stdout)
-            
+            with span("probe"), PROBE_SECONDS.time():
+                video_metadata = await _probe(temp_file)
+
             # Find video stream
             video_stream = next(
                 (s for s in video_metadata.get("streams", []) if s.get("codec_type") == "video"),
@@ -140,30 +229,33 @@ async def handle_video_download(callback: CallbackQuery) -> None:
             height = video_stream.get("height", 0)
             duration = int(float(video_metadata.get("format", {}).get("duration", 0)))
             
-            logger.info(f"Video metadata: {width}x{height}, duration: {duration}s")
+            logger.debug(f"Video metadata: {width}x{height}, duration: {duration}s")
         except Exception as e:
             logger.warning(f"Could not extract video metadata: {e}")
             width = height = duration = 0
 
         # Send video to user with proper parameters
         video_file = FSInputFile(temp_file)
-        await callback.message.answer_video(
-            video=video_file,
-            caption="✅ Видео готово!",
-            supports_streaming=True,
-            width=width if width > 0 else None,
-            height=height if height > 0 else None,
-            duration=duration if duration > 0 else None
-        )
+        with span("upload"), UPLOAD_SECONDS.time(kind="video"):
+            await message.answer_video(
+                video=video_file,
+                caption="✅ Видео готово!",
+                supports_streaming=True,
+                width=width if width > 0 else None,
+                height=height if height > 0 else None,
+                duration=duration if duration > 0 else None
+            )
+        history.update_download(download_id, "completed", file_size_bytes=file_size)
 
-        # Delete status message
-        await callback.message.delete()
+        # Bring the card back, so the other format can be requested from the cached source
+        await _show_preview(message, job)
 
         logger.info(f"Video sent to user {user_id}")
 
     except Exception as e:
         logger.error(f"Error downloading video: {e}")
-        await callback.message.edit_text(
+        history.update_download(download_id, "failed", error_message=str(e))
+        await message.edit_text(
             "❌ Произошла ошибка при скачивании видео\n\n"
             "Возможные причины:\n"
             "• Файл слишком большой (>2 ГБ)\n"
@@ -173,60 +265,74 @@ async def handle_video_download(callback: CallbackQuery) -> None:
         )
 
     finally:
+        ACTIVE_JOBS.dec(kind="video")
+        # Still unfinished only if the job was cancelled (drain on shutdown)
+        history.update_download(download_id, "cancelled")
         # Cleanup: always delete temporary file
         if temp_file:
-            await file_manager.cleanup_file(temp_file)
-            logger.info(f"Cleaned up temp file: {temp_file}")
+            with span("cleanup"):
+                await file_manager.cleanup_file(temp_file)
+            logger.debug(f"Cleaned up temp file: {temp_file}")
+        if job.trace:
+            await finish_trace(job.trace)
 
 
-@router.callback_query(F.data == "dl:audio")
+@router.callback_query(F.data.startswith("dl:audio:"))
 async def handle_audio_download(callback: CallbackQuery) -> None:
     """Handle audio format selection and download."""
     await callback.answer()
 
-    # Extract URL from message text (hidden in spoiler)
-    if not callback.message or not callback.message.text:
-        await callback.message.edit_text("❌ Не удалось найти ссылку. Отправь её заново.")
+    found = await _get_job(callback)
+    if not found:
         return
-    
-    # Extract URL from spoiler tag in message
-    import re
-    url_match = re.search(r'https?://[^\s<]+', callback.message.text)
-    if not url_match:
-        await callback.message.edit_text("❌ Не удалось найти ссылку. Отправь её заново.")
-        return
-    
-    url = url_match.group(0)
+    job, message = found
+
+    use_trace(job.trace)
+    url = job.url
     user_id = callback.from_user.id
 
     # Update message to show download progress
-    await callback.message.edit_text("⏬ Скачиваю аудио...\n\n⏳ Это может занять некоторое время")
+    await message.edit_text("⏬ Скачиваю аудио...\n\n⏳ Это может занять некоторое время")
 
+    ACTIVE_JOBS.inc(kind="audio")
+    download_id = history.start_download(user_id, url, job.info, "audio", "audio")
     temp_file = None
     try:
         # Create user temp directory
         user_temp_dir = file_manager.get_user_temp_dir(user_id)
 
-        # Download audio
-        temp_file = await downloader.download_audio(url, user_temp_dir)
+        # Download audio (or pick up the speculative download)
+        speculative.record_choice(user_id, "audio")
+        with span("download_audio"):
+            temp_file = await speculative.claim(job.token, "audio")
+            if temp_file is None:
+                full_info = await job.get_full_info()
+                temp_file = await downloader.download_audio(
+                    url, user_temp_dir, full_info, clip=job.clip
+                )
 
-        logger.info(f"Audio downloaded: {temp_file}")
+        logger.debug(f"Audio downloaded: {temp_file}")
 
         # Update message
-        await callback.message.edit_text("📤 Отправляю аудио...")
+        await message.edit_text("📤 Отправляю аудио...")
+        file_size = await file_manager.get_file_size(temp_file)
+        history.update_download(download_id, "uploading", file_size_bytes=file_size)
 
         # Send audio to user
         audio_file = FSInputFile(temp_file)
-        await callback.message.answer_audio(audio=audio_file, caption="✅ Аудио готово!")
+        with span("upload"), UPLOAD_SECONDS.time(kind="audio"):
+            await message.answer_audio(audio=audio_file, caption="✅ Аудио готово!")
+        history.update_download(download_id, "completed", file_size_bytes=file_size)
 
-        # Delete status message
-        await callback.message.delete()
+        # Bring the card back, so the other format can be requested from the cached source
+        await _show_preview(message, job)
 
         logger.info(f"Audio sent to user {user_id}")
 
     except Exception as e:
         logger.error(f"Error downloading audio: {e}")
-        await callback.message.edit_text(
+        history.update_download(download_id, "failed", error_message=str(e))
+        await message.edit_text(
             "❌ Произошла ошибка при скачивании аудио\n\n"
             "Возможные причины:\n"
             "• Файл слишком большой (>2 ГБ)\n"
@@ -236,10 +342,159 @@ async def handle_audio_download(callback: CallbackQuery) -> None:
         )
 
     finally:
+        ACTIVE_JOBS.dec(kind="audio")
+        # Still unfinished only if the job was cancelled (drain on shutdown)
+        history.update_download(download_id, "cancelled")
         # Cleanup: always delete temporary file
         if temp_file:
-            await file_manager.cleanup_file(temp_file)
-            logger.info(f"Cleaned up temp file: {temp_file}")
+            with span("cleanup"):
+                await file_manager.cleanup_file(temp_file)
+            logger.debug(f"Cleaned up temp file: {temp_file}")
+        if job.trace:
+            await finish_trace(job.trace)
+
+
+@router.callback_query(F.data.startswith("clip:off:"))
+async def handle_clip_off(callback: CallbackQuery) -> None:
+    """Switch a clip job back to downloading the whole video."""
+    await callback.answer()
+
+    found = await _get_job(callback)
+    if not found:
+        return
+    job, message = found
+
+    job.clip = None
+    await _show_preview(message, job)
+    speculative.start(job)
+
+
+async def _show_preview(message: Message, job: JobContext) -> None:
+    """Render the preview card of a job with its format selection keyboard."""
+    video_info = job.info
+    duration_str = _format_duration(video_info.get("duration", 0))
+
+    renditions = video_info.get("renditions") or []
+    clip_line = ""
+    if job.clip is not None:
+        start, end = job.clip
+        end_str = _format_duration(int(end)) if end is not None else "конец"
+        clip_line = f"✂️ Фрагмент: {_format_duration(int(start))}–{end_str}\n"
+        renditions = _clip_renditions(renditions, job.clip, video_info.get("duration"))
+
+    legend = ""
+    if renditions:
+        legend = "⚡ — без перекодирования, ⚙️ — с перекодированием\n"
+
+    info_text = (
+        f"📹 <b>{escape(video_info.get('title', 'Без названия'))}</b>\n\n"
+        f"⏱ Длительность: {duration_str}\n"
+        f"{clip_line}"
+        f"👤 Автор: {escape(video_info.get('uploader', 'Неизвестно'))}\n\n"
+        f"{legend}"
+        f"Выбери формат для скачивания:"
+    )
+    keyboard = get_format_keyboard(
+        job.token,
+        clip=job.clip is not None,
+        renditions=renditions,
+        default_quality=_default_quality(renditions),
+    )
+    await message.edit_text(info_text, parse_mode="HTML", reply_markup=keyboard)
+
+
+def _default_quality(renditions: list[dict[str, Any]]) -> str | None:
+    """
+    Quality the default button gets: the highest offered up to settings.default_quality.
+
+    Short videos with a progressive file of at least settings.progressive_min_quality
+    get that file instead (see services.downloader._select_progressive()).
+    """
+    limit = parse_quality(None)
+    fitting = [r for r in renditions if limit is None or _rendition_side(r) <= limit]
+    fast = [
+        r for r in fitting
+        if r.get("progressive") and settings.progressive_min_quality
+        and _rendition_side(r) >= settings.progressive_min_quality
+    ]
+    if fast:
+        return str(fast[-1]["quality"])
+    return str(fitting[-1]["quality"]) if fitting else None
+
+
+def _rendition_side(rendition: dict[str, Any]) -> int:
+    """Short side of the frame of a rendition, from its quality like "720p"."""
+    return parse_quality(rendition["quality"]) or 0
+
+
+def _clip_renditions(
+    renditions: list[dict[str, Any]], clip: tuple[float, float | None], duration: float | None
+) -> list[dict[str, Any]]:
+    """Ladder of a clip: sizes scaled to its length, always encoded (the cut needs it)."""
+    start, end = clip
+    share = ((end or duration or 0) - start) / duration if duration else None
+    return [
+        {
+            **r,
+            "size": int(r["size"] * share) if r["size"] and share else None,
+            "remux": False,
+            "progressive": False,
+        }
+        for r in renditions
+    ]
+
+
+def _fit_clip(
+    clip: tuple[float, float | None] | None, duration: float | None
+) -> tuple[float, float | None] | None:
+    """Clamp a requested clip to the video; None if it doesn't cut anything off."""
+    if clip is None or not duration:
+        return clip
+    start, end = clip
+    end = None if end is None or end >= duration else end
+    if start >= duration or (start == 0 and end is None):
+        return None
+    return start, end
+
+
+async def _probe(path: Path) -> dict[str, Any]:
+    """Streams and format of a media file, from ffprobe run without blocking the loop."""
+    process = await asyncio.create_subprocess_exec(
+        "ffprobe",
+        "-v", "quiet",
+        "-print_format", "json",
+        "-show_format",
+        "-show_streams",
+        str(path),
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(f"ffprobe failed: {stderr.decode(errors='replace').strip()}")
+    metadata: dict[str, Any] = json.loads(stdout)
+    return metadata
+
+
+async def _get_job(callback: CallbackQuery) -> tuple[JobContext, Message] | None:
+    """
+    Resolve the job referenced by callback data like "dl:video:<token>".
+
+    Notifies the user and returns None if the job is unknown or expired.
+
+    Returns:
+        The job and the message of its preview card
+    """
+    if not isinstance(callback.message, Message) or not callback.data:
+        return None
+
+    token = callback.data.rsplit(":", 1)[-1]
+    job = job_store.get(token)
+    if not job:
+        await callback.message.edit_text("⌛ Ссылка устарела. Отправь её заново.")
+        return None
+
+    return job, callback.message
 
 
 def _format_duration(seconds: int) -> str:
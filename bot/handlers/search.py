@@ -0,0 +1,195 @@
+"""Search handler: text that isn't a link is searched on YouTube."""
+
+from html import escape
+from typing import Any
+
+from aiogram import F, Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import CallbackQuery, Message
+from loguru import logger
+
+from bot.handlers.download import _format_duration, downloader, start_job
+from bot.keyboards.inline import get_search_keyboard
+from config import on_change, settings
+from services.tracing import finish_trace, start_trace
+from services.youtube_search import SearchResults, YoutubeSearch
+
+router = Router(name="search")
+
+search = YoutubeSearch(downloader)
+
+
+@on_change("search_cache_max_size", "search_cache_ttl_seconds", "job_ttl_seconds")
+def _resize_search_cache() -> None:
+    search.resize(
+        settings.search_cache_max_size, settings.search_cache_ttl_seconds, settings.job_ttl_seconds
+    )
+
+
+MIN_QUERY_LENGTH = 2
+MAX_QUERY_LENGTH = 200
+
+
+def is_search_query(text: str) -> bool:
+    """Whether a message should be searched: plain text, not a command or a link."""
+    text = text.strip()
+    lowered = text.lower()
+    return (
+        MIN_QUERY_LENGTH <= len(text) <= MAX_QUERY_LENGTH
+        and not text.startswith("/")
+        and "://" not in text
+        and "youtube.com/" not in lowered
+        and "youtu.be/" not in lowered
+    )
+
+
+@router.message(Command("search"))
+async def cmd_search(message: Message, command: CommandObject) -> None:
+    """Search YouTube: /search <query>."""
+    query = (command.args or "").strip()
+    if not is_search_query(query):
+        await message.answer(
+            "🔍 Отправь текст для поиска видео на YouTube\n\n"
+            "Например:\n"
+            "• lofi hip hop radio\n"
+            "• /search как готовить пасту"
+        )
+        return
+    await _search(message, query)
+
+
+@router.message(F.text.func(is_search_query))
+async def handle_search_query(message: Message) -> None:
+    """Search YouTube for a plain text message."""
+    await _search(message, message.text or "")
+
+
+@router.callback_query(F.data.startswith("search:page:"))
+async def handle_search_page(callback: CallbackQuery) -> None:
+    """Show another page of cached search results."""
+    await callback.answer()
+    message = callback.message
+    if not isinstance(message, Message) or not callback.data:
+        return
+
+    _, _, token, page = callback.data.split(":")
+    results = await _get_results(message, token)
+    if results is None:
+        return
+    await _show_page(message, results, int(page))
+
+
+@router.callback_query(F.data.startswith("search:pick:"))
+async def handle_search_pick(callback: CallbackQuery) -> None:
+    """Open the preview card of a search result, from the metadata of the search."""
+    await callback.answer()
+    message = callback.message
+    if not isinstance(message, Message) or not callback.data:
+        return
+
+    _, _, token, index = callback.data.split(":")
+    results = await _get_results(message, token)
+    if results is None:
+        return
+    try:
+        entry = results.entries[int(index)]
+    except IndexError:
+        await message.answer("⌛ Результаты поиска изменились. Повтори поиск.")
+        return
+
+    user_id = callback.from_user.id
+    trace = start_trace("job", user_id=user_id, url=entry["url"], source="search")
+    status_msg = await message.answer("🔍 Получаю информацию о видео...")
+    video_info = {
+        "id": entry["id"],
+        "title": entry["title"] or "Unknown",
+        "duration": int(entry["duration"] or 0),
+        "thumbnail": "",
+        "uploader": entry["uploader"] or "Unknown",
+        "view_count": entry["view_count"],
+    }
+    try:
+        await start_job(status_msg, entry["url"], user_id, video_info)
+    except Exception as e:  # noqa: BLE001 - the user is told to try again
+        await finish_trace(trace)
+        logger.error(f"Error opening search result {entry['url']}: {e}")
+        await status_msg.edit_text("❌ Не удалось открыть видео. Попробуй ещё раз.")
+
+
+@router.callback_query(F.data == "noop")
+async def handle_noop(callback: CallbackQuery) -> None:
+    """Buttons that only show information, like the page number."""
+    await callback.answer()
+
+
+async def _search(message: Message, query: str) -> None:
+    status_msg = await message.answer(
+        f"🔍 Ищу видео по запросу:\n«{escape(query.strip())}»\n\n⏳ Пожалуйста, подождите...",
+        parse_mode="HTML",
+    )
+    try:
+        results = await search.search(query)
+    except Exception as e:  # noqa: BLE001 - the user is told to try later
+        logger.error(f"Search failed: {e}")
+        await status_msg.edit_text("❌ Поиск не удался. Попробуй позже.")
+        return
+
+    if not results.entries:
+        await status_msg.edit_text(
+            f"😔 По запросу «{escape(results.query)}» ничего не найдено", parse_mode="HTML"
+        )
+        return
+    await _show_page(status_msg, results, 0)
+
+
+async def _get_results(message: Message, token: str) -> SearchResults | None:
+    """Results behind a button, notifying the user in its message if they're gone."""
+    try:
+        results = await search.get(token)
+    except Exception as e:  # noqa: BLE001 - treated like expired results
+        logger.error(f"Search failed: {e}")
+        results = None
+    if results is None:
+        await message.edit_text("⌛ Результаты поиска устарели. Повтори поиск.")
+    return results
+
+
+async def _show_page(message: Message, results: SearchResults, page: int) -> None:
+    """Render a page of results into a bot message."""
+    page = max(0, min(page, results.pages - 1))
+    first = page * settings.search_page_size
+    entries = results.page(page)
+
+    lines = [f"📺 <b>Найдено по запросу «{escape(results.query)}»:</b>\n"]
+    for number, entry in enumerate(entries, first + 1):
+        lines.append(f"{number}. {escape(entry['title'])}\n   {_describe(entry)}")
+    lines.append("\nВыбери видео для скачивания:")
+
+    await message.edit_text(
+        "\n".join(lines),
+        parse_mode="HTML",
+        reply_markup=get_search_keyboard(results.token, page, results.pages, first, len(entries)),
+    )
+
+
+def _describe(entry: dict[str, Any]) -> str:
+    """Channel, duration and views of a result, like "👤 Lofi Girl · ⏱ 3:45 · 👁 12M"."""
+    parts = []
+    if entry["uploader"]:
+        parts.append(f"👤 {escape(entry['uploader'])}")
+    if entry["live"]:
+        parts.append("🔴 LIVE")
+    elif entry["duration"]:
+        parts.append(f"⏱ {_format_duration(int(entry['duration']))}")
+    if entry["view_count"]:
+        parts.append(f"👁 {_format_count(entry['view_count'])}")
+    return " · ".join(parts)
+
+
+def _format_count(count: int) -> str:
+    """Short view count: 950, 12K, 3.4M."""
+    for threshold, suffix in ((1_000_000_000, "B"), (1_000_000, "M"), (1_000, "K")):
+        if count >= threshold:
+            value = count / threshold
+            return f"{value:.1f}{suffix}" if value < 10 else f"{value:.0f}{suffix}"
+    return str(count)
@@ -32,7 +32,8 @@ async def cmd_help(message: Message) -> None:
         "📖 <b>Справка по использованию</b>\n\n"
         "<b>Доступные команды:</b>\n"
         "/start - Начать работу с ботом\n"
-        "/help - Показать эту справку\n\n"
+        "/help - Показать эту справку\n"
+        "/search - Найти видео на YouTube\n\n"
         "<b>Как скачать видео/аудио:</b>\n"
         "1. Найди видео на YouTube\n"
         "2. Скопируй ссылку на видео\n"
@@ -44,6 +45,15 @@ async def cmd_help(message: Message) -> None:
         "• youtube.com/watch?v=...\n"
         "• youtu.be/...\n"
         "• m.youtube.com/watch?v=...\n\n"
+        "<b>Поиск:</b>\n"
+        "Отправь название видео без ссылки или /search <code>запрос</code> — "
+        "покажу результаты поиска на YouTube\n\n"
+        "<b>Несколько видео:</b>\n"
+        "Отправь несколько ссылок одним сообщением или ссылку на плейлист "
+        "(youtube.com/playlist?list=...) — пришлю всё альбомами\n\n"
+        "<b>Фрагмент видео:</b>\n"
+        "Добавь время после ссылки, например <code>https://youtu.be/... 1:30-4:05</code>, "
+        "или отправь ссылку с отметкой времени (<code>?t=90</code>)\n\n"
         "❗ <b>Ограничения:</b>\n"
         "• Максимальный размер файла: 2 ГБ\n"
         "• Доступны только публичные видео\n\n"
@@ -68,9 +78,11 @@ async def cmd_test_download(message: Message) -> None:
     
     Files will be saved in temp/{user_id}/ directory.
     """
+    import asyncio
     from pathlib import Path
-    import subprocess
+
     from loguru import logger
+
     from services.downloader import DownloaderService
     from services.file_manager import FileManager
     
@@ -123,15 +135,16 @@ async def cmd_test_download(message: Message) -> None:
         
         logger.info(f"Running ffmpeg: {' '.join(ffmpeg_command)}")
         
-        result = subprocess.run(
-            ffmpeg_command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
+        # Async subprocess: a re-encode takes minutes, the bot must keep answering meanwhile
+        process = await asyncio.create_subprocess_exec(
+            *ffmpeg_command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
         )
+        _, stderr = await process.communicate()
         
-        if result.returncode != 0:
-            raise Exception(f"FFmpeg failed: {result.stderr}")
+        if process.returncode != 0:
+            raise RuntimeError(f"FFmpeg failed: {stderr.decode(errors='replace')}")
         
         logger.info(f"✅ Video re-encoded: {reencoded_path}")
         
@@ -1,26 +1,123 @@
 """Inline keyboards for bot."""
 
+from typing import Any
 
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
+from services.file_manager import format_file_size
 
-def get_format_keyboard(url: str) -> InlineKeyboardMarkup:
+# Marks of ladder buttons: the streams are only repackaged / have to be re-encoded
+REMUX_MARK = "⚡"
+TRANSCODE_MARK = "⚙️"
+
+
+def get_format_keyboard(
+    token: str,
+    clip: bool = False,
+    renditions: list[dict[str, Any]] | None = None,
+    default_quality: str | None = None,
+) -> InlineKeyboardMarkup:
     """
     Create inline keyboard for format selection.
 
-    Note: URL is now stored in FSM state, not in callback_data.
-    This avoids Telegram's 64-byte callback_data limit.
+    The job token references a JobContext in the job store, so the
+    callback data stays short and doesn't need to carry the URL.
 
     Args:
-        url: YouTube URL (not used, kept for API compatibility)
+        token: Job token returned by JobStore.create()
+        clip: The job downloads a clip, offer to download the whole video instead
+        renditions: Available video qualities (services.downloader.quality_ladder());
+            without them a single video button downloads the default quality
+        default_quality: Quality downloaded by the default video button
+
+    Returns:
+        InlineKeyboardMarkup with Video and Audio buttons
+    """
+    if not renditions:
+        buttons = [
+            [
+                InlineKeyboardButton(text="🎬 Видео", callback_data=f"dl:video:{token}"),
+                InlineKeyboardButton(text="🎵 Аудио", callback_data=f"dl:audio:{token}"),
+            ]
+        ]
+    else:
+        ladder = [_rendition_button(token, r, r["quality"] == default_quality) for r in renditions]
+        buttons = [ladder[i:i + 2] for i in range(0, len(ladder), 2)]
+        buttons.append([InlineKeyboardButton(text="🎵 Аудио", callback_data=f"dl:audio:{token}")])
+
+    if clip:
+        buttons.append(
+            [InlineKeyboardButton(text="🎞 Целиком", callback_data=f"clip:off:{token}")]
+        )
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+def get_batch_keyboard(token: str) -> InlineKeyboardMarkup:
+    """
+    Create inline keyboard for the format of a whole batch.
+
+    Args:
+        token: Batch token returned by BatchPipeline.create()
 
     Returns:
         InlineKeyboardMarkup with Video and Audio buttons
     """
     buttons = [
         [
-            InlineKeyboardButton(text="🎬 Видео", callback_data="dl:video"),
-            InlineKeyboardButton(text="🎵 Аудио", callback_data="dl:audio"),
+            InlineKeyboardButton(text="🎬 Все видео", callback_data=f"batch:video:{token}"),
+            InlineKeyboardButton(text="🎵 Всё аудио", callback_data=f"batch:audio:{token}"),
         ]
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+def get_search_keyboard(
+    token: str, page: int, pages: int, first: int, count: int
+) -> InlineKeyboardMarkup:
+    """
+    Create inline keyboard for a page of search results.
+
+    Args:
+        token: Search token (services.youtube_search.SearchResults.token)
+        page: Current page, from 0
+        pages: Number of pages
+        first: Index of the first result on the page
+        count: Number of results on the page
+
+    Returns:
+        InlineKeyboardMarkup with a numbered button per result and page navigation
+    """
+    buttons = [
+        [
+            InlineKeyboardButton(text=str(index + 1), callback_data=f"search:pick:{token}:{index}")
+            for index in range(first, first + count)
+        ]
+    ]
+    navigation = []
+    if page > 0:
+        navigation.append(
+            InlineKeyboardButton(text="◀️", callback_data=f"search:page:{token}:{page - 1}")
+        )
+    if pages > 1:
+        navigation.append(InlineKeyboardButton(text=f"{page + 1}/{pages}", callback_data="noop"))
+    if page < pages - 1:
+        navigation.append(
+            InlineKeyboardButton(text="▶️", callback_data=f"search:page:{token}:{page + 1}")
+        )
+    if navigation:
+        buttons.append(navigation)
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+def _rendition_button(token: str, rendition: dict[str, Any], default: bool) -> InlineKeyboardButton:
+    """Button of one video quality, like "🎬 720p · 52.3 MB ⚡"."""
+    text = f"{'⭐' if default else '🎬'} {rendition['quality']}"
+    if rendition["size"]:
+        text += f" · {format_file_size(rendition['size'])}"
+    text += f" {REMUX_MARK if rendition['remux'] else TRANSCODE_MARK}"
+    # The default quality keeps the plain callback, so a speculative download can be claimed
+    if default:
+        return InlineKeyboardButton(text=text, callback_data=f"dl:video:{token}")
+    return InlineKeyboardButton(
+        text=text, callback_data=f"dl:video:{rendition['quality']}:{token}"
+    )
@@ -0,0 +1,6 @@
+"""Bot middlewares package."""
+
+from bot.middlewares.activity import UserActivityMiddleware
+from bot.middlewares.drain import DrainMiddleware
+
+__all__ = ["DrainMiddleware", "UserActivityMiddleware"]
@@ -0,0 +1,26 @@
+"""Middleware recording who uses the bot."""
+
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User
+
+from database import history
+
+
+class UserActivityMiddleware(BaseMiddleware):
+    """Saves the profile and last activity of the user behind every update (queued, no I/O)."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        user: User | None = data.get("event_from_user")
+        if user is not None and not user.is_bot:
+            history.record_user(
+                user.id, user.username, user.first_name, user.last_name, user.language_code
+            )
+        return await handler(event, data)
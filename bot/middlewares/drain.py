@@ -0,0 +1,64 @@
+"""Middleware keeping track of running handlers for the shutdown drain."""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.types import CallbackQuery, Chat, TelegramObject
+from loguru import logger
+
+from services.lifecycle import lifecycle
+
+RESTART_NOTICE = "🔄 Бот перезапускается. Повтори запрос через минуту"
+INTERRUPTED_NOTICE = (
+    "🔄 Бот перезапускается, задача прервана.\n\n"
+    "Отправь ссылку ещё раз через минуту"
+)
+# Longest wait for the notice to an interrupted user
+NOTICE_TIMEOUT_SECONDS = 5.0
+
+
+class DrainMiddleware(BaseMiddleware):
+    """
+    Registers every handler with the lifecycle, and turns updates away while draining.
+
+    A handler cancelled at the drain deadline tells its user that the job
+    was interrupted, so they know to send the link again.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        if lifecycle.draining:
+            if isinstance(event, CallbackQuery):
+                await _send(event.answer(RESTART_NOTICE, show_alert=True))
+            else:
+                await _notify(data, RESTART_NOTICE)
+            return None
+
+        with lifecycle.track():
+            try:
+                return await handler(event, data)
+            except asyncio.CancelledError:
+                if lifecycle.draining:
+                    await _notify(data, INTERRUPTED_NOTICE)
+                raise
+
+
+async def _notify(data: dict[str, Any], text: str) -> None:
+    """Send a message to the chat of the update."""
+    bot: Bot | None = data.get("bot")
+    chat: Chat | None = data.get("event_chat")
+    if bot is not None and chat is not None:
+        await _send(bot.send_message(chat.id, text))
+
+
+async def _send(request: Awaitable[Any]) -> None:
+    try:
+        await asyncio.wait_for(request, NOTICE_TIMEOUT_SECONDS)
+    except Exception as e:  # noqa: BLE001 - the notice is best effort
+        logger.warning(f"Failed to send the restart notice: {e}")
@@ -1,5 +1,6 @@
 """Configuration package."""
 
+from config.reload import on_change, reload_settings
 from config.settings import Settings, settings
 
-__all__ = ["Settings", "settings"]
+__all__ = ["Settings", "on_change", "reload_settings", "settings"]
@@ -0,0 +1,95 @@
+"""Reload of settings at runtime (SIGHUP or /reload) without restarting the bot."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from typing import Any
+
+from loguru import logger
+
+from config.settings import Settings, settings
+
+# Settings read once at startup (connections, threads, files opened by then)
+RESTART_REQUIRED = frozenset({
+    "telegram_bot_token",
+    "temp_dir",
+    "download_workers",
+    "metrics_host",
+    "metrics_port",
+    "database_path",
+    "log_file",
+    "log_json",
+    "log_level",
+    "loop_watchdog_interval",
+    "loop_block_threshold_seconds",
+    "loop_debug",
+})
+
+Callback = Callable[[], None]
+_subscribers: list[tuple[frozenset[str], Callback]] = []
+
+
+def on_change(*fields: str) -> Callable[[Callback], Callback]:
+    """
+    Register a function to run after a reload changed any of ``fields``.
+
+    Components that copy settings when they are built (pools, caches,
+    limits) use it to update themselves; everything reading ``settings``
+    on each use picks up new values by itself.
+
+    Example:
+        >>> @on_change("search_cache_max_size")
+        ... def resize_search_cache() -> None:
+        ...     pass
+    """
+    def register(callback: Callback) -> Callback:
+        _subscribers.append((frozenset(fields), callback))
+        return callback
+
+    return register
+
+
+async def reload_settings() -> tuple[dict[str, tuple[Any, Any]], list[str]]:
+    """
+    Read the environment and .env again and apply what changed.
+
+    Values are assigned to the shared ``settings`` object, then the
+    subscribers of the changed fields run. Fields in RESTART_REQUIRED keep
+    their value.
+
+    Returns:
+        Applied changes (field -> (old, new)) and changed fields that need a restart
+
+    Raises:
+        pydantic.ValidationError: If the new settings are invalid (nothing is applied)
+    """
+    # Parsing reads .env, keep it off the event loop. Required fields come from
+    # the environment, which mypy can't see
+    fresh = await asyncio.to_thread(Settings)  # type: ignore[call-arg]
+    applied: dict[str, tuple[Any, Any]] = {}
+    pending: list[str] = []
+    for name in Settings.model_fields:
+        old, new = getattr(settings, name), getattr(fresh, name)
+        if old == new:
+            continue
+        if name in RESTART_REQUIRED:
+            pending.append(name)
+            continue
+        setattr(settings, name, new)
+        applied[name] = (old, new)
+
+    for fields, callback in _subscribers:
+        if fields & applied.keys():
+            try:
+                callback()
+            except Exception as e:  # noqa: BLE001 - the other subscribers still run
+                logger.error(f"Failed to apply reloaded settings in {callback.__qualname__}: {e}")
+
+    if applied:
+        logger.info(f"Settings reloaded: {', '.join(sorted(applied))}")
+    else:
+        logger.info("Settings reloaded: nothing changed")
+    if pending:
+        logger.warning(f"Changed settings that take a restart: {', '.join(sorted(pending))}")
+    return applied, pending
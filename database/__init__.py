@@ -0,0 +1,6 @@
+"""Database package: users and download history in SQLite."""
+
+from database.repository import HistoryRepository, history
+from database.stats import RollingStats
+
+__all__ = ["HistoryRepository", "RollingStats", "history"]
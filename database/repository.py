@@ -0,0 +1,186 @@
+"""Repository of users and download history, written in the background."""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import sqlite3
+from pathlib import Path
+from typing import Any
+
+from loguru import logger
+
+from config import settings
+from database.schema import DOWNLOAD_UPDATE_COLUMNS, connect, timestamp
+from database.stats import RollingStats
+from database.writer import INSERT, UPDATE, USER, BatchWriter, Change
+from services.metrics import DB_PENDING_CHANGES
+
+# Statuses that end a download
+FINAL_STATUSES = frozenset({"completed", "failed", "cancelled"})
+
+
+class HistoryRepository:
+    """
+    Users and their downloads in SQLite.
+
+    Writes return immediately: they are queued for the BatchWriter thread
+    and committed in batches, with repeated updates of a row merged. Reads
+    used by the bot (usage statistics) come from RollingStats, loaded when
+    the repository is opened and kept current by the writes. Until
+    open() is called, or with ``path`` None, every write is a no-op.
+    """
+
+    def __init__(self, path: Path | None, batch_size: int, flush_interval: float) -> None:
+        """
+        Args:
+            path: SQLite database file, None to disable history
+            batch_size: Most changes in one transaction
+            flush_interval: Longest time a change waits for its commit, in seconds
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stats = RollingStats()
+        self._writer: BatchWriter | None = None
+        self._ids = itertools.count(1)
+        # Downloads without a final status yet
+        self._active: set[int] = set()
+
+    @classmethod
+    def from_settings(cls) -> HistoryRepository:
+        return cls(
+            settings.database_path,
+            batch_size=settings.database_batch_size,
+            flush_interval=settings.database_flush_interval,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self._writer is not None
+
+    async def open(self) -> None:
+        """Create the schema if needed, load the aggregates and start the writer."""
+        if self.path is None or self._writer is not None:
+            return
+        path = self.path
+
+        def load() -> tuple[sqlite3.Connection, int]:
+            conn = connect(path)
+            (last_id,) = conn.execute("SELECT COALESCE(MAX(id), 0) FROM downloads").fetchone()
+            self.stats.load(conn)
+            return conn, last_id
+
+        conn, last_id = await asyncio.to_thread(load)
+        # IDs are assigned here, so a download can be updated before its insert is committed
+        self._ids = itertools.count(last_id + 1)
+        self._writer = BatchWriter(conn, self.batch_size, self.flush_interval)
+        DB_PENDING_CHANGES.set_function(self._writer.pending)
+        logger.info(
+            f"History database {path}: {self.stats.totals.users} users, "
+            f"{self.stats.totals.downloads} downloads"
+        )
+
+    async def flush(self) -> None:
+        """Wait until everything queued so far is committed."""
+        if self._writer is not None:
+            await asyncio.to_thread(self._writer.flush().wait)
+
+    async def close(self) -> None:
+        """Commit the remaining changes and close the database."""
+        if self._writer is not None:
+            writer, self._writer = self._writer, None
+            await asyncio.to_thread(writer.close)
+
+    def record_user(
+        self,
+        telegram_id: int,
+        username: str | None,
+        first_name: str,
+        last_name: str | None,
+        language_code: str | None,
+    ) -> None:
+        """Save a user's profile and mark them active now."""
+        if self._writer is None:
+            return
+        self.stats.user_seen(telegram_id)
+        self._writer.put(Change(USER, telegram_id, {
+            "telegram_id": telegram_id,
+            "username": username,
+            "first_name": first_name,
+            "last_name": last_name,
+            "language_code": language_code,
+            "seen_at": timestamp(),
+        }))
+
+    def start_download(
+        self,
+        telegram_id: int,
+        url: str,
+        info: dict[str, Any],
+        fmt: str,
+        quality: str,
+    ) -> int | None:
+        """
+        Record a download that starts now.
+
+        Args:
+            telegram_id: Telegram user ID of the job owner
+            url: Video URL
+            info: Video info (id, title, uploader, duration, view_count)
+            fmt: "video" or "audio"
+            quality: Requested quality, "audio" for audio
+
+        Returns:
+            ID to pass to update_download(), None if history is disabled
+        """
+        if self._writer is None:
+            return None
+        download_id = next(self._ids)
+        now = timestamp()
+        self._active.add(download_id)
+        self.stats.download_started(download_id, telegram_id, fmt)
+        self._writer.put(Change(INSERT, download_id, {
+            "telegram_id": telegram_id,
+            "video_url": url,
+            "video_id": info.get("id") or "",
+            "video_title": info.get("title") or "",
+            "channel_name": info.get("uploader"),
+            "duration_seconds": int(info.get("duration") or 0) or None,
+            "view_count": info.get("view_count"),
+            "format": fmt,
+            "quality": quality,
+            "status": "downloading",
+            "created_at": now,
+            "started_at": now,
+        }))
+        return download_id
+
+    def update_download(self, download_id: int | None, status: str, **fields: Any) -> None:
+        """
+        Move a download to another status.
+
+        Updates after a final status are ignored, e.g. a failure while
+        restoring the preview card of a delivered file.
+
+        Args:
+            download_id: ID from start_download(); None is ignored
+            status: "uploading", "completed", "failed" or "cancelled"
+            **fields: Other columns to set, e.g. file_size_bytes, error_message
+        """
+        if self._writer is None or download_id not in self._active:
+            return
+        unknown = set(fields) - DOWNLOAD_UPDATE_COLUMNS
+        if unknown:
+            raise ValueError(f"Unknown download columns: {', '.join(sorted(unknown))}")
+        fields["status"] = status
+        if status in FINAL_STATUSES:
+            self._active.discard(download_id)
+            fields["completed_at"] = timestamp()
+            self.stats.download_finished(
+                download_id, status == "completed", fields.get("file_size_bytes")
+            )
+        self._writer.put(Change(UPDATE, download_id, fields))
+
+
+history = HistoryRepository.from_settings()
@@ -0,0 +1,101 @@
+"""SQLite schema of users and download history (see docs/05-DATABASE-SCHEMA.md)."""
+
+from __future__ import annotations
+
+import sqlite3
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    telegram_id INTEGER NOT NULL UNIQUE,
+    username TEXT,
+    first_name TEXT NOT NULL DEFAULT '',
+    last_name TEXT,
+    language_code TEXT DEFAULT 'ru',
+    default_quality TEXT DEFAULT '720p',
+    preferred_format TEXT DEFAULT 'video' CHECK (preferred_format IN ('video', 'audio')),
+    is_blocked INTEGER NOT NULL DEFAULT 0,
+    is_admin INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_activity TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_users_telegram_id ON users(telegram_id);
+CREATE INDEX IF NOT EXISTS idx_users_username ON users(username);
+CREATE INDEX IF NOT EXISTS idx_users_last_activity ON users(last_activity);
+
+CREATE TABLE IF NOT EXISTS downloads (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE ON UPDATE CASCADE,
+    video_url TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    video_title TEXT NOT NULL,
+    channel_name TEXT,
+    duration_seconds INTEGER,
+    view_count INTEGER,
+    format TEXT NOT NULL CHECK (format IN ('video', 'audio')),
+    quality TEXT NOT NULL,
+    file_size_bytes INTEGER,
+    file_path TEXT,
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (
+        status IN ('pending', 'downloading', 'uploading', 'completed', 'failed', 'cancelled')
+    ),
+    progress_percent INTEGER DEFAULT 0 CHECK (progress_percent BETWEEN 0 AND 100),
+    error_message TEXT,
+    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    started_at TEXT,
+    completed_at TEXT,
+    updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_downloads_user_id ON downloads(user_id);
+CREATE INDEX IF NOT EXISTS idx_downloads_video_id ON downloads(video_id);
+CREATE INDEX IF NOT EXISTS idx_downloads_status ON downloads(status);
+CREATE INDEX IF NOT EXISTS idx_downloads_created_at ON downloads(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_downloads_user_created ON downloads(user_id, created_at DESC);
+"""
+
+# Columns a download may be updated with
+DOWNLOAD_UPDATE_COLUMNS = frozenset({
+    "status",
+    "file_size_bytes",
+    "progress_percent",
+    "error_message",
+    "started_at",
+    "completed_at",
+})
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    """
+    Open the database in WAL mode, creating the file and the schema if needed.
+
+    WAL lets the stats queries read while the writer commits; with
+    ``synchronous=NORMAL`` a commit doesn't wait for fsync, only a
+    checkpoint does.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def timestamp(when: float | None = None) -> str:
+    """
+    UTC time in SQLite's CURRENT_TIMESTAMP format.
+
+    Examples:
+        >>> timestamp(0)
+        '1970-01-01 00:00:00'
+    """
+    if when is None:
+        when = time.time()
+    return datetime.fromtimestamp(when, UTC).strftime("%Y-%m-%d %H:%M:%S")
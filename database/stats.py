@@ -0,0 +1,152 @@
+"""Rolling usage aggregates kept in memory, so /stats never queries the database."""
+
+from __future__ import annotations
+
+import sqlite3
+import time
+from dataclasses import dataclass, field
+
+HOUR = 3600
+# Longest window of the rolling aggregates
+WINDOW_HOURS = 7 * 24
+
+
+@dataclass
+class Bucket:
+    """Downloads started within one hour."""
+
+    downloads: int = 0
+    video: int = 0
+    audio: int = 0
+    completed: int = 0
+    failed: int = 0
+    bytes: int = 0
+    seconds: float = 0.0  # total time of completed downloads
+    users: set[int] = field(default_factory=set)
+
+
+@dataclass
+class Totals:
+    """All-time counters."""
+
+    users: int = 0
+    downloads: int = 0
+    completed: int = 0
+    failed: int = 0
+    bytes: int = 0
+
+
+class RollingStats:
+    """
+    Hourly buckets of the last WINDOW_HOURS and all-time totals.
+
+    Loaded once from the database at startup, then updated in memory by
+    the same calls that queue the writes. Downloads are counted in the hour
+    they started. Used from the event loop only.
+    """
+
+    def __init__(self) -> None:
+        self.totals = Totals()
+        self._buckets: dict[int, Bucket] = {}
+        self._known_users: set[int] = set()
+        # Download ID -> hour it started in, until it finishes
+        self._running: dict[int, tuple[int, float]] = {}
+
+    def load(self, conn: sqlite3.Connection, now: float | None = None) -> None:
+        """Seed the aggregates from the database (blocking, call before serving)."""
+        now = time.time() if now is None else now
+        self._known_users = {row[0] for row in conn.execute("SELECT telegram_id FROM users")}
+        downloads, completed, failed, size = conn.execute(
+            "SELECT COUNT(*), "
+            "COALESCE(SUM(status = 'completed'), 0), "
+            "COALESCE(SUM(status = 'failed'), 0), "
+            "COALESCE(SUM(CASE WHEN status = 'completed' THEN file_size_bytes END), 0) "
+            "FROM downloads"
+        ).fetchone()
+        self.totals = Totals(len(self._known_users), downloads, completed, failed, size)
+
+        since = int(now // HOUR) - WINDOW_HOURS + 1
+        rows = conn.execute(
+            "SELECT CAST(strftime('%s', d.created_at) AS INTEGER) / ? AS hour, u.telegram_id, "
+            "d.format, d.status, d.file_size_bytes, "
+            "strftime('%s', d.completed_at) - strftime('%s', d.started_at) "
+            "FROM downloads d JOIN users u ON u.id = d.user_id "
+            "WHERE d.created_at >= datetime(?, 'unixepoch')",
+            (HOUR, since * HOUR),
+        )
+        for hour, telegram_id, fmt, status, size, seconds in rows:
+            bucket = self._bucket(hour)
+            bucket.downloads += 1
+            bucket.users.add(telegram_id)
+            if fmt == "audio":
+                bucket.audio += 1
+            else:
+                bucket.video += 1
+            if status == "completed":
+                bucket.completed += 1
+                bucket.bytes += size or 0
+                bucket.seconds += seconds or 0
+            elif status == "failed":
+                bucket.failed += 1
+
+    def user_seen(self, telegram_id: int) -> None:
+        if telegram_id not in self._known_users:
+            self._known_users.add(telegram_id)
+            self.totals.users += 1
+
+    def download_started(self, download_id: int, telegram_id: int, fmt: str) -> None:
+        now = time.time()
+        bucket = self._bucket(int(now // HOUR))
+        bucket.downloads += 1
+        bucket.users.add(telegram_id)
+        if fmt == "audio":
+            bucket.audio += 1
+        else:
+            bucket.video += 1
+        self.totals.downloads += 1
+        self.user_seen(telegram_id)
+        self._running[download_id] = (int(now // HOUR), now)
+
+    def download_finished(self, download_id: int, ok: bool, size: int | None = None) -> None:
+        started = self._running.pop(download_id, None)
+        if started is None:
+            return
+        hour, started_at = started
+        bucket = self._bucket(hour)
+        if ok:
+            bucket.completed += 1
+            bucket.bytes += size or 0
+            bucket.seconds += time.time() - started_at
+            self.totals.completed += 1
+            self.totals.bytes += size or 0
+        else:
+            bucket.failed += 1
+            self.totals.failed += 1
+
+    def window(self, hours: int) -> Bucket:
+        """Aggregate of the downloads started in the last ``hours`` hours."""
+        current = int(time.time() // HOUR)
+        total = Bucket()
+        for hour in range(current - min(hours, WINDOW_HOURS) + 1, current + 1):
+            bucket = self._buckets.get(hour)
+            if bucket is None:
+                continue
+            total.downloads += bucket.downloads
+            total.video += bucket.video
+            total.audio += bucket.audio
+            total.completed += bucket.completed
+            total.failed += bucket.failed
+            total.bytes += bucket.bytes
+            total.seconds += bucket.seconds
+            total.users |= bucket.users
+        return total
+
+    def _bucket(self, hour: int) -> Bucket:
+        bucket = self._buckets.get(hour)
+        if bucket is None:
+            bucket = self._buckets[hour] = Bucket()
+            # Drop the hours that fell out of the window
+            oldest = hour - WINDOW_HOURS
+            for stale in [h for h in self._buckets if h <= oldest]:
+                del self._buckets[stale]
+        return bucket
@@ -0,0 +1,208 @@
+"""Writer thread committing queued database changes in batches."""
+
+from __future__ import annotations
+
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from loguru import logger
+
+from database.schema import timestamp
+from services.metrics import DB_BATCH_ROWS, DB_CHANGES, DB_COMMIT_ERRORS, DB_COMMIT_SECONDS
+
+USER = "user"
+INSERT = "insert"
+UPDATE = "update"
+
+UPSERT_USER = """
+INSERT INTO users (telegram_id, username, first_name, last_name, language_code,
+                   created_at, last_activity, updated_at)
+VALUES (:telegram_id, :username, :first_name, :last_name, :language_code,
+        :seen_at, :seen_at, :seen_at)
+ON CONFLICT(telegram_id) DO UPDATE SET
+    username = excluded.username,
+    first_name = excluded.first_name,
+    last_name = excluded.last_name,
+    language_code = excluded.language_code,
+    last_activity = excluded.last_activity,
+    updated_at = excluded.updated_at
+"""
+
+# Downloads of users who never passed the activity middleware still need a users row
+ENSURE_USER = "INSERT OR IGNORE INTO users (telegram_id) VALUES (?)"
+
+INSERT_DOWNLOAD = """
+INSERT INTO downloads (id, user_id, video_url, video_id, video_title, channel_name,
+                       duration_seconds, view_count, format, quality, file_size_bytes,
+                       status, error_message, created_at, started_at, completed_at, updated_at)
+VALUES (:id, (SELECT id FROM users WHERE telegram_id = :telegram_id), :video_url, :video_id,
+        :video_title, :channel_name, :duration_seconds, :view_count, :format, :quality,
+        :file_size_bytes, :status, :error_message, :created_at, :started_at, :completed_at,
+        :updated_at)
+"""
+
+DOWNLOAD_DEFAULTS: dict[str, Any] = {
+    "channel_name": None,
+    "duration_seconds": None,
+    "view_count": None,
+    "file_size_bytes": None,
+    "status": "pending",
+    "error_message": None,
+    "started_at": None,
+    "completed_at": None,
+}
+
+
+@dataclass
+class Change:
+    """One queued write: a user seen, a download created, or a download updated."""
+
+    kind: str  # USER, INSERT or UPDATE
+    key: int  # Telegram user ID or download ID
+    fields: dict[str, Any]
+
+
+@dataclass
+class Batch:
+    """
+    Changes collected between two commits, merged per row.
+
+    Repeated activity of a user becomes one upsert, and the status updates
+    of a download become one UPDATE, or are folded into its INSERT if it
+    wasn't committed yet.
+    """
+
+    users: dict[int, dict[str, Any]] = field(default_factory=dict)
+    inserts: dict[int, dict[str, Any]] = field(default_factory=dict)
+    updates: dict[int, dict[str, Any]] = field(default_factory=dict)
+    changes: int = 0
+
+    def add(self, change: Change) -> None:
+        self.changes += 1
+        if change.kind == USER:
+            self.users[change.key] = change.fields
+        elif change.kind == INSERT:
+            self.inserts[change.key] = change.fields
+        elif change.key in self.inserts:
+            self.inserts[change.key].update(change.fields)
+        else:
+            self.updates.setdefault(change.key, {}).update(change.fields)
+
+    @property
+    def rows(self) -> int:
+        return len(self.users) + len(self.inserts) + len(self.updates)
+
+
+class BatchWriter:
+    """
+    Owns the write connection and commits queued changes from a background thread.
+
+    Callers only append to an in-process queue, so the event loop never waits
+    for SQLite. The thread collects changes for up to ``flush_interval``
+    seconds (or ``batch_size`` changes), merges those of the same row and
+    writes them in one transaction. A batch that fails is logged and
+    dropped: history is best effort and must not stall the bot.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, batch_size: int, flush_interval: float) -> None:
+        """
+        Args:
+            conn: Connection opened by database.schema.connect()
+            batch_size: Most changes in one transaction
+            flush_interval: Longest time a change waits for its commit, in seconds
+        """
+        self._conn = conn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.SimpleQueue[Change | threading.Event | None] = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, change: Change) -> None:
+        DB_CHANGES.inc(kind=change.kind)
+        self._queue.put(change)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self) -> threading.Event:
+        """Commit everything queued so far; the returned event is set once it is written."""
+        written = threading.Event()
+        self._queue.put(written)
+        return written
+
+    def close(self) -> None:
+        """Commit the remaining changes and stop the thread. Blocks."""
+        self._queue.put(None)
+        self._thread.join()
+        self._conn.close()
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            batch = Batch()
+            flushed: list[threading.Event] = []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is None:
+                    stopping = True
+                    break
+                if isinstance(item, threading.Event):
+                    flushed.append(item)
+                    break
+                batch.add(item)
+                remaining = deadline - time.monotonic()
+                if batch.changes >= self.batch_size or remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if batch.changes:
+                self._commit(batch)
+            for event in flushed:
+                event.set()
+
+    def _commit(self, batch: Batch) -> None:
+        now = timestamp()
+        started = time.perf_counter()
+        try:
+            self._conn.execute("BEGIN")
+            if batch.users:
+                self._conn.executemany(UPSERT_USER, batch.users.values())
+            if batch.inserts:
+                telegram_ids = {row["telegram_id"] for row in batch.inserts.values()}
+                self._conn.executemany(ENSURE_USER, [(i,) for i in telegram_ids])
+                self._conn.executemany(INSERT_DOWNLOAD, [
+                    {**DOWNLOAD_DEFAULTS, **row, "id": download_id, "updated_at": now}
+                    for download_id, row in batch.inserts.items()
+                ])
+            # One statement per set of updated columns
+            by_columns: dict[tuple[str, ...], list[dict[str, Any]]] = {}
+            for download_id, row in batch.updates.items():
+                by_columns.setdefault(tuple(sorted(row)), []).append(
+                    {**row, "id": download_id, "updated_at": now}
+                )
+            for columns, rows in by_columns.items():
+                assignments = ", ".join(f"{column} = :{column}" for column in columns)
+                self._conn.executemany(
+                    f"UPDATE downloads SET {assignments}, updated_at = :updated_at WHERE id = :id",
+                    rows,
+                )
+            self._conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            if self._conn.in_transaction:
+                self._conn.execute("ROLLBACK")
+            DB_COMMIT_ERRORS.inc()
+            logger.error(f"Failed to write {batch.changes} history changes: {e}")
+            return
+        finally:
+            DB_COMMIT_SECONDS.observe(time.perf_counter() - started)
+        DB_BATCH_ROWS.observe(batch.rows)
+        logger.debug(f"Wrote {batch.changes} history changes as {batch.rows} rows")
@@ -1,48 +1,119 @@
 """Main entry point for Sly Fox Tunes bot."""
 
 import asyncio
+import signal
+from contextlib import suppress
 
 from aiogram import Bot, Dispatcher
 from loguru import logger
 
-from bot.handlers import download, start
+from bot.handlers import admin, batch, download, search, start
+from bot.middlewares import DrainMiddleware, UserActivityMiddleware
+from config.reload import reload_settings
 from config.settings import settings
+from database import history
+from services.cookies import cookie_manager
+from services.downloader import warm_up
+from services.lifecycle import lifecycle
+from services.logs import setup_logging
+from services.metrics import start_metrics_server
+from services.watchdog import loop_watchdog
+
+
+def create_dispatcher() -> Dispatcher:
+    """Create the dispatcher with all bot handlers registered."""
+    dp = Dispatcher()
+
+    # Outer middlewares run for every update, before the filters pick a handler
+    for middleware in (DrainMiddleware(), UserActivityMiddleware()):
+        dp.message.outer_middleware(middleware)
+        dp.callback_query.outer_middleware(middleware)
+
+    # Register handlers (order matters!)
+    dp.include_router(start.router)
+    dp.include_router(admin.router)
+    # Before download: its text handler takes any message starting with a link
+    dp.include_router(batch.router)
+    # Before download: its text handler answers any other text
+    dp.include_router(search.router)
+    dp.include_router(download.router)
+
+    logger.info("Bot handlers registered")
+    return dp
+
+
+# Tasks started from signal handlers, referenced until they finish
+_background_tasks: set[asyncio.Task[None]] = set()
+
+
+async def _reload() -> None:
+    try:
+        await reload_settings()
+    except Exception as e:  # noqa: BLE001 - a bad reload must not stop the bot
+        logger.error(f"Settings reload failed, keeping the current settings: {e}")
+
+
+def _handle_reload_signal() -> None:
+    """SIGHUP: reload settings (kill -HUP <pid> or systemctl reload)."""
+    task = asyncio.create_task(_reload())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
 
 
 async def main() -> None:
     """Initialize and start the bot."""
-    # Configure logger
-    logger.add(
-        "logs/bot.log",
-        rotation="10 MB",
-        retention="7 days",
-        level="INFO",
-        format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}",
-    )
+    setup_logging()
 
     logger.info("Starting Sly Fox Tunes bot...")
 
-    # Initialize bot and dispatcher
-
     # Initialize bot and dispatcher
     bot = Bot(token=settings.telegram_bot_token)
-    dp = Dispatcher()
+    dp = create_dispatcher()
 
-    # Register handlers (order matters!)
-    dp.include_router(start.router)
-    dp.include_router(download.router)
+    metrics_runner = None
+    if settings.metrics_port:
+        metrics_runner = await start_metrics_server(settings.metrics_host, settings.metrics_port)
 
-    logger.info("Bot handlers registered")
+    # Download history and usage statistics
+    await history.open()
+
+    # Loop lag metrics and stacks of callbacks blocking the loop
+    loop_watchdog.start()
+
+    warm_up_task = None
+    if settings.warm_up:
+        # yt-dlp loads in a worker thread while the first updates are polled
+        warm_up_task = asyncio.create_task(warm_up())
+
+    # Signals are not supported on Windows
+    with suppress(NotImplementedError, AttributeError):
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, _handle_reload_signal)
 
     try:
-        # Start polling
+        # Start polling; SIGTERM/SIGINT stop it. The session stays open for the drain
         logger.info("Starting polling...")
-        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        await dp.start_polling(
+            bot, allowed_updates=dp.resolve_used_update_types(), close_bot_session=False
+        )
     finally:
         # Graceful shutdown
         logger.info("Shutting down bot...")
+        # Updates are no longer fetched: new ones wait in Telegram for the next instance,
+        # running jobs get up to SHUTDOWN_TIMEOUT_SECONDS to finish
+        await lifecycle.drain(settings.shutdown_timeout_seconds)
+        if warm_up_task:
+            warm_up_task.cancel()
+        loop_watchdog.stop()
         await bot.session.close()
+        # Keep cookies YouTube rotated during the session
+        cookie_manager.save()
+        # Commit the queued history
+        await history.close()
+        if metrics_runner:
+            await metrics_runner.cleanup()
         logger.info("Bot stopped")
+        # Flush queued records
+        await logger.complete()
 
 
 if __name__ == "__main__":
@@ -2,6 +2,7 @@
 
 from pathlib import Path
 from config.settings import settings
+from services.cookies import cookie_manager
 from services.downloader import _get_base_ydl_opts
 
 
@@ -35,7 +36,16 @@ def test_cookies_config():
     for key, value in opts.items():
         print(f"   {key}: {value}")
     
-    if 'cookiefile' in opts:
+    # Check cookie profiles
+    print("\n3. Cookie profiles:")
+    for profile in cookie_manager.profiles:
+        try:
+            jar = cookie_manager.get_jar(profile)
+            print(f"   ✓ {profile}: {len(jar)} cookies")
+        except Exception as e:  # noqa: BLE001 - report every profile that fails to load
+            print(f"   ⚠ {profile}: failed to load ({e})")
+
+    if cookie_manager.profiles:
         print("\n   ✓ Cookies will be used for YouTube downloads")
     else:
         print("\n   ℹ Downloads will work without cookies (may fail on some videos)")
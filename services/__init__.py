@@ -1,33 +1,102 @@
-"""Services package."""
-
-from services.downloader import (
-    DownloadError,
-    download_audio,
-    download_video,
-    get_video_info,
-)
-from services.file_manager import (
-    cleanup_file,
-    cleanup_user_dir,
-    format_file_size,
-    get_file_size,
-    get_user_temp_dir,
-)
-from services.validators import extract_video_id, is_youtube_url
+"""
+Services package.
 
-__all__ = [
+Names are imported from their submodules on first access, so importing a
+light module (e.g. services.validators) doesn't load the downloader.
+"""
+
+from __future__ import annotations
+
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from services.downloader import (
+        DownloadError,
+        VideoUnavailableError,
+        classify_error,
+        classify_failure,
+        download_audio,
+        download_video,
+        expand_playlist,
+        get_video_info,
+        get_video_preview,
+        resolve_formats,
+        search_videos,
+    )
+    from services.file_manager import (
+        cleanup_file,
+        cleanup_user_dir,
+        format_file_size,
+        get_file_size,
+        get_user_temp_dir,
+    )
+    from services.validators import (
+        extract_video_id,
+        extract_youtube_urls,
+        is_playlist_url,
+        is_youtube_url,
+    )
+
+# Public name -> submodule defining it
+_EXPORTS = {
     # Downloader
-    "DownloadError",
-    "get_video_info",
-    "download_video",
-    "download_audio",
+    "DownloadError": "services.downloader",
+    "VideoUnavailableError": "services.downloader",
+    "classify_error": "services.downloader",
+    "classify_failure": "services.downloader",
+    "get_video_preview": "services.downloader",
+    "get_video_info": "services.downloader",
+    "resolve_formats": "services.downloader",
+    "download_video": "services.downloader",
+    "download_audio": "services.downloader",
+    "expand_playlist": "services.downloader",
+    "search_videos": "services.downloader",
     # File Manager
-    "get_user_temp_dir",
+    "get_user_temp_dir": "services.file_manager",
+    "cleanup_file": "services.file_manager",
+    "cleanup_user_dir": "services.file_manager",
+    "get_file_size": "services.file_manager",
+    "format_file_size": "services.file_manager",
+    # Validators
+    "is_youtube_url": "services.validators",
+    "extract_video_id": "services.validators",
+    "extract_youtube_urls": "services.validators",
+    "is_playlist_url": "services.validators",
+}
+
+__all__ = [
+    "DownloadError",
+    "VideoUnavailableError",
+    "classify_error",
+    "classify_failure",
     "cleanup_file",
     "cleanup_user_dir",
-    "get_file_size",
+    "download_audio",
+    "download_video",
+    "expand_playlist",
+    "extract_video_id",
+    "extract_youtube_urls",
     "format_file_size",
-    # Validators
+    "get_file_size",
+    "get_user_temp_dir",
+    "get_video_info",
+    "get_video_preview",
+    "is_playlist_url",
     "is_youtube_url",
-    "extract_video_id",
+    "resolve_formats",
+    "search_videos",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *__all__])
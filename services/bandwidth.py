@@ -0,0 +1,177 @@
+"""Global download bandwidth shared fairly between concurrent downloads."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from config import on_change, settings
+from services.metrics import BANDWIDTH_THROTTLE_SECONDS
+
+# Bytes a flow may get ahead of its rate (absorbs block-sized bursts)
+BURST_SECONDS = 0.25
+# Allocations are recomputed at most this often while flows are running
+REBALANCE_SECONDS = 0.25
+# A flow that was held back this recently is considered to want more bandwidth
+SATURATED_SECONDS = 1.0
+
+
+class Flow:
+    """One running download, paced to its share of the bandwidth."""
+
+    def __init__(self, scheduler: BandwidthScheduler, kind: str, weight: float) -> None:
+        self.scheduler = scheduler
+        self.kind = kind
+        self.weight = weight
+        self.rate = 0.0  # allocated bytes per second
+        self.measured_rate = 0.0
+        self.downloaded = 0
+        self.started_at = time.monotonic()
+        self.throttled_at = self.started_at
+        self._reported = 0
+        self._next_send = self.started_at
+
+    def progress_hook(self, status: dict[str, Any]) -> None:
+        """yt-dlp progress hook: pace the download thread by sleeping."""
+        downloaded = status.get("downloaded_bytes") or 0
+        if status.get("status") != "downloading" or downloaded <= self._reported:
+            return
+        delay = self.scheduler._consume(self, downloaded - self._reported)
+        self._reported = downloaded
+        if delay > 0:
+            BANDWIDTH_THROTTLE_SECONDS.inc(delay, kind=self.kind)
+            time.sleep(delay)
+
+
+class BandwidthScheduler:
+    """
+    Divides a download bandwidth limit between running downloads.
+
+    Each download (flow) gets a share proportional to the weight of its
+    class, so interactive audio requests stay fast while bulk video and
+    background prefetches take what's left. Shares are max-min fair: a flow
+    that can't use its share (e.g. the server is slower) leaves the rest to
+    the others. Flows are paced from their yt-dlp progress hook, which runs
+    in the download threads.
+    """
+
+    def __init__(self, limit: float, weights: dict[str, float]) -> None:
+        """
+        Args:
+            limit: Total bytes per second for all downloads (0 = unlimited)
+            weights: Relative share per download class, e.g. {"audio": 4, "video": 1}
+        """
+        self.limit = limit
+        self.weights = weights
+        self._flows: list[Flow] = []
+        self._lock = threading.Lock()
+        self._balanced_at = 0.0
+
+    @classmethod
+    def from_settings(cls) -> BandwidthScheduler:
+        return cls(
+            limit=settings.download_bandwidth_mbps * 1_000_000 / 8,
+            weights={
+                "audio": settings.bandwidth_weight_audio,
+                "video": settings.bandwidth_weight_video,
+                "background": settings.bandwidth_weight_background,
+            },
+        )
+
+    def update_from(self, fresh: BandwidthScheduler) -> None:
+        """Take the limit and weights of another scheduler, e.g. after a settings reload."""
+        with self._lock:
+            self.limit = fresh.limit
+            self.weights = fresh.weights
+            for flow in self._flows:
+                flow.weight = self.weights.get(flow.kind, 1.0)
+            self._rebalance()
+
+    @contextmanager
+    def flow(self, kind: str) -> Iterator[Flow]:
+        """
+        Register a download for the duration of the block.
+
+        Args:
+            kind: Download class, a key of ``weights``
+
+        Yields:
+            Flow whose ``progress_hook`` must be passed to yt-dlp
+        """
+        flow = Flow(self, kind, self.weights.get(kind, 1.0))
+        with self._lock:
+            self._flows.append(flow)
+            self._rebalance()
+        try:
+            yield flow
+        finally:
+            with self._lock:
+                self._flows.remove(flow)
+                self._rebalance()
+
+    def active(self) -> list[dict[str, Any]]:
+        """Allocation of every running download, for diagnostics."""
+        with self._lock:
+            return [
+                {"kind": f.kind, "rate": f.rate, "measured_rate": f.measured_rate,
+                 "downloaded": f.downloaded}
+                for f in self._flows
+            ]
+
+    def _consume(self, flow: Flow, size: int) -> float:
+        """Account for downloaded bytes and return how long the flow must wait."""
+        now = time.monotonic()
+        with self._lock:
+            flow.downloaded += size
+            flow.measured_rate = flow.downloaded / max(now - flow.started_at, 1e-3)
+            if not self.limit:
+                return 0.0
+            if now - self._balanced_at >= REBALANCE_SECONDS:
+                self._rebalance()
+            flow._next_send = max(flow._next_send, now - BURST_SECONDS) + size / flow.rate
+            delay = flow._next_send - now
+            if delay > 0:
+                flow.throttled_at = now
+            return delay
+
+    def _rebalance(self) -> None:
+        """Max-min fair weighted allocation (water-filling). Called with the lock held."""
+        self._balanced_at = now = time.monotonic()
+        if not self.limit:
+            return
+
+        remaining = self.limit
+        pending = list(self._flows)
+        while pending:
+            total_weight = sum(f.weight for f in pending)
+            # Flows that are not being held back only need a bit more than they get now
+            limited = [
+                f for f in pending
+                if now - f.throttled_at > SATURATED_SECONDS
+                and f.measured_rate * 1.2 < remaining * f.weight / total_weight
+            ]
+            if not limited:
+                for f in pending:
+                    f.rate = remaining * f.weight / total_weight
+                return
+            for f in limited:
+                f.rate = max(f.measured_rate * 1.2, 1.0)
+                remaining -= f.rate
+                pending.remove(f)
+            remaining = max(remaining, 1.0)
+
+
+bandwidth = BandwidthScheduler.from_settings()
+
+
+@on_change(
+    "download_bandwidth_mbps",
+    "bandwidth_weight_audio",
+    "bandwidth_weight_video",
+    "bandwidth_weight_background",
+)
+def _reload_bandwidth() -> None:
+    bandwidth.update_from(BandwidthScheduler.from_settings())
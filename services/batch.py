@@ -0,0 +1,247 @@
+"""Batches of videos (several links or a playlist) downloaded as one job."""
+
+from __future__ import annotations
+
+import asyncio
+import secrets
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from loguru import logger
+
+from config import settings
+from database import history
+from services.cache import TTLCache
+from services.downloader import DownloaderService
+from services.file_manager import cleanup_file, get_file_size
+from services.tracing import Trace, span
+from services.validators import extract_video_id, is_playlist_url
+
+# Telegram accepts 2-10 files per media group
+MEDIA_GROUP_SIZE = 10
+
+
+@dataclass
+class BatchItem:
+    """One video of a batch."""
+
+    url: str
+    title: str = ""
+    duration: int = 0
+    status: str = "pending"  # pending, downloading, done, failed
+    path: Path | None = None
+    error: str | None = None
+    size: int = 0
+    download_id: int | None = None  # row in the download history
+
+
+@dataclass
+class BatchJob:
+    """A batch waiting for the user's format choice, then running as a whole."""
+
+    token: str
+    user_id: int
+    items: list[BatchItem]
+    created_at: float = field(default_factory=time.time)
+    kind: str | None = None  # "video" or "audio" once started
+    trace: Trace | None = None
+
+    def count(self, status: str) -> int:
+        return sum(1 for item in self.items if item.status == status)
+
+
+class BatchPipeline:
+    """
+    Downloads the videos of a batch with bounded parallelism.
+
+    A batch is one unit of work: its items share a concurrency limit
+    (``batch_concurrency``), report progress through one callback and are
+    delivered in their original order, in groups of up to
+    MEDIA_GROUP_SIZE as soon as a whole group is ready. A user can run
+    one batch at a time.
+    """
+
+    TOKEN_BYTES = 6
+
+    def __init__(self, downloader: DownloaderService) -> None:
+        self.downloader = downloader
+        self._batches: TTLCache[str, BatchJob] = TTLCache(
+            maxsize=settings.job_store_max_size, ttl=settings.job_ttl_seconds
+        )
+        self._running: set[int] = set()
+
+    def resize(self, maxsize: int, ttl: float) -> None:
+        """Change the limits of the batch store (settings reloaded)."""
+        self._batches.resize(maxsize, ttl)
+
+    async def collect(self, urls: list[str]) -> list[BatchItem]:
+        """
+        Turn the links of a message into batch items.
+
+        Playlists are expanded with flat extraction; duplicate videos are
+        dropped and the batch is cut at ``batch_max_items``.
+
+        Args:
+            urls: Video and playlist links
+
+        Returns:
+            Items in message order (playlist entries in playlist order)
+        """
+        items: list[BatchItem] = []
+        seen: set[str] = set()
+        limit = settings.batch_max_items
+        for url in urls:
+            if len(items) >= limit:
+                break
+            if is_playlist_url(url):
+                try:
+                    with span("expand_playlist"):
+                        entries = await self.downloader.expand_playlist(url, limit - len(items))
+                except Exception as e:  # noqa: BLE001 - the other links are still collected
+                    logger.warning(f"Skipping playlist {url}: {e}")
+                    continue
+            else:
+                entries = [{"id": extract_video_id(url) or url, "url": url}]
+
+            for entry in entries:
+                if entry["id"] in seen:
+                    continue
+                seen.add(entry["id"])
+                items.append(BatchItem(
+                    url=entry["url"],
+                    title=entry.get("title") or "",
+                    duration=int(entry.get("duration") or 0),
+                ))
+        return items[:limit]
+
+    def create(self, user_id: int, items: list[BatchItem]) -> BatchJob:
+        """Register a batch for its buttons and return it."""
+        token = secrets.token_urlsafe(self.TOKEN_BYTES)
+        while token in self._batches:
+            token = secrets.token_urlsafe(self.TOKEN_BYTES)
+        batch = BatchJob(token=token, user_id=user_id, items=items)
+        self._batches.set(token, batch)
+        logger.debug(f"Registered batch {token} with {len(items)} videos")
+        return batch
+
+    def get(self, token: str) -> BatchJob | None:
+        """Get a batch by token, or None if unknown or expired."""
+        return self._batches.get(token)
+
+    def is_running(self, user_id: int) -> bool:
+        return user_id in self._running
+
+    async def run(
+        self,
+        batch: BatchJob,
+        kind: str,
+        output_dir: Path,
+        deliver: Callable[[list[BatchItem]], Awaitable[None]],
+        on_progress: Callable[[BatchJob], Awaitable[None]] | None = None,
+    ) -> None:
+        """
+        Download every item and hand them over in groups.
+
+        Failed items are marked and skipped, they don't stop the batch.
+        Files are deleted after their group was delivered.
+
+        Args:
+            batch: Batch to run
+            kind: "video" or "audio"
+            output_dir: Directory for the downloaded files
+            deliver: Sends a group of downloaded items (1 to MEDIA_GROUP_SIZE)
+            on_progress: Called whenever an item changes its status
+        """
+        batch.kind = kind
+        self._running.add(batch.user_id)
+        semaphore = asyncio.Semaphore(settings.batch_concurrency)
+
+        async def progress() -> None:
+            if on_progress is not None:
+                try:
+                    await on_progress(batch)
+                except Exception as e:  # noqa: BLE001 - status updates are best effort
+                    logger.warning(f"Batch {batch.token} progress update failed: {e}")
+
+        async def fetch(index: int, item: BatchItem) -> None:
+            async with semaphore:
+                item.status = "downloading"
+                item.download_id = history.start_download(
+                    batch.user_id,
+                    item.url,
+                    {"id": extract_video_id(item.url), "title": item.title,
+                     "duration": item.duration},
+                    kind,
+                    "audio" if kind == "audio" else settings.default_quality,
+                )
+                await progress()
+                try:
+                    with span("batch_item", index=index):
+                        info = await self.downloader.resolve_formats(item.url)
+                        item.title = item.title or info.get("title") or ""
+                        item.duration = item.duration or int(info.get("duration") or 0)
+                        output_path = output_dir / f"batch_{batch.token}_{index}"
+                        if kind == "audio":
+                            item.path = await self.downloader.download_audio(
+                                item.url, output_path, info
+                            )
+                        else:
+                            item.path = await self.downloader.download_video(
+                                item.url, output_path, info
+                            )
+                    item.size = await get_file_size(item.path)
+                    item.status = "done"
+                    history.update_download(
+                        item.download_id, "uploading", file_size_bytes=item.size
+                    )
+                except Exception as e:  # noqa: BLE001 - one failed item doesn't stop the batch
+                    logger.warning(f"Batch {batch.token} item {item.url} failed: {e}")
+                    item.status = "failed"
+                    item.error = str(e)
+                    history.update_download(item.download_id, "failed", error_message=str(e))
+                await progress()
+
+        # Semaphore waiters are woken in order, so items finish roughly in order
+        tasks = [asyncio.create_task(fetch(i, item)) for i, item in enumerate(batch.items)]
+        try:
+            for start in range(0, len(tasks), MEDIA_GROUP_SIZE):
+                await asyncio.gather(*tasks[start:start + MEDIA_GROUP_SIZE])
+                group = [
+                    item for item in batch.items[start:start + MEDIA_GROUP_SIZE]
+                    if item.status == "done"
+                ]
+                if not group:
+                    continue
+                try:
+                    await deliver(group)
+                except Exception as e:  # noqa: BLE001 - the group is reported as failed
+                    logger.error(f"Failed to deliver batch {batch.token} group: {e}")
+                    for item in group:
+                        item.status = "failed"
+                        item.error = str(e)
+                        history.update_download(item.download_id, "failed", error_message=str(e))
+                else:
+                    for item in group:
+                        history.update_download(
+                            item.download_id, "completed", file_size_bytes=item.size
+                        )
+                finally:
+                    for item in group:
+                        if item.path is not None:
+                            await cleanup_file(item.path)
+                            item.path = None
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Items of a cancelled batch that never finished
+            for item in batch.items:
+                history.update_download(item.download_id, "cancelled")
+            # Files of items that were never delivered (cancelled batch)
+            for item in batch.items:
+                if item.path is not None:
+                    await cleanup_file(item.path)
+            self._running.discard(batch.user_id)
+            self._batches.pop(batch.token)
+
@@ -0,0 +1,306 @@
+"""Shared YouTube cookie jars with change detection, rotation and health tracking."""
+
+from __future__ import annotations
+
+import hashlib
+import itertools
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from loguru import logger
+
+from config import on_change, settings
+from services.metrics import COOKIE_PROFILE_EVENTS
+
+if TYPE_CHECKING:
+    import yt_dlp
+    from yt_dlp.cookies import YoutubeDLCookieJar
+
+# Substrings of yt-dlp errors meaning YouTube rejected the session behind the cookies
+BOT_CHECK_ERRORS = (
+    "confirm you're not a bot",
+    "confirm you’re not a bot",
+    "cookies are no longer valid",
+    "http error 429",
+    "too many requests",
+)
+
+BROWSER_PREFIX = "browser:"
+
+
+def is_bot_check(error: BaseException) -> bool:
+    """Whether a yt-dlp error means the cookies were rejected or rate limited."""
+    message = str(error).lower()
+    return any(marker in message for marker in BOT_CHECK_ERRORS)
+
+
+@dataclass
+class CookieProfile:
+    """One cookie source: a Netscape cookies file or a browser profile."""
+
+    name: str
+    path: Path | None = None
+    browser: tuple[str, ...] | None = None  # yt-dlp browser spec, e.g. ("chrome", "Profile 1")
+    jar: YoutubeDLCookieJar | None = None
+    # Change detection
+    mtime_ns: int = 0
+    size: int = -1
+    digest: str = ""
+    loaded_at: float = 0.0
+    # Health
+    failures: int = 0
+    banned_until: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def banned(self) -> bool:
+        return time.monotonic() < self.banned_until
+
+
+class CookieManager:
+    """
+    Loads every cookie source once into a shared in-memory jar.
+
+    Files are re-read only when their mtime or size changes and their
+    content hash differs; browser profiles (whose databases yt-dlp locates
+    itself) are re-read every ``browser_reload_seconds``. A reload replaces
+    the cookies inside the existing jar, so pooled YoutubeDL instances pick
+    it up without being recreated.
+
+    Jobs are spread across healthy profiles round-robin. A profile that hits
+    YouTube's bot check ``max_failures`` times in a row is benched for
+    ``ban_seconds``.
+    """
+
+    def __init__(
+        self,
+        sources: list[str],
+        ban_seconds: float,
+        max_failures: int,
+        browser_reload_seconds: float,
+    ) -> None:
+        """
+        Args:
+            sources: Cookie file paths or "browser:<name>[:<profile>]" specs
+            ban_seconds: How long a failing profile is skipped
+            max_failures: Consecutive bot-check failures before a ban
+            browser_reload_seconds: Re-read interval of browser profiles
+        """
+        self.ban_seconds = ban_seconds
+        self.max_failures = max_failures
+        self.browser_reload_seconds = browser_reload_seconds
+        self.profiles: dict[str, CookieProfile] = {}
+        for source in sources:
+            if source.startswith(BROWSER_PREFIX):
+                spec = tuple(source.removeprefix(BROWSER_PREFIX).split(":"))
+                profile = CookieProfile(name=source, browser=spec)
+            else:
+                profile = CookieProfile(name=source, path=Path(source))
+            self.profiles[profile.name] = profile
+        self._order = itertools.cycle(list(self.profiles))
+        self._lock = threading.Lock()
+
+        if self.profiles:
+            logger.info(f"Cookie profiles: {', '.join(self.profiles)}")
+        else:
+            logger.info("No cookies configured. Using iOS client fallback for bot detection bypass.")
+
+    @classmethod
+    def from_settings(cls) -> CookieManager:
+        sources = list(settings.cookie_profiles)
+        if settings.cookies_from_browser:
+            sources.insert(0, f"{BROWSER_PREFIX}{settings.cookies_from_browser}")
+        if settings.cookies_file:
+            if settings.cookies_file.exists():
+                sources.insert(0, str(settings.cookies_file))
+            else:
+                logger.warning(f"Cookies file not found: {settings.cookies_file}")
+        return cls(
+            sources,
+            ban_seconds=settings.cookie_ban_seconds,
+            max_failures=settings.cookie_max_failures,
+            browser_reload_seconds=settings.cookie_browser_reload_seconds,
+        )
+
+    def update_from(self, fresh: CookieManager) -> None:
+        """
+        Take the sources and limits of another manager, e.g. after a settings reload.
+
+        Profiles present in both keep their loaded jar and health.
+        """
+        self.ban_seconds = fresh.ban_seconds
+        self.max_failures = fresh.max_failures
+        self.browser_reload_seconds = fresh.browser_reload_seconds
+        with self._lock:
+            self.profiles = {
+                name: self.profiles.get(name, profile) for name, profile in fresh.profiles.items()
+            }
+            self._order = itertools.cycle(list(self.profiles))
+
+    def choose(self, sticky: str | None = None) -> str | None:
+        """
+        Pick the cookie profile for the next job.
+
+        Args:
+            sticky: Profile the job already uses; kept unless banned or removed
+
+        Returns:
+            Profile name, or None if there are no profiles or all are banned
+        """
+        with self._lock:
+            profile = self.profiles.get(sticky) if sticky is not None else None
+            if profile is not None and not profile.banned:
+                return profile.name
+            for _ in range(len(self.profiles)):
+                name = next(self._order)
+                if not self.profiles[name].banned:
+                    return name
+        if self.profiles:
+            logger.warning("All cookie profiles are banned, continuing without cookies")
+        return None
+
+    def get_jar(self, name: str) -> YoutubeDLCookieJar:
+        """
+        Get the jar of a profile, loading or reloading it if the source changed.
+
+        Blocking (reads files, decrypts browser databases): call from a worker thread.
+        """
+        profile = self.profiles[name]
+        with profile.lock:
+            try:
+                self._refresh(profile)
+            except Exception as e:
+                if profile.jar is None:
+                    raise
+                logger.warning(f"Failed to reload cookies {name}, keeping the old ones: {e}")
+            assert profile.jar is not None
+            return profile.jar
+
+    def attach(self, ydl: yt_dlp.YoutubeDL, name: str) -> None:
+        """Make a YoutubeDL instance use the shared jar of a profile."""
+        # YoutubeDL.cookiejar is a cached property, pre-seeding it skips loading from params
+        ydl.__dict__["cookiejar"] = self.get_jar(name)
+
+    def report_success(self, name: str | None) -> None:
+        if name in self.profiles:
+            self.profiles[name].failures = 0
+
+    def report_failure(self, name: str | None, error: BaseException) -> None:
+        """Count a failed request; bench the profile if YouTube keeps rejecting it."""
+        if name not in self.profiles or not is_bot_check(error):
+            return
+        profile = self.profiles[name]
+        profile.failures += 1
+        COOKIE_PROFILE_EVENTS.inc(event="bot_check")
+        if profile.failures >= self.max_failures:
+            profile.banned_until = time.monotonic() + self.ban_seconds
+            profile.failures = 0
+            COOKIE_PROFILE_EVENTS.inc(event="banned")
+            logger.warning(f"Cookie profile {name} rejected by YouTube, benched for "
+                           f"{self.ban_seconds:.0f}s")
+
+    def status(self) -> list[dict[str, Any]]:
+        """Health of every profile, for diagnostics."""
+        now = time.monotonic()
+        return [
+            {
+                "name": p.name,
+                "loaded": p.jar is not None,
+                "cookies": len(p.jar) if p.jar is not None else 0,
+                "failures": p.failures,
+                "banned_for": max(0.0, p.banned_until - now),
+            }
+            for p in self.profiles.values()
+        ]
+
+    def save(self) -> None:
+        """Write the jars of file profiles back, keeping cookies YouTube rotated."""
+        for profile in self.profiles.values():
+            if profile.path is None or profile.jar is None:
+                continue
+            with profile.lock:
+                try:
+                    stat = profile.path.stat()
+                    if (stat.st_mtime_ns, stat.st_size) != (profile.mtime_ns, profile.size):
+                        # Replaced since the last load: the new file wins
+                        continue
+                    profile.jar.save(str(profile.path))
+                    self._remember_file(profile, profile.path.read_bytes())
+                except OSError as e:
+                    logger.warning(f"Failed to save cookies {profile.name}: {e}")
+
+    def _refresh(self, profile: CookieProfile) -> None:
+        if profile.browser is not None:
+            if profile.jar is None or (
+                time.monotonic() - profile.loaded_at >= self.browser_reload_seconds
+            ):
+                self._replace(profile, _load_browser(profile.browser))
+            return
+
+        assert profile.path is not None
+        stat = profile.path.stat()
+        if profile.jar is not None and (stat.st_mtime_ns, stat.st_size) == (
+            profile.mtime_ns, profile.size
+        ):
+            return
+
+        content = profile.path.read_bytes()
+        if profile.jar is not None and hashlib.sha256(content).hexdigest() == profile.digest:
+            # Touched but unchanged
+            profile.mtime_ns, profile.size = stat.st_mtime_ns, stat.st_size
+            return
+
+        self._replace(profile, _load_file(profile.path))
+        self._remember_file(profile, content)
+
+    @staticmethod
+    def _remember_file(profile: CookieProfile, content: bytes) -> None:
+        assert profile.path is not None
+        stat = profile.path.stat()
+        profile.mtime_ns, profile.size = stat.st_mtime_ns, stat.st_size
+        profile.digest = hashlib.sha256(content).hexdigest()
+
+    @staticmethod
+    def _replace(profile: CookieProfile, fresh: YoutubeDLCookieJar) -> None:
+        COOKIE_PROFILE_EVENTS.inc(event="loaded" if profile.jar is None else "reloaded")
+        if profile.jar is None:
+            profile.jar = fresh
+        else:
+            # Swap the contents so instances already holding the jar see the new cookies
+            with profile.jar._cookies_lock:
+                profile.jar._cookies = fresh._cookies
+        profile.loaded_at = time.monotonic()
+        logger.info(f"Loaded {len(profile.jar)} cookies from {profile.name}")
+
+
+def _load_file(path: Path) -> YoutubeDLCookieJar:
+    from yt_dlp.cookies import YoutubeDLCookieJar
+
+    jar = YoutubeDLCookieJar(str(path))
+    jar.load()
+    return jar
+
+
+def _load_browser(spec: tuple[str, ...]) -> YoutubeDLCookieJar:
+    from yt_dlp.cookies import _parse_browser_specification, extract_cookies_from_browser
+
+    browser_name, profile, keyring, container = _parse_browser_specification(*spec)
+    return extract_cookies_from_browser(browser_name, profile, keyring=keyring, container=container)
+
+
+cookie_manager = CookieManager.from_settings()
+
+
+@on_change(
+    "cookies_file",
+    "cookies_from_browser",
+    "cookie_profiles",
+    "cookie_ban_seconds",
+    "cookie_max_failures",
+    "cookie_browser_reload_seconds",
+)
+def _reload_cookie_sources() -> None:
+    cookie_manager.update_from(CookieManager.from_settings())
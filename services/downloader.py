@@ -3,13 +3,58 @@
 from __future__ import annotations
 
 import asyncio
+import copy
+import functools
+import os
+import shutil
+import struct
 import subprocess
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
+from contextvars import ContextVar, copy_context
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any, TypeVar
 
-import yt_dlp
 from loguru import logger
 
+from config import on_change, settings
+from services.bandwidth import bandwidth
+from services.cache import TTLCache
+from services.cookies import cookie_manager, is_bot_check
+from services.file_manager import format_file_size, source_cache
+from services.metrics import (
+    DOWNLOAD_BYTES,
+    DOWNLOAD_SECONDS,
+    DOWNLOAD_SPEED,
+    ENCODE_REALTIME_FACTOR,
+    ENCODE_SECONDS,
+    EXECUTOR_BUSY,
+    EXECUTOR_SATURATION,
+    EXTRACTION_SECONDS,
+    QUEUE_WAIT_SECONDS,
+    SOURCE_CACHE_REQUESTS,
+    VIDEO_PATHS,
+)
+from services.proxies import Proxy, proxy_pool, redact
+from services.resilience import (
+    PERMANENT,
+    THROTTLED,
+    TRANSIENT,
+    CircuitBreaker,
+    CircuitOpenError,
+    breakers,
+    call_with_retries,
+    wait_for_any,
+)
+from services.tracing import profiled, span
+from services.validators import extract_video_id
+from services.ydl_pool import YoutubeDLPool
+
+if TYPE_CHECKING:
+    import yt_dlp
+
 
 class DownloadError(Exception):
     """Custom exception for download errors."""
@@ -17,19 +62,308 @@ class DownloadError(Exception):
     pass
 
 
-def _get_base_ydl_opts() -> dict[str, Any]:
+class VideoUnavailableError(DownloadError):
+    """Video can't be fetched by any client: removed, private, age-gated, etc."""
+
+    def __init__(self, message: str, reason: str) -> None:
+        super().__init__(message)
+        self.reason = reason
+
+
+# Substrings of yt-dlp error messages that mean retrying with another client is pointless
+_PERMANENT_ERRORS: dict[str, tuple[str, ...]] = {
+    "private": ("private video", "video is private"),
+    "removed": (
+        "video unavailable",
+        "has been removed",
+        "no longer available",
+        "account associated with this video has been terminated",
+    ),
+    "age_restricted": ("confirm your age", "age-restricted", "inappropriate for some users"),
+    "geo_blocked": ("not available in your country", "blocked it in your country", "geo restrict"),
+    "members_only": ("members-only", "join this channel"),
+}
+
+# Substrings of yt-dlp error messages that mean YouTube is rate limiting; they win over
+# _PERMANENT_ERRORS: the reply reads "Video unavailable. This content isn't available,
+# try again later."
+_THROTTLED_ERRORS = ("try again later",)
+
+# Substrings of yt-dlp error messages that mean a network problem worth retrying
+_TRANSIENT_ERRORS = (
+    "timed out",
+    "connection reset",
+    "connection refused",
+    "connection aborted",
+    "remote end closed connection",
+    "temporary failure in name resolution",
+    "incompleteread",
+    "http error 500",
+    "http error 502",
+    "http error 503",
+    "http error 504",
+)
+
+T = TypeVar("T")
+
+# Part of a video to download: (start, end) in seconds, end None for "until the end"
+Clip = tuple[float, float | None]
+
+# Video qualities offered to users, by the short side of the frame ("720p")
+QUALITY_LADDER = (360, 480, 720, 1080, 1440, 2160)
+
+# Player clients: requested together by the primary extraction, tried one by one
+# when it fails, and used alone for the cheap preview
+PRIMARY_CLIENTS = ["ios", "android", "web"]
+FALLBACK_CLIENTS = ["ios", "android", "mweb", "tv_embedded"]
+PREVIEW_CLIENTS = ["ios"]
+
+# Executor for blocking yt-dlp/FFmpeg calls of the current task (None = download executor)
+_executor: ContextVar[Executor | None] = ContextVar("downloader_executor", default=None)
+_download_executor: ThreadPoolExecutor | None = None
+# Bandwidth class of downloads started from the current task (None = by job kind)
+_download_class: ContextVar[str | None] = ContextVar("download_class", default=None)
+
+# Reused YoutubeDL instances. _new_ydl is looked up on every call, so patching it works
+ydl_pool = YoutubeDLPool(
+    lambda ydl_opts: _create_ydl(ydl_opts),
+    max_idle=settings.ydl_pool_max_idle,
+    max_uses=settings.ydl_max_uses,
+    max_age=settings.ydl_max_age_seconds,
+)
+
+# Dead links are remembered so repeat requests fail without touching YouTube
+_unavailable_videos: TTLCache[str, tuple[str, str]] = TTLCache(
+    maxsize=settings.negative_cache_max_size,
+    ttl=settings.negative_cache_ttl_seconds,
+)
+
+
+def _default_executor() -> ThreadPoolExecutor:
+    """Executor for downloads and encodes, sized by settings.download_workers."""
+    global _download_executor
+    if _download_executor is None:
+        _download_executor = ThreadPoolExecutor(
+            max_workers=settings.download_workers, thread_name_prefix="download"
+        )
+        EXECUTOR_SATURATION.set_function(
+            lambda: EXECUTOR_BUSY.get(executor="download") / settings.download_workers,
+            executor="download",
+        )
+    return _download_executor
+
+
+async def _run_blocking(func: Callable[[], T]) -> T:
     """
-    Get base yt-dlp options including cookies if configured.
+    Run a blocking call in the current task's executor, recording queue wait and load.
+
+    Args:
+        func: Function to call in a worker thread
+
+    Returns:
+        Result of ``func``
+    """
+    executor = _executor.get() or _default_executor()
+    name = getattr(executor, "_thread_name_prefix", "") or "custom"
+    submitted = time.perf_counter()
+    # Spans opened in the worker thread belong to the calling job's trace
+    context = copy_context()
+    func = profiled(func)
+
+    def run() -> T:
+        QUEUE_WAIT_SECONDS.observe(time.perf_counter() - submitted, executor=name)
+        with EXECUTOR_BUSY.track_inprogress(executor=name):
+            return context.run(func)
+
+    return await asyncio.get_running_loop().run_in_executor(executor, run)
+
+
+async def _timed_extraction(client: str, func: Callable[[], dict[str, Any]]) -> dict[str, Any]:
+    """Run an extraction attempt and record its duration per client and outcome."""
+    start = time.perf_counter()
+    outcome = "failure"
+    try:
+        with span(f"extract:{client}"):
+            info = await _run_blocking(func)
+        outcome = "success"
+        return info
+    finally:
+        EXTRACTION_SECONDS.observe(time.perf_counter() - start, client=client, outcome=outcome)
+
+
+@contextmanager
+def _timed_encode(output: str, media_duration: float | None) -> Iterator[None]:
+    """Record encode time and realtime factor (media seconds per encode second)."""
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    ENCODE_SECONDS.observe(elapsed, output=output)
+    if media_duration:
+        ENCODE_REALTIME_FACTOR.observe(media_duration / max(elapsed, 1e-6), output=output)
+
+
+def use_executor(executor: Executor | None) -> None:
+    """
+    Run blocking work of downloads started from the current task in ``executor``.
+
+    The setting is stored in a context variable, so it only affects the
+    calling task (and tasks created from it), e.g. low-priority prefetching.
+    """
+    _executor.set(executor)
+
+
+def use_download_class(kind: str | None) -> None:
+    """
+    Share download bandwidth as ``kind`` (see services.bandwidth) in the current task.
+
+    Like use_executor(), only affects the calling task, e.g. "background"
+    for prefetching. By default audio jobs download as "audio" and video
+    jobs as "video".
+    """
+    _download_class.set(kind)
+
+
+def classify_error(error: BaseException) -> str | None:
+    """
+    Classify a yt-dlp error as permanent or transient.
+
+    Args:
+        error: Exception raised by yt-dlp
+
+    Returns:
+        Reason of a permanent failure ("private", "removed", "age_restricted",
+        "geo_blocked", "members_only"), or None for transient errors
+        (network problems, throttling, bot checks)
+    """
+    message = str(error).lower()
+    if any(marker in message for marker in _THROTTLED_ERRORS):
+        return None
+    for reason, markers in _PERMANENT_ERRORS.items():
+        if any(marker in message for marker in markers):
+            return reason
+    return None
+
+
+def classify_failure(error: BaseException) -> str:
+    """
+    Classify a failed request for retries and circuit breakers.
+
+    Args:
+        error: Exception raised by yt-dlp
+
+    Returns:
+        "permanent" (see classify_error()), "throttled" (429, bot check),
+        "transient" (network errors, 5xx) or "error" for anything else
+        (missing formats, FFmpeg failures), which says nothing about the path
+    """
+    if classify_error(error) is not None:
+        return PERMANENT
+    message = str(error).lower()
+    if is_bot_check(error) or any(marker in message for marker in _THROTTLED_ERRORS):
+        return THROTTLED
+    if isinstance(error, (TimeoutError, ConnectionError)) or any(
+        marker in message for marker in _TRANSIENT_ERRORS
+    ):
+        return TRANSIENT
+    return "error"
+
+
+def _egress_identity(ydl_opts: dict[str, Any]) -> str:
+    """Network identity YouTube sees a request coming from (proxy name or "direct")."""
+    return redact(ydl_opts.get("proxy"))
+
+
+def _egress_open(proxy: Proxy) -> bool:
+    """Whether the circuit breaker of a proxy lets requests through."""
+    return breakers.get("egress", proxy.name).available()
+
+
+async def _reported(egress: str, func: Callable[[], Awaitable[T]], timed: bool = True) -> T:
+    """Make a request attempt and report its outcome to the proxy pool."""
+    start = time.perf_counter()
+    try:
+        result = await func()
+    except Exception as e:
+        proxy_pool.report(egress, classify_failure(e) not in (THROTTLED, TRANSIENT))
+        raise
+    proxy_pool.report(egress, True, time.perf_counter() - start if timed else None)
+    return result
+
+
+def _path_breakers(client: str, ydl_opts: dict[str, Any]) -> list[CircuitBreaker]:
+    """Breakers of a request's player client and egress identity."""
+    return [breakers.get("client", client), breakers.get("egress", _egress_identity(ydl_opts))]
+
+
+async def _guarded_extraction(
+    client: str,
+    ydl_opts: dict[str, Any],
+    func: Callable[[], dict[str, Any]],
+    max_wait: float | None = None,
+) -> dict[str, Any]:
+    """Run an extraction through the circuit breakers of its path, retrying network errors."""
+    return await call_with_retries(
+        lambda: _reported(_egress_identity(ydl_opts), lambda: _timed_extraction(client, func)),
+        _path_breakers(client, ydl_opts),
+        classify_failure,
+        max_wait,
+    )
+
+
+def _remember_unavailable(url: str, error: BaseException) -> VideoUnavailableError | None:
+    """Put a permanently failed video into the negative cache and return the error to raise."""
+    reason = classify_error(error)
+    if reason is None:
+        return None
+
+    key = extract_video_id(url) or url
+    _unavailable_videos.set(key, (reason, str(error)))
+    logger.info(
+        f"Video {key} is unavailable ({reason}), "
+        f"cached for {settings.negative_cache_ttl_seconds}s"
+    )
+    return VideoUnavailableError(f"Video is unavailable: {error}", reason)
+
+
+def _check_unavailable(url: str) -> None:
+    """Raise VideoUnavailableError right away if the video is in the negative cache."""
+    cached = _unavailable_videos.get(extract_video_id(url) or url)
+    if cached:
+        reason, message = cached
+        raise VideoUnavailableError(f"Video is unavailable: {message}", reason)
+
+
+def _get_base_ydl_opts(
+    proxy: str | None = None, cookie_profile: str | None = None
+) -> dict[str, Any]:
+    """
+    Get base yt-dlp options with the next cookie profile if any are configured.
     Uses multiple fallback strategies to avoid bot detection.
-    
+
+    The options are built once; call clear_ydl_cache() after changing settings.
+
+    Args:
+        proxy: Proxy URL from the proxy pool, None to connect directly
+        cookie_profile: Profile the job was extracted with (``cookie_profile``
+            of its info dict); kept unless it was benched or removed
+
     Returns:
-        Dictionary with base yt-dlp options
+        Dictionary with base yt-dlp options (a copy the caller may modify)
     """
-    from config.settings import settings
-    
+    opts = copy.deepcopy(_build_base_ydl_opts())
+    # Not a yt-dlp option: picked up by _create_ydl, keeps instances per profile in the pool
+    opts["cookie_profile"] = cookie_manager.choose(cookie_profile)
+    if proxy:
+        opts["proxy"] = proxy
+    return opts
+
+
+@functools.lru_cache(maxsize=1)
+def _build_base_ydl_opts() -> dict[str, Any]:
     opts: dict[str, Any] = {
         "quiet": True,
         "no_warnings": True,
+        "noprogress": True,  # quiet alone doesn't silence the progress line
         # Anti-bot measures
         "nocheckcertificate": True,
         "prefer_insecure": False,
@@ -38,7 +372,7 @@ def _get_base_ydl_opts() -> dict[str, Any]:
         "extractor_args": {
             "youtube": {
                 # Use multiple clients as fallback (ios works without cookies often)
-                "player_client": ["ios", "android", "web"],
+                "player_client": PRIMARY_CLIENTS,
                 "player_skip": ["webpage", "configs"],
                 # Skip signature decryption issues
                 "skip": ["dash", "hls"],
@@ -59,31 +393,35 @@ def _get_base_ydl_opts() -> dict[str, Any]:
         "age_limit": None,  # Don't filter by age
         "geo_bypass": True,  # Try to bypass geo restrictions
         "no_check_certificate": True,
+        # Streams split into ranges by _split_into_ranges() must be complete
+        "skip_unavailable_fragments": False,
     }
-    
-    # Priority 1: Use cookies from browser (most reliable)
-    if settings.cookies_from_browser:
-        opts["cookiesfrombrowser"] = (settings.cookies_from_browser,)
-        logger.info(f"Using cookies from browser: {settings.cookies_from_browser}")
-    # Priority 2: Use cookies file
-    elif settings.cookies_file and settings.cookies_file.exists():
-        opts["cookiefile"] = str(settings.cookies_file)
-        logger.info(f"Using cookies file: {settings.cookies_file}")
-    elif settings.cookies_file:
-        logger.warning(f"Cookies file not found: {settings.cookies_file}")
-    else:
-        logger.info("No cookies configured. Using iOS client fallback for bot detection bypass.")
-    
+    if settings.download_bandwidth_mbps:
+        # Small fixed read blocks keep the bandwidth scheduler's pacing smooth
+        opts.update({"buffersize": 64 * 1024, "noresizebuffer": True})
+    # Cookies are attached by _create_ydl from the shared jars in services.cookies
+    return opts
+
+
+def _get_primary_ydl_opts(
+    proxy: str | None = None, cookie_profile: str | None = None
+) -> dict[str, Any]:
+    """Get yt-dlp options for the primary full extraction."""
+    opts = _get_base_ydl_opts(proxy, cookie_profile)
+    opts.update({
+        "extract_flat": False,
+    })
     return opts
 
 
-def _get_fallback_ydl_opts(client_type: str = "ios") -> dict[str, Any]:
+def _get_fallback_ydl_opts(client_type: str = "ios", proxy: str | None = None) -> dict[str, Any]:
     """
     Get yt-dlp options with specific client fallback.
     Used when primary method fails.
     
     Args:
         client_type: Client to use ("ios", "android", "mweb", "tv_embedded")
+        proxy: Proxy URL from the proxy pool, None to connect directly
     
     Returns:
         Dictionary with yt-dlp options for specific client
@@ -136,21 +474,95 @@ def _get_fallback_ydl_opts(client_type: str = "ios") -> dict[str, Any]:
             "Accept-Language": "en-US,en;q=0.9",
         },
     }
+    if proxy:
+        opts["proxy"] = proxy
     
-    logger.info(f"Using fallback client: {client_type}")
     return opts
 
 
+def _get_preview_ydl_opts(proxy: str | None = None) -> dict[str, Any]:
+    """
+    Get yt-dlp options for the lightweight preview request.
+
+    Only one player API request is made: the watch page, player configs and
+    player JS are skipped since the preview doesn't need playable formats.
+
+    Args:
+        proxy: Proxy URL from the proxy pool, None to connect directly
+
+    Returns:
+        Dictionary with yt-dlp options for preview extraction
+    """
+    opts = _get_base_ydl_opts(proxy)
+    opts.update({
+        "extract_flat": False,
+        "check_formats": False,
+        "extractor_args": {
+            "youtube": {
+                "player_client": PREVIEW_CLIENTS,
+                "player_skip": ["webpage", "configs", "js"],
+                "skip": ["dash", "hls", "translated_subs"],
+            }
+        },
+    })
+    return opts
+
+
+async def get_video_preview(url: str) -> dict[str, Any]:
+    """
+    Cheaply extract the metadata shown on the preview card.
+
+    Asks a single player client for the basic video details and skips the
+    webpage, the player JS (signature decryption) and format processing.
+    Falls back to the full get_video_info() if the lightweight request fails.
+
+    Args:
+        url: YouTube video URL
+
+    Returns:
+        Dictionary with the same keys as get_video_info()
+
+    Raises:
+        VideoUnavailableError: If the video is permanently unavailable
+        DownloadError: If video info cannot be extracted with any method
+    """
+    _check_unavailable(url)
+
+    logger.debug(f"Extracting preview for: {url}")
+
+    try:
+        async with proxy_pool.acquire(prefer=_egress_open) as proxy:
+            ydl_opts = _get_preview_ydl_opts(proxy.url)
+            # A paused path isn't waited for, the full extraction has fallbacks
+            info = await _guarded_extraction(
+                "preview", ydl_opts, lambda: _extract_info_sync(url, ydl_opts, process=False), 0
+            )
+        result = _build_info_result(info)
+        logger.info(f"Extracted preview for: {result['title']}")
+        return result
+
+    except Exception as e:
+        unavailable = _remember_unavailable(url, e)
+        if unavailable:
+            raise unavailable from e
+        logger.warning(f"Lightweight preview failed, falling back to full extraction: {e}")
+        return await get_video_info(url)
+
+
 async def get_video_info(url: str) -> dict[str, Any]:
     """
     Extract video information from YouTube URL.
     Uses multiple fallback strategies if primary method fails.
 
+    Permanent failures (removed, private, age-gated videos) skip the fallback
+    chain and are kept in a negative cache, so repeat requests fail instantly.
+
     Args:
         url: YouTube video URL
 
     Returns:
         Dictionary with video info containing:
+            - id: YouTube video ID
             - title: Video title
             - duration: Duration in seconds
             - thumbnail: Thumbnail URL
@@ -158,238 +570,894 @@ async def get_video_info(url: str) -> dict[str, Any]:
             - view_count: Number of views
 
     Raises:
+        VideoUnavailableError: If the video is permanently unavailable
         DownloadError: If video info cannot be extracted with any method
     """
-    # Try primary method first
-    ydl_opts = _get_base_ydl_opts()
-    ydl_opts.update({
-        "extract_flat": False,
-    })
+    info = await _extract_with_fallbacks(url)
+    return _build_info_result(info)
 
-    logger.info(f"Extracting video info from: {url}")
-    
-    # Fallback clients to try if primary fails
-    fallback_clients = ["ios", "android", "mweb", "tv_embedded"]
-    
-    # Try primary method
+
+async def resolve_formats(url: str) -> dict[str, Any]:
+    """
+    Run full extraction with format resolution.
+
+    The result can be passed to download_video()/download_audio() as ``info``
+    so the download doesn't have to extract the video again. Its ``egress``
+    key names the proxy the stream URLs were issued to, ``cookie_profile``
+    the cookies the job uses.
+
+    Args:
+        url: YouTube video URL
+
+    Returns:
+        Sanitized yt-dlp info dict including the list of formats
+
+    Raises:
+        VideoUnavailableError: If the video is permanently unavailable
+        DownloadError: If video info cannot be extracted with any method
+    """
+    return await _extract_with_fallbacks(url)
+
+
+async def expand_playlist(url: str, limit: int) -> list[dict[str, Any]]:
+    """
+    List the videos of a playlist without extracting each of them.
+
+    Uses flat extraction: only the playlist pages are requested, the
+    entries carry their ID, title and duration but no formats.
+
+    Args:
+        url: YouTube playlist URL
+        limit: Maximum number of entries, from the start of the playlist
+
+    Returns:
+        Entries like ``{"id": ..., "url": ..., "title": ..., "duration": ...}``
+
+    Raises:
+        DownloadError: If the playlist cannot be extracted
+    """
+    logger.debug(f"Expanding playlist: {url}")
     try:
-        loop = asyncio.get_event_loop()
-        info = await loop.run_in_executor(None, lambda: _extract_info_sync(url, ydl_opts))
-
-        result = {
-            "title": info.get("title", "Unknown"),
-            "duration": info.get("duration", 0),
-            "thumbnail": info.get("thumbnail", ""),
-            "uploader": info.get("uploader", "Unknown"),
-            "view_count": info.get("view_count", 0),
+        info = await _extract_flat(url, limit, "playlist")
+    except Exception as e:
+        logger.warning(f"Failed to expand playlist {url}: {e}")
+        raise DownloadError(f"Could not get playlist: {e}") from e
+
+    entries = _flat_entries(info)
+    logger.info(f"Playlist {info.get('title')}: {len(entries)} videos")
+    return entries
+
+
+async def search_videos(query: str, limit: int) -> list[dict[str, Any]]:
+    """
+    Search YouTube for videos.
+
+    Uses flat extraction of ``ytsearch``: one request to the search page,
+    none per result.
+
+    Args:
+        query: Search text
+        limit: Maximum number of results
+
+    Returns:
+        Results in YouTube's order, entries like expand_playlist() plus
+        ``uploader`` and ``view_count``
+
+    Raises:
+        DownloadError: If the search fails
+    """
+    logger.debug(f"Searching for: {query}")
+    try:
+        info = await _extract_flat(f"ytsearch{limit}:{query}", limit, "search")
+    except Exception as e:
+        logger.warning(f"Search failed for {query!r}: {e}")
+        raise DownloadError(f"Could not search: {e}") from e
+    return _flat_entries(info)
+
+
+async def _extract_flat(url: str, limit: int, client: str) -> dict[str, Any]:
+    """List the entries of a playlist-like URL without extracting each entry."""
+    async with proxy_pool.acquire(prefer=_egress_open) as proxy:
+        ydl_opts = _get_base_ydl_opts(proxy.url)
+
+        def extract() -> dict[str, Any]:
+            with _cookie_health(ydl_opts), ydl_pool.acquire(
+                ydl_opts, extract_flat="in_playlist", noplaylist=False, playlist_items=f"1:{limit}"
+            ) as ydl:
+                info: dict[str, Any] = ydl.sanitize_info(ydl.extract_info(url, download=False))
+                return info
+
+        return await _guarded_extraction(client, ydl_opts, extract)
+
+
+def _flat_entries(info: dict[str, Any]) -> list[dict[str, Any]]:
+    """Pick the fields used by the bot from flat playlist entries."""
+    return [
+        {
+            "id": entry["id"],
+            "url": f"https://www.youtube.com/watch?v={entry['id']}",
+            "title": entry.get("title") or "",
+            "duration": entry.get("duration") or 0,
+            "uploader": entry.get("channel") or entry.get("uploader") or "",
+            "view_count": entry.get("view_count") or 0,
+            "live": entry.get("live_status") == "is_live",
         }
+        for entry in info.get("entries") or []
+        if entry and entry.get("id")
+    ]
 
-        logger.info(f"Successfully extracted info for: {result['title']}")
-        return result
 
-    except Exception as primary_error:
-        logger.warning(f"Primary method failed: {primary_error}")
-        
-        # Try fallback clients
-        for client in fallback_clients:
-            try:
-                logger.info(f"Trying fallback client: {client}")
-                fallback_opts = _get_fallback_ydl_opts(client)
-                fallback_opts.update({"extract_flat": False})
-                
-                loop = asyncio.get_event_loop()
-                info = await loop.run_in_executor(
-                    None, lambda: _extract_info_sync(url, fallback_opts)
-                )
+async def _extract_with_fallbacks(url: str) -> dict[str, Any]:
+    """
+    Full extraction through a proxy of the pool, recorded as ``egress`` in the result.
 
-                result = {
-                    "title": info.get("title", "Unknown"),
-                    "duration": info.get("duration", 0),
-                    "thumbnail": info.get("thumbnail", ""),
-                    "uploader": info.get("uploader", "Unknown"),
-                    "view_count": info.get("view_count", 0),
-                }
+    The job's cookie profile is chosen here, once, and recorded as
+    ``cookie_profile``: the downloads of the job reuse it.
 
-                logger.success(f"Fallback {client} succeeded! Extracted: {result['title']}")
-                return result
+    If every client is paused by its circuit breaker, the extraction queues
+    until one reopens. It gives its proxy slot back meanwhile and takes one
+    again (maybe on another proxy) when it retries.
+    """
+    _check_unavailable(url)
 
-            except Exception as e:
-                logger.warning(f"Fallback {client} failed: {e}")
-                continue
-        
+    cookie_profile = cookie_manager.choose()
+    while True:
+        async with proxy_pool.acquire(prefer=_egress_open) as proxy:
+            paths = _extraction_paths(proxy, cookie_profile)
+            info = await _extract_with_clients(url, paths)
+        if info is not None:
+            info["egress"] = proxy.name
+            info["cookie_profile"] = paths[0][1]["cookie_profile"]
+            return info
+
+        # Every client is paused: queue until one of them reopens
+        try:
+            await wait_for_any(
+                [_path_breakers(client, ydl_opts) for client, ydl_opts in paths],
+                settings.breaker_max_wait_seconds,
+            )
+        except CircuitOpenError as e:
+            logger.error(f"All extraction paths are paused for: {url}")
+            raise DownloadError(f"YouTube is throttling requests, try again later: {e}") from e
+
+
+def _extraction_paths(
+    proxy: Proxy, cookie_profile: str | None
+) -> list[tuple[str, dict[str, Any]]]:
+    """Player clients of a full extraction with their yt-dlp options, primary first."""
+    paths = [("primary", _get_primary_ydl_opts(proxy.url, cookie_profile))]
+    for client in FALLBACK_CLIENTS:
+        fallback_opts = _get_fallback_ydl_opts(client, proxy.url)
+        fallback_opts.update({"extract_flat": False})
+        paths.append((client, fallback_opts))
+    return paths
+
+
+async def _extract_with_clients(
+    url: str, paths: list[tuple[str, dict[str, Any]]]
+) -> dict[str, Any] | None:
+    """
+    Full extraction with the primary options, then each fallback client in turn.
+
+    Network errors are retried on the same client. Clients paused by their
+    circuit breaker (or the breaker of the egress identity) are skipped.
+
+    Returns:
+        The info dict, or None if every client is paused
+    """
+    logger.debug(f"Extracting video info from: {url}")
+    last_error: Exception | None = None
+    for client, ydl_opts in paths:
+        if not all(b.available() for b in _path_breakers(client, ydl_opts)):
+            logger.debug(f"Skipping {client} client: circuit open")
+            continue
+        if client != "primary":
+            logger.debug(f"Trying fallback client: {client}")
+        try:
+            info = await _guarded_extraction(
+                client, ydl_opts, functools.partial(_extract_info_sync, url, ydl_opts), 0
+            )
+        except Exception as e:
+            logger.warning(
+                f"{'Primary method' if client == 'primary' else f'Fallback {client}'} "
+                f"failed: {e}"
+            )
+            unavailable = _remember_unavailable(url, e)
+            if unavailable:
+                raise unavailable from e
+            last_error = e
+            continue
+
+        if client == "primary":
+            logger.info(f"Successfully extracted info for: {info.get('title')}")
+        else:
+            logger.success(f"Fallback {client} succeeded! Extracted: {info.get('title')}")
+        return info
+
+    if last_error is not None:
         # All methods failed
         logger.error(f"All extraction methods failed for: {url}")
         raise DownloadError(
             f"Could not get video information after trying all methods. "
-            f"Last error: {primary_error}"
-        ) from primary_error
+            f"Last error: {last_error}"
+        ) from last_error
+    return None
+
+
+def _build_info_result(info: dict[str, Any]) -> dict[str, Any]:
+    """Pick the fields used by the bot from a yt-dlp info dict."""
+    return {
+        "id": info.get("id", ""),
+        "title": info.get("title", "Unknown"),
+        "duration": info.get("duration", 0),
+        "thumbnail": info.get("thumbnail", ""),
+        "uploader": info.get("uploader", "Unknown"),
+        "view_count": info.get("view_count", 0),
+        "renditions": quality_ladder(info),
+    }
+
+
+def quality_ladder(info: dict[str, Any]) -> list[dict[str, Any]]:
+    """
+    List the video qualities that can be downloaded, with their cost.
+
+    Works on the unprocessed formats of a preview as well as on a full
+    extraction. Sizes are estimated from the size or bitrate of the source
+    streams that would be downloaded.
 
+    Args:
+        info: yt-dlp info dict
 
-def _extract_info_sync(url: str, ydl_opts: dict[str, Any]) -> dict[str, Any]:
-    """Synchronous helper to extract info with yt-dlp."""
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        return ydl.extract_info(url, download=False)
+    Returns:
+        Lowest quality first, entries like
+        ``{"quality": "720p", "size": 52_000_000, "remux": True,
+        "progressive": False}``; ``size`` is None if unknown, ``remux`` means
+        the streams are already H.264/AAC and only need to be repackaged
+        instead of re-encoded, ``progressive`` that a single file is sent as
+        it is (see _select_progressive())
+    """
+    ladder: list[dict[str, Any]] = []
+    previous = 0
+    for rung in QUALITY_LADDER:
+        try:
+            video_format, audio_format = _select_formats(info, max_quality=rung)
+        except DownloadError:
+            continue
+        progressive = _select_progressive(info, rung, video_format)
+        if progressive is not None:
+            video_format, audio_format = progressive, None
+        # A rung is only offered if it gets a better stream than the one below it
+        if _short_side(video_format) > previous:
+            previous = _short_side(video_format)
+            streams = [video_format, *([audio_format] if audio_format else [])]
+            sizes = [_estimate_size(f, info.get("duration")) for f in streams]
+            ladder.append({
+                "quality": f"{rung}p",
+                "size": sum(sizes) if None not in sizes else None,
+                "remux": _can_remux(video_format, audio_format),
+                "progressive": progressive is not None,
+            })
+    return ladder
 
 
-async def download_video(url: str, output_path: Path) -> Path:
+def parse_quality(quality: str | None) -> int | None:
+    """
+    Convert a quality name to the maximum short side of the frame.
+
+    Args:
+        quality: "360p", "720p", ... or "best"; None for settings.default_quality
+
+    Returns:
+        Maximum short side in pixels, None for the best available quality
+
+    Raises:
+        ValueError: If the name is not a quality
+    """
+    quality = (quality or settings.default_quality).strip().lower()
+    if quality == "best":
+        return None
+    return int(quality.removesuffix("p"))
+
+
+def _new_ydl(ydl_opts: dict[str, Any]) -> yt_dlp.YoutubeDL:
+    """
+    Create a YoutubeDL instance.
+
+    All yt-dlp calls go through this function, so benchmarks can swap in
+    instances with stub extractors.
+    """
+    # Imported on first use to keep bot startup fast, see warm_up()
+    import yt_dlp
+
+    return yt_dlp.YoutubeDL(ydl_opts)
+
+
+def _create_ydl(ydl_opts: dict[str, Any]) -> yt_dlp.YoutubeDL:
+    """Create a pooled instance sharing the in-memory jar of its cookie profile."""
+    profile = ydl_opts.pop("cookie_profile", None)
+    ydl = _new_ydl(ydl_opts)
+    if profile:
+        cookie_manager.attach(ydl, profile)
+    return ydl
+
+
+@contextmanager
+def _cookie_health(ydl_opts: dict[str, Any]) -> Iterator[None]:
+    """Reload the cookie profile if its source changed and record how the request went."""
+    profile = ydl_opts.get("cookie_profile")
+    if profile:
+        cookie_manager.get_jar(profile)
+    try:
+        yield
+    except Exception as e:
+        cookie_manager.report_failure(profile, e)
+        raise
+    cookie_manager.report_success(profile)
+
+
+def clear_ydl_cache() -> None:
+    """Rebuild yt-dlp options and instances on next use (after settings or _new_ydl change)."""
+    _build_base_ydl_opts.cache_clear()
+    ydl_pool.clear()
+
+
+@on_change("download_bandwidth_mbps", "cookies_file", "cookies_from_browser", "cookie_profiles")
+def _reload_ydl_opts() -> None:
+    # Also drops pooled instances bound to cookie profiles that were removed
+    clear_ydl_cache()
+
+
+@on_change("ydl_pool_max_idle", "ydl_max_uses", "ydl_max_age_seconds")
+def _reload_ydl_pool() -> None:
+    ydl_pool.max_idle = settings.ydl_pool_max_idle
+    ydl_pool.max_uses = settings.ydl_max_uses
+    ydl_pool.max_age = settings.ydl_max_age_seconds
+    # Surplus idle instances are closed as they are returned
+
+
+@on_change("negative_cache_max_size", "negative_cache_ttl_seconds")
+def _reload_negative_cache() -> None:
+    _unavailable_videos.resize(
+        settings.negative_cache_max_size, settings.negative_cache_ttl_seconds
+    )
+
+
+async def warm_up() -> None:
+    """
+    Load yt-dlp and its extractors ahead of the first request.
+
+    yt-dlp is imported lazily so the bot starts polling sooner; running this
+    in the background after startup keeps the first user from paying for it.
+    The instance is left in the pool for the first extraction.
+    """
+    started = time.perf_counter()
+
+    def create() -> None:
+        with ydl_pool.acquire(_get_primary_ydl_opts()):
+            pass
+
+    try:
+        await _run_blocking(create)
+        logger.info(f"Downloader warmed up in {time.perf_counter() - started:.2f}s")
+    except Exception as e:  # noqa: BLE001 - the first extraction retries it
+        logger.warning(f"Downloader warm-up failed: {e}")
+
+
+def _extract_info_sync(
+    url: str, ydl_opts: dict[str, Any], process: bool = True
+) -> dict[str, Any]:
+    """
+    Synchronous helper to extract info with yt-dlp.
+
+    With ``process=False`` only the extractor runs: formats are neither
+    selected nor checked, which is enough for title/duration/uploader.
+    """
+    with _cookie_health(ydl_opts), ydl_pool.acquire(ydl_opts) as ydl:
+        info: dict[str, Any] = ydl.sanitize_info(
+            ydl.extract_info(url, download=False, process=process)
+        )
+        return info
+
+
+async def download_video(
+    url: str,
+    output_path: Path,
+    info: dict[str, Any] | None = None,
+    progress_hook: Callable[[dict[str, Any]], None] | None = None,
+    clip: Clip | None = None,
+    quality: str | None = None,
+) -> Path:
     """
     Download video from YouTube in MP4 format.
 
-    Downloads video with 720p quality (or best available if 720p not available).
-    Video is re-encoded with FFmpeg to ensure Telegram compatibility.
+    Downloads the best video up to the requested quality. Video and audio
+    streams are fetched through the source cache; H.264/AAC streams are
+    remuxed into MP4, anything else is re-encoded with FFmpeg to ensure
+    Telegram compatibility. If a higher quality of the same video is
+    already cached and an encode is needed anyway, it is downscaled
+    instead of downloading the lower quality.
+
+    Short videos with a progressive H.264/AAC MP4 (typical for Shorts) take
+    a fast path: that single file is downloaded and sent as it is, remuxed
+    only to move its index to the front. A chosen quality needs a
+    progressive file as good as the separate streams; without ``quality``
+    one of at least ``progressive_min_quality`` is enough.
 
     Args:
         url: YouTube video URL
         output_path: Path where to save the downloaded video
+        info: Info dict from resolve_formats() to skip re-extraction
+        progress_hook: yt-dlp progress hook; raising from it aborts the download
+        clip: Only download and encode this part of the video
+        quality: "360p", "720p", ... or "best"; None for settings.default_quality
 
     Returns:
         Path to the downloaded video file
 
     Raises:
+        VideoUnavailableError: If the video is permanently unavailable
         DownloadError: If download fails
     """
+    _check_unavailable(url)
+
     # Ensure output directory exists
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
-    # Temporary file for initial download
-    temp_download_path = output_path.with_name(f"{output_path.name}_temp")
-    
-    ydl_opts = _get_base_ydl_opts()
-    ydl_opts.update({
-        # Download best quality video+audio
-        "format": "bestvideo[height<=720]+bestaudio/best[height<=720]",
-        "outtmpl": str(temp_download_path),
-        "merge_output_format": "mp4",
-    })
-
     try:
-        logger.info(f"Starting video download from: {url}")
-        logger.info(f"Output path: {output_path}")
-
-        # Run yt-dlp in executor to avoid blocking
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, lambda: _download_sync(url, ydl_opts))
+        logger.debug(f"Starting video download from: {url} to {output_path}")
 
-        # yt-dlp may add .mp4 extension if not present
-        if not temp_download_path.exists():
-            temp_download_path = temp_download_path.with_suffix(".mp4")
-            if not temp_download_path.exists():
-                raise DownloadError("Downloaded file not found")
+        info = await _info_for_download(url, info)
 
-        logger.info(f"Downloaded raw video to: {temp_download_path}")
-        
-        # Re-encode video with FFmpeg to ensure Telegram compatibility
+        max_quality = parse_quality(quality)
+        video_format, audio_format = _select_formats(info, max_quality)
+        progressive = None
+        if clip is None:
+            # Only the default button accepts a lower quality, a chosen quality is kept
+            min_quality = settings.progressive_min_quality if quality is None else None
+            progressive = _select_progressive(info, max_quality, video_format, min_quality)
+        if progressive is not None:
+            logger.info(
+                f"Fast path for {info.get('id')}: progressive format {progressive['format_id']} "
+                f"({_short_side(progressive)}p) instead of {video_format['format_id']} "
+                f"({_short_side(video_format)}p)"
+            )
+            video_format, audio_format = progressive, None
+        # Clip streams start at a keyframe before the clip: only the encode cuts them exactly
+        remux = clip is None and _can_remux(video_format, audio_format)
+        scale_to = None
+        if not remux and audio_format is not None:
+            cached = _cached_higher_video(info, video_format, clip)
+            if cached is not None:
+                logger.debug(
+                    f"Downscaling cached format {cached['format_id']} "
+                    f"instead of downloading {video_format['format_id']}"
+                )
+                scale_to = _short_side(video_format)
+                video_format = cached
         final_output_path = output_path.with_suffix(".mp4")
-        logger.info(f"Starting re-encoding for Telegram compatibility...")
-        logger.info(f"Input file: {temp_download_path}")
-        logger.info(f"Output file: {final_output_path}")
-        
-        try:
-            await loop.run_in_executor(
-                None, 
-                lambda: _reencode_for_telegram(temp_download_path, final_output_path)
+
+        async with AsyncExitStack() as stack:
+            video_source = await stack.enter_async_context(
+                _lease_source(info, video_format, progress_hook, "video", clip)
             )
-            logger.info(f"Re-encoding completed successfully")
-        except Exception as e:
-            logger.error(f"Re-encoding failed: {e}")
-            raise
-        
-        # Clean up temporary file
-        if temp_download_path.exists():
-            temp_download_path.unlink()
-            logger.info(f"Removed temporary file: {temp_download_path}")
+            audio_source = None
+            if audio_format is not None:
+                audio_source = await stack.enter_async_context(
+                    _lease_source(info, audio_format, progress_hook, "video", clip)
+                )
+
+            # A single H.264/AAC MP4 is sent as it is
+            ready = remux and audio_source is None and video_format.get("ext") == "mp4"
+            VIDEO_PATHS.inc(
+                path="progressive" if ready else "remux" if remux else "encode"
+            )
+            # Re-encode video with FFmpeg to ensure Telegram compatibility
+            with span("reencode", remux=remux, ready=ready), _timed_encode(
+                "remux" if remux else "mp4", _clip_duration(info, clip)
+            ):
+                if ready:
+                    await _run_blocking(
+                        lambda: _package_progressive(video_source, final_output_path)
+                    )
+                else:
+                    await _run_blocking(
+                        lambda: _reencode_for_telegram(
+                            video_source, final_output_path, audio_source, remux, scale_to, clip
+                        )
+                    )
 
         logger.info(f"Successfully processed video to: {final_output_path}")
         return final_output_path
 
     except Exception as e:
         logger.error(f"Failed to download video: {e}")
+        unavailable = _remember_unavailable(url, e)
+        if unavailable:
+            raise unavailable from e
         raise DownloadError(f"Could not download video: {e}") from e
 
 
-async def download_audio(url: str, output_path: Path) -> Path:
+async def download_audio(
+    url: str,
+    output_path: Path,
+    info: dict[str, Any] | None = None,
+    progress_hook: Callable[[dict[str, Any]], None] | None = None,
+    clip: Clip | None = None,
+) -> Path:
     """
     Download audio from YouTube in MP3 format.
 
-    Downloads audio with 192kbps quality.
+    Downloads audio with 192kbps quality. The audio stream is fetched
+    through the source cache, so it's shared with video downloads.
 
     Args:
         url: YouTube video URL
         output_path: Path where to save the downloaded audio
+        info: Info dict from resolve_formats() to skip re-extraction
+        progress_hook: yt-dlp progress hook; raising from it aborts the download
+        clip: Only download and encode this part of the audio
 
     Returns:
         Path to the downloaded audio file
 
     Raises:
+        VideoUnavailableError: If the video is permanently unavailable
         DownloadError: If download fails
     """
+    _check_unavailable(url)
+
     # Ensure output directory exists
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
-    ydl_opts = _get_base_ydl_opts()
-    ydl_opts.update({
-        "format": "bestaudio/best",
-        "outtmpl": str(output_path),
-        "postprocessors": [
-            {
-                "key": "FFmpegExtractAudio",
-                "preferredcodec": "mp3",
-                "preferredquality": "192",
-            }
-        ],
-    })
-
     try:
-        logger.info(f"Starting audio download from: {url}")
-        logger.info(f"Output path: {output_path}")
+        logger.debug(f"Starting audio download from: {url} to {output_path}")
+
+        info = await _info_for_download(url, info)
 
-        # Run yt-dlp in executor to avoid blocking
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, lambda: _download_sync(url, ydl_opts))
+        audio_format = _select_audio_format(info)
+        if audio_format is None:
+            raise DownloadError("No audio format available")
 
-        # yt-dlp will add .mp3 extension after conversion
         output_path_mp3 = output_path.with_suffix(".mp3")
-        if not output_path_mp3.exists() and output_path.exists():
-            # If original file exists but not mp3, use original
-            output_path_mp3 = output_path
-        elif not output_path_mp3.exists():
-            raise DownloadError("Downloaded file not found")
+        async with _lease_source(
+            info, audio_format, progress_hook, "audio", clip
+        ) as audio_source:
+            with span("encode_mp3"), _timed_encode("mp3", _clip_duration(info, clip)):
+                await _run_blocking(
+                    lambda: _convert_to_mp3(audio_source, output_path_mp3, clip)
+                )
 
         logger.info(f"Successfully downloaded audio to: {output_path_mp3}")
         return output_path_mp3
 
     except Exception as e:
         logger.error(f"Failed to download audio: {e}")
+        unavailable = _remember_unavailable(url, e)
+        if unavailable:
+            raise unavailable from e
         raise DownloadError(f"Could not download audio: {e}") from e
 
 
-def _reencode_for_telegram(input_path: Path, output_path: Path) -> None:
+async def _info_for_download(url: str, info: dict[str, Any] | None) -> dict[str, Any]:
+    """
+    Info dict to download from: extracted now if missing or if its proxy was quarantined.
+
+    Stream URLs only work from the address that extracted them, so a job
+    whose proxy was taken out of rotation has to be extracted again.
+    """
+    if info is not None and proxy_pool.available(info.get("egress")):
+        return info
+    if info is not None:
+        logger.debug(f"Proxy {info.get('egress')} is quarantined, extracting {url} again")
+    return await _extract_with_fallbacks(url)
+
+
+def _clip_duration(info: dict[str, Any], clip: Clip | None) -> float | None:
+    """Duration of the media that ends up in the output file."""
+    duration = info.get("duration")
+    if clip is None:
+        return duration
+    start, end = clip
+    end = end if end is not None else duration
+    return end - start if end is not None else None
+
+
+def _has_codec(fmt: dict[str, Any], key: str) -> bool:
+    return fmt.get(key) not in (None, "none")
+
+
+def _short_side(fmt: dict[str, Any]) -> int:
+    """Quality of a video format: "720p" is 720 for 1280x720 and for vertical 720x1280."""
+    width, height = fmt.get("width") or 0, fmt.get("height") or 0
+    return min(width, height) if width and height else height
+
+
+def _can_remux(video_format: dict[str, Any], audio_format: dict[str, Any] | None) -> bool:
+    """Whether the streams can be copied into a Telegram-compatible MP4 without an encode."""
+    acodec = (audio_format or video_format).get("acodec") or ""
+    return str(video_format.get("vcodec")).startswith("avc1") and acodec.startswith("mp4a")
+
+
+def _estimate_size(fmt: dict[str, Any], duration: float | None) -> int | None:
+    """Size of a format in bytes, from its metadata or bitrate (kbit/s) and duration."""
+    size = fmt.get("filesize") or fmt.get("filesize_approx")
+    if size:
+        return int(size)
+    if fmt.get("tbr") and duration:
+        return int(fmt["tbr"] * 1000 / 8 * duration)
+    return None
+
+
+def _cached_higher_video(
+    info: dict[str, Any], video_format: dict[str, Any], clip: Clip | None
+) -> dict[str, Any] | None:
+    """Find the smallest cached video-only format of a higher quality than ``video_format``."""
+    cached = [
+        f for f in info.get("formats") or []
+        if _has_codec(f, "vcodec") and not _has_codec(f, "acodec")
+        and _short_side(f) > _short_side(video_format)
+        and source_cache.contains(info["id"], _cache_key(f, clip))
+    ]
+    return min(cached, key=_short_side) if cached else None
+
+
+def _select_audio_format(info: dict[str, Any]) -> dict[str, Any] | None:
+    """Pick the best audio-only format, preferring AAC (m4a) for remux-free MP4 output."""
+    audio: list[dict[str, Any]] = [
+        f for f in info.get("formats") or []
+        if _has_codec(f, "acodec") and not _has_codec(f, "vcodec") and f.get("url")
+    ]
+    if not audio:
+        return None
+    return max(audio, key=lambda f: (f.get("ext") == "m4a", f.get("abr") or f.get("tbr") or 0))
+
+
+def _select_formats(
+    info: dict[str, Any], max_quality: int | None
+) -> tuple[dict[str, Any], dict[str, Any] | None]:
+    """
+    Pick the formats to download for a video, like "bestvideo[height<=N]+bestaudio/best".
+
+    Among formats of the same quality H.264 is preferred, so the result can
+    be remuxed instead of re-encoded.
+
+    Args:
+        info: Full yt-dlp info dict
+        max_quality: Maximum short side of the frame (see _short_side), None for any
+
+    Returns:
+        Tuple of (video format, audio format); the audio format is None
+        when a progressive format (video with audio) was selected
+
+    Raises:
+        DownloadError: If no suitable format is available
+    """
+    formats = [f for f in info.get("formats") or [] if f.get("url")]
+
+    def video_rank(f: dict[str, Any]) -> tuple[int, bool, float]:
+        return (_short_side(f), str(f.get("vcodec")).startswith("avc1"), f.get("tbr") or 0)
+
+    def fits(f: dict[str, Any]) -> bool:
+        return max_quality is None or _short_side(f) <= max_quality
+
+    video_only = [
+        f for f in formats
+        if _has_codec(f, "vcodec") and not _has_codec(f, "acodec") and fits(f)
+    ]
+    audio_format = _select_audio_format(info)
+    if video_only and audio_format:
+        return max(video_only, key=video_rank), audio_format
+
+    progressive = [
+        f for f in formats
+        if _has_codec(f, "vcodec") and _has_codec(f, "acodec") and fits(f)
+    ]
+    if progressive:
+        return max(progressive, key=video_rank), None
+
+    raise DownloadError(f"No video format up to {max_quality}p available")
+
+
+def _select_progressive(
+    info: dict[str, Any],
+    max_quality: int | None,
+    video_format: dict[str, Any],
+    min_quality: int | None = None,
+) -> dict[str, Any] | None:
+    """
+    Pick a progressive H.264/AAC MP4 to send instead of merging separate streams.
+
+    Only for videos up to ``progressive_max_duration``. The format has to
+    be at least as good as ``video_format``, the video stream that would
+    be merged otherwise, or at least ``min_quality``: Shorts usually have a
+    360p progressive format only, so the default download trades quality
+    for speed (see progressive_min_quality).
+
+    Args:
+        info: yt-dlp info dict
+        max_quality: Maximum short side of the frame (see _short_side), None for any
+        video_format: Video format picked by _select_formats()
+        min_quality: Lowest acceptable short side below ``video_format``, None for none
+
+    Returns:
+        The progressive format, or None to download the streams separately
+    """
+    duration = info.get("duration")
+    if not duration or duration > settings.progressive_max_duration:
+        return None
+    floor = _short_side(video_format)
+    if min_quality:
+        floor = min(floor, min_quality)
+    candidates = [
+        f for f in info.get("formats") or []
+        if f.get("url") and f.get("ext") == "mp4" and _can_remux(f, None)
+        and (max_quality is None or _short_side(f) <= max_quality)
+        and _short_side(f) >= floor
+    ]
+    if not candidates:
+        return None
+    progressive: dict[str, Any] = max(candidates, key=lambda f: (_short_side(f), f.get("tbr") or 0))
+    return progressive
+
+
+@asynccontextmanager
+async def _lease_source(
+    info: dict[str, Any],
+    fmt: dict[str, Any],
+    progress_hook: Callable[[dict[str, Any]], None] | None = None,
+    kind: str = "video",
+    clip: Clip | None = None,
+) -> AsyncIterator[Path]:
+    """Get a source stream (or a clip of it) from the cache, downloading it on a miss."""
+
+    stream = "audio" if not _has_codec(fmt, "vcodec") else "video"
+    kind = _download_class.get() or kind
+    cache_key = _cache_key(fmt, clip)
+
+    async def fetch(target: Path) -> Path:
+        logger.debug(f"Downloading format {fmt['format_id']} of {info['id']}")
+        SOURCE_CACHE_REQUESTS.inc(result="miss")
+        start = time.perf_counter()
+        # Same proxy as the extraction: the stream URLs are bound to its address
+        with span("download", format_id=fmt["format_id"], stream=stream):
+            async with proxy_pool.acquire(info.get("egress")) as proxy:
+                path = await call_with_retries(
+                    lambda: _reported(
+                        proxy.name,
+                        lambda: _run_blocking(
+                            lambda: _download_format_sync(
+                                info, fmt["format_id"], target, progress_hook, kind, clip,
+                                proxy.url,
+                            )
+                        ),
+                        timed=False,
+                    ),
+                    [breakers.get("egress", proxy.name)],
+                    classify_failure,
+                )
+        elapsed = time.perf_counter() - start
+        size = path.stat().st_size
+        DOWNLOAD_SECONDS.observe(elapsed, stream=stream)
+        DOWNLOAD_BYTES.inc(size, stream=stream)
+        DOWNLOAD_SPEED.observe(size / max(elapsed, 1e-6), stream=stream)
+        return path
+
+    if source_cache.contains(info["id"], cache_key):
+        SOURCE_CACHE_REQUESTS.inc(result="hit")
+
+    # Background downloads (prefetching) are aborted from their progress hook and get the
+    # bandwidth share of background work: requests of users must not wait for them
+    async with source_cache.lease(
+        info["id"], cache_key, fetch, shared=kind != "background"
+    ) as path:
+        yield path
+
+
+def _cache_key(fmt: dict[str, Any], clip: Clip | None = None) -> str:
+    """Source cache key of a format, or of a clip of it."""
+    if clip is None:
+        return str(fmt["format_id"])
+    start, end = clip
+    # Clip streams keep the timestamps of the whole video (see _download_format_sync())
+    return f"{fmt['format_id']}@{start * 1000:.0f}-{'end' if end is None else f'{end * 1000:.0f}'}"
+
+
+def _has_faststart(path: Path) -> bool:
+    """Whether the index (moov box) of an MP4 file comes before its media data."""
+    with path.open("rb") as f:
+        while len(header := f.read(8)) == 8:
+            size, box = struct.unpack(">I4s", header)
+            if box == b"moov":
+                return True
+            if box == b"mdat":
+                return False
+            if size == 1:
+                # 64-bit size follows the box type
+                size = struct.unpack(">Q", f.read(8))[0] - 8
+            elif size < 8:
+                # 0: the box runs to the end of the file
+                return False
+            f.seek(size - 8, os.SEEK_CUR)
+    return False
+
+
+def _package_progressive(source: Path, output_path: Path) -> None:
+    """
+    Put a progressive H.264/AAC MP4 from the source cache at ``output_path``.
+
+    A file that can already stream is hard-linked (copied across file
+    systems), so it costs no I/O and eviction from the cache doesn't
+    affect it; otherwise it is remuxed with faststart.
+    """
+    if not _has_faststart(source):
+        _reencode_for_telegram(source, output_path, remux=True)
+        return
+    output_path.unlink(missing_ok=True)
+    try:
+        os.link(source, output_path)
+    except OSError:
+        shutil.copyfile(source, output_path)
+    logger.debug(f"Progressive MP4 used as downloaded: {source.name}")
+
+
+def _reencode_for_telegram(
+    input_path: Path,
+    output_path: Path,
+    audio_path: Path | None = None,
+    remux: bool = False,
+    scale_to: int | None = None,
+    clip: Clip | None = None,
+) -> None:
     """
     Re-encode video with FFmpeg to ensure Telegram compatibility.
     
     Uses H.264 video codec and AAC audio codec with yuv420p pixel format.
     This ensures the video will play correctly in Telegram on all devices.
+    If a separate audio stream is given, it's merged in the same pass.
+    With ``remux`` the streams (already H.264/AAC) are copied as they are,
+    ``scale_to`` downscales the short side of the frame to that many pixels
+    and ``clip`` cuts streams downloaded for a clip exactly at its times.
     """
-    logger.info(f"Starting FFmpeg re-encoding...")
-    logger.info(f"Input: {input_path} (exists: {input_path.exists()})")
-    logger.info(f"Output: {output_path}")
-    
+    inputs = ["-i", str(input_path)]
+    if audio_path is not None:
+        inputs += ["-i", str(audio_path), "-map", "0:v:0", "-map", "1:a:0"]
+
+    if remux:
+        codecs = ["-c", "copy"]
+    else:
+        codecs = [
+            "-c:v", "libx264",           # H.264 video codec
+            "-preset", "fast",            # Encoding speed
+            "-crf", "23",                 # Quality (18-28, lower = better)
+            "-c:a", "aac",                # AAC audio codec
+            "-b:a", "192k",               # Audio bitrate
+            "-pix_fmt", "yuv420p",        # Pixel format for compatibility
+        ]
+        video_filters = []
+        if clip is not None:
+            inputs = ["-copyts", *inputs]
+            video_filters.append(_trim_filter(clip))
+            codecs += ["-af", _trim_filter(clip, audio=True)]
+        if scale_to:
+            # Short side to scale_to, long side keeps the aspect ratio (rounded to even)
+            video_filters.append(
+                f"scale='if(gt(iw,ih),-2,{scale_to})':'if(gt(iw,ih),{scale_to},-2)'"
+            )
+        if video_filters:
+            codecs += ["-vf", ",".join(video_filters)]
+
     cmd = [
         "ffmpeg",
-        "-i", str(input_path),
-        "-c:v", "libx264",           # H.264 video codec
-        "-preset", "fast",            # Encoding speed
-        "-crf", "23",                 # Quality (18-28, lower = better)
-        "-c:a", "aac",                # AAC audio codec
-        "-b:a", "192k",               # Audio bitrate
+        *inputs,
+        *codecs,
         "-movflags", "+faststart",    # Enable streaming
-        "-pix_fmt", "yuv420p",        # Pixel format for compatibility
         "-y",                         # Overwrite output file
         str(output_path)
     ]
     
-    logger.info(f"FFmpeg command: {' '.join(cmd)}")
-    
+    # Lazy: the command is only joined if DEBUG records are emitted
+    logger.opt(lazy=True).debug("FFmpeg command: {}", lambda: " ".join(cmd))
+
     try:
         result = subprocess.run(
             cmd,
@@ -398,33 +1466,196 @@ def _reencode_for_telegram(input_path: Path, output_path: Path) -> None:
             check=True,
             text=True
         )
-        logger.info(f"FFmpeg completed. Output file exists: {output_path.exists()}")
-        if output_path.exists():
-            size_mb = output_path.stat().st_size / (1024 * 1024)
-            logger.info(f"Output file size: {size_mb:.2f} MB")
-        logger.info("Video re-encoded successfully")
+        logger.opt(lazy=True).debug(
+            "Video re-encoded: {}", lambda: format_file_size(output_path.stat().st_size)
+        )
     except subprocess.CalledProcessError as e:
         logger.error(f"FFmpeg error: {e.stderr}")
         raise DownloadError(f"Failed to re-encode video: {e.stderr}") from e
 
 
-def _download_sync(url: str, ydl_opts: dict[str, Any]) -> None:
-    """Synchronous helper to download with yt-dlp."""
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        ydl.download([url])
+def _download_format_sync(
+    info: dict[str, Any],
+    format_id: str,
+    target: Path,
+    progress_hook: Callable[[dict[str, Any]], None] | None = None,
+    kind: str = "video",
+    clip: Clip | None = None,
+    proxy: str | None = None,
+) -> Path:
+    """
+    Synchronous helper to download a single format of a resolved video.
+
+    Formats are taken from the info dict instead of extracting the video
+    again (like ``--load-info-json``). Large streams are fetched over
+    several connections at once, and the download is paced to its share
+    of the global bandwidth.
+
+    A clip is fetched by FFmpeg seeking in the remote stream (HTTP range
+    requests) and copying the packets from the keyframe before ``start`` up
+    to ``end``. That keyframe differs between the video and the audio
+    stream, so the packets keep the timestamps of the whole video
+    (``-copyts``): the single encode that follows cuts both streams exactly
+    at the clip's times (see _trim_filter()).
+
+    Args:
+        info: Resolved info dict
+        format_id: Format to download
+        target: Output path without extension
+        progress_hook: yt-dlp progress hook
+        kind: Bandwidth class ("audio", "video" or "background")
+        clip: Only download this part, (start, end) in seconds
+        proxy: Proxy URL, the one the info dict was extracted through
+
+    Returns:
+        Path to the downloaded file (``target`` with the format's extension)
+    """
+    overlay: dict[str, Any] = {}
+    if clip is None:
+        info = copy.deepcopy(info)
+        info["formats"] = [
+            _split_into_ranges(f) if f.get("format_id") == format_id else f
+            for f in info.get("formats") or []
+        ]
+    else:
+        start, end = clip
+        section = {"start_time": start, **({"end_time": end} if end is not None else {})}
+        overlay.update(
+            download_ranges=lambda _info, _ydl: [section],
+            force_keyframes_at_cuts=False,
+            external_downloader_args={"ffmpeg_o": ["-copyts"]},
+        )
+
+    ydl_opts = _get_base_ydl_opts(proxy, info.get("cookie_profile"))
+    with bandwidth.flow(kind) as flow, _cookie_health(ydl_opts), ydl_pool.acquire(
+        ydl_opts,
+        format=format_id,
+        outtmpl=f"{target}.%(ext)s",
+        # The caller's hook goes first: it may abort the download before the flow sleeps
+        progress_hooks=[*([progress_hook] if progress_hook else []), flow.progress_hook],
+        concurrent_fragment_downloads=settings.download_connections,
+        http_chunk_size=settings.download_chunk_mb * 1024 * 1024,
+        **overlay,
+    ) as ydl:
+        ydl.process_ie_result(info, download=True)
+
+    downloaded = [
+        p for p in target.parent.glob(f"{target.name}.*") if p.suffix not in (".part", ".ytdl")
+    ]
+    if not downloaded:
+        raise DownloadError(f"Downloaded file for format {format_id} not found")
+    return downloaded[0]
+
+
+def _split_into_ranges(fmt: dict[str, Any]) -> dict[str, Any]:
+    """
+    Turn a large progressive HTTP format into fragments fetched in parallel.
+
+    YouTube throttles each connection, so a single stream is much slower than
+    several. The stream is split into ``download_chunk_mb`` byte ranges that
+    yt-dlp downloads ``download_connections`` at a time and joins in order,
+    like a DASH stream. The ranges use googlevideo's ``range`` URL parameter:
+    yt-dlp doesn't pass byte ranges of DASH fragments as headers. Formats
+    without a known size are returned unchanged (downloaded in chunks over
+    one connection).
+    """
+    chunk = settings.download_chunk_mb * 1024 * 1024
+    size = fmt.get("filesize")
+    if (
+        settings.download_connections <= 1
+        or fmt.get("protocol") not in ("http", "https")
+        or not size
+        or size <= chunk
+    ):
+        return fmt
+
+    from yt_dlp.utils import update_url_query
+
+    fragments = [
+        {"url": update_url_query(fmt["url"], {"range": f"{start}-{min(start + chunk, size) - 1}"})}
+        for start in range(0, size, chunk)
+    ]
+    return {**fmt, "protocol": "http_dash_segments", "fragments": fragments}
+
+
+def _trim_filter(clip: Clip, audio: bool = False) -> str:
+    """
+    FFmpeg filter cutting a clip stream (read with ``-copyts``) at the clip's times.
+
+    The timestamps of the result start at 0 again.
+    """
+    start, end = clip
+    prefix = "a" if audio else ""
+    bounds = f"start={start}" + ("" if end is None else f":end={end}")
+    return f"{prefix}trim={bounds},{prefix}setpts=PTS-STARTPTS"
+
+
+def _convert_to_mp3(input_path: Path, output_path: Path, clip: Clip | None = None) -> None:
+    """Convert an audio stream (a clip stream cut at ``clip``) to 192kbps MP3 with FFmpeg."""
+    trim = [] if clip is None else ["-af", _trim_filter(clip, audio=True)]
+    cmd = [
+        "ffmpeg",
+        *(["-copyts"] if clip is not None else []),
+        "-i", str(input_path),
+        "-vn",                        # Drop video if the source has any
+        *trim,
+        "-c:a", "libmp3lame",
+        "-b:a", "192k",
+        "-y",
+        str(output_path)
+    ]
+
+    logger.opt(lazy=True).debug("FFmpeg command: {}", lambda: " ".join(cmd))
+
+    try:
+        subprocess.run(cmd, capture_output=True, check=True, text=True)
+    except subprocess.CalledProcessError as e:
+        logger.error(f"FFmpeg error: {e.stderr}")
+        raise DownloadError(f"Failed to convert audio: {e.stderr}") from e
 
 
 class DownloaderService:
     """Service class wrapper for downloader functions."""
 
+    async def get_video_preview(self, url: str) -> dict[str, Any]:
+        """Get basic video information for the preview card."""
+        return await get_video_preview(url)
+
     async def get_video_info(self, url: str) -> dict[str, Any]:
         """Get video information."""
         return await get_video_info(url)
 
-    async def download_video(self, url: str, output_path: Path) -> Path:
+    async def resolve_formats(self, url: str) -> dict[str, Any]:
+        """Get full video information including formats."""
+        return await resolve_formats(url)
+
+    async def expand_playlist(self, url: str, limit: int) -> list[dict[str, Any]]:
+        """List the videos of a playlist."""
+        return await expand_playlist(url, limit)
+
+    async def search_videos(self, query: str, limit: int) -> list[dict[str, Any]]:
+        """Search YouTube for videos."""
+        return await search_videos(query, limit)
+
+    async def download_video(
+        self,
+        url: str,
+        output_path: Path,
+        info: dict[str, Any] | None = None,
+        progress_hook: Callable[[dict[str, Any]], None] | None = None,
+        clip: Clip | None = None,
+        quality: str | None = None,
+    ) -> Path:
         """Download video."""
-        return await download_video(url, output_path)
+        return await download_video(url, output_path, info, progress_hook, clip, quality)
 
-    async def download_audio(self, url: str, output_path: Path) -> Path:
+    async def download_audio(
+        self,
+        url: str,
+        output_path: Path,
+        info: dict[str, Any] | None = None,
+        progress_hook: Callable[[dict[str, Any]], None] | None = None,
+        clip: Clip | None = None,
+    ) -> Path:
         """Download audio."""
-        return await download_audio(url, output_path)
+        return await download_audio(url, output_path, info, progress_hook, clip)
@@ -3,12 +3,17 @@
 from __future__ import annotations
 
 import asyncio
+import secrets
 import shutil
+from collections import Counter, OrderedDict
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from loguru import logger
 
-from config import settings
+from config import on_change, settings
+from services.metrics import SOURCE_CACHE_BYTES, TEMP_DIR_BYTES
 
 
 def get_user_temp_dir(user_id: int) -> Path:
@@ -49,7 +54,7 @@ async def cleanup_file(file_path: Path) -> None:
         return
 
     try:
-        logger.info(f"Cleaning up: {file_path}")
+        logger.debug(f"Cleaning up: {file_path}")
 
         # Run deletion in executor to avoid blocking
         loop = asyncio.get_event_loop()
@@ -57,11 +62,11 @@ async def cleanup_file(file_path: Path) -> None:
         if file_path.is_file():
             # Delete file
             await loop.run_in_executor(None, file_path.unlink)
-            logger.info(f"Successfully deleted file: {file_path}")
+            logger.debug(f"Successfully deleted file: {file_path}")
         elif file_path.is_dir():
             # Delete directory and its contents
             await loop.run_in_executor(None, shutil.rmtree, file_path)
-            logger.info(f"Successfully deleted directory: {file_path}")
+            logger.debug(f"Successfully deleted directory: {file_path}")
 
     except Exception as e:
         logger.error(f"Failed to delete {file_path}: {e}")
@@ -87,7 +92,7 @@ async def cleanup_user_dir(user_id: int) -> None:
         return
 
     try:
-        logger.info(f"Cleaning up user directory: {user_dir}")
+        logger.debug(f"Cleaning up user directory: {user_dir}")
 
         # Count files before deletion for logging
         file_count = len(list(user_dir.rglob("*")))
@@ -150,9 +155,238 @@ def format_file_size(size_bytes: int) -> str:
     return f"{size_bytes:.1f} TB"
 
 
+class SourceCache:
+    """
+    Disk cache of downloaded source streams with size-bounded LRU eviction.
+
+    Entries are keyed by (video ID, yt-dlp format ID) and stored as
+    ``{video_id}.{format_id}.{ext}`` in the cache directory, so MP3s,
+    re-encoded MP4s and other derived outputs can be produced from an
+    already downloaded stream without going back to YouTube.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int) -> None:
+        """
+        Args:
+            cache_dir: Directory for cached streams
+            max_bytes: Total size after which least recently used entries are evicted
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple[str, str], Path] = OrderedDict()
+        self._sizes: dict[tuple[str, str], int] = {}
+        # Sum of _sizes, kept up to date as entries come and go
+        self._total_bytes = 0
+        self._pending: dict[tuple[str, str], asyncio.Future[Path]] = {}
+        self._leases: Counter[tuple[str, str]] = Counter()
+        self._indexed = False
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    @asynccontextmanager
+    async def lease(
+        self,
+        video_id: str,
+        format_id: str,
+        fetch: Callable[[Path], Awaitable[Path]],
+        shared: bool = True,
+    ) -> AsyncIterator[Path]:
+        """
+        Get a cached stream, downloading it first if needed.
+
+        The entry is protected from eviction until the context exits.
+        Concurrent requests for the same stream share a single download. If
+        that download is cancelled, the requests waiting for it download the
+        stream themselves.
+
+        Args:
+            video_id: YouTube video ID
+            format_id: yt-dlp format ID
+            fetch: Coroutine function downloading the stream; receives the
+                target path without extension and returns the actual file path
+            shared: False for a download that may be aborted for reasons of
+                its own (a speculative prefetch): other requests don't wait
+                for it. It still uses a cached or shared download.
+
+        Yields:
+            Path to the cached stream
+        """
+        key = (video_id, format_id)
+        self._leases[key] += 1
+        try:
+            yield await self._get_or_fetch(key, fetch, shared)
+        finally:
+            self._leases[key] -= 1
+            if self._leases[key] <= 0:
+                del self._leases[key]
+            self._evict()
+
+    def clear(self) -> None:
+        """Forget all entries and re-index the cache directory on next use."""
+        self._entries.clear()
+        self._sizes.clear()
+        self._total_bytes = 0
+        self._indexed = False
+
+    def contains(self, video_id: str, format_id: str) -> bool:
+        """Check whether a stream is cached."""
+        self._index()
+        return (video_id, format_id) in self._entries
+
+    async def _get_or_fetch(
+        self, key: tuple[str, str], fetch: Callable[[Path], Awaitable[Path]], shared: bool
+    ) -> Path:
+        self._index()
+
+        while True:
+            path = self._entries.get(key)
+            if path is not None and path.exists():
+                self._entries.move_to_end(key)
+                logger.debug(f"Source cache hit: {path.name}")
+                return path
+
+            pending = self._pending.get(key)
+            if pending is None:
+                break
+            logger.debug(f"Waiting for in-flight download of {key}")
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                task = asyncio.current_task()
+                if not pending.cancelled() or (task is not None and task.cancelling()):
+                    raise
+                # Only the download was cancelled (its job was), not this request
+                logger.debug(f"In-flight download of {key} was cancelled, fetching it again")
+
+        if not shared:
+            return await self._fetch_unshared(key, fetch)
+
+        future: asyncio.Future[Path] = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            path = await fetch(self.cache_dir / f"{key[0]}.{key[1]}")
+            self._add(key, path)
+            future.set_result(path)
+            logger.debug(f"Source cached: {path.name} ({format_file_size(self._sizes[key])})")
+            return path
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved if nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            del self._pending[key]
+
+    async def _fetch_unshared(
+        self, key: tuple[str, str], fetch: Callable[[Path], Awaitable[Path]]
+    ) -> Path:
+        """Download to a file of its own, then adopt it unless a shared download won."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        target = self.cache_dir / f"{key[0]}.{key[1]}~{secrets.token_hex(4)}"
+        try:
+            path = await fetch(target)
+            # A shared download of the stream may have started in the meantime
+            pending = self._pending.get(key)
+            if pending is not None:
+                await asyncio.wait([pending])
+        except BaseException:
+            for leftover in self.cache_dir.glob(f"{target.name}.*"):
+                leftover.unlink(missing_ok=True)
+            raise
+
+        existing = self._entries.get(key)
+        if existing is not None and existing.exists():
+            path.unlink(missing_ok=True)
+            return existing
+
+        cached = path.rename(self.cache_dir / f"{key[0]}.{key[1]}{path.suffix}")
+        self._add(key, cached)
+        logger.debug(f"Source cached: {cached.name} ({format_file_size(self._sizes[key])})")
+        return cached
+
+    def _add(self, key: tuple[str, str], path: Path) -> None:
+        """Register a cached stream (replacing the entry of the same key, if any)."""
+        size = path.stat().st_size
+        self._total_bytes += size - self._sizes.get(key, 0)
+        self._entries[key] = path
+        self._sizes[key] = size
+
+    def _index(self) -> None:
+        """Pick up streams left in the cache directory by a previous run."""
+        if self._indexed:
+            return
+        self._indexed = True
+
+        if not self.cache_dir.exists():
+            return
+
+        files = [
+            p for p in self.cache_dir.iterdir()
+            if p.is_file() and p.suffix not in (".part", ".ytdl")
+        ]
+        for path in sorted(files, key=lambda p: p.stat().st_mtime):
+            parts = path.name.split(".")
+            if len(parts) < 3:
+                continue
+            self._add((parts[0], parts[1]), path)
+
+        logger.info(
+            f"Source cache: {len(self._entries)} entries, {format_file_size(self.total_bytes)}"
+        )
+
+    def _evict(self) -> None:
+        """Delete least recently used streams that aren't in use until under the size limit."""
+        for key in list(self._entries):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if self._leases.get(key):
+                continue
+
+            path = self._entries.pop(key)
+            self._total_bytes -= self._sizes.pop(key, 0)
+            try:
+                path.unlink(missing_ok=True)
+                logger.debug(f"Evicted from source cache: {path.name}")
+            except OSError as e:
+                logger.error(f"Failed to evict {path}: {e}")
+
+
+def _dir_size(path: Path) -> int:
+    """Total size of files under a directory (0 if it doesn't exist)."""
+    if not path.exists():
+        return 0
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+# Shared source cache of the process
+source_cache = SourceCache(
+    settings.temp_dir / "sources", settings.source_cache_max_mb * 1024 * 1024
+)
+
+SOURCE_CACHE_BYTES.set_function(lambda: source_cache.total_bytes)
+TEMP_DIR_BYTES.set_function(lambda: _dir_size(settings.temp_dir))
+
+
+@on_change("source_cache_max_mb")
+def _resize_source_cache() -> None:
+    # A smaller limit is enforced when the next lease ends
+    source_cache.max_bytes = settings.source_cache_max_mb * 1024 * 1024
+
+
 class FileManager:
     """Service class wrapper for file manager functions."""
 
+    @property
+    def source_cache(self) -> SourceCache:
+        """Shared cache of downloaded source streams."""
+        return source_cache
+
     def get_user_temp_dir(self, user_id: int) -> Path:
         """Get user temp directory."""
         return get_user_temp_dir(user_id)
@@ -0,0 +1,108 @@
+"""Short-token registry of download jobs referenced from inline keyboards."""
+
+from __future__ import annotations
+
+import asyncio
+import secrets
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from loguru import logger
+
+from config import settings
+from services.cache import TTLCache
+from services.tracing import Trace
+
+
+@dataclass
+class JobContext:
+    """Pre-resolved state of a preview card, shared between its buttons."""
+
+    token: str
+    url: str
+    video_id: str
+    user_id: int
+    info: dict[str, Any]
+    created_at: float = field(default_factory=time.time)
+    # Background full extraction (resolve_formats), started when prefetch is enabled
+    info_task: asyncio.Task[dict[str, Any]] | None = None
+    # Timeline of the job, continued by the button callbacks
+    trace: Trace | None = None
+    # Part of the video to download, (start, end) in seconds; None for the whole video
+    clip: tuple[float, float | None] | None = None
+
+    async def get_full_info(self) -> dict[str, Any] | None:
+        """
+        Wait for the background format resolution, if one was started.
+
+        Returns:
+            Full info dict, or None if resolution wasn't started or failed
+        """
+        if self.info_task is None:
+            return None
+        try:
+            return await self.info_task
+        except Exception as e:  # noqa: BLE001 - the download extracts the video itself
+            logger.warning(f"Background format resolution failed for {self.video_id}: {e}")
+            return None
+
+
+class JobStore:
+    """
+    Store of job contexts addressed by short random tokens.
+
+    Tokens are embedded into callback data (``dl:video:<token>``), which keeps
+    it well below Telegram's 64-byte limit and removes the need to recover the
+    URL from the message text.
+    """
+
+    TOKEN_BYTES = 6  # 8 URL-safe characters
+
+    def __init__(self, maxsize: int | None = None, ttl: float | None = None) -> None:
+        """
+        Args:
+            maxsize: Maximum number of jobs kept in memory
+            ttl: Time in seconds after which a job expires
+        """
+        self._jobs: TTLCache[str, JobContext] = TTLCache(
+            maxsize=maxsize or settings.job_store_max_size,
+            ttl=ttl or settings.job_ttl_seconds,
+        )
+
+    def create(self, url: str, video_id: str, user_id: int, info: dict[str, Any]) -> JobContext:
+        """
+        Register a new job and return its context.
+
+        Args:
+            url: YouTube video URL
+            video_id: Resolved YouTube video ID
+            user_id: Telegram user ID of the job owner
+            info: Video info returned by the downloader
+
+        Returns:
+            New job context with a unique token
+        """
+        token = secrets.token_urlsafe(self.TOKEN_BYTES)
+        while token in self._jobs:
+            token = secrets.token_urlsafe(self.TOKEN_BYTES)
+
+        job = JobContext(token=token, url=url, video_id=video_id, user_id=user_id, info=info)
+        self._jobs.set(token, job)
+        logger.debug(f"Registered job {token} for video {video_id}")
+        return job
+
+    def get(self, token: str) -> JobContext | None:
+        """Get job context by token, or None if unknown or expired."""
+        return self._jobs.get(token)
+
+    def discard(self, token: str) -> None:
+        """Forget a job."""
+        self._jobs.pop(token)
+
+    def resize(self, maxsize: int, ttl: float) -> None:
+        """Change the limits (settings reloaded); existing jobs keep their expiry."""
+        self._jobs.resize(maxsize, ttl)
+
+    def __len__(self) -> int:
+        return len(self._jobs)
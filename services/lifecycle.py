@@ -0,0 +1,81 @@
+"""Running update handlers and the drain before shutdown."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from loguru import logger
+
+from services.metrics import DRAIN_CANCELLED
+
+# How long cancelled handlers get for their cleanup and the message to the user
+CANCEL_GRACE_SECONDS = 10.0
+
+
+class Lifecycle:
+    """
+    Tracks the tasks handling updates, so a shutdown can let them finish.
+
+    Draining stops new work (updates still arriving are turned away) and
+    waits for the running handlers: downloads, encodes and uploads complete
+    and clean up as usual. Handlers still running at the deadline are
+    cancelled, which runs their cleanup and lets them tell the user to
+    retry.
+
+    Used from the event loop only.
+    """
+
+    def __init__(self) -> None:
+        self.draining = False
+        self._tasks: set[asyncio.Task[object]] = set()
+
+    @property
+    def running(self) -> int:
+        return len(self._tasks)
+
+    @contextmanager
+    def track(self) -> Iterator[None]:
+        """Count the current task as running work for the duration of the block."""
+        task = asyncio.current_task()
+        if task is None:
+            yield
+            return
+        self._tasks.add(task)
+        try:
+            yield
+        finally:
+            self._tasks.discard(task)
+
+    async def drain(self, timeout: float) -> int:
+        """
+        Stop taking new work and wait for the running handlers.
+
+        Args:
+            timeout: Longest wait in seconds before the rest is cancelled
+
+        Returns:
+            Number of handlers cancelled at the deadline
+        """
+        self.draining = True
+        if not self._tasks:
+            return 0
+        logger.info(f"Draining {len(self._tasks)} running handlers (up to {timeout:.0f}s)")
+        started = time.monotonic()
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        if not pending:
+            logger.info(f"Drained in {time.monotonic() - started:.1f}s")
+            return 0
+
+        logger.warning(f"Cancelling {len(pending)} handlers still running after {timeout:.0f}s")
+        DRAIN_CANCELLED.inc(len(pending))
+        for task in pending:
+            task.cancel()
+        # Let them run their cleanup and notify their users
+        await asyncio.wait(pending, timeout=CANCEL_GRACE_SECONDS)
+        return len(pending)
+
+
+lifecycle = Lifecycle()
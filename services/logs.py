@@ -0,0 +1,183 @@
+"""Logging setup: sinks written by background threads, JSON records tagged with the job ID."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import queue
+import sys
+import threading
+import traceback
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, TextIO
+
+from loguru import logger
+
+from config import settings
+from services.tracing import current_trace
+
+if TYPE_CHECKING:
+    from loguru import Record
+
+CONSOLE_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | "
+    "{extra[job_id]} | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
+    "<level>{message}</level>"
+)
+TEXT_FORMAT = "{time:YYYY-MM-DD HH:mm:ss} | {level} | {extra[job_id]} | {message}"
+
+LOG_FILE_MAX_BYTES = 10 * 1024 * 1024
+LOG_FILE_BACKUPS = 10
+
+
+def setup_logging(console: TextIO | None = sys.stderr) -> None:
+    """
+    Replace loguru's default handler with the bot's sinks.
+
+    Records are formatted by the calling thread and handed to a writer
+    thread per sink, so slow disks, log rotation or a blocked terminal never
+    stall the event loop or the download workers. Every record carries the
+    ID of the job (trace) it was logged from, including records from worker
+    threads.
+
+    Args:
+        console: Stream for human-readable logs, None to log to the file only
+    """
+    logger.remove()
+    logger.configure(extra={"job_id": "-"}, patcher=_add_job_id)
+
+    if console is not None:
+        logger.add(
+            QueuedSink(console, "console"),
+            level=settings.log_level,
+            format=CONSOLE_FORMAT,
+            colorize=console.isatty(),
+            diagnose=False,
+        )
+    if settings.log_file:
+        logger.add(
+            QueuedSink(RotatingFile(settings.log_file), "file"),
+            level=settings.log_level,
+            format=_json_format if settings.log_json else TEXT_FORMAT,
+            colorize=False,
+            diagnose=False,
+        )
+
+
+class QueuedSink:
+    """
+    Loguru sink writing formatted records from a background thread.
+
+    loguru's own ``enqueue=True`` pickles every record through a
+    multiprocessing pipe, which costs the caller more than a plain file
+    write; this one only appends to an in-process queue. Records that pile
+    up while the target is slow are written in one batch.
+    """
+
+    def __init__(self, target: TextIO | RotatingFile, name: str) -> None:
+        self._target = target
+        self._queue: queue.SimpleQueue[str | threading.Event | None] = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name=f"log-{name}", daemon=True)
+        self._thread.start()
+
+    def write(self, message: str) -> None:
+        self._queue.put(message)
+
+    async def complete(self) -> None:
+        """Wait until everything logged so far is written (``await logger.complete()``)."""
+        written = threading.Event()
+        self._queue.put(written)
+        await asyncio.to_thread(written.wait)
+
+    def stop(self) -> None:
+        """Write the remaining records and stop the thread (``logger.remove()``)."""
+        self._queue.put(None)
+        self._thread.join()
+        if isinstance(self._target, RotatingFile):
+            self._target.close()
+
+    def _run(self) -> None:
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            lines = [item for item in batch if isinstance(item, str)]
+            if lines:
+                try:
+                    self._target.write("".join(lines))
+                    self._target.flush()
+                except Exception as e:  # noqa: BLE001 - keep the writer thread alive
+                    # Logging the failure would come back to this sink
+                    print(f"Failed to write logs: {e}", file=sys.__stderr__)
+
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+                elif item is None:
+                    running = False
+
+
+class RotatingFile:
+    """Append-only log file renamed to ``<name>.1`` (``.2``, ...) when it grows too large."""
+
+    def __init__(
+        self, path: Path, max_bytes: int = LOG_FILE_MAX_BYTES, backups: int = LOG_FILE_BACKUPS
+    ) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = path.open("a", encoding="utf-8")
+        self._size = self._file.tell()
+
+    def write(self, text: str) -> None:
+        if self._size and self._size + len(text) > self.max_bytes:
+            self._rotate()
+        self._file.write(text)
+        self._size += len(text)
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def _rotate(self) -> None:
+        self._file.close()
+        for index in range(self.backups - 1, 0, -1):
+            older = self.path.with_name(f"{self.path.name}.{index}")
+            if older.exists():
+                older.replace(self.path.with_name(f"{self.path.name}.{index + 1}"))
+        if self.backups:
+            self.path.replace(self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+        self._file = self.path.open("a", encoding="utf-8")
+        self._size = 0
+
+
+def _add_job_id(record: Record) -> None:
+    trace = current_trace()
+    if trace is not None:
+        record["extra"]["job_id"] = trace.trace_id
+
+
+def _json_format(record: Record) -> str:
+    """Render a record as one JSON line."""
+    data: dict[str, Any] = {
+        "time": record["time"].isoformat(timespec="milliseconds"),
+        "level": record["level"].name,
+        "message": record["message"],
+        "logger": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "thread": record["thread"].name,
+        **record["extra"],
+    }
+    if record["exception"] is not None:
+        data["exception"] = "".join(traceback.format_exception(*record["exception"]))
+    # Returned as a template, so braces in the message must not reach loguru's formatter
+    record["extra"]["json"] = json.dumps(data, ensure_ascii=False, default=str)
+    return "{extra[json]}\n"
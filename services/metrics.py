@@ -0,0 +1,346 @@
+"""Pipeline metrics exported in Prometheus text format."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+from loguru import logger
+
+if TYPE_CHECKING:
+    from aiohttp import web
+
+# Default latency buckets in seconds (preview requests up to long encodes)
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+LabelValues = tuple[str, ...]
+
+
+class _Metric:
+    """Base class for metrics with optional labels."""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _format_labels(self, values: LabelValues, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> list[str]:
+        return [f"{self.name}{self._format_labels(k)} {v}" for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, or is computed at scrape time by a callback."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[LabelValues, float] = {}
+        self._callbacks: dict[LabelValues, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, func: Callable[[], float], **labels: str) -> None:
+        """Compute the value with ``func`` on every scrape."""
+        with self._lock:
+            self._callbacks[self._key(labels)] = func
+
+    def get(self, **labels: str) -> float:
+        key = self._key(labels)
+        if key in self._callbacks:
+            return self._callbacks[key]()
+        return self._values.get(key, 0)
+
+    @contextmanager
+    def track_inprogress(self, **labels: str) -> Iterator[None]:
+        """Increment the gauge while the block runs."""
+        self.inc(1, **labels)
+        try:
+            yield
+        finally:
+            self.dec(1, **labels)
+
+    def _samples(self) -> list[str]:
+        samples = [f"{self.name}{self._format_labels(k)} {v}" for k, v in self._values.items()]
+        for key, func in self._callbacks.items():
+            try:
+                samples.append(f"{self.name}{self._format_labels(key)} {func()}")
+            except Exception as e:  # noqa: BLE001 - a broken callback must not fail the scrape
+                logger.warning(f"Failed to collect gauge {self.name}: {e}")
+        return samples
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: dict[LabelValues, list[int]] = {}
+        self._sums: dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            counts[index] += 1
+            self._sums[key] = self._sums.get(key, 0) + value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of the block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> list[str]:
+        samples = []
+        for key, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                labels = self._format_labels(key, f'le="{le}"')
+                samples.append(f"{self.name}_bucket{labels} {cumulative}")
+            samples.append(f"{self.name}_sum{self._format_labels(key)} {self._sums[key]}")
+            samples.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return samples
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+REGISTRY: list[_Metric] = []
+
+
+def render_metrics() -> str:
+    """Render all registered metrics in Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+# Pipeline stages
+EXTRACTION_SECONDS = Histogram(
+    "sft_extraction_seconds",
+    "Video info extraction time per player client",
+    ("client", "outcome"),
+)
+DOWNLOAD_SECONDS = Histogram(
+    "sft_download_seconds", "Source stream download time", ("stream",)
+)
+DOWNLOAD_BYTES = Counter(
+    "sft_download_bytes_total", "Bytes downloaded from YouTube", ("stream",)
+)
+DOWNLOAD_SPEED = Histogram(
+    "sft_download_speed_bytes_per_second",
+    "Download throughput per source stream",
+    ("stream",),
+    buckets=(64e3, 256e3, 1e6, 2.5e6, 5e6, 10e6, 25e6, 50e6, 100e6),
+)
+ENCODE_SECONDS = Histogram("sft_encode_seconds", "FFmpeg encode time", ("output",))
+ENCODE_REALTIME_FACTOR = Histogram(
+    "sft_encode_realtime_factor",
+    "Media duration divided by encode time (higher is faster)",
+    ("output",),
+    buckets=(0.25, 0.5, 1, 2, 5, 10, 25, 50, 100, 250),
+)
+PROBE_SECONDS = Histogram("sft_probe_seconds", "ffprobe time before upload")
+UPLOAD_SECONDS = Histogram("sft_upload_seconds", "Upload time to Telegram", ("kind",))
+QUEUE_WAIT_SECONDS = Histogram(
+    "sft_queue_wait_seconds",
+    "Time blocking work waits for a free executor thread",
+    ("executor",),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300),
+)
+VIDEO_PATHS = Counter(
+    "sft_video_paths_total",
+    "Video downloads by how the file was made: progressive (sent as downloaded), "
+    "remux or encode",
+    ("path",),
+)
+SOURCE_CACHE_REQUESTS = Counter(
+    "sft_source_cache_requests_total", "Source cache lookups", ("result",)
+)
+YDL_POOL_REQUESTS = Counter(
+    "sft_ydl_pool_requests_total", "YoutubeDL instance checkouts from the pool", ("result",)
+)
+BANDWIDTH_THROTTLE_SECONDS = Counter(
+    "sft_bandwidth_throttle_seconds_total",
+    "Time downloads were held back by the bandwidth scheduler",
+    ("kind",),
+)
+SEARCH_REQUESTS = Counter(
+    "sft_search_requests_total", "Search queries by result cache outcome", ("result",)
+)
+COOKIE_PROFILE_EVENTS = Counter(
+    "sft_cookie_profile_events_total", "Cookie jar loads, bot checks and bans", ("event",)
+)
+REQUEST_FAILURES = Counter(
+    "sft_request_failures_total", "Failed requests to YouTube by failure class", ("error",)
+)
+REQUEST_RETRIES = Counter(
+    "sft_request_retries_total", "Requests to YouTube retried after a backoff", ("error",)
+)
+CIRCUIT_TRANSITIONS = Counter(
+    "sft_circuit_transitions_total",
+    "Circuit breaker state changes per client profile and egress identity",
+    ("path", "name", "state"),
+)
+PROXY_REQUESTS = Counter(
+    "sft_proxy_requests_total", "Requests to YouTube per egress proxy", ("proxy", "result")
+)
+PROXY_QUARANTINES = Counter(
+    "sft_proxy_quarantines_total", "Proxies taken out of rotation for poor health", ("proxy",)
+)
+LOOP_BLOCKS = Counter(
+    "sft_loop_blocks_total", "Times the event loop was blocked longer than the threshold"
+)
+SYNC_IO_CALLS = Counter(
+    "sft_sync_io_calls_total", "Call sites of blocking calls inside coroutines (debug mode)",
+    ("event",),
+)
+DB_CHANGES = Counter(
+    "sft_db_changes_total", "Changes queued for the history database", ("kind",)
+)
+DB_COMMIT_ERRORS = Counter(
+    "sft_db_commit_errors_total", "History database batches that failed to commit"
+)
+DRAIN_CANCELLED = Counter(
+    "sft_drain_cancelled_total", "Handlers cancelled because a shutdown drain timed out"
+)
+CIRCUIT_WAIT_SECONDS = Histogram(
+    "sft_circuit_wait_seconds", "Time requests queued for a tripped path to reopen"
+)
+
+DB_COMMIT_SECONDS = Histogram(
+    "sft_db_commit_seconds", "Time to commit a batch to the history database",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+DB_BATCH_ROWS = Histogram(
+    "sft_db_batch_rows", "Rows written per history database commit, after merging changes",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+LOOP_LAG_SECONDS = Histogram(
+    "sft_loop_lag_seconds", "How late the event loop wakes up a sleeping task",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+# Resource usage
+ACTIVE_JOBS = Gauge("sft_active_jobs", "Jobs currently being processed", ("kind",))
+EXECUTOR_BUSY = Gauge("sft_executor_busy_threads", "Executor threads running work", ("executor",))
+EXECUTOR_SATURATION = Gauge(
+    "sft_executor_saturation", "Busy executor threads divided by pool size", ("executor",)
+)
+TEMP_DIR_BYTES = Gauge("sft_temp_dir_bytes", "Disk usage of the temp directory")
+SOURCE_CACHE_BYTES = Gauge("sft_source_cache_bytes", "Disk usage of the source cache")
+PROXY_IN_FLIGHT = Gauge("sft_proxy_in_flight", "Requests running per egress proxy", ("proxy",))
+PROXY_HEALTH = Gauge(
+    "sft_proxy_health", "Health score per egress proxy (success rate discounted by latency)",
+    ("proxy",),
+)
+DB_PENDING_CHANGES = Gauge(
+    "sft_db_pending_changes", "Changes waiting for the history database writer"
+)
+LOOP_LAG = Gauge("sft_loop_lag", "Latest event loop lag in seconds")
+CIRCUIT_STATE = Gauge(
+    "sft_circuit_state",
+    "Circuit breaker state per client profile and egress identity (0 closed, 1 half-open, 2 open)",
+    ("path", "name"),
+)
+
+
+async def _handle_metrics(request: web.Request) -> web.Response:
+    from aiohttp import web
+
+    # Gauge callbacks may touch the filesystem, keep them off the event loop
+    body = await asyncio.get_running_loop().run_in_executor(None, render_metrics)
+    return web.Response(text=body, content_type="text/plain", charset="utf-8")
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """
+    Start the HTTP endpoint serving metrics at /metrics.
+
+    Args:
+        host: Interface to listen on
+        port: TCP port
+
+    Returns:
+        Runner to pass to ``runner.cleanup()`` on shutdown
+    """
+    from aiohttp import web
+
+    app = web.Application()
+    app.router.add_get("/metrics", _handle_metrics)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+    return runner
@@ -0,0 +1,312 @@
+"""Retries with backoff and circuit breakers for requests to YouTube."""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from collections.abc import Awaitable, Callable, Sequence
+from typing import TypeVar
+
+from loguru import logger
+
+from config import on_change, settings
+from services.metrics import (
+    CIRCUIT_STATE,
+    CIRCUIT_TRANSITIONS,
+    CIRCUIT_WAIT_SECONDS,
+    REQUEST_FAILURES,
+    REQUEST_RETRIES,
+)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Failure classes (see services.downloader.classify_failure)
+PERMANENT = "permanent"  # the video itself can't be fetched, the path is fine
+THROTTLED = "throttled"  # 429 or bot check: don't retry on the same path
+TRANSIENT = "transient"  # network error or 5xx: retry after a backoff
+
+# How often jobs check a half-open path whose probe request is still running
+PROBE_POLL_SECONDS = 1.0
+
+
+class CircuitOpenError(Exception):
+    """Every path of a request is tripped and none reopens in time."""
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """
+    Pause before a retry: exponential backoff with full jitter.
+
+    Args:
+        attempt: Number of the failed attempt, from 0
+        base: Upper bound of the first pause, in seconds
+        cap: Upper bound of any pause
+
+    Returns:
+        Random delay between 0 and ``min(cap, base * 2**attempt)``
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Stops dispatching to a path (a player client or an egress identity) that keeps failing.
+
+    After ``failure_threshold`` throttled or transient failures in a row the
+    breaker opens for ``reset_seconds``, doubled on every trip without a
+    success in between (up to ``max_reset_seconds``). Then it is half-open:
+    a single probe request goes through, its success closes the breaker and
+    its failure opens it again.
+
+    Used from the event loop only.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        name: str,
+        failure_threshold: int,
+        reset_seconds: float,
+        max_reset_seconds: float,
+    ) -> None:
+        """
+        Args:
+            path: Kind of path, "client" or "egress" (metric label)
+            name: Client profile or egress identity
+            failure_threshold: Failures in a row before the breaker opens
+            reset_seconds: First pause of a tripped path
+            max_reset_seconds: Longest pause after repeated trips
+        """
+        self.path = path
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.max_reset_seconds = max_reset_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.opened_until = 0.0
+        self._probing = False
+        CIRCUIT_STATE.set(_STATE_VALUES[CLOSED], path=path, name=name)
+
+    def available(self) -> bool:
+        """Whether a request could be dispatched now (doesn't claim the probe)."""
+        if self.state == OPEN and time.monotonic() >= self.opened_until:
+            self._transition(HALF_OPEN)
+        return self.state == CLOSED or (self.state == HALF_OPEN and not self._probing)
+
+    def claim(self) -> None:
+        """Dispatch a request; in the half-open state it is the probe."""
+        if self.state == HALF_OPEN:
+            self._probing = True
+
+    def retry_after(self) -> float:
+        """Seconds until a request may be dispatched (0 if it may be now)."""
+        if self.available():
+            return 0.0
+        if self.state == OPEN:
+            return self.opened_until - time.monotonic()
+        return PROBE_POLL_SECONDS
+
+    def record_success(self) -> None:
+        self._probing = False
+        self.failures = 0
+        self.trips = 0
+        if self.state != CLOSED:
+            self._transition(CLOSED)
+            logger.info(f"Circuit {self.path}:{self.name} closed")
+
+    def record_failure(self) -> None:
+        """Count a throttled or transient failure, opening the breaker if needed."""
+        self._probing = False
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self._open()
+
+    def release(self) -> None:
+        """End a request that tells nothing about the path (cancelled, unrelated error)."""
+        self._probing = False
+
+    def _open(self) -> None:
+        pause = min(self.max_reset_seconds, self.reset_seconds * 2 ** self.trips)
+        self.trips += 1
+        self.failures = 0
+        self.opened_until = time.monotonic() + pause
+        self._transition(OPEN)
+        logger.warning(f"Circuit {self.path}:{self.name} tripped, paused for {pause:.0f}s")
+
+    def _transition(self, state: str) -> None:
+        self.state = state
+        CIRCUIT_STATE.set(_STATE_VALUES[state], path=self.path, name=self.name)
+        CIRCUIT_TRANSITIONS.inc(path=self.path, name=self.name, state=state)
+
+
+class CircuitBreakers:
+    """Breakers created on first use, one per (path, name)."""
+
+    def __init__(self) -> None:
+        self._breakers: dict[tuple[str, str], CircuitBreaker] = {}
+
+    def get(self, path: str, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get((path, name))
+        if breaker is None:
+            breaker = CircuitBreaker(
+                path,
+                name,
+                failure_threshold=settings.breaker_failure_threshold,
+                reset_seconds=settings.breaker_reset_seconds,
+                max_reset_seconds=settings.breaker_max_reset_seconds,
+            )
+            self._breakers[(path, name)] = breaker
+        return breaker
+
+    def status(self) -> list[dict[str, object]]:
+        """State of every breaker, for diagnostics."""
+        return [
+            {
+                "path": b.path,
+                "name": b.name,
+                "state": b.state,
+                "failures": b.failures,
+                "retry_after": round(b.retry_after(), 1),
+            }
+            for b in self._breakers.values()
+        ]
+
+    def update_limits(self) -> None:
+        """Apply the breaker settings to existing breakers, keeping their state."""
+        for breaker in self._breakers.values():
+            breaker.failure_threshold = settings.breaker_failure_threshold
+            breaker.reset_seconds = settings.breaker_reset_seconds
+            breaker.max_reset_seconds = settings.breaker_max_reset_seconds
+
+    def clear(self) -> None:
+        """Forget all breakers (settings changed)."""
+        self._breakers.clear()
+
+
+async def wait_for_any(paths: Sequence[Sequence[CircuitBreaker]], max_wait: float) -> int:
+    """
+    Wait until one of several paths may be dispatched to.
+
+    A path is a group of breakers that all have to be available, e.g. a
+    player client and the egress identity it goes out through.
+
+    Args:
+        paths: Candidate paths in order of preference
+        max_wait: Longest wait in seconds (0 = don't wait)
+
+    Returns:
+        Index of the first available path
+
+    Raises:
+        CircuitOpenError: If no path becomes available within ``max_wait``
+    """
+    started = time.monotonic()
+    deadline = started + max_wait
+    try:
+        while True:
+            delays = [max((b.retry_after() for b in path), default=0.0) for path in paths]
+            soonest = min(delays)
+            if soonest <= 0:
+                return delays.index(soonest)
+            remaining = deadline - time.monotonic()
+            if soonest > remaining:
+                names = ", ".join(f"{b.path}:{b.name}" for path in paths for b in path
+                                  if not b.available())
+                raise CircuitOpenError(f"Circuit open for {names}", soonest)
+            await asyncio.sleep(soonest)
+    finally:
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            CIRCUIT_WAIT_SECONDS.observe(waited)
+
+
+async def call_with_retries(
+    func: Callable[[], Awaitable[T]],
+    breakers: Sequence[CircuitBreaker],
+    classify: Callable[[BaseException], str],
+    max_wait: float | None = None,
+) -> T:
+    """
+    Call ``func`` through a path guarded by breakers, retrying transient failures.
+
+    Transient failures are retried up to ``retry_attempts`` times in total
+    with backoff_delay() pauses, unless they tripped a breaker. Throttled
+    failures are raised right away, so the caller can switch to another
+    path. Both count against the breakers; a permanent failure means the
+    path works. Other errors are raised without touching the breakers.
+
+    Args:
+        func: Makes one attempt of the request
+        breakers: Breakers of the path, all must be available
+        classify: Maps an exception to PERMANENT, THROTTLED, TRANSIENT or anything else
+        max_wait: How long to queue for a tripped path, default breaker_max_wait_seconds
+
+    Returns:
+        Result of ``func``
+
+    Raises:
+        CircuitOpenError: If the path stays tripped longer than ``max_wait``
+        Exception: The last failure of ``func``
+    """
+    if max_wait is None:
+        max_wait = settings.breaker_max_wait_seconds
+    attempts = max(1, settings.retry_attempts)
+    attempt = 0
+    while True:
+        await wait_for_any([breakers], max_wait)
+        for breaker in breakers:
+            breaker.claim()
+        try:
+            result = await func()
+        except Exception as e:
+            failure = classify(e)
+            REQUEST_FAILURES.inc(error=failure)
+            for breaker in breakers:
+                if failure in (THROTTLED, TRANSIENT):
+                    breaker.record_failure()
+                elif failure == PERMANENT:
+                    breaker.record_success()
+                else:
+                    breaker.release()
+            # A path the failure just tripped isn't retried either
+            if (
+                failure != TRANSIENT
+                or attempt == attempts - 1
+                or not all(b.available() for b in breakers)
+            ):
+                raise
+            delay = backoff_delay(
+                attempt, settings.retry_backoff_seconds, settings.retry_backoff_max_seconds
+            )
+            REQUEST_RETRIES.inc(error=failure)
+            logger.info(f"Retrying in {delay:.1f}s after {failure} error: {e}")
+            await asyncio.sleep(delay)
+            attempt += 1
+        except BaseException:
+            for breaker in breakers:
+                breaker.release()
+            raise
+        else:
+            for breaker in breakers:
+                breaker.record_success()
+            return result
+
+
+breakers = CircuitBreakers()
+
+
+@on_change("breaker_failure_threshold", "breaker_reset_seconds", "breaker_max_reset_seconds")
+def _reload_breaker_limits() -> None:
+    breakers.update_limits()
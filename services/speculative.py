@@ -0,0 +1,263 @@
+"""Speculative prefetch of the format a user is most likely to pick."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from loguru import logger
+
+from config import settings
+from services.cache import TTLCache
+from services.downloader import DownloaderService, use_download_class, use_executor
+from services.file_manager import cleanup_file
+from services.job_store import JobContext
+from services.metrics import EXECUTOR_BUSY, EXECUTOR_SATURATION
+from services.tracing import span
+
+# Choices remembered per user for prediction
+HISTORY_SIZE = 20
+# Minimum number of own choices before the user's history is trusted over the global ratio
+MIN_USER_HISTORY = 3
+# Niceness of speculative worker threads and the FFmpeg processes they spawn
+SPECULATIVE_NICENESS = 10
+
+
+class SpeculationCancelled(Exception):
+    """Raised from the progress hook to abort a speculative download."""
+
+
+@dataclass
+class SpeculativeJob:
+    """A background download started before the user clicked a button."""
+
+    token: str
+    kind: str  # "video" or "audio"
+    task: asyncio.Task[Path] | None = None
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+    downloaded_bytes: int = 0
+    claimed: bool = False
+
+
+def _lower_thread_priority() -> None:
+    """Executor initializer: lower the CPU priority of the worker thread (Linux only)."""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), SPECULATIVE_NICENESS)
+    except (AttributeError, OSError) as e:
+        logger.debug(f"Could not lower speculative thread priority: {e}")
+
+
+class SpeculativeEngine:
+    """
+    Starts downloading the most likely format right after the preview card.
+
+    The prediction is based on the user's own recent choices, or on the
+    global audio/video ratio for new users. Speculative downloads run in a
+    separate low-priority executor, are limited by the number of concurrent
+    jobs and by the total number of bytes in flight, and are cancelled when
+    the user picks the other format or ignores the card.
+    """
+
+    def __init__(self, downloader: DownloaderService) -> None:
+        """
+        Args:
+            downloader: Downloader used for speculative downloads
+        """
+        self.downloader = downloader
+        self._jobs: dict[str, SpeculativeJob] = {}
+        self._history: TTLCache[int, deque[str]] = TTLCache(maxsize=100_000, ttl=30 * 24 * 3600)
+        self._global: Counter[str] = Counter()
+        self._executor: ThreadPoolExecutor | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return settings.speculative_enabled
+
+    def record_choice(self, user_id: int, kind: str) -> None:
+        """
+        Remember which format the user picked.
+
+        Args:
+            user_id: Telegram user ID
+            kind: "video" or "audio"
+        """
+        history = self._history.get(user_id)
+        if history is None:
+            history = deque(maxlen=HISTORY_SIZE)
+        history.append(kind)
+        self._history.set(user_id, history)
+        self._global[kind] += 1
+
+    def predict(self, user_id: int) -> tuple[str, float]:
+        """
+        Predict the format the user will pick.
+
+        Args:
+            user_id: Telegram user ID
+
+        Returns:
+            Tuple of (kind, confidence), where confidence is in [0, 1]
+        """
+        history = self._history.get(user_id)
+        if history and len(history) >= MIN_USER_HISTORY:
+            counts = Counter(history)
+        else:
+            counts = self._global
+
+        total = counts["video"] + counts["audio"]
+        if total == 0:
+            return "video", 0.5
+
+        kind = "audio" if counts["audio"] > counts["video"] else "video"
+        return kind, counts[kind] / total
+
+    def start(self, job: JobContext) -> None:
+        """
+        Start a speculative download for a freshly rendered preview card.
+
+        Does nothing if speculation is disabled, the job budget is exhausted,
+        the video is too long or the prediction isn't confident enough.
+
+        Args:
+            job: Job context of the preview card
+        """
+        if not self.enabled:
+            return
+
+        if len(self._jobs) >= settings.speculative_max_jobs:
+            logger.debug(f"Speculative budget exhausted, skipping job {job.token}")
+            return
+
+        duration = job.info.get("duration") or 0
+        if duration > settings.speculative_max_duration:
+            return
+
+        kind, confidence = self.predict(job.user_id)
+        if confidence < settings.speculative_min_confidence:
+            return
+
+        spec = SpeculativeJob(token=job.token, kind=kind)
+        spec.task = asyncio.create_task(self._run(spec, job))
+        # Failures of unclaimed speculations are expected and not worth a traceback
+        spec.task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._jobs[job.token] = spec
+        logger.info(f"Speculatively fetching {kind} for job {job.token} ({confidence:.0%})")
+
+    async def claim(self, token: str, kind: str) -> Path | None:
+        """
+        Take over the speculative download of a job, if it matches the choice.
+
+        A speculative download of the other format is cancelled.
+
+        Args:
+            token: Job token
+            kind: Format picked by the user ("video" or "audio")
+
+        Returns:
+            Path to the downloaded file (owned by the caller from now on),
+            or None if there is nothing usable
+        """
+        spec = self._jobs.get(token)
+        if spec is None or spec.task is None:
+            return None
+
+        if spec.kind != kind:
+            logger.info(f"Speculation miss for job {token}: predicted {spec.kind}, got {kind}")
+            self.cancel(token)
+            return None
+
+        spec.claimed = True
+        try:
+            path = await spec.task
+            logger.info(f"Speculation hit for job {token}")
+            return path
+        except Exception as e:  # noqa: BLE001 - the user's download runs normally instead
+            logger.warning(f"Speculative download for job {token} failed: {e}")
+            return None
+        finally:
+            self._jobs.pop(token, None)
+
+    def cancel(self, token: str) -> None:
+        """Abort the speculative download of a job and delete its output."""
+        spec = self._jobs.pop(token, None)
+        if spec is None:
+            return
+
+        # The download thread notices the event in its progress hook and cleans up
+        spec.cancel_event.set()
+        if spec.task and spec.task.done() and not spec.task.exception():
+            asyncio.create_task(cleanup_file(spec.task.result()))
+
+    async def _run(self, spec: SpeculativeJob, job: JobContext) -> Path:
+        """Download in the low-priority executor and expire if nobody claims the result."""
+        use_executor(self._get_executor())
+        use_download_class("background")
+
+        def progress_hook(status: dict[str, Any]) -> None:
+            if spec.cancel_event.is_set():
+                raise SpeculationCancelled(f"Speculative download {spec.token} cancelled")
+
+            spec.downloaded_bytes = status.get("downloaded_bytes") or 0
+            in_flight = sum(s.downloaded_bytes for s in list(self._jobs.values()))
+            if in_flight > settings.speculative_max_bytes and not spec.claimed:
+                raise SpeculationCancelled(f"Speculative byte budget exceeded by {spec.token}")
+
+        output_dir = settings.temp_dir / "speculative"
+        output_path = output_dir / f"{spec.token}_{spec.kind}"
+        full_info = await job.get_full_info()
+        if spec.kind == "audio":
+            coro = self.downloader.download_audio(job.url, output_path, full_info, progress_hook)
+        else:
+            coro = self.downloader.download_video(job.url, output_path, full_info, progress_hook)
+
+        try:
+            with span("speculative", kind=spec.kind):
+                path = await coro
+            if spec.cancel_event.is_set():
+                raise SpeculationCancelled(f"Speculative download {spec.token} cancelled")
+        except Exception:
+            self._jobs.pop(spec.token, None)
+            for leftover in output_dir.glob(f"{spec.token}_*"):
+                await cleanup_file(leftover)
+            raise
+
+        # Drop the result if the card is ignored
+        asyncio.get_running_loop().call_later(
+            settings.speculative_idle_timeout, self._expire, spec
+        )
+        return path
+
+    def _expire(self, spec: SpeculativeJob) -> None:
+        """Delete an unclaimed speculative result."""
+        if not spec.claimed and self._jobs.get(spec.token) is spec:
+            logger.debug(f"Speculative result for job {spec.token} was never claimed")
+            self.cancel(spec.token)
+
+    def resize_executor(self) -> None:
+        """
+        Size the executor by ``speculative_max_jobs`` again (after a settings reload).
+
+        A new executor is created on next use. Downloads running on the old
+        one finish there; its threads exit once nothing references it.
+        """
+        self._executor = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            workers = settings.speculative_max_jobs
+            self._executor = ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix="speculative",
+                initializer=_lower_thread_priority,
+            )
+            EXECUTOR_SATURATION.set_function(
+                lambda: EXECUTOR_BUSY.get(executor="speculative") / workers,
+                executor="speculative",
+            )
+        return self._executor
@@ -0,0 +1,275 @@
+"""Per-job tracing timeline and opt-in profiling."""
+
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import json
+import pstats
+import random
+import secrets
+import threading
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, TypeVar
+
+from loguru import logger
+
+from config import settings
+
+T = TypeVar("T")
+
+PROFILING_MODES = ("off", "cprofile", "tracemalloc")
+
+
+@dataclass
+class Span:
+    """Timed step of a job."""
+
+    name: str
+    start: float  # seconds since the trace started
+    duration: float = 0.0
+    parent: str | None = None
+    error: str | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class Trace:
+    """Timeline of a single job, from the link message to the delivered file."""
+
+    trace_id: str
+    name: str
+    started_at: float = field(default_factory=time.time)
+    attributes: dict[str, Any] = field(default_factory=dict)
+    spans: list[Span] = field(default_factory=list)
+    profile_mode: str = "off"
+    _profiles: list[cProfile.Profile] = field(default_factory=list, repr=False)
+
+    @property
+    def active_seconds(self) -> float:
+        """Time spent in top-level spans, i.e. without waiting for the user."""
+        return sum(s.duration for s in self.spans if s.parent is None)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat(),
+            "active_seconds": round(self.active_seconds, 3),
+            "attributes": self.attributes,
+            "spans": [asdict(s) for s in self.spans],
+        }
+
+
+_current_trace: ContextVar[Trace | None] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[str | None] = ContextVar("current_span", default=None)
+
+# Admin-controlled profiling of sampled jobs
+_profiling: dict[str, Any] = {"mode": "off", "rate": 0.0}
+# Traces tracing allocations right now; tracemalloc runs while there is any
+_tracemalloc_traces: set[str] = set()
+_tracemalloc_lock = threading.Lock()
+
+
+def set_profiling(mode: str, rate: float = 0.1) -> None:
+    """
+    Enable or disable profiling of sampled jobs.
+
+    Args:
+        mode: "off", "cprofile" or "tracemalloc"
+        rate: Fraction of new jobs to profile, in [0, 1]
+    """
+    if mode not in PROFILING_MODES:
+        raise ValueError(f"Unknown profiling mode: {mode}")
+    _profiling["mode"] = mode
+    _profiling["rate"] = max(0.0, min(rate, 1.0))
+    if mode != "tracemalloc":
+        # Sampled jobs still running stop tracing too, tracemalloc slows every allocation
+        with _tracemalloc_lock:
+            _tracemalloc_traces.clear()
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+    logger.info(f"Profiling: {mode} (rate {_profiling['rate']:.0%})")
+
+
+def get_profiling() -> tuple[str, float]:
+    """Get the current profiling mode and sampling rate."""
+    return str(_profiling["mode"]), float(_profiling["rate"])
+
+
+def start_trace(name: str, **attributes: Any) -> Trace:
+    """
+    Create a trace and make it current for the calling task.
+
+    Args:
+        name: Job name, e.g. "preview"
+        **attributes: Extra fields stored with the trace (user ID, URL, ...)
+
+    Returns:
+        New trace
+    """
+    trace = Trace(trace_id=secrets.token_hex(8), name=name, attributes=attributes)
+
+    mode, rate = get_profiling()
+    if mode != "off" and random.random() < rate:
+        trace.profile_mode = mode
+        if mode == "tracemalloc":
+            _start_tracemalloc(trace)
+        logger.info(f"Profiling trace {trace.trace_id} with {mode}")
+
+    _current_trace.set(trace)
+    return trace
+
+
+def use_trace(trace: Trace | None) -> None:
+    """
+    Make an existing trace current for the calling task (e.g. in a button callback).
+
+    Resumes allocation tracing paused by pause_trace(), unless tracemalloc
+    profiling was switched off in the meantime.
+    """
+    if trace is not None and trace.profile_mode == "tracemalloc":
+        if get_profiling()[0] == "tracemalloc":
+            _start_tracemalloc(trace)
+        else:
+            trace.profile_mode = "off"
+    _current_trace.set(trace)
+
+
+def pause_trace(trace: Trace | None) -> None:
+    """
+    Stop tracing allocations while a job waits for the user.
+
+    Most preview cards are never clicked, so their traces are never
+    finished; without the pause a sampled preview would keep tracemalloc
+    running for good. use_trace() resumes it.
+    """
+    if trace is not None and trace.profile_mode == "tracemalloc":
+        _stop_tracemalloc(trace)
+
+
+def current_trace() -> Trace | None:
+    """Get the trace of the calling task."""
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span | None]:
+    """
+    Time a step of the current job. Does nothing outside of a trace.
+
+    Args:
+        name: Step name, e.g. "download"
+        **attributes: Extra fields stored with the span
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    item = Span(
+        name=name,
+        start=time.time() - trace.started_at,
+        parent=_current_span.get(),
+        attributes=attributes,
+    )
+    trace.spans.append(item)
+    token = _current_span.set(name)
+    started = time.perf_counter()
+    try:
+        yield item
+    except BaseException as e:
+        item.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        item.duration = time.perf_counter() - started
+        _current_span.reset(token)
+
+
+def profiled(func: Callable[[], T]) -> Callable[[], T]:
+    """
+    Wrap a blocking call so it runs under cProfile if the current job is sampled.
+
+    Must be called in the task context; the returned function may run in any thread.
+    """
+    trace = _current_trace.get()
+    if trace is None or trace.profile_mode != "cprofile":
+        return func
+
+    def run() -> T:
+        profile = cProfile.Profile()
+        trace._profiles.append(profile)
+        return profile.runcall(func)
+
+    return run
+
+
+async def finish_trace(trace: Trace) -> None:
+    """
+    Close a trace: log slow jobs as structured JSON and store collected profiles.
+
+    Args:
+        trace: Trace to finish
+    """
+    if trace.active_seconds >= settings.slow_job_seconds:
+        logger.warning(
+            f"Slow job {trace.trace_id} ({trace.name}): {trace.active_seconds:.1f}s"
+        )
+        await asyncio.to_thread(_dump_json, settings.trace_dir, trace.trace_id, trace.to_dict())
+
+    if trace.profile_mode == "cprofile" and trace._profiles:
+        await asyncio.to_thread(_dump_cprofile, trace)
+    elif trace.profile_mode == "tracemalloc":
+        with _tracemalloc_lock:
+            tracing = trace.trace_id in _tracemalloc_traces and tracemalloc.is_tracing()
+        snapshot = tracemalloc.take_snapshot() if tracing else None
+        _stop_tracemalloc(trace)
+        if snapshot is not None:
+            await asyncio.to_thread(_dump_tracemalloc, trace, snapshot)
+
+    trace.profile_mode = "off"
+    trace._profiles.clear()
+
+
+def _start_tracemalloc(trace: Trace) -> None:
+    with _tracemalloc_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+        _tracemalloc_traces.add(trace.trace_id)
+
+
+def _stop_tracemalloc(trace: Trace) -> None:
+    with _tracemalloc_lock:
+        _tracemalloc_traces.discard(trace.trace_id)
+        if not _tracemalloc_traces and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def _dump_json(directory: Path, name: str, data: dict[str, Any]) -> None:
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{datetime.now():%Y%m%d-%H%M%S}-{name}.json"
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=2, default=str), encoding="utf-8")
+    logger.info(f"Trace saved: {path}")
+
+
+def _dump_cprofile(trace: Trace) -> None:
+    settings.profile_dir.mkdir(parents=True, exist_ok=True)
+    path = settings.profile_dir / f"{datetime.now():%Y%m%d-%H%M%S}-{trace.trace_id}.prof"
+    stats = pstats.Stats(*trace._profiles)
+    stats.dump_stats(str(path))
+    logger.info(f"cProfile stats saved: {path} (open with `python -m pstats {path}`)")
+
+
+def _dump_tracemalloc(trace: Trace, snapshot: tracemalloc.Snapshot) -> None:
+    settings.profile_dir.mkdir(parents=True, exist_ok=True)
+    path = settings.profile_dir / f"{datetime.now():%Y%m%d-%H%M%S}-{trace.trace_id}.tracemalloc"
+    top = snapshot.statistics("lineno")[:50]
+    path.write_text("\n".join(str(stat) for stat in top), encoding="utf-8")
+    logger.info(f"tracemalloc top allocations saved: {path}")
@@ -62,6 +62,59 @@ def is_youtube_url(text: str) -> bool:
     return False
 
 
+def is_playlist_url(text: str) -> bool:
+    """
+    Check if the given text is a YouTube playlist URL.
+
+    Watch links with a ``list=`` parameter are not playlists here: they
+    point to one video of the playlist.
+
+    Args:
+        text: Text to check
+
+    Returns:
+        True if text is a playlist URL, False otherwise
+
+    Examples:
+        >>> is_playlist_url("https://www.youtube.com/playlist?list=PLFgquLnL59alCl_2TQ")
+        True
+        >>> is_playlist_url("https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PLFgquLnL59a")
+        False
+    """
+    if not text or not isinstance(text, str):
+        return False
+    pattern = r"^https?://(www\.|m\.|music\.)?youtube\.com/playlist\?(.*&)?list=[\w-]+"
+    return bool(re.match(pattern, text))
+
+
+def extract_youtube_urls(text: str) -> list[str]:
+    """
+    Find all video and playlist links in a message.
+
+    Args:
+        text: Message text, links separated by whitespace or other text
+
+    Returns:
+        Links accepted by is_youtube_url() or is_playlist_url(), in order,
+        without duplicates
+
+    Examples:
+        >>> extract_youtube_urls("https://youtu.be/dQw4w9WgXcQ and https://youtu.be/9bZkp7q19f0")
+        ['https://youtu.be/dQw4w9WgXcQ', 'https://youtu.be/9bZkp7q19f0']
+        >>> extract_youtube_urls("no links here")
+        []
+    """
+    if not text or not isinstance(text, str):
+        return []
+
+    urls: list[str] = []
+    for candidate in re.findall(r"https?://\S+", text):
+        candidate = candidate.rstrip(".,;:!?)»\"'")
+        if (is_youtube_url(candidate) or is_playlist_url(candidate)) and candidate not in urls:
+            urls.append(candidate)
+    return urls
+
+
 def extract_video_id(url: str) -> str | None:
     """
     Extract video ID from YouTube URL.
@@ -101,3 +154,93 @@ def extract_video_id(url: str) -> str | None:
         return match.group(1)
 
     return None
+
+
+# A time like "90", "1:30", "1:02:03", "1:30.5" or "1h2m3s", "2m", "90s"
+_TIMESTAMP = r"\d+(?::\d{1,2}){0,2}(?:\.\d+)?|(?:\d+h)?(?:\d+m)?(?:\d+(?:\.\d+)?s)?"
+
+
+def parse_timestamp(text: str) -> float | None:
+    """
+    Parse a time position in seconds.
+
+    Args:
+        text: "90", "1:30", "1:02:03", "1h2m3s", "2m30s", "90s"
+
+    Returns:
+        Seconds, or None if the text is not a time
+
+    Examples:
+        >>> parse_timestamp("1:02:03")
+        3723.0
+        >>> parse_timestamp("2m30s")
+        150.0
+        >>> parse_timestamp("soon")
+    """
+    text = text.strip().lower()
+    if not text or not re.fullmatch(_TIMESTAMP, text):
+        return None
+
+    if ":" in text or text.replace(".", "", 1).isdigit():
+        seconds = 0.0
+        for part in text.split(":"):
+            seconds = seconds * 60 + float(part)
+        return seconds
+
+    units = {"h": 3600, "m": 60, "s": 1}
+    return sum(float(value) * units[unit] for value, unit in re.findall(r"([\d.]+)([hms])", text))
+
+
+def parse_clip(text: str) -> tuple[float, float | None] | None:
+    """
+    Find the part of a video requested in a message.
+
+    Times after the URL win ("<url> 1:30-4:05" or "<url> 1:30 4:05", also on
+    the next line); a single time is the end if the URL has a start
+    (``t=``), otherwise the start. They only count if nothing else follows
+    the URL, so numbers in a comment ("<url> 2 раза") aren't taken for a
+    clip. Without times in the text, the URL's ``t=``/``start=`` and
+    ``end=`` parameters are used.
+
+    Args:
+        text: Message with a YouTube URL
+
+    Returns:
+        (start, end) in seconds with end None for "until the end", or None
+        if no clip was requested
+
+    Examples:
+        >>> parse_clip("https://youtu.be/dQw4w9WgXcQ 1:30-4:05")
+        (90.0, 245.0)
+        >>> parse_clip("https://youtu.be/dQw4w9WgXcQ?t=90")
+        (90.0, None)
+        >>> parse_clip("https://youtu.be/dQw4w9WgXcQ")
+        >>> parse_clip("https://youtu.be/dQw4w9WgXcQ посмотри 2 раза")
+    """
+    # The URL ends at any whitespace: times may follow on the next line
+    parts = text.split(maxsplit=1)
+    url = parts[0] if parts else ""
+    rest = parts[1] if len(parts) > 1 else ""
+    query = dict(re.findall(r"[?&#](t|start|end)=([^&#\s]+)", url))
+    url_start = parse_timestamp(query.get("t") or query.get("start") or "")
+    url_end = parse_timestamp(query.get("end", ""))
+
+    tokens = [token for token in re.split(r"[\s\-–—]+", rest) if token]
+    times = [seconds for token in tokens if (seconds := parse_timestamp(token)) is not None]
+    if len(times) != len(tokens) or len(times) > 2:
+        # Other text after the URL: its numbers are not times
+        times = []
+    if len(times) >= 2:
+        start, end = times[0], times[1]
+    elif len(times) == 1 and url_start is not None:
+        start, end = url_start, times[0]
+    elif len(times) == 1:
+        start, end = times[0], None
+    elif url_start is not None or url_end is not None:
+        start, end = url_start or 0.0, url_end
+    else:
+        return None
+
+    if (end is not None and end <= start) or (end is None and not start):
+        return None
+    return start, end
@@ -0,0 +1,192 @@
+"""Event loop watchdog: lag measurement, stacks of blocking calls, sync I/O detection."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import sys
+import sysconfig
+import threading
+import time
+import traceback
+from pathlib import Path
+from types import FrameType
+from typing import Any
+
+from loguru import logger
+
+from config import settings
+from services.metrics import LOOP_BLOCKS, LOOP_LAG, LOOP_LAG_SECONDS, SYNC_IO_CALLS
+
+# Audit events of blocking calls (https://docs.python.org/3/library/audit_events.html)
+SYNC_IO_EVENTS = frozenset({
+    "open",
+    "os.system",
+    "shutil.copyfile",
+    "shutil.rmtree",
+    "subprocess.Popen",
+    "time.sleep",  # Python 3.12+
+})
+# Frames shown in a logged stack
+STACK_LIMIT = 30
+
+_STDLIB_DIRS = tuple(
+    str(Path(sysconfig.get_paths()[key]).resolve()) for key in ("stdlib", "platstdlib")
+)
+_ASYNCIO_DIR = str(Path(asyncio.__file__).parent)
+
+
+class LoopWatchdog:
+    """
+    Watches the event loop for callbacks that keep it busy.
+
+    A task on the loop sleeps ``interval`` seconds at a time and exports how
+    much later than that it woke up (the loop lag). A daemon thread checks
+    the task's heartbeat: when the loop hasn't come back for longer than
+    ``block_threshold``, it logs the stack of the loop thread, which is the
+    code blocking it right now.
+
+    In debug mode asyncio's own debug checks are on as well (slow callbacks,
+    calls from the wrong thread, unawaited coroutines), and blocking calls
+    (file opens, subprocesses, ``time.sleep``...) made by a coroutine are
+    logged with their call site, once per call site.
+    """
+
+    def __init__(self, interval: float, block_threshold: float, debug: bool = False) -> None:
+        """
+        Args:
+            interval: Seconds between two lag measurements
+            block_threshold: Loop stall in seconds after which the stack is logged
+            debug: Enable asyncio debug mode and sync I/O detection
+        """
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self.debug = debug
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id = 0
+        self._heartbeat = 0.0
+        self._task: asyncio.Task[None] | None = None
+        self._thread: threading.Thread | None = None
+        self._stopped = threading.Event()
+        self._reported_sites: set[tuple[str, str, int]] = set()
+
+    @classmethod
+    def from_settings(cls) -> LoopWatchdog:
+        return cls(
+            interval=settings.loop_watchdog_interval,
+            block_threshold=settings.loop_block_threshold_seconds,
+            debug=settings.loop_debug,
+        )
+
+    def start(self) -> None:
+        """Start watching the running loop."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._measure())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+        if self.debug:
+            self._loop.set_debug(True)
+            self._loop.slow_callback_duration = self.block_threshold
+            _forward_asyncio_logs()
+            sys.addaudithook(self._audit)
+            logger.info("Event loop debug mode enabled")
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+        if self._thread:
+            self._thread.join()
+        if self._loop and self.debug:
+            self._loop.set_debug(False)
+
+    async def _measure(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            LOOP_LAG_SECONDS.observe(lag)
+            LOOP_LAG.set(lag)
+            self._heartbeat = time.monotonic()
+
+    def _watch(self) -> None:
+        """Daemon thread: report the stack of the loop thread while it's stalled."""
+        stalled_since = 0.0
+        while not self._stopped.wait(self.interval):
+            heartbeat = self._heartbeat
+            stall = time.monotonic() - heartbeat - self.interval
+            if stall < self.block_threshold:
+                if stalled_since:
+                    logger.warning(
+                        f"Event loop was blocked for {time.monotonic() - stalled_since:.2f}s"
+                    )
+                    stalled_since = 0.0
+                continue
+            if stalled_since:
+                continue  # Already reported this stall
+
+            stalled_since = heartbeat + self.interval
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            LOOP_BLOCKS.inc()
+            stack = "".join(traceback.format_stack(frame, limit=STACK_LIMIT))
+            logger.warning(f"Event loop blocked for {stall:.2f}s, loop thread stack:\n{stack}")
+
+    def _audit(self, event: str, args: tuple[Any, ...]) -> None:
+        """Audit hook: log blocking calls made on the loop thread inside a task."""
+        if (
+            event not in SYNC_IO_EVENTS
+            or self._stopped.is_set()
+            or threading.get_ident() != self._loop_thread_id
+            or asyncio.current_task(self._loop) is None
+        ):
+            return
+        site = _caller(sys._getframe(1))
+        if site is None or (event, *site) in self._reported_sites:
+            return
+        self._reported_sites.add((event, *site))
+        SYNC_IO_CALLS.inc(event=event)
+        stack = "".join(traceback.format_stack(sys._getframe(1), limit=STACK_LIMIT))
+        logger.opt(depth=1).warning(
+            f"Blocking call {event} inside a coroutine at {site[0]}:{site[1]}\n{stack}"
+        )
+
+
+def _caller(frame: FrameType | None) -> tuple[str, int] | None:
+    """
+    Innermost call site outside the standard library, None for asyncio's own calls.
+
+    asyncio starts subprocesses and reads its own files on the loop thread,
+    which is part of the async APIs and not a blocking call of the bot.
+    """
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_ASYNCIO_DIR):
+            return None
+        if not filename.startswith(_STDLIB_DIRS) and not filename.startswith("<frozen"):
+            return filename, frame.f_lineno
+        frame = frame.f_back
+    return None
+
+
+class _InterceptHandler(logging.Handler):
+    """Passes stdlib log records (asyncio's debug warnings) on to loguru."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        logger.opt(exception=record.exc_info).log(record.levelname, record.getMessage())
+
+
+def _forward_asyncio_logs() -> None:
+    asyncio_logger = logging.getLogger("asyncio")
+    if not any(isinstance(h, _InterceptHandler) for h in asyncio_logger.handlers):
+        asyncio_logger.addHandler(_InterceptHandler())
+        asyncio_logger.setLevel(logging.WARNING)
+        asyncio_logger.propagate = False
+
+
+loop_watchdog = LoopWatchdog.from_settings()
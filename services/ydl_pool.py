@@ -0,0 +1,219 @@
+"""Pool of reusable YoutubeDL instances, one idle list per option profile."""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+from loguru import logger
+
+from services.metrics import YDL_POOL_REQUESTS
+
+if TYPE_CHECKING:
+    import yt_dlp
+
+# Options that may differ between jobs sharing an instance. Everything else
+# (client, headers, cookies, ...) is read when the instance is created and
+# therefore defines the profile.
+OVERLAY_KEYS = frozenset({
+    "format",
+    "outtmpl",
+    "progress_hooks",
+    "ratelimit",
+    "http_chunk_size",
+    "concurrent_fragment_downloads",
+    "download_ranges",
+    "force_keyframes_at_cuts",
+    "external_downloader_args",
+    "noplaylist",
+    "playlist_items",
+    "extract_flat",
+})
+
+
+@dataclass
+class _Entry:
+    ydl: yt_dlp.YoutubeDL
+    created_at: float = field(default_factory=time.monotonic)
+    uses: int = 0
+
+
+def profile_key(ydl_opts: dict[str, Any]) -> str:
+    """Stable key of an option dict (callables such as hooks are keyed by name)."""
+    return json.dumps(ydl_opts, sort_keys=True, default=repr)
+
+
+class YoutubeDLPool:
+    """
+    Reuses YoutubeDL instances instead of creating one per request.
+
+    Creating an instance processes the options, instantiates extractors and
+    loads cookies; reusing it also keeps its HTTP connections and the
+    extractors' caches (e.g. the player JS) warm. Instances are pooled per
+    profile (the option dict they were created with) and handed out to one
+    caller at a time. Per-job options from OVERLAY_KEYS are applied on
+    checkout and reverted on return. Instances are closed after
+    ``max_uses`` checkouts or ``max_age`` seconds, or if a call fails with
+    something other than a regular yt-dlp error.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[dict[str, Any]], yt_dlp.YoutubeDL],
+        max_idle: int,
+        max_uses: int,
+        max_age: float,
+    ) -> None:
+        """
+        Args:
+            factory: Creates an instance from an option dict
+            max_idle: Idle instances kept per profile (0 disables pooling)
+            max_uses: Checkouts before an instance is recycled
+            max_age: Seconds before an instance is recycled
+        """
+        self.factory = factory
+        self.max_idle = max_idle
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self._idle: dict[str, deque[_Entry]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self, ydl_opts: dict[str, Any], **overlay: Any) -> Iterator[yt_dlp.YoutubeDL]:
+        """
+        Check out an instance for the given profile.
+
+        Args:
+            ydl_opts: Options defining the profile
+            **overlay: Per-job options (keys from OVERLAY_KEYS)
+
+        Yields:
+            YoutubeDL instance, exclusively owned until the block exits
+        """
+        unknown = overlay.keys() - OVERLAY_KEYS
+        if unknown:
+            raise ValueError(f"Options can't be overlaid on a pooled instance: {sorted(unknown)}")
+
+        key = profile_key(ydl_opts)
+        entry = self._checkout(key)
+        if entry is None:
+            YDL_POOL_REQUESTS.inc(result="miss")
+            # YoutubeDL normalizes its params in place, don't let it touch the caller's dict
+            entry = _Entry(self.factory(_copy_opts(ydl_opts)))
+        else:
+            YDL_POOL_REQUESTS.inc(result="hit")
+
+        import yt_dlp
+
+        reusable = False
+        restore = _apply_overlay(entry.ydl, overlay)
+        try:
+            yield entry.ydl
+            reusable = True
+        except (yt_dlp.utils.DownloadError, yt_dlp.utils.ExtractorError):
+            # Regular extraction/download failures leave the instance intact
+            reusable = True
+            raise
+        finally:
+            restore()
+            entry.uses += 1
+            if not (reusable and self._checkin(key, entry)):
+                _close(entry)
+
+    def clear(self) -> None:
+        """Close all idle instances (e.g. after the options or the factory changed)."""
+        with self._lock:
+            entries = [e for idle in self._idle.values() for e in idle]
+            self._idle.clear()
+        for entry in entries:
+            _close(entry)
+
+    def idle_count(self) -> int:
+        with self._lock:
+            return sum(len(idle) for idle in self._idle.values())
+
+    def _expired(self, entry: _Entry) -> bool:
+        return (
+            entry.uses >= self.max_uses
+            or time.monotonic() - entry.created_at >= self.max_age
+        )
+
+    def _checkout(self, key: str) -> _Entry | None:
+        expired = []
+        entry = None
+        with self._lock:
+            idle = self._idle.get(key)
+            while idle:
+                # Most recently used first: its connections are the most likely to be alive
+                candidate = idle.pop()
+                if self._expired(candidate):
+                    expired.append(candidate)
+                else:
+                    entry = candidate
+                    break
+        for old in expired:
+            _close(old)
+        return entry
+
+    def _checkin(self, key: str, entry: _Entry) -> bool:
+        if self._expired(entry):
+            return False
+        with self._lock:
+            idle = self._idle.setdefault(key, deque())
+            if len(idle) >= self.max_idle:
+                return False
+            idle.append(entry)
+            return True
+
+
+def _copy_opts(ydl_opts: dict[str, Any]) -> dict[str, Any]:
+    """Copy nested containers, keep everything else (hooks, tuples of strings) as is."""
+    if isinstance(ydl_opts, dict):
+        return {k: _copy_opts(v) for k, v in ydl_opts.items()}
+    if isinstance(ydl_opts, list):
+        return [_copy_opts(v) for v in ydl_opts]
+    return ydl_opts
+
+
+def _apply_overlay(ydl: yt_dlp.YoutubeDL, overlay: dict[str, Any]) -> Callable[[], None]:
+    """Apply per-job options and return a function reverting them."""
+    missing = object()
+    saved = {key: ydl.params.get(key, missing) for key in overlay}
+    saved_selector = ydl.format_selector
+    hooks = list(overlay.get("progress_hooks") or [])
+
+    for key, value in overlay.items():
+        if key == "outtmpl" and isinstance(value, str):
+            # Normalized to a dict when the instance is created
+            value = {**ydl.params.get("outtmpl", {}), "default": value}
+        ydl.params[key] = value
+    if "format" in overlay:
+        # The format selector is compiled when the instance is created
+        ydl.format_selector = ydl.build_format_selector(overlay["format"])
+    for hook in hooks:
+        ydl.add_progress_hook(hook)
+
+    def restore() -> None:
+        for key, value in saved.items():
+            if value is missing:
+                ydl.params.pop(key, None)
+            else:
+                ydl.params[key] = value
+        ydl.format_selector = saved_selector
+        for hook in hooks:
+            ydl._progress_hooks.remove(hook)
+
+    return restore
+
+
+def _close(entry: _Entry) -> None:
+    try:
+        entry.ydl.close()
+    except Exception as e:  # noqa: BLE001 - a retired instance is dropped either way
+        logger.debug(f"Failed to close YoutubeDL instance: {e}")
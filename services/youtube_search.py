@@ -0,0 +1,152 @@
+"""YouTube search with results cached per query."""
+
+from __future__ import annotations
+
+import asyncio
+import secrets
+from dataclasses import dataclass
+from typing import Any
+
+from loguru import logger
+
+from config import settings
+from services.cache import TTLCache
+from services.downloader import DownloaderService
+from services.metrics import SEARCH_REQUESTS
+
+
+def normalize_query(query: str) -> str:
+    """
+    Cache key of a search query: case and extra whitespace don't matter.
+
+    Examples:
+        >>> normalize_query("  Lofi   HIP hop ")
+        'lofi hip hop'
+    """
+    return " ".join(query.lower().split())
+
+
+@dataclass
+class SearchResults:
+    """Results of one query, addressed from inline buttons by a short token."""
+
+    token: str
+    query: str
+    entries: list[dict[str, Any]]
+
+    @property
+    def pages(self) -> int:
+        return max(1, -(-len(self.entries) // settings.search_page_size))
+
+    def page(self, number: int) -> list[dict[str, Any]]:
+        """Entries of a page, numbered from 0."""
+        start = number * settings.search_page_size
+        return self.entries[start:start + settings.search_page_size]
+
+
+class YoutubeSearch:
+    """
+    Searches YouTube and caches the results per normalized query.
+
+    All ``search_results`` results are fetched with one flat extraction, so
+    switching pages and repeating a query (by anyone) within
+    ``search_cache_ttl_seconds`` needs no new request. Concurrent identical
+    queries share one extraction.
+    """
+
+    TOKEN_BYTES = 6
+
+    def __init__(self, downloader: DownloaderService) -> None:
+        self.downloader = downloader
+        self._results: TTLCache[str, SearchResults] = TTLCache(
+            maxsize=settings.search_cache_max_size, ttl=settings.search_cache_ttl_seconds
+        )
+        # Tokens outlive the results: paging an old message searches again
+        self._tokens: TTLCache[str, str] = TTLCache(
+            maxsize=settings.search_cache_max_size, ttl=settings.job_ttl_seconds
+        )
+        self._query_tokens: TTLCache[str, str] = TTLCache(
+            maxsize=settings.search_cache_max_size, ttl=settings.job_ttl_seconds
+        )
+        self._pending: dict[str, asyncio.Future[SearchResults]] = {}
+
+    def resize(self, maxsize: int, ttl: float, token_ttl: float) -> None:
+        """
+        Change the cache limits (settings reloaded).
+
+        Args:
+            maxsize: Most cached queries
+            ttl: How long results are cached
+            token_ttl: How long paging buttons keep working
+        """
+        self._results.resize(maxsize, ttl)
+        self._tokens.resize(maxsize, token_ttl)
+        self._query_tokens.resize(maxsize, token_ttl)
+
+    async def search(self, query: str) -> SearchResults:
+        """
+        Get the results of a query, from the cache if possible.
+
+        Args:
+            query: Search text as typed by the user
+
+        Returns:
+            Cached or fresh results
+
+        Raises:
+            DownloadError: If the search fails
+        """
+        key = normalize_query(query)
+        cached = self._results.get(key)
+        if cached is not None:
+            SEARCH_REQUESTS.inc(result="hit")
+            return cached
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            SEARCH_REQUESTS.inc(result="shared")
+            return await asyncio.shield(pending)
+
+        SEARCH_REQUESTS.inc(result="miss")
+        future: asyncio.Future[SearchResults] = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            entries = await self.downloader.search_videos(key, settings.search_results)
+            results = SearchResults(self._token_for(key), query.strip(), entries)
+            self._results.set(key, results)
+            future.set_result(results)
+            logger.info(f"Search {key!r}: {len(entries)} results")
+            return results
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; don't warn about an unretrieved exception
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            del self._pending[key]
+
+    async def get(self, token: str) -> SearchResults | None:
+        """
+        Get the results behind a button token.
+
+        Returns:
+            Results (searched again if they expired), or None if the token is unknown
+        """
+        key = self._tokens.get(token)
+        if key is None:
+            return None
+        return await self.search(key)
+
+    def _token_for(self, key: str) -> str:
+        """Token of a query, reused while it's alive so old messages keep working."""
+        token = self._query_tokens.get(key)
+        if token is None or self._tokens.get(token) != key:
+            token = secrets.token_urlsafe(self.TOKEN_BYTES)
+            while token in self._tokens:
+                token = secrets.token_urlsafe(self.TOKEN_BYTES)
+        self._tokens.set(token, key)
+        self._query_tokens.set(key, token)
+        return token
@@ -0,0 +1,42 @@
+"""Shared fixtures: settings needed to import the bot's modules and a controllable clock."""
+
+import os
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+# Settings are read on import; the token is the only required one
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:test")
+
+
+class FakeClock:
+    """Stand-in for time.monotonic() that only moves when told to."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> FakeClock:
+    """Freeze time.monotonic() for code measuring expiry, pauses and rates."""
+    fake = FakeClock()
+    monkeypatch.setattr(time, "monotonic", fake)
+    return fake
+
+
+@pytest.fixture(autouse=True)
+def temp_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Path]:
+    """Keep files written by the code under test out of the working directory."""
+    from config import settings
+
+    path = tmp_path / "temp"
+    monkeypatch.setattr(settings, "temp_dir", path)
+    yield path
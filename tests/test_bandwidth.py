@@ -0,0 +1,86 @@
+"""Tests for dividing the download bandwidth between running downloads."""
+
+import pytest
+from pydantic import ValidationError
+
+from config.settings import Settings
+from services.bandwidth import BandwidthScheduler
+from tests.conftest import FakeClock
+
+
+@pytest.fixture
+def scheduler(clock: FakeClock) -> BandwidthScheduler:
+    return BandwidthScheduler(limit=1000, weights={"audio": 4, "video": 1})
+
+
+def test_shares_follow_weights(scheduler: BandwidthScheduler) -> None:
+    with scheduler.flow("audio") as audio, scheduler.flow("video") as video:
+        assert audio.rate == pytest.approx(800)
+        assert video.rate == pytest.approx(200)
+    assert scheduler.active() == []
+
+
+def test_single_flow_gets_the_whole_limit(scheduler: BandwidthScheduler) -> None:
+    with scheduler.flow("video") as video:
+        assert video.rate == pytest.approx(1000)
+
+
+def test_unknown_class_has_weight_one(scheduler: BandwidthScheduler) -> None:
+    with scheduler.flow("audio") as audio, scheduler.flow("background") as background:
+        assert audio.rate == pytest.approx(800)
+        assert background.rate == pytest.approx(200)
+
+
+def test_unsaturated_flow_leaves_its_share_to_others(
+    scheduler: BandwidthScheduler, clock: FakeClock
+) -> None:
+    with scheduler.flow("audio") as audio, scheduler.flow("video") as video:
+        # The audio server only delivers 100 B/s and audio hasn't been held back for 2 s
+        clock.advance(2)
+        audio.measured_rate = 100
+        video.throttled_at = clock.now
+        scheduler._rebalance()
+        assert audio.rate == pytest.approx(120)
+        assert video.rate == pytest.approx(880)
+
+
+def test_saturated_flows_keep_weighted_shares(
+    scheduler: BandwidthScheduler, clock: FakeClock
+) -> None:
+    with scheduler.flow("audio") as audio, scheduler.flow("video") as video:
+        clock.advance(2)
+        audio.measured_rate = 100
+        audio.throttled_at = video.throttled_at = clock.now
+        scheduler._rebalance()
+        assert audio.rate == pytest.approx(800)
+        assert video.rate == pytest.approx(200)
+
+
+def test_consume_paces_flow(scheduler: BandwidthScheduler, clock: FakeClock) -> None:
+    with scheduler.flow("video") as video:
+        assert scheduler._consume(video, 500) == pytest.approx(0.5)
+        assert scheduler._consume(video, 500) == pytest.approx(1.0)
+        # Once the schedule is caught up a quarter second's worth passes at once
+        clock.advance(1.25)
+        assert scheduler._consume(video, 250) == pytest.approx(0)
+
+
+def test_unlimited(clock: FakeClock) -> None:
+    scheduler = BandwidthScheduler(limit=0, weights={"audio": 4, "video": 1})
+    with scheduler.flow("video") as video:
+        assert video.rate == 0
+        assert scheduler._consume(video, 10**9) == 0
+
+
+def test_update_from_rebalances(scheduler: BandwidthScheduler) -> None:
+    with scheduler.flow("audio") as audio, scheduler.flow("video") as video:
+        scheduler.update_from(BandwidthScheduler(limit=2000, weights={"audio": 1, "video": 1}))
+        assert audio.rate == pytest.approx(1000)
+        assert video.rate == pytest.approx(1000)
+
+
+@pytest.mark.parametrize("weight", ["0", "-1"])
+def test_weights_must_be_positive(weight: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("BANDWIDTH_WEIGHT_BACKGROUND", weight)
+    with pytest.raises(ValidationError):
+        Settings()  # type: ignore[call-arg]  # the token comes from the environment
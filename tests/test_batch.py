@@ -0,0 +1,120 @@
+"""Tests for collecting and running batches of videos."""
+
+import asyncio
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from config import settings
+from services.batch import MEDIA_GROUP_SIZE, BatchItem, BatchPipeline
+from services.downloader import DownloaderService
+
+PLAYLIST = "https://www.youtube.com/playlist?list=PL1"
+
+
+def watch_url(video_id: str) -> str:
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+class FakeDownloader(DownloaderService):
+    """Playlists of fixed entries and downloads that write a small file."""
+
+    def __init__(self, entries: list[dict[str, Any]], failing: set[str] | None = None) -> None:
+        self.entries = entries
+        self.failing = failing or set()
+        self.running = 0
+        self.max_running = 0
+
+    async def expand_playlist(self, url: str, limit: int) -> list[dict[str, Any]]:
+        if url != PLAYLIST:
+            raise RuntimeError("private playlist")
+        return self.entries[:limit]
+
+    async def resolve_formats(self, url: str) -> dict[str, Any]:
+        return {"title": f"title of {url}", "duration": 60}
+
+    async def download_audio(self, url: str, output_path: Path, *args: Any, **kwargs: Any) -> Path:
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(0)
+            if url in self.failing:
+                raise RuntimeError("boom")
+            path = output_path.with_suffix(".mp3")
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b"x")
+            return path
+        finally:
+            self.running -= 1
+
+
+def entry(video_id: str) -> dict[str, Any]:
+    return {"id": video_id, "url": watch_url(video_id), "title": video_id, "duration": 10}
+
+
+async def test_collect_expands_playlists_and_drops_duplicates() -> None:
+    pipeline = BatchPipeline(FakeDownloader([entry("aaaaaaaaaaa"), entry("bbbbbbbbbbb")]))
+    items = await pipeline.collect([
+        watch_url("bbbbbbbbbbb"), PLAYLIST, "https://www.youtube.com/playlist?list=PL2",
+    ])
+    assert [item.url for item in items] == [watch_url("bbbbbbbbbbb"), watch_url("aaaaaaaaaaa")]
+    assert items[1].title == "aaaaaaaaaaa"
+    assert items[1].duration == 10
+
+
+async def test_collect_stops_at_the_item_limit(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "batch_max_items", 2)
+    pipeline = BatchPipeline(FakeDownloader([entry(f"video{i:06d}") for i in range(5)]))
+    items = await pipeline.collect([PLAYLIST, watch_url("ccccccccccc")])
+    assert len(items) == 2
+
+
+def test_create_and_get() -> None:
+    pipeline = BatchPipeline(FakeDownloader([]))
+    batch = pipeline.create(7, [BatchItem(url=watch_url("aaaaaaaaaaa"))])
+    assert pipeline.get(batch.token) is batch
+    assert pipeline.get("unknown") is None
+
+
+async def test_run_delivers_groups_in_order_and_skips_failures(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "batch_concurrency", 3)
+    urls = [watch_url(f"video{i:06d}") for i in range(MEDIA_GROUP_SIZE + 2)]
+    downloader = FakeDownloader([], failing={urls[1]})
+    pipeline = BatchPipeline(downloader)
+    batch = pipeline.create(7, [BatchItem(url=url) for url in urls])
+    groups: list[list[str]] = []
+    delivered_files: list[Path] = []
+
+    async def deliver(items: list[BatchItem]) -> None:
+        assert pipeline.is_running(7)
+        groups.append([item.url for item in items])
+        delivered_files.extend(item.path for item in items if item.path is not None)
+
+    await pipeline.run(batch, "audio", tmp_path, deliver)
+
+    assert groups == [[url for url in urls[:MEDIA_GROUP_SIZE] if url != urls[1]],
+                      urls[MEDIA_GROUP_SIZE:]]
+    assert batch.count("failed") == 1
+    assert batch.items[1].error == "boom"
+    assert batch.items[0].title == f"title of {urls[0]}"
+    assert downloader.max_running == 3
+    # Files are removed after delivery and the batch is forgotten
+    assert delivered_files and not any(path.exists() for path in delivered_files)
+    assert not pipeline.is_running(7)
+    assert pipeline.get(batch.token) is None
+
+
+async def test_failed_delivery_marks_the_group_failed(tmp_path: Path) -> None:
+    pipeline = BatchPipeline(FakeDownloader([]))
+    batch = pipeline.create(7, [BatchItem(url=watch_url("aaaaaaaaaaa"))])
+
+    async def deliver(items: list[BatchItem]) -> None:
+        raise RuntimeError("telegram is down")
+
+    await pipeline.run(batch, "audio", tmp_path, deliver)
+    assert batch.items[0].status == "failed"
+    assert batch.items[0].error == "telegram is down"
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,68 @@
+"""Tests for the TTL/LRU cache."""
+
+from services.cache import TTLCache
+from tests.conftest import FakeClock
+
+
+def test_entry_expires_after_ttl(clock: FakeClock) -> None:
+    cache: TTLCache[str, int] = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1)
+
+    clock.advance(59)
+    assert cache.get("a") == 1
+    clock.advance(1)
+    assert cache.get("a") is None
+    assert "a" not in cache
+
+
+def test_per_entry_ttl_overrides_default(clock: FakeClock) -> None:
+    cache: TTLCache[str, int] = TTLCache(maxsize=10, ttl=60)
+    cache.set("short", 1, ttl=5)
+    cache.set("long", 2)
+
+    clock.advance(10)
+    assert cache.get("short", 0) == 0
+    assert cache.get("long") == 2
+
+
+def test_least_recently_used_entry_is_evicted(clock: FakeClock) -> None:
+    cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # "b" is now the least recently used
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_pop_and_purge_expired(clock: FakeClock) -> None:
+    cache: TTLCache[str, int] = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=1)
+    cache.set("c", 3, ttl=1)
+
+    assert cache.pop("a") == 1
+    assert cache.pop("a") is None
+    clock.advance(2)
+    assert cache.purge_expired() == 2
+    assert len(cache) == 0
+
+
+def test_resize_evicts_oldest_and_keeps_expiry(clock: FakeClock) -> None:
+    cache: TTLCache[str, int] = TTLCache(maxsize=5, ttl=60)
+    for i, key in enumerate("abcde"):
+        cache.set(key, i)
+    cache.get("a")
+
+    cache.resize(maxsize=2, ttl=600)
+
+    assert len(cache) == 2
+    assert cache.get("a") == 0 and cache.get("e") == 4
+    # Stored entries keep their old TTL, new ones get the new default
+    cache.set("f", 5)
+    clock.advance(120)
+    assert cache.get("e") is None
+    assert cache.get("f") == 5
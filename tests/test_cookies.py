@@ -0,0 +1,140 @@
+"""Tests for shared cookie jars and the rotation of cookie profiles."""
+
+import os
+from http.cookiejar import LoadError
+from pathlib import Path
+
+import pytest
+
+from services.cookies import CookieManager, is_bot_check
+from tests.conftest import FakeClock
+
+HEADER = "# Netscape HTTP Cookie File\n"
+
+
+def cookie_file(path: Path, **cookies: str) -> Path:
+    lines = [
+        f".youtube.com\tTRUE\t/\tTRUE\t4102444800\t{name}\t{value}\n"
+        for name, value in cookies.items()
+    ]
+    path.write_text(HEADER + "".join(lines), encoding="utf-8")
+    return path
+
+
+def make_manager(*sources: str | Path) -> CookieManager:
+    return CookieManager(
+        [str(s) for s in sources], ban_seconds=600, max_failures=2, browser_reload_seconds=60
+    )
+
+
+def test_bot_check_errors() -> None:
+    assert is_bot_check(Exception("Sign in to confirm you’re not a bot"))
+    assert is_bot_check(Exception("HTTP Error 429: Too Many Requests"))
+    assert not is_bot_check(Exception("Video unavailable"))
+
+
+def test_no_profiles() -> None:
+    manager = make_manager()
+    assert manager.choose() is None
+    assert manager.status() == []
+
+
+def test_profiles_rotate_and_banned_ones_are_skipped(clock: FakeClock) -> None:
+    manager = make_manager("a.txt", "b.txt")
+    assert [manager.choose() for _ in range(3)] == ["a.txt", "b.txt", "a.txt"]
+
+    bot_check = Exception("Sign in to confirm you're not a bot")
+    manager.report_failure("b.txt", bot_check)
+    manager.report_success("b.txt")
+    manager.report_failure("b.txt", bot_check)
+    assert not manager.profiles["b.txt"].banned
+
+    manager.report_failure("b.txt", bot_check)
+    assert manager.profiles["b.txt"].banned
+    assert [manager.choose() for _ in range(3)] == ["a.txt"] * 3
+
+    clock.advance(600)
+    assert {manager.choose(), manager.choose()} == {"a.txt", "b.txt"}
+
+
+def test_sticky_profile_is_kept_until_banned_or_removed(clock: FakeClock) -> None:
+    manager = make_manager("a.txt", "b.txt")
+    assert [manager.choose("b.txt") for _ in range(3)] == ["b.txt"] * 3
+    assert manager.choose("gone.txt") == "a.txt"
+
+    for _ in range(2):
+        manager.report_failure("b.txt", Exception("HTTP Error 429"))
+    assert manager.choose("b.txt") == "a.txt"
+
+
+def test_other_errors_do_not_count(clock: FakeClock) -> None:
+    manager = make_manager("a.txt")
+    for _ in range(5):
+        manager.report_failure("a.txt", Exception("Read timed out"))
+    assert manager.choose() == "a.txt"
+
+
+def test_all_profiles_banned(clock: FakeClock) -> None:
+    manager = make_manager("a.txt")
+    for _ in range(2):
+        manager.report_failure("a.txt", Exception("HTTP Error 429"))
+    assert manager.choose() is None
+
+
+def test_jar_is_loaded_once_and_shared(tmp_path: Path) -> None:
+    path = cookie_file(tmp_path / "cookies.txt", SID="one")
+    manager = make_manager(path)
+
+    jar = manager.get_jar(str(path))
+    assert {c.name: c.value for c in jar} == {"SID": "one"}
+    assert manager.get_jar(str(path)) is jar
+    assert manager.status()[0]["cookies"] == 1
+
+
+def test_changed_file_is_reloaded_into_the_same_jar(tmp_path: Path) -> None:
+    path = cookie_file(tmp_path / "cookies.txt", SID="one")
+    manager = make_manager(path)
+    jar = manager.get_jar(str(path))
+
+    cookie_file(path, SID="two", HSID="three")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert manager.get_jar(str(path)) is jar
+    assert {c.name: c.value for c in jar} == {"SID": "two", "HSID": "three"}
+
+
+def test_touched_file_is_not_parsed_again(tmp_path: Path) -> None:
+    path = cookie_file(tmp_path / "cookies.txt", SID="one")
+    manager = make_manager(path)
+    jar = manager.get_jar(str(path))
+    jar.clear()  # would be refilled by a reload
+
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert len(manager.get_jar(str(path))) == 0
+
+
+def test_broken_file_keeps_the_loaded_cookies(tmp_path: Path) -> None:
+    path = cookie_file(tmp_path / "cookies.txt", SID="one")
+    manager = make_manager(path)
+    manager.get_jar(str(path))
+
+    path.write_text("not a cookie file", encoding="utf-8")
+    assert {c.name for c in manager.get_jar(str(path))} == {"SID"}
+
+    broken = make_manager(path)
+    with pytest.raises(LoadError):
+        broken.get_jar(str(path))
+
+
+def test_save_writes_rotated_cookies_back(tmp_path: Path) -> None:
+    path = cookie_file(tmp_path / "cookies.txt", SID="one")
+    manager = make_manager(path)
+    jar = manager.get_jar(str(path))
+    for cookie in jar:
+        cookie.value = "rotated"
+
+    manager.save()
+    assert "\tSID\trotated" in path.read_text(encoding="utf-8")
@@ -0,0 +1,140 @@
+"""Tests for the batched history writer."""
+
+import sqlite3
+from pathlib import Path
+from typing import Any
+
+from database import HistoryRepository
+from database.stats import RollingStats
+from database.writer import INSERT, UPDATE, USER, Batch, Change
+
+INFO = {"id": "dQw4w9WgXcQ", "title": "Song", "uploader": "Artist", "duration": 212}
+
+
+def test_batch_merges_repeated_user_activity() -> None:
+    batch = Batch()
+    batch.add(Change(USER, 1, {"telegram_id": 1, "username": "old"}))
+    batch.add(Change(USER, 1, {"telegram_id": 1, "username": "new"}))
+    assert batch.users == {1: {"telegram_id": 1, "username": "new"}}
+    assert (batch.changes, batch.rows) == (2, 1)
+
+
+def test_batch_folds_updates_into_uncommitted_insert() -> None:
+    batch = Batch()
+    batch.add(Change(INSERT, 7, {"telegram_id": 1, "status": "downloading"}))
+    batch.add(Change(UPDATE, 7, {"status": "uploading"}))
+    batch.add(Change(UPDATE, 7, {"status": "completed", "file_size_bytes": 100}))
+    assert batch.inserts == {
+        7: {"telegram_id": 1, "status": "completed", "file_size_bytes": 100}
+    }
+    assert batch.updates == {}
+    assert (batch.changes, batch.rows) == (3, 1)
+
+
+def test_batch_merges_updates_of_committed_download() -> None:
+    batch = Batch()
+    batch.add(Change(UPDATE, 7, {"status": "uploading"}))
+    batch.add(Change(UPDATE, 7, {"status": "failed", "error_message": "boom"}))
+    batch.add(Change(UPDATE, 8, {"status": "cancelled"}))
+    assert batch.updates == {
+        7: {"status": "failed", "error_message": "boom"},
+        8: {"status": "cancelled"},
+    }
+    assert batch.inserts == {}
+    assert (batch.changes, batch.rows) == (3, 2)
+
+
+def query(path: Path, sql: str) -> list[Any]:
+    with sqlite3.connect(path) as conn:
+        return conn.execute(sql).fetchall()
+
+
+async def test_history_round_trip(tmp_path: Path) -> None:
+    path = tmp_path / "history.db"
+    repo = HistoryRepository(path, batch_size=100, flush_interval=0.05)
+    await repo.open()
+    repo.record_user(42, "fox", "Fox", None, "ru")
+    done = repo.start_download(42, "https://youtu.be/dQw4w9WgXcQ", INFO, "audio", "audio")
+    repo.update_download(done, "uploading")
+    repo.update_download(done, "completed", file_size_bytes=1234)
+    # A final status sticks
+    repo.update_download(done, "failed", error_message="late")
+    await repo.flush()
+    failed = repo.start_download(42, "https://youtu.be/dQw4w9WgXcQ", INFO, "video", "720p")
+    await repo.flush()
+    repo.update_download(failed, "failed", error_message="boom")
+    await repo.close()
+
+    assert done is not None and failed == done + 1
+    assert query(path, "SELECT telegram_id, username, language_code FROM users") == [
+        (42, "fox", "ru")
+    ]
+    rows = query(
+        path,
+        "SELECT d.id, u.telegram_id, d.video_id, d.duration_seconds, d.format, d.status,"
+        " d.file_size_bytes, d.error_message, d.completed_at IS NOT NULL"
+        " FROM downloads d JOIN users u ON u.id = d.user_id ORDER BY d.id",
+    )
+    assert rows == [
+        (done, 42, "dQw4w9WgXcQ", 212, "audio", "completed", 1234, None, 1),
+        (failed, 42, "dQw4w9WgXcQ", 212, "video", "failed", None, "boom", 1),
+    ]
+
+
+async def test_reopen_continues_ids(tmp_path: Path) -> None:
+    path = tmp_path / "history.db"
+
+    async def start_one() -> int | None:
+        repo = HistoryRepository(path, batch_size=100, flush_interval=0.05)
+        await repo.open()
+        download_id = repo.start_download(1, "u", INFO, "audio", "audio")
+        await repo.close()
+        return download_id
+
+    assert await start_one() == 1
+    assert await start_one() == 2
+
+
+async def test_disabled_history_is_a_no_op() -> None:
+    repo = HistoryRepository(None, batch_size=100, flush_interval=0.05)
+    await repo.open()
+    assert not repo.enabled
+    assert repo.start_download(1, "u", INFO, "audio", "audio") is None
+    repo.update_download(None, "completed")
+    await repo.close()
+
+
+def test_rolling_stats_count_in_memory() -> None:
+    stats = RollingStats()
+    stats.user_seen(1)
+    stats.download_started(10, 1, "audio")
+    stats.download_started(11, 2, "720p")
+    stats.download_finished(10, ok=True, size=500)
+    stats.download_finished(11, ok=False)
+    stats.download_finished(12, ok=True)  # unknown download
+
+    day = stats.window(24)
+    assert (day.downloads, day.audio, day.video) == (2, 1, 1)
+    assert (day.completed, day.failed, day.bytes, day.users) == (1, 1, 500, {1, 2})
+    assert stats.totals.users == 2
+    assert (stats.totals.downloads, stats.totals.completed, stats.totals.bytes) == (2, 1, 500)
+
+
+async def test_rolling_stats_are_loaded_from_the_database(tmp_path: Path) -> None:
+    path = tmp_path / "history.db"
+    repo = HistoryRepository(path, batch_size=100, flush_interval=0.05)
+    await repo.open()
+    repo.record_user(42, "fox", "Fox", None, "ru")
+    done = repo.start_download(42, "https://youtu.be/dQw4w9WgXcQ", INFO, "audio", "audio")
+    repo.update_download(done, "completed", file_size_bytes=1234)
+    repo.start_download(42, "https://youtu.be/dQw4w9WgXcQ", INFO, "video", "720p")
+    await repo.close()
+
+    reopened = HistoryRepository(path, batch_size=100, flush_interval=0.05)
+    await reopened.open()
+    await reopened.close()
+    stats = reopened.stats
+    assert (stats.totals.users, stats.totals.downloads, stats.totals.completed) == (1, 2, 1)
+    assert stats.totals.bytes == 1234
+    day = stats.window(24)
+    assert (day.downloads, day.audio, day.video, day.completed, day.users) == (2, 1, 1, 1, {42})
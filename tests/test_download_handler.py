@@ -0,0 +1,40 @@
+"""Tests for the helpers of the download handlers."""
+
+from typing import Any
+
+import pytest
+
+from bot.handlers.download import _clip_renditions, _default_quality
+from config import settings
+
+
+def rendition(quality: str, progressive: bool = False) -> dict[str, Any]:
+    return {"quality": quality, "size": 1000, "remux": True, "progressive": progressive}
+
+
+@pytest.fixture(autouse=True)
+def defaults(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "default_quality", "720p")
+    monkeypatch.setattr(settings, "progressive_min_quality", 360)
+
+
+def test_default_quality_is_the_highest_up_to_the_setting() -> None:
+    ladder = [rendition("360p"), rendition("720p"), rendition("1080p")]
+    assert _default_quality(ladder) == "720p"
+    assert _default_quality([rendition("1080p")]) is None
+
+
+def test_default_quality_takes_a_progressive_file(monkeypatch: pytest.MonkeyPatch) -> None:
+    ladder = [rendition("240p", progressive=True), rendition("360p", progressive=True),
+              rendition("720p")]
+    assert _default_quality(ladder) == "360p"
+
+    monkeypatch.setattr(settings, "progressive_min_quality", 480)
+    assert _default_quality(ladder) == "720p"
+    monkeypatch.setattr(settings, "progressive_min_quality", 0)
+    assert _default_quality(ladder) == "720p"
+
+
+def test_clip_renditions_are_always_encoded() -> None:
+    (clip,) = _clip_renditions([rendition("360p", progressive=True)], (10, 20), 40)
+    assert clip == {"quality": "360p", "size": 250, "remux": False, "progressive": False}
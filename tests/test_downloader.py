@@ -0,0 +1,396 @@
+"""Tests for error classification and format selection of the downloader."""
+
+import asyncio
+import struct
+import subprocess
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from config import settings
+from services import downloader
+from services.cookies import CookieManager
+from services.downloader import (
+    DownloadError,
+    VideoUnavailableError,
+    _check_unavailable,
+    _convert_to_mp3,
+    _extract_with_fallbacks,
+    _get_base_ydl_opts,
+    _has_faststart,
+    _reencode_for_telegram,
+    _remember_unavailable,
+    _select_formats,
+    _select_progressive,
+    _split_into_ranges,
+    _trim_filter,
+    _unavailable_videos,
+    classify_error,
+    classify_failure,
+    parse_quality,
+    quality_ladder,
+)
+from services.proxies import ProxyPool, redact
+from services.resilience import CircuitBreaker, CircuitBreakers
+
+URL = "https://youtu.be/dQw4w9WgXcQ"
+# YouTube's rate-limit reply
+RATE_LIMITED = (
+    "ERROR: [youtube] abc: Video unavailable. This content isn't available, try again later."
+)
+
+
+@pytest.fixture(autouse=True)
+def empty_negative_cache() -> Iterator[None]:
+    _unavailable_videos.clear()
+    yield
+    _unavailable_videos.clear()
+
+
+@pytest.mark.parametrize(
+    ("message", "reason"),
+    [
+        ("ERROR: [youtube] abc: Private video. Sign in if you've been granted access", "private"),
+        ("ERROR: [youtube] abc: Video unavailable", "removed"),
+        ("ERROR: [youtube] abc: This video has been removed by the uploader", "removed"),
+        ("ERROR: [youtube] abc: Sign in to confirm your age", "age_restricted"),
+        ("ERROR: [youtube] abc: This video is not available in your country", "geo_blocked"),
+        ("ERROR: [youtube] abc: Join this channel to get access to members-only content",
+         "members_only"),
+        ("ERROR: [youtube] abc: Sign in to confirm you're not a bot", None),
+        ("ERROR: Unable to download webpage: HTTP Error 503: Service Unavailable", None),
+        (RATE_LIMITED, None),
+    ],
+)
+def test_classify_error(message: str, reason: str | None) -> None:
+    assert classify_error(Exception(message)) == reason
+
+
+@pytest.mark.parametrize(
+    ("error", "failure"),
+    [
+        (Exception("ERROR: [youtube] abc: Private video"), "permanent"),
+        (Exception("ERROR: [youtube] abc: Sign in to confirm you're not a bot"), "throttled"),
+        (Exception("ERROR: Unable to download webpage: HTTP Error 429: Too Many Requests"),
+         "throttled"),
+        (Exception("ERROR: Unable to download webpage: HTTP Error 503: Service Unavailable"),
+         "transient"),
+        (Exception(RATE_LIMITED), "throttled"),
+        (Exception("ERROR: Read timed out"), "transient"),
+        (ConnectionResetError("reset by peer"), "transient"),
+        (Exception("ERROR: Requested format is not available"), "error"),
+    ],
+)
+def test_classify_failure(error: Exception, failure: str) -> None:
+    assert classify_failure(error) == failure
+
+
+def test_unavailable_video_is_remembered() -> None:
+    error = _remember_unavailable(URL, Exception("ERROR: [youtube] abc: Private video"))
+    assert isinstance(error, VideoUnavailableError)
+    assert error.reason == "private"
+
+    # Other links of the same video fail right away
+    with pytest.raises(VideoUnavailableError) as excinfo:
+        _check_unavailable("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+    assert excinfo.value.reason == "private"
+
+
+def test_rate_limit_reply_is_not_remembered() -> None:
+    assert _remember_unavailable(URL, Exception(RATE_LIMITED)) is None
+    _check_unavailable(URL)
+
+
+def test_transient_error_is_not_remembered() -> None:
+    assert _remember_unavailable(URL, Exception("Read timed out")) is None
+    _check_unavailable(URL)
+
+
+@pytest.fixture
+def ranges(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "download_connections", 4)
+    monkeypatch.setattr(settings, "download_chunk_mb", 1)
+
+
+def test_large_stream_is_split_into_ranges(ranges: None) -> None:
+    fmt = {"url": "https://rr1.googlevideo.com/videoplayback?id=1", "protocol": "https",
+           "filesize": 2 * 1024 * 1024 + 10}
+    split = _split_into_ranges(fmt)
+
+    assert split["protocol"] == "http_dash_segments"
+    assert [f["url"].rsplit("range=", 1)[1] for f in split["fragments"]] == [
+        "0-1048575", "1048576-2097151", "2097152-2097161"
+    ]
+
+
+@pytest.mark.parametrize(
+    "fmt",
+    [
+        {"url": "u", "protocol": "https", "filesize": 1000},
+        {"url": "u", "protocol": "https", "filesize": None},
+        {"url": "u", "protocol": "m3u8_native", "filesize": 10**9},
+    ],
+)
+def test_small_or_unknown_streams_are_kept(ranges: None, fmt: dict[str, Any]) -> None:
+    assert _split_into_ranges(fmt) is fmt
+
+
+def video(format_id: str, height: int, vcodec: str = "avc1.4d401f", tbr: float = 1000,
+          ext: str = "mp4") -> dict[str, Any]:
+    return {"format_id": format_id, "url": "u", "ext": ext, "vcodec": vcodec, "acodec": "none",
+            "width": height * 16 // 9, "height": height, "tbr": tbr}
+
+
+def progressive(format_id: str, height: int, tbr: float = 600) -> dict[str, Any]:
+    return {"format_id": format_id, "url": "u", "ext": "mp4", "vcodec": "avc1.42001E",
+            "acodec": "mp4a.40.2", "width": height * 16 // 9, "height": height, "tbr": tbr}
+
+
+AUDIO = [
+    {"format_id": "251", "url": "u", "ext": "webm", "vcodec": "none", "acodec": "opus",
+     "abr": 160, "tbr": 160},
+    {"format_id": "140", "url": "u", "ext": "m4a", "vcodec": "none", "acodec": "mp4a.40.2",
+     "abr": 128, "tbr": 128},
+]
+
+
+def make_info(*formats: dict[str, Any], duration: int = 40) -> dict[str, Any]:
+    return {"id": "dQw4w9WgXcQ", "duration": duration, "formats": [*formats, *AUDIO]}
+
+
+def test_select_formats_prefers_h264_and_aac() -> None:
+    info = make_info(
+        video("247", 720, vcodec="vp9", tbr=1500), video("136", 720), video("137", 1080),
+    )
+    video_format, audio_format = _select_formats(info, max_quality=720)
+    assert video_format["format_id"] == "136"
+    assert audio_format is not None and audio_format["format_id"] == "140"
+
+
+def test_select_formats_measures_vertical_videos_by_the_short_side() -> None:
+    info = make_info({**video("136", 0), "width": 720, "height": 1280})
+    video_format, _ = _select_formats(info, max_quality=720)
+    assert video_format["format_id"] == "136"
+
+
+def test_select_formats_falls_back_to_progressive() -> None:
+    info = {"id": "x", "formats": [progressive("18", 360)]}
+    video_format, audio_format = _select_formats(info, max_quality=None)
+    assert video_format["format_id"] == "18"
+    assert audio_format is None
+
+
+def test_select_formats_without_a_fitting_format() -> None:
+    with pytest.raises(DownloadError):
+        _select_formats(make_info(video("137", 1080)), max_quality=360)
+
+
+def test_quality_ladder() -> None:
+    ladder = quality_ladder(make_info(video("134", 360, tbr=300), video("136", 720)))
+    assert [r["quality"] for r in ladder] == ["360p", "720p"]
+    assert all(r["remux"] for r in ladder)
+    # Bitrates in kbit/s over 40 seconds, video plus AAC audio
+    assert ladder[0]["size"] == (300 + 128) * 1000 // 8 * 40
+    assert ladder[1]["size"] == (1000 + 128) * 1000 // 8 * 40
+
+
+def test_quality_ladder_skips_rungs_without_a_better_stream() -> None:
+    ladder = quality_ladder(make_info(video("136", 720, vcodec="vp9")))
+    assert [r["quality"] for r in ladder] == ["720p"]
+    assert not ladder[0]["remux"]
+
+
+SHORT = make_info(progressive("18", 360), video("134", 360, tbr=300), video("136", 720))
+
+
+def test_progressive_used_when_it_loses_nothing() -> None:
+    video_format, _ = _select_formats(SHORT, 360)
+    progressive_format = _select_progressive(SHORT, 360, video_format)
+    assert progressive_format is not None and progressive_format["format_id"] == "18"
+
+
+def test_chosen_quality_is_not_lowered_for_the_fast_path() -> None:
+    video_format, _ = _select_formats(SHORT, 720)
+    assert _select_progressive(SHORT, 720, video_format) is None
+
+
+def test_default_download_accepts_a_lower_progressive_file() -> None:
+    video_format, _ = _select_formats(SHORT, 720)
+    progressive_format = _select_progressive(SHORT, 720, video_format, min_quality=360)
+    assert progressive_format is not None and progressive_format["format_id"] == "18"
+    assert _select_progressive(SHORT, 720, video_format, min_quality=480) is None
+
+
+def test_long_videos_keep_separate_streams(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "progressive_max_duration", 600)
+    info = {**SHORT, "duration": 601}
+    video_format, _ = _select_formats(info, 360)
+    assert _select_progressive(info, 360, video_format, min_quality=360) is None
+
+
+def test_progressive_must_be_a_telegram_compatible_mp4() -> None:
+    info = make_info({**progressive("43", 360), "ext": "webm", "vcodec": "vp8"},
+                     video("134", 360))
+    video_format, _ = _select_formats(info, 360)
+    assert _select_progressive(info, 360, video_format, min_quality=360) is None
+
+
+def test_quality_ladder_prefers_progressive_files() -> None:
+    ladder = quality_ladder(SHORT)
+    assert [r["quality"] for r in ladder] == ["360p", "720p"]
+    assert ladder[0]["progressive"] and ladder[0]["remux"]
+    # 360p sends the progressive file alone: 600 kbit/s for 40 s
+    assert ladder[0]["size"] == 600 * 1000 // 8 * 40
+    assert not ladder[1]["progressive"]
+    assert ladder[1]["size"] == (1000 + 128) * 1000 // 8 * 40
+
+
+def box(kind: bytes, payload: bytes = b"") -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+@pytest.mark.parametrize(
+    ("data", "faststart"),
+    [
+        (box(b"ftyp", b"isom") + box(b"moov", b"x" * 16) + box(b"mdat", b"y" * 64), True),
+        (box(b"ftyp", b"isom") + box(b"mdat", b"y" * 64) + box(b"moov", b"x" * 16), False),
+        # 64-bit box size before the index
+        (box(b"ftyp", b"isom") + struct.pack(">I4sQ", 1, b"free", 24) + b"z" * 8 + box(b"moov"),
+         True),
+        # Box running to the end of the file
+        (box(b"ftyp", b"isom") + struct.pack(">I4s", 0, b"mdat") + b"y" * 64, False),
+        (b"not an mp4", False),
+        (b"", False),
+    ],
+)
+def test_has_faststart(tmp_path: Path, data: bytes, faststart: bool) -> None:
+    path = tmp_path / "video.mp4"
+    path.write_bytes(data)
+    assert _has_faststart(path) is faststart
+
+
+def test_quality_ladder_size_is_unknown_without_bitrates() -> None:
+    info = make_info({**video("136", 720), "tbr": None})
+    assert quality_ladder(info)[0]["size"] is None
+
+
+@pytest.mark.parametrize(
+    ("name", "quality"), [("720p", 720), (" 1080P ", 1080), ("best", None), (None, 480)]
+)
+def test_parse_quality(
+    name: str | None, quality: int | None, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "default_quality", "480p")
+    assert parse_quality(name) == quality
+
+
+@pytest.fixture
+def ffmpeg_commands(monkeypatch: pytest.MonkeyPatch) -> list[list[str]]:
+    commands: list[list[str]] = []
+
+    def run(cmd: list[str], **kwargs: Any) -> subprocess.CompletedProcess[str]:
+        commands.append(cmd)
+        Path(cmd[-1]).write_bytes(b"out")
+        return subprocess.CompletedProcess(cmd, 0, "", "")
+
+    monkeypatch.setattr(subprocess, "run", run)
+    return commands
+
+
+@pytest.mark.parametrize(
+    ("clip", "audio", "expected"),
+    [
+        ((90.0, 120.5), False, "trim=start=90.0:end=120.5,setpts=PTS-STARTPTS"),
+        ((90.0, 120.5), True, "atrim=start=90.0:end=120.5,asetpts=PTS-STARTPTS"),
+        ((90.0, None), True, "atrim=start=90.0,asetpts=PTS-STARTPTS"),
+    ],
+)
+def test_trim_filter(clip: tuple[float, float | None], audio: bool, expected: str) -> None:
+    assert _trim_filter(clip, audio) == expected
+
+
+def test_clip_is_cut_in_the_encode(tmp_path: Path, ffmpeg_commands: list[list[str]]) -> None:
+    _reencode_for_telegram(
+        tmp_path / "v.webm", tmp_path / "out.mp4", tmp_path / "a.webm", scale_to=360,
+        clip=(90.0, 120.0),
+    )
+
+    [cmd] = ffmpeg_commands
+    # Clip streams keep the source timestamps, which the trim filters rely on
+    assert cmd.index("-copyts") < cmd.index("-i")
+    assert cmd[cmd.index("-af") + 1] == "atrim=start=90.0:end=120.0,asetpts=PTS-STARTPTS"
+    video_filters = cmd[cmd.index("-vf") + 1].split(",")
+    assert video_filters[:2] == ["trim=start=90.0:end=120.0", "setpts=PTS-STARTPTS"]
+    assert video_filters[2].startswith("scale=")
+
+
+def test_full_video_is_not_trimmed(tmp_path: Path, ffmpeg_commands: list[list[str]]) -> None:
+    _reencode_for_telegram(tmp_path / "v.webm", tmp_path / "out.mp4", tmp_path / "a.webm")
+    _convert_to_mp3(tmp_path / "a.webm", tmp_path / "out.mp3")
+
+    for cmd in ffmpeg_commands:
+        assert "-copyts" not in cmd
+        assert "-af" not in cmd
+        assert "-vf" not in cmd
+
+
+def test_audio_clip_is_cut_in_the_conversion(
+    tmp_path: Path, ffmpeg_commands: list[list[str]]
+) -> None:
+    _convert_to_mp3(tmp_path / "a.webm", tmp_path / "out.mp3", (90.0, None))
+
+    [cmd] = ffmpeg_commands
+    assert cmd.index("-copyts") < cmd.index("-i")
+    assert cmd[cmd.index("-af") + 1] == "atrim=start=90.0,asetpts=PTS-STARTPTS"
+
+
+async def test_extraction_gives_its_proxy_slot_back_while_paths_are_paused(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    proxy_url = "http://10.0.0.1:3128"
+    pool = ProxyPool([proxy_url], max_concurrency=1, min_success_rate=0.5, quarantine_seconds=600)
+    egress = CircuitBreaker(
+        "egress", redact(proxy_url), failure_threshold=1, reset_seconds=0.05,
+        max_reset_seconds=0.05,
+    )
+    egress.record_failure()
+    paused = CircuitBreakers()
+    paused._breakers[("egress", egress.name)] = egress
+    monkeypatch.setattr(downloader, "proxy_pool", pool)
+    monkeypatch.setattr(downloader, "breakers", paused)
+    monkeypatch.setattr(
+        downloader, "_extract_info_sync", lambda url, opts: {"id": "abc", "title": "Video"}
+    )
+
+    extraction = asyncio.create_task(_extract_with_fallbacks(URL))
+    await asyncio.sleep(0.01)
+    assert not extraction.done()
+    # Another request gets the only slot of the proxy meanwhile
+    async with asyncio.timeout(0.01), pool.acquire():
+        pass
+
+    info = await extraction
+    assert info["egress"] == redact(proxy_url)
+    assert pool.proxies[redact(proxy_url)].in_flight == 0
+
+
+async def test_job_keeps_the_cookie_profile_of_its_extraction(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    manager = CookieManager(
+        ["a.txt", "b.txt"], ban_seconds=600, max_failures=2, browser_reload_seconds=60
+    )
+    monkeypatch.setattr(downloader, "cookie_manager", manager)
+    monkeypatch.setattr(
+        downloader, "_extract_info_sync", lambda url, opts: {"id": "abc", "title": "Video"}
+    )
+
+    first = await _extract_with_fallbacks(URL)
+    second = await _extract_with_fallbacks(URL)
+    assert [first["cookie_profile"], second["cookie_profile"]] == ["a.txt", "b.txt"]
+    # Later requests of a job don't move the rotation on
+    for _ in range(3):
+        assert _get_base_ydl_opts(None, second["cookie_profile"])["cookie_profile"] == "b.txt"
+    assert _get_base_ydl_opts()["cookie_profile"] == "a.txt"
@@ -0,0 +1,48 @@
+"""Tests keeping heavy modules out of the bot's startup path."""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+HEAVY = ("yt_dlp", "aiohttp.web", "services.downloader")
+
+
+def loaded_modules(code: str) -> set[str]:
+    """Names from HEAVY imported by ``code`` in a fresh interpreter."""
+    check = f"{code}\nimport sys\nprint(' '.join(m for m in {HEAVY!r} if m in sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-c", check],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "TELEGRAM_BOT_TOKEN": "123456:test"},
+    )
+    return set(result.stdout.split())
+
+
+@pytest.mark.parametrize(
+    "module", ["services", "services.validators", "services.tracing", "services.metrics"]
+)
+def test_light_modules_do_not_load_the_downloader(module: str) -> None:
+    assert loaded_modules(f"import {module}") == set()
+
+
+def test_package_names_resolve_on_first_access() -> None:
+    loaded = loaded_modules("import services\nassert services.DownloadError.__name__")
+    assert "services.downloader" in loaded
+    assert "yt_dlp" not in loaded
+
+
+def test_unknown_package_name() -> None:
+    import services
+
+    with pytest.raises(AttributeError):
+        _ = services.no_such_name
+
+
+def test_all_lists_every_lazy_name() -> None:
+    import services
+
+    assert sorted(services.__all__) == sorted(services._EXPORTS)
@@ -0,0 +1,74 @@
+"""Tests for the short-token registry of preview jobs."""
+
+import asyncio
+from typing import Any
+
+from services.job_store import JobStore
+from tests.conftest import FakeClock
+
+URL = "https://youtu.be/dQw4w9WgXcQ"
+
+
+def test_job_is_found_by_its_token() -> None:
+    store = JobStore(maxsize=10, ttl=60)
+    job = store.create(URL, "dQw4w9WgXcQ", user_id=1, info={"title": "Song"})
+
+    assert store.get(job.token) is job
+    assert job.url == URL and job.user_id == 1
+    # Callback data "dl:video:<token>" must stay within Telegram's 64 bytes
+    assert len(f"dl:video:{job.token}".encode()) <= 64
+
+
+def test_tokens_are_unique() -> None:
+    store = JobStore(maxsize=1000, ttl=60)
+    tokens = {store.create(URL, "dQw4w9WgXcQ", 1, {}).token for _ in range(500)}
+    assert len(tokens) == 500
+
+
+def test_job_expires(clock: FakeClock) -> None:
+    store = JobStore(maxsize=10, ttl=60)
+    job = store.create(URL, "dQw4w9WgXcQ", 1, {})
+
+    clock.advance(61)
+    assert store.get(job.token) is None
+
+
+def test_oldest_job_is_dropped_when_full() -> None:
+    store = JobStore(maxsize=2, ttl=60)
+    first = store.create(URL, "dQw4w9WgXcQ", 1, {})
+    store.create(URL, "dQw4w9WgXcQ", 2, {})
+    store.create(URL, "dQw4w9WgXcQ", 3, {})
+
+    assert store.get(first.token) is None
+    assert len(store) == 2
+
+
+def test_discard() -> None:
+    store = JobStore(maxsize=10, ttl=60)
+    job = store.create(URL, "dQw4w9WgXcQ", 1, {})
+    store.discard(job.token)
+    store.discard(job.token)
+    assert store.get(job.token) is None
+
+
+async def test_full_info_of_background_resolution() -> None:
+    store = JobStore(maxsize=10, ttl=60)
+    job = store.create(URL, "dQw4w9WgXcQ", 1, {})
+    assert await job.get_full_info() is None
+
+    async def resolve() -> dict[str, Any]:
+        return {"formats": []}
+
+    job.info_task = asyncio.create_task(resolve())
+    assert await job.get_full_info() == {"formats": []}
+
+
+async def test_failed_background_resolution_gives_no_info() -> None:
+    store = JobStore(maxsize=10, ttl=60)
+    job = store.create(URL, "dQw4w9WgXcQ", 1, {})
+
+    async def resolve() -> dict[str, Any]:
+        raise RuntimeError("boom")
+
+    job.info_task = asyncio.create_task(resolve())
+    assert await job.get_full_info() is None
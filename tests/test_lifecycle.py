@@ -0,0 +1,103 @@
+"""Tests for the shutdown drain of running handlers."""
+
+import asyncio
+from typing import Any
+
+import pytest
+from aiogram.types import TelegramObject
+
+from bot.middlewares.drain import INTERRUPTED_NOTICE, RESTART_NOTICE, DrainMiddleware
+from services import lifecycle as lifecycle_module
+from services.lifecycle import Lifecycle
+
+
+@pytest.fixture
+def lifecycle(monkeypatch: pytest.MonkeyPatch) -> Lifecycle:
+    fresh = Lifecycle()
+    monkeypatch.setattr("bot.middlewares.drain.lifecycle", fresh)
+    monkeypatch.setattr(lifecycle_module, "CANCEL_GRACE_SECONDS", 1.0)
+    return fresh
+
+
+class FakeChat:
+    id = 7
+
+
+class FakeBot:
+    def __init__(self) -> None:
+        self.sent: list[tuple[int, str]] = []
+
+    async def send_message(self, chat_id: int, text: str) -> None:
+        self.sent.append((chat_id, text))
+
+
+def handler_data(bot: FakeBot) -> dict[str, Any]:
+    return {"bot": bot, "event_chat": FakeChat()}
+
+
+async def test_drain_waits_for_running_handlers(lifecycle: Lifecycle) -> None:
+    finished: list[str] = []
+
+    async def handler() -> None:
+        with lifecycle.track():
+            await asyncio.sleep(0.05)
+            finished.append("done")
+
+    task = asyncio.create_task(handler())
+    await asyncio.sleep(0)
+    assert lifecycle.running == 1
+
+    assert await lifecycle.drain(timeout=5) == 0
+    assert lifecycle.draining
+    assert finished == ["done"]
+    assert lifecycle.running == 0
+    await task
+
+
+async def test_drain_cancels_handlers_at_the_deadline(lifecycle: Lifecycle) -> None:
+    cleaned_up: list[str] = []
+
+    async def handler() -> None:
+        with lifecycle.track():
+            try:
+                await asyncio.sleep(60)
+            finally:
+                cleaned_up.append("cleanup")
+
+    task = asyncio.create_task(handler())
+    await asyncio.sleep(0)
+    assert await lifecycle.drain(timeout=0.01) == 1
+    assert task.cancelled()
+    assert cleaned_up == ["cleanup"]
+
+
+async def test_drain_without_handlers(lifecycle: Lifecycle) -> None:
+    assert await lifecycle.drain(timeout=5) == 0
+
+
+async def test_middleware_turns_updates_away_while_draining(lifecycle: Lifecycle) -> None:
+    bot = FakeBot()
+    calls: list[TelegramObject] = []
+
+    async def handler(event: TelegramObject, data: dict[str, Any]) -> None:
+        calls.append(event)
+
+    await lifecycle.drain(timeout=0)
+    assert await DrainMiddleware()(handler, TelegramObject(), handler_data(bot)) is None
+    assert calls == []
+    assert bot.sent == [(7, RESTART_NOTICE)]
+
+
+async def test_middleware_tells_the_user_of_an_interrupted_handler(lifecycle: Lifecycle) -> None:
+    bot = FakeBot()
+
+    async def handler(event: TelegramObject, data: dict[str, Any]) -> None:
+        await asyncio.sleep(60)
+
+    task = asyncio.create_task(DrainMiddleware()(handler, TelegramObject(), handler_data(bot)))
+    await asyncio.sleep(0)
+    assert lifecycle.running == 1
+
+    assert await lifecycle.drain(timeout=0.01) == 1
+    assert task.cancelled()
+    assert bot.sent == [(7, INTERRUPTED_NOTICE)]
@@ -0,0 +1,72 @@
+"""Tests for the log sinks and JSON records."""
+
+import io
+import json
+import threading
+from pathlib import Path
+
+from loguru import logger
+
+from services.logs import QueuedSink, RotatingFile, _add_job_id, _json_format
+from services.tracing import start_trace, use_trace
+
+
+def test_rotating_file(tmp_path: Path) -> None:
+    path = tmp_path / "bot.log"
+    log = RotatingFile(path, max_bytes=10, backups=2)
+    for line in ("first\n", "second\n", "third\n", "fourth\n"):
+        log.write(line)
+    log.close()
+
+    assert path.read_text() == "fourth\n"
+    assert (tmp_path / "bot.log.1").read_text() == "third\n"
+    assert (tmp_path / "bot.log.2").read_text() == "second\n"
+    assert not (tmp_path / "bot.log.3").exists()
+
+
+def test_rotating_file_appends_to_an_existing_file(tmp_path: Path) -> None:
+    path = tmp_path / "bot.log"
+    path.write_text("old\n")
+    log = RotatingFile(path, max_bytes=100)
+    log.write("new\n")
+    log.close()
+    assert path.read_text() == "old\nnew\n"
+
+
+async def test_queued_sink_writes_from_its_thread() -> None:
+    threads: set[str] = set()
+
+    class Target(io.StringIO):
+        def write(self, text: str) -> int:
+            threads.add(threading.current_thread().name)
+            return super().write(text)
+
+    target = Target()
+    sink = QueuedSink(target, "test")
+    sink.write("one\n")
+    sink.write("two\n")
+    await sink.complete()
+
+    assert target.getvalue() == "one\ntwo\n"
+    assert threads == {"log-test"}
+    sink.stop()
+
+
+def test_json_records_carry_the_job_id() -> None:
+    lines: list[str] = []
+    handler = logger.add(lines.append, format=_json_format, level="INFO")
+    try:
+        trace = start_trace("download")
+        logger.patch(_add_job_id).bind(job_id="-").info("Downloading {braces}")
+        use_trace(None)
+        logger.bind(job_id="-").warning("Outside")
+    finally:
+        logger.remove(handler)
+
+    first, second = (json.loads(line) for line in lines)
+    assert first["message"] == "Downloading {braces}"
+    assert first["level"] == "INFO"
+    assert first["job_id"] == trace.trace_id
+    assert first["thread"] == threading.current_thread().name
+    assert second["job_id"] == "-"
+    assert second["level"] == "WARNING"
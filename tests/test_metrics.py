@@ -0,0 +1,127 @@
+"""Tests for the metrics registry and the Prometheus text exposition."""
+
+import pytest
+
+from services import metrics
+from services.metrics import Counter, Gauge, Histogram, render_metrics
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch: pytest.MonkeyPatch) -> list[metrics._Metric]:
+    """Register the metrics created by a test in an empty registry."""
+    fresh: list[metrics._Metric] = []
+    monkeypatch.setattr(metrics, "REGISTRY", fresh)
+    return fresh
+
+
+def test_counter_exposition() -> None:
+    counter = Counter("sft_test_total", "Things counted", ("kind",))
+    counter.inc(kind="audio")
+    counter.inc(2, kind="audio")
+    counter.inc(kind="video")
+
+    assert counter.get(kind="audio") == 3
+    assert counter.get(kind="other") == 0
+    assert counter.render().splitlines() == [
+        "# HELP sft_test_total Things counted",
+        "# TYPE sft_test_total counter",
+        'sft_test_total{kind="audio"} 3',
+        'sft_test_total{kind="video"} 1',
+    ]
+
+
+def test_metric_without_labels() -> None:
+    counter = Counter("sft_plain_total", "Plain counter")
+    counter.inc(0.5)
+    assert counter.render().splitlines()[-1] == "sft_plain_total 0.5"
+
+
+def test_label_values_are_escaped_and_missing_labels_are_empty() -> None:
+    counter = Counter("sft_escape_total", "Escaping", ("path", "kind"))
+    counter.inc(path='C:\\dir\n"x"')
+
+    assert counter.render().splitlines()[-1] == (
+        'sft_escape_total{path="C:\\\\dir\\n\\"x\\"",kind=""} 1'
+    )
+
+
+def test_gauge_set_inc_dec_and_inprogress() -> None:
+    gauge = Gauge("sft_active", "Active things", ("kind",))
+    gauge.set(5, kind="a")
+    gauge.inc(kind="a")
+    gauge.dec(3, kind="a")
+    assert gauge.get(kind="a") == 3
+
+    with gauge.track_inprogress(kind="b"):
+        assert gauge.get(kind="b") == 1
+    assert gauge.get(kind="b") == 0
+
+
+def test_gauge_callback_runs_on_every_scrape() -> None:
+    gauge = Gauge("sft_computed", "Computed at scrape time", ("pool",))
+    values = iter([1.0, 2.0])
+    gauge.set_function(lambda: next(values), pool="x")
+
+    assert gauge.render().splitlines()[-1] == 'sft_computed{pool="x"} 1.0'
+    assert gauge.get(pool="x") == 2.0
+
+
+def test_failing_gauge_callback_is_skipped() -> None:
+    gauge = Gauge("sft_broken", "Broken callback")
+
+    def broken() -> float:
+        raise OSError("gone")
+
+    gauge.set_function(broken)
+    assert gauge.render().splitlines() == [
+        "# HELP sft_broken Broken callback",
+        "# TYPE sft_broken gauge",
+    ]
+
+
+def test_histogram_buckets_are_cumulative() -> None:
+    histogram = Histogram("sft_seconds", "Durations", ("stage",), buckets=(1, 0.1, 10))
+    for value in (0.05, 0.1, 0.5, 20):
+        histogram.observe(value, stage="x")
+
+    assert histogram.render().splitlines()[2:] == [
+        'sft_seconds_bucket{stage="x",le="0.1"} 2',
+        'sft_seconds_bucket{stage="x",le="1.0"} 3',
+        'sft_seconds_bucket{stage="x",le="10.0"} 3',
+        'sft_seconds_bucket{stage="x",le="+Inf"} 4',
+        'sft_seconds_sum{stage="x"} 20.65',
+        'sft_seconds_count{stage="x"} 4',
+    ]
+
+
+def test_histogram_time() -> None:
+    histogram = Histogram("sft_block_seconds", "Block durations", buckets=(60,))
+    with histogram.time():
+        pass
+    assert 'sft_block_seconds_bucket{le="60.0"} 1' in histogram.render()
+
+
+def test_render_metrics_joins_the_registry() -> None:
+    Counter("sft_a_total", "A").inc()
+    Gauge("sft_b", "B").set(2)
+
+    text = render_metrics()
+    assert text.endswith("\n")
+    assert text.splitlines() == [
+        "# HELP sft_a_total A",
+        "# TYPE sft_a_total counter",
+        "sft_a_total 1",
+        "# HELP sft_b B",
+        "# TYPE sft_b gauge",
+        "sft_b 2",
+    ]
+
+
+async def test_metrics_endpoint() -> None:
+    from aiohttp.test_utils import make_mocked_request
+
+    Counter("sft_served_total", "Served").inc()
+    response = await metrics._handle_metrics(make_mocked_request("GET", "/metrics"))
+
+    assert response.content_type == "text/plain"
+    assert response.text is not None and "sft_served_total 1" in response.text
@@ -0,0 +1,76 @@
+"""Tests for reloading settings at runtime."""
+
+from pathlib import Path
+
+import pytest
+from pydantic import ValidationError
+
+from config import reload, settings
+from config.reload import on_change, reload_settings
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """No .env file, no subscribers but the test's; settings restored afterwards."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(reload, "_subscribers", [])
+    for name in ("search_page_size", "search_results", "download_workers"):
+        monkeypatch.setattr(settings, name, getattr(settings, name))
+
+
+async def test_changed_fields_are_applied_and_their_subscribers_run(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls: list[str] = []
+
+    @on_change("search_page_size")
+    def page_size_changed() -> None:
+        calls.append("page_size")
+
+    @on_change("search_results")
+    def results_changed() -> None:
+        calls.append("results")
+
+    old = settings.search_page_size
+    monkeypatch.setenv("SEARCH_PAGE_SIZE", str(old + 2))
+    applied, _ = await reload_settings()
+
+    assert applied["search_page_size"] == (old, old + 2)
+    assert settings.search_page_size == old + 2
+    assert calls == ["page_size"]
+
+
+async def test_failing_subscriber_does_not_stop_the_others(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls: list[str] = []
+
+    @on_change("search_page_size")
+    def broken() -> None:
+        raise RuntimeError("boom")
+
+    @on_change("search_page_size", "search_results")
+    def working() -> None:
+        calls.append("working")
+
+    monkeypatch.setenv("SEARCH_PAGE_SIZE", str(settings.search_page_size + 1))
+    await reload_settings()
+    assert calls == ["working"]
+
+
+async def test_fields_read_at_startup_need_a_restart(monkeypatch: pytest.MonkeyPatch) -> None:
+    workers = settings.download_workers
+    monkeypatch.setenv("DOWNLOAD_WORKERS", str(workers + 1))
+    applied, pending = await reload_settings()
+    assert "download_workers" in pending
+    assert "download_workers" not in applied
+    assert settings.download_workers == workers
+
+
+async def test_invalid_settings_apply_nothing(monkeypatch: pytest.MonkeyPatch) -> None:
+    page_size = settings.search_page_size
+    monkeypatch.setenv("SEARCH_PAGE_SIZE", str(page_size + 1))
+    monkeypatch.setenv("SEARCH_RESULTS", "many")
+    with pytest.raises(ValidationError):
+        await reload_settings()
+    assert settings.search_page_size == page_size
@@ -0,0 +1,209 @@
+"""Tests for circuit breakers and retries of requests to YouTube."""
+
+from collections.abc import Awaitable, Callable
+
+import pytest
+
+from config import settings
+from services.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    PERMANENT,
+    THROTTLED,
+    TRANSIENT,
+    CircuitBreaker,
+    CircuitOpenError,
+    backoff_delay,
+    call_with_retries,
+    wait_for_any,
+)
+from tests.conftest import FakeClock
+
+
+def make_breaker(threshold: int = 3) -> CircuitBreaker:
+    return CircuitBreaker(
+        "client", "test", failure_threshold=threshold, reset_seconds=60, max_reset_seconds=200
+    )
+
+
+def test_breaker_opens_after_failures_in_a_row(clock: FakeClock) -> None:
+    breaker = make_breaker()
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()  # resets the streak
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.available()
+    assert breaker.retry_after() == pytest.approx(60)
+
+
+def test_half_open_breaker_lets_one_probe_through(clock: FakeClock) -> None:
+    breaker = make_breaker(threshold=1)
+    breaker.record_failure()
+
+    clock.advance(60)
+    assert breaker.available()
+    assert breaker.state == HALF_OPEN
+    breaker.claim()
+    assert not breaker.available()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.trips == 0
+
+
+def test_failed_probe_doubles_the_pause_up_to_the_cap(clock: FakeClock) -> None:
+    breaker = make_breaker(threshold=1)
+    pauses: list[float] = []
+    for _ in range(4):
+        breaker.record_failure()
+        pauses.append(breaker.retry_after())
+        clock.advance(breaker.retry_after())
+        assert breaker.available()
+        breaker.claim()
+
+    assert pauses == pytest.approx([60, 120, 200, 200])
+
+
+def test_released_probe_frees_the_half_open_breaker(clock: FakeClock) -> None:
+    breaker = make_breaker(threshold=1)
+    breaker.record_failure()
+    clock.advance(60)
+    breaker.available()
+    breaker.claim()
+
+    breaker.release()
+    assert breaker.state == HALF_OPEN
+    assert breaker.available()
+
+
+def test_backoff_delay_is_bounded(monkeypatch: pytest.MonkeyPatch) -> None:
+    def uniform(low: float, high: float) -> float:
+        return high
+
+    monkeypatch.setattr("services.resilience.random.uniform", uniform)
+    assert backoff_delay(0, base=1, cap=30) == 1
+    assert backoff_delay(3, base=1, cap=30) == 8
+    assert backoff_delay(10, base=1, cap=30) == 30
+
+
+class Failing:
+    """Request that fails with the given errors, then returns "ok"."""
+
+    def __init__(self, *errors: Exception) -> None:
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def classify(error: BaseException) -> str:
+    return str(error)
+
+
+@pytest.fixture
+def fast_retries(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "retry_attempts", 3)
+    monkeypatch.setattr(settings, "retry_backoff_seconds", 0.0)
+    monkeypatch.setattr(settings, "retry_backoff_max_seconds", 0.0)
+
+
+async def run(
+    func: Callable[[], Awaitable[str]], breaker: CircuitBreaker, max_wait: float = 0.0
+) -> str:
+    return await call_with_retries(func, [breaker], classify, max_wait=max_wait)
+
+
+async def test_transient_failures_are_retried(fast_retries: None) -> None:
+    breaker = make_breaker(threshold=5)
+    func = Failing(Exception(TRANSIENT), Exception(TRANSIENT))
+
+    assert await run(func, breaker) == "ok"
+    assert func.calls == 3
+    assert breaker.failures == 0
+
+
+async def test_transient_failures_give_up_after_the_attempts(fast_retries: None) -> None:
+    breaker = make_breaker(threshold=5)
+    func = Failing(*[Exception(TRANSIENT)] * 5)
+
+    with pytest.raises(Exception, match=TRANSIENT):
+        await run(func, breaker)
+    assert func.calls == 3
+    assert breaker.failures == 3
+
+
+async def test_retries_stop_when_the_breaker_trips(fast_retries: None) -> None:
+    breaker = make_breaker(threshold=2)
+    func = Failing(*[Exception(TRANSIENT)] * 5)
+
+    with pytest.raises(Exception, match=TRANSIENT):
+        await run(func, breaker)
+    assert func.calls == 2
+    assert breaker.state == OPEN
+
+
+async def test_throttled_failure_is_not_retried(fast_retries: None) -> None:
+    breaker = make_breaker(threshold=5)
+    func = Failing(Exception(THROTTLED))
+
+    with pytest.raises(Exception, match=THROTTLED):
+        await run(func, breaker)
+    assert func.calls == 1
+    assert breaker.failures == 1
+
+
+async def test_permanent_failure_counts_as_a_working_path(fast_retries: None) -> None:
+    breaker = make_breaker(threshold=5)
+    breaker.record_failure()
+    func = Failing(Exception(PERMANENT))
+
+    with pytest.raises(Exception, match=PERMANENT):
+        await run(func, breaker)
+    assert func.calls == 1
+    assert breaker.failures == 0
+
+
+async def test_unrelated_error_leaves_the_breaker_alone(fast_retries: None) -> None:
+    breaker = make_breaker(threshold=5)
+    breaker.record_failure()
+    func = Failing(Exception("error"))
+
+    with pytest.raises(Exception, match="error"):
+        await run(func, breaker)
+    assert breaker.failures == 1
+
+
+async def test_open_breaker_raises_circuit_open(fast_retries: None) -> None:
+    breaker = make_breaker(threshold=1)
+    breaker.record_failure()
+    func = Failing()
+
+    with pytest.raises(CircuitOpenError):
+        await run(func, breaker, max_wait=0.0)
+    assert func.calls == 0
+
+
+async def test_wait_for_any_returns_the_first_available_path(clock: FakeClock) -> None:
+    tripped = make_breaker(threshold=1)
+    tripped.record_failure()
+    healthy = make_breaker()
+    assert await wait_for_any([[tripped], [tripped, healthy], [healthy]], max_wait=0) == 2
+
+
+async def test_wait_for_any_gives_up_when_no_path_reopens_in_time(clock: FakeClock) -> None:
+    breaker = make_breaker(threshold=1)
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError) as raised:
+        await wait_for_any([[breaker]], max_wait=30)
+    assert raised.value.retry_after == pytest.approx(60)
+    assert "client:test" in str(raised.value)
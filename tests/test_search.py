@@ -0,0 +1,107 @@
+"""Tests for cached YouTube search."""
+
+import asyncio
+from typing import Any
+
+import pytest
+
+from config import settings
+from services.downloader import DownloadError, DownloaderService, _flat_entries
+from services.youtube_search import YoutubeSearch, normalize_query
+
+
+class FakeDownloader(DownloaderService):
+    """Search returning numbered entries; counts calls and can be held or failed."""
+
+    def __init__(self) -> None:
+        self.queries: list[str] = []
+        self.release = asyncio.Event()
+        self.release.set()
+        self.error: Exception | None = None
+
+    async def search_videos(self, query: str, limit: int) -> list[dict[str, Any]]:
+        self.queries.append(query)
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return [{"id": f"{query}-{i}", "title": str(i)} for i in range(limit)]
+
+
+@pytest.fixture
+def downloader(monkeypatch: pytest.MonkeyPatch) -> FakeDownloader:
+    monkeypatch.setattr(settings, "search_results", 12)
+    monkeypatch.setattr(settings, "search_page_size", 5)
+    return FakeDownloader()
+
+
+def test_normalize_query() -> None:
+    assert normalize_query("  Lofi   HIP hop ") == "lofi hip hop"
+
+
+async def test_repeated_queries_are_served_from_the_cache(downloader: FakeDownloader) -> None:
+    search = YoutubeSearch(downloader)
+    first = await search.search("Lofi  Hip Hop")
+    second = await search.search("lofi hip hop")
+    assert second is first
+    assert downloader.queries == ["lofi hip hop"]
+    assert first.query == "Lofi  Hip Hop"
+
+
+async def test_concurrent_queries_share_one_search(downloader: FakeDownloader) -> None:
+    search = YoutubeSearch(downloader)
+    downloader.release.clear()
+    tasks = [asyncio.create_task(search.search("cats")) for _ in range(3)]
+    await asyncio.sleep(0)
+    downloader.release.set()
+    results = await asyncio.gather(*tasks)
+    assert all(result is results[0] for result in results)
+    assert downloader.queries == ["cats"]
+
+
+async def test_pages(downloader: FakeDownloader) -> None:
+    results = await YoutubeSearch(downloader).search("cats")
+    assert results.pages == 3
+    assert [entry["title"] for entry in results.page(2)] == ["10", "11"]
+    assert results.page(3) == []
+
+
+async def test_failed_search_is_not_cached(downloader: FakeDownloader) -> None:
+    search = YoutubeSearch(downloader)
+    downloader.error = DownloadError("Could not search")
+    with pytest.raises(DownloadError):
+        await search.search("cats")
+    downloader.error = None
+    await search.search("cats")
+    assert downloader.queries == ["cats", "cats"]
+
+
+async def test_tokens_outlive_the_cached_results(downloader: FakeDownloader) -> None:
+    search = YoutubeSearch(downloader)
+    results = await search.search("cats")
+    assert await search.get(results.token) is results
+    assert await search.get("unknown") is None
+
+    search._results.clear()
+    again = await search.get(results.token)
+    assert again is not None and again is not results
+    assert again.token == results.token
+    assert downloader.queries == ["cats", "cats"]
+
+
+def test_flat_entries() -> None:
+    info = {"entries": [
+        {"id": "dQw4w9WgXcQ", "title": "Song", "duration": 212.0, "channel": "Rick",
+         "view_count": 10, "live_status": "not_live"},
+        {"id": "9bZkp7q19f0", "uploader": "PSY", "live_status": "is_live"},
+        None,
+        {"title": "no id"},
+    ]}
+    entries = _flat_entries(info)
+    assert [entry["id"] for entry in entries] == ["dQw4w9WgXcQ", "9bZkp7q19f0"]
+    assert entries[0]["url"] == "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+    assert entries[0]["uploader"] == "Rick"
+    assert not entries[0]["live"]
+    assert entries[1] == {
+        "id": "9bZkp7q19f0", "url": "https://www.youtube.com/watch?v=9bZkp7q19f0",
+        "title": "", "duration": 0, "uploader": "PSY", "view_count": 0, "live": True,
+    }
@@ -0,0 +1,219 @@
+"""Tests for the shared cache of downloaded source streams."""
+
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from services.file_manager import SourceCache
+
+
+class Fetcher:
+    """Fake stream download writing ``size`` bytes, optionally held until released."""
+
+    def __init__(self, size: int = 100) -> None:
+        self.size = size
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.release.set()
+        self.error: Exception | None = None
+
+    async def __call__(self, target: Path) -> Path:
+        self.calls += 1
+        await self.release.wait()
+        path = target.with_name(f"{target.name}.webm")
+        if self.error is not None:
+            path.with_name(f"{path.name}.part").write_bytes(b"x")
+            raise self.error
+        path.write_bytes(b"x" * self.size)
+        return path
+
+
+@pytest.fixture
+def cache(tmp_path: Path) -> SourceCache:
+    return SourceCache(tmp_path / "sources", max_bytes=250)
+
+
+async def test_stream_is_downloaded_once(cache: SourceCache) -> None:
+    fetch = Fetcher()
+    async with cache.lease("abc", "251", fetch) as first:
+        assert first.name == "abc.251.webm"
+    async with cache.lease("abc", "251", fetch) as second:
+        assert second == first
+
+    assert fetch.calls == 1
+    assert cache.contains("abc", "251")
+    assert not cache.contains("abc", "140")
+
+
+async def test_concurrent_leases_share_one_download(cache: SourceCache) -> None:
+    fetch = Fetcher()
+    fetch.release.clear()
+
+    async def lease() -> Path:
+        async with cache.lease("abc", "251", fetch) as path:
+            return path
+
+    tasks = [asyncio.create_task(lease()) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    fetch.release.set()
+    paths = await asyncio.gather(*tasks)
+
+    assert fetch.calls == 1
+    assert len(set(paths)) == 1
+
+
+async def test_failed_download_reaches_waiters_and_is_retried(cache: SourceCache) -> None:
+    fetch = Fetcher()
+    fetch.release.clear()
+    fetch.error = OSError("connection reset")
+
+    async def lease() -> Path:
+        async with cache.lease("abc", "251", fetch) as path:
+            return path
+
+    tasks = [asyncio.create_task(lease()) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    fetch.release.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert all(isinstance(r, OSError) for r in results)
+
+    fetch.error = None
+    assert (await lease()).exists()
+    assert fetch.calls == 2
+
+
+async def test_least_recently_used_streams_are_evicted(cache: SourceCache) -> None:
+    fetch = Fetcher()
+    for video_id in ("a", "b"):
+        async with cache.lease(video_id, "251", fetch):
+            pass
+    async with cache.lease("a", "251", fetch):
+        pass  # "b" is now the least recently used
+    async with cache.lease("c", "251", fetch) as path:
+        assert path.exists()
+
+    assert cache.contains("a", "251") and cache.contains("c", "251")
+    assert not cache.contains("b", "251")
+    assert not (cache.cache_dir / "b.251.webm").exists()
+    assert cache.total_bytes == 200
+
+
+async def test_leased_streams_are_not_evicted(cache: SourceCache) -> None:
+    fetch = Fetcher()
+    async with cache.lease("a", "251", fetch) as held:
+        for video_id in ("b", "c", "d"):
+            async with cache.lease(video_id, "251", fetch):
+                pass
+        assert held.exists()
+    assert cache.total_bytes <= 250
+
+
+async def test_streams_of_a_previous_run_are_indexed(tmp_path: Path) -> None:
+    directory = tmp_path / "sources"
+    directory.mkdir()
+    (directory / "abc.251.webm").write_bytes(b"x" * 10)
+    (directory / "abc.140.m4a.part").write_bytes(b"x" * 10)
+    (directory / "stray").write_bytes(b"x")
+
+    cache = SourceCache(directory, max_bytes=1000)
+    fetch = Fetcher()
+    async with cache.lease("abc", "251", fetch) as path:
+        assert path.name == "abc.251.webm"
+    assert fetch.calls == 0
+    assert not cache.contains("abc", "140")
+
+
+async def test_total_bytes_follow_entries(cache: SourceCache) -> None:
+    path = await lease_path(cache, Fetcher(size=100))
+    assert cache.total_bytes == 100
+
+    # A stream deleted behind the cache's back is downloaded again, not counted twice
+    path.unlink()
+    await lease_path(cache, Fetcher(size=60))
+    assert cache.total_bytes == 60
+
+    cache.clear()
+    assert cache.total_bytes == 0
+    assert cache.contains("abc", "251")
+    assert cache.total_bytes == 60
+
+
+async def lease_path(cache: SourceCache, fetch: Fetcher, shared: bool = True) -> Path:
+    async with cache.lease("abc", "251", fetch, shared=shared) as path:
+        return path
+
+
+async def test_waiters_download_again_when_the_download_is_cancelled(cache: SourceCache) -> None:
+    held = Fetcher()
+    held.release.clear()
+    owner = asyncio.create_task(lease_path(cache, held))
+    await asyncio.sleep(0.01)
+    waiter = asyncio.create_task(lease_path(cache, Fetcher()))
+    await asyncio.sleep(0.01)
+
+    owner.cancel()
+    path = await waiter
+    assert path.name == "abc.251.webm" and path.exists()
+    assert owner.cancelled()
+
+
+async def test_cancelled_waiter_leaves_the_download_running(cache: SourceCache) -> None:
+    fetch = Fetcher()
+    fetch.release.clear()
+    owner = asyncio.create_task(lease_path(cache, fetch))
+    await asyncio.sleep(0.01)
+    waiter = asyncio.create_task(lease_path(cache, fetch))
+    await asyncio.sleep(0.01)
+
+    waiter.cancel()
+    await asyncio.sleep(0.01)
+    assert waiter.cancelled()
+    fetch.release.set()
+    assert (await owner).exists()
+    assert fetch.calls == 1
+
+
+async def test_unshared_download_is_not_waited_for(cache: SourceCache) -> None:
+    background = Fetcher()
+    background.release.clear()
+    background.error = RuntimeError("prefetch aborted")
+    prefetch = asyncio.create_task(lease_path(cache, background, shared=False))
+    await asyncio.sleep(0.01)
+
+    user = Fetcher()
+    path = await lease_path(cache, user)
+    assert user.calls == 1 and path.exists()
+
+    background.release.set()
+    with pytest.raises(RuntimeError):
+        await prefetch
+    # Neither the aborted download nor its partial files stay behind
+    assert [p.name for p in cache.cache_dir.iterdir()] == ["abc.251.webm"]
+
+
+async def test_unshared_download_is_cached(cache: SourceCache) -> None:
+    path = await lease_path(cache, Fetcher(), shared=False)
+    assert path.name == "abc.251.webm"
+    assert cache.contains("abc", "251")
+    assert cache.total_bytes == 100
+
+
+async def test_unshared_download_gives_way_to_a_shared_one(cache: SourceCache) -> None:
+    background = Fetcher()
+    background.release.clear()
+    prefetch = asyncio.create_task(lease_path(cache, background, shared=False))
+    await asyncio.sleep(0.01)
+    shared = Fetcher()
+    shared.release.clear()
+    user = asyncio.create_task(lease_path(cache, shared))
+    await asyncio.sleep(0.01)
+
+    # The prefetch finishes first and waits for the shared download to keep one copy
+    background.release.set()
+    await asyncio.sleep(0.01)
+    assert not prefetch.done()
+    shared.release.set()
+
+    assert await prefetch == await user
+    assert [p.name for p in cache.cache_dir.iterdir()] == ["abc.251.webm"]
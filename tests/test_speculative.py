@@ -0,0 +1,210 @@
+"""Tests for the speculative prefetch after a preview card."""
+
+import asyncio
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from config import settings
+from services.downloader import Clip, DownloaderService
+from services.job_store import JobContext, JobStore
+from services.metrics import EXECUTOR_BUSY, EXECUTOR_SATURATION
+from services.speculative import SpeculationCancelled, SpeculativeEngine
+
+URL = "https://youtu.be/dQw4w9WgXcQ"
+
+ProgressHook = Callable[[dict[str, Any]], None] | None
+
+
+class FakeDownloader(DownloaderService):
+    """Downloads that report 1000 bytes, wait for release(), then report 2000 and finish."""
+
+    def __init__(self) -> None:
+        self.started = asyncio.Event()
+        self.finish = asyncio.Event()
+        self.calls: list[str] = []
+
+    async def download_video(
+        self, url: str, output_path: Path, info: dict[str, Any] | None = None,
+        progress_hook: ProgressHook = None, clip: Clip | None = None,
+        quality: str | None = None,
+    ) -> Path:
+        return await self._download("video", output_path.with_suffix(".mp4"), progress_hook)
+
+    async def download_audio(
+        self, url: str, output_path: Path, info: dict[str, Any] | None = None,
+        progress_hook: ProgressHook = None, clip: Clip | None = None,
+    ) -> Path:
+        return await self._download("audio", output_path.with_suffix(".mp3"), progress_hook)
+
+    async def _download(self, kind: str, path: Path, progress_hook: ProgressHook) -> Path:
+        assert progress_hook is not None
+        self.calls.append(kind)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.with_suffix(".part").write_bytes(b"x" * 1000)
+        progress_hook({"status": "downloading", "downloaded_bytes": 1000})
+        self.started.set()
+        await self.finish.wait()
+        progress_hook({"status": "downloading", "downloaded_bytes": 2000})
+        path.with_suffix(".part").rename(path)
+        return path
+
+
+@pytest.fixture(autouse=True)
+def speculation(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "speculative_enabled", True)
+    monkeypatch.setattr(settings, "speculative_max_jobs", 2)
+    monkeypatch.setattr(settings, "speculative_max_bytes", 10_000)
+    monkeypatch.setattr(settings, "speculative_max_duration", 1200)
+    monkeypatch.setattr(settings, "speculative_min_confidence", 0.6)
+    monkeypatch.setattr(settings, "speculative_idle_timeout", 300)
+
+
+@pytest.fixture
+def downloader() -> FakeDownloader:
+    return FakeDownloader()
+
+
+@pytest.fixture
+def engine(downloader: FakeDownloader) -> SpeculativeEngine:
+    engine = SpeculativeEngine(downloader)
+    for _ in range(3):
+        engine.record_choice(1, "audio")
+    return engine
+
+
+def make_job(user_id: int = 1, duration: int = 200) -> JobContext:
+    return JobStore(maxsize=10, ttl=60).create(URL, "dQw4w9WgXcQ", user_id, {"duration": duration})
+
+
+def spec_files() -> list[Path]:
+    directory = settings.temp_dir / "speculative"
+    return sorted(directory.iterdir()) if directory.exists() else []
+
+
+def test_prediction_without_history_is_a_coin_flip(downloader: FakeDownloader) -> None:
+    assert SpeculativeEngine(downloader).predict(1) == ("video", 0.5)
+
+
+def test_prediction_prefers_own_history_over_global_ratio(downloader: FakeDownloader) -> None:
+    engine = SpeculativeEngine(downloader)
+    for _ in range(4):
+        engine.record_choice(1, "audio")
+    engine.record_choice(2, "video")
+
+    # Too few own choices: the global ratio decides
+    assert engine.predict(2) == ("audio", 0.8)
+    for _ in range(2):
+        engine.record_choice(2, "video")
+    assert engine.predict(2) == ("video", 1.0)
+
+
+async def test_start_skips_unlikely_or_expensive_jobs(
+    engine: SpeculativeEngine, downloader: FakeDownloader, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    unsure = SpeculativeEngine(downloader)
+    unsure.start(make_job())
+    assert unsure._jobs == {}
+
+    engine.start(make_job(duration=3600))
+    monkeypatch.setattr(settings, "speculative_enabled", False)
+    engine.start(make_job())
+    assert engine._jobs == {}
+
+
+async def test_job_budget(engine: SpeculativeEngine, downloader: FakeDownloader) -> None:
+    jobs = [make_job() for _ in range(3)]
+    for job in jobs:
+        engine.start(job)
+    assert len(engine._jobs) == 2
+
+    for job in jobs:
+        engine.cancel(job.token)
+    downloader.finish.set()
+    await asyncio.sleep(0.01)
+
+
+async def test_claimed_speculation_hands_over_the_file(
+    engine: SpeculativeEngine, downloader: FakeDownloader
+) -> None:
+    job = make_job()
+    engine.start(job)
+    await downloader.started.wait()
+
+    claim = asyncio.create_task(engine.claim(job.token, "audio"))
+    downloader.finish.set()
+    path = await claim
+
+    assert path is not None and path.suffix == ".mp3" and path.exists()
+    assert downloader.calls == ["audio"]
+    assert engine._jobs == {}
+
+
+async def test_other_choice_cancels_the_speculation(
+    engine: SpeculativeEngine, downloader: FakeDownloader
+) -> None:
+    job = make_job()
+    engine.start(job)
+    await downloader.started.wait()
+    spec = engine._jobs[job.token]
+
+    assert await engine.claim(job.token, "video") is None
+    downloader.finish.set()
+    assert spec.task is not None
+    with pytest.raises(SpeculationCancelled):
+        await spec.task
+    assert spec_files() == []
+
+
+async def test_byte_budget_aborts_unclaimed_speculation(
+    engine: SpeculativeEngine, downloader: FakeDownloader, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "speculative_max_bytes", 1500)
+    job = make_job()
+    engine.start(job)
+    spec = engine._jobs[job.token]
+    await downloader.started.wait()
+
+    downloader.finish.set()
+    assert spec.task is not None
+    with pytest.raises(SpeculationCancelled):
+        await spec.task
+    assert engine._jobs == {}
+    assert spec_files() == []
+
+
+async def test_unclaimed_result_expires(
+    engine: SpeculativeEngine, downloader: FakeDownloader, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "speculative_idle_timeout", 0)
+    job = make_job()
+    engine.start(job)
+    downloader.finish.set()
+    spec = engine._jobs[job.token]
+    assert spec.task is not None
+    await spec.task
+
+    # Expiry and the file cleanup run as callbacks on the loop
+    for _ in range(20):
+        await asyncio.sleep(0.01)
+        if not spec_files():
+            break
+    assert spec_files() == []
+    assert await engine.claim(job.token, "audio") is None
+
+
+def test_executor_is_resized(engine: SpeculativeEngine, monkeypatch: pytest.MonkeyPatch) -> None:
+    old = engine._get_executor()
+    assert old._max_workers == 2
+
+    monkeypatch.setattr(settings, "speculative_max_jobs", 4)
+    engine.resize_executor()
+    new = engine._get_executor()
+    assert new is not old
+    assert new._max_workers == 4
+    busy = EXECUTOR_BUSY.get(executor="speculative")
+    assert EXECUTOR_SATURATION.get(executor="speculative") == busy / 4
+    old.shutdown()
+    new.shutdown()
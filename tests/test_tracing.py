@@ -0,0 +1,149 @@
+"""Tests for job traces and sampled profiling."""
+
+import json
+import tracemalloc
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from config import settings
+from services.tracing import (
+    current_trace,
+    finish_trace,
+    pause_trace,
+    profiled,
+    set_profiling,
+    span,
+    start_trace,
+    use_trace,
+)
+
+
+@pytest.fixture(autouse=True)
+def no_profiling(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    monkeypatch.setattr(settings, "trace_dir", tmp_path / "traces")
+    monkeypatch.setattr(settings, "profile_dir", tmp_path / "profiles")
+    yield
+    set_profiling("off")
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    use_trace(None)
+
+
+def test_spans_nest_and_record_errors() -> None:
+    trace = start_trace("preview", user_id=1)
+    assert current_trace() is trace
+
+    with span("download", stream="video") as outer, span("encode"):
+        pass
+    with pytest.raises(ValueError), span("upload"):
+        raise ValueError("too large")
+
+    assert [(s.name, s.parent) for s in trace.spans] == [
+        ("download", None), ("encode", "download"), ("upload", None)
+    ]
+    assert outer is not None and outer.attributes == {"stream": "video"}
+    assert trace.spans[2].error == "ValueError: too large"
+    assert trace.active_seconds == pytest.approx(trace.spans[0].duration + trace.spans[2].duration)
+
+
+def test_span_outside_a_trace_does_nothing() -> None:
+    with span("download") as item:
+        assert item is None
+
+
+async def test_slow_job_is_dumped_as_json(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "slow_job_seconds", 0.0)
+    trace = start_trace("download", url="https://youtu.be/dQw4w9WgXcQ")
+    with span("download"):
+        pass
+
+    await finish_trace(trace)
+
+    (path,) = settings.trace_dir.iterdir()
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert data["trace_id"] == trace.trace_id
+    assert data["attributes"] == {"url": "https://youtu.be/dQw4w9WgXcQ"}
+    assert [s["name"] for s in data["spans"]] == ["download"]
+
+
+async def test_fast_job_is_not_dumped() -> None:
+    await finish_trace(start_trace("download"))
+    assert not settings.trace_dir.exists()
+
+
+def test_unknown_profiling_mode() -> None:
+    with pytest.raises(ValueError):
+        set_profiling("perf")
+
+
+async def test_sampled_job_is_profiled_with_cprofile() -> None:
+    set_profiling("cprofile", rate=1.0)
+    trace = start_trace("download")
+    assert trace.profile_mode == "cprofile"
+
+    assert profiled(lambda: sum(range(1000)))() == 499500
+    await finish_trace(trace)
+
+    (path,) = settings.profile_dir.iterdir()
+    assert path.suffix == ".prof"
+
+
+def test_unsampled_job_is_not_profiled() -> None:
+    set_profiling("cprofile", rate=0.0)
+    trace = start_trace("download")
+
+    def func() -> int:
+        return 1
+
+    assert trace.profile_mode == "off"
+    assert profiled(func) is func
+
+
+async def test_sampled_job_traces_allocations() -> None:
+    set_profiling("tracemalloc", rate=1.0)
+    trace = start_trace("download")
+    assert tracemalloc.is_tracing()
+
+    await finish_trace(trace)
+
+    assert not tracemalloc.is_tracing()
+    (path,) = settings.profile_dir.iterdir()
+    assert path.suffix == ".tracemalloc"
+
+
+async def test_waiting_job_pauses_allocation_tracing() -> None:
+    set_profiling("tracemalloc", rate=1.0)
+    trace = start_trace("preview")
+    pause_trace(trace)
+    assert not tracemalloc.is_tracing()
+
+    use_trace(trace)
+    assert tracemalloc.is_tracing()
+    await finish_trace(trace)
+    assert not tracemalloc.is_tracing()
+    assert len(list(settings.profile_dir.iterdir())) == 1
+
+
+def test_tracing_stays_on_while_another_job_traces() -> None:
+    set_profiling("tracemalloc", rate=1.0)
+    first = start_trace("preview")
+    second = start_trace("preview")
+    pause_trace(first)
+    assert tracemalloc.is_tracing()
+    pause_trace(second)
+    assert not tracemalloc.is_tracing()
+
+
+async def test_switching_profiling_off_stops_allocation_tracing() -> None:
+    set_profiling("tracemalloc", rate=1.0)
+    trace = start_trace("preview")
+    pause_trace(trace)
+
+    set_profiling("off")
+    use_trace(trace)
+    assert not tracemalloc.is_tracing()
+    assert trace.profile_mode == "off"
+    await finish_trace(trace)
+    assert not settings.profile_dir.exists() or not list(settings.profile_dir.iterdir())
@@ -0,0 +1,105 @@
+"""Tests for parsing links, timestamps and clip requests."""
+
+import pytest
+
+from services.validators import (
+    extract_youtube_urls,
+    is_playlist_url,
+    parse_clip,
+    parse_timestamp,
+)
+
+URL = "https://youtu.be/dQw4w9WgXcQ"
+PLAYLIST = "https://www.youtube.com/playlist?list=PLFgquLnL59alCl_2TQ"
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        (PLAYLIST, True),
+        ("https://m.youtube.com/playlist?si=x&list=PL-abc_1", True),
+        ("https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PLFgquLnL59a", False),
+        ("https://example.com/playlist?list=PL1", False),
+        ("", False),
+    ],
+)
+def test_is_playlist_url(text: str, expected: bool) -> None:
+    assert is_playlist_url(text) is expected
+
+
+def test_extract_youtube_urls_keeps_order_and_drops_duplicates() -> None:
+    text = f"смотри {URL}, и ещё ({PLAYLIST}) и снова {URL}."
+    assert extract_youtube_urls(text) == [URL, PLAYLIST]
+
+
+def test_extract_youtube_urls_skips_other_links() -> None:
+    assert extract_youtube_urls("https://example.com/video и просто текст") == []
+
+
+@pytest.mark.parametrize(
+    ("text", "seconds"),
+    [
+        ("90", 90.0),
+        ("1:30", 90.0),
+        ("1:02:03", 3723.0),
+        ("1:30.5", 90.5),
+        ("1h2m3s", 3723.0),
+        ("2m30s", 150.0),
+        ("2m", 120.0),
+        ("90s", 90.0),
+        (" 1:30 ", 90.0),
+    ],
+)
+def test_parse_timestamp(text: str, seconds: float) -> None:
+    assert parse_timestamp(text) == seconds
+
+
+@pytest.mark.parametrize("text", ["", "soon", "1:2:3:4", "1:300", "-5", "раза"])
+def test_parse_timestamp_rejects_other_text(text: str) -> None:
+    assert parse_timestamp(text) is None
+
+
+@pytest.mark.parametrize(
+    ("text", "clip"),
+    [
+        (f"{URL} 1:30-4:05", (90.0, 245.0)),
+        (f"{URL} 1:30 – 4:05", (90.0, 245.0)),
+        (f"{URL} 1:30 4:05", (90.0, 245.0)),
+        (f"{URL} 1:30", (90.0, None)),
+        (f"{URL}?t=90", (90.0, None)),
+        (f"{URL}?t=1m30s", (90.0, None)),
+        ("https://www.youtube.com/watch?v=dQw4w9WgXcQ&start=10&end=20", (10.0, 20.0)),
+        # A single time after a URL with a start is the end
+        (f"{URL}?t=90 2:00", (90.0, 120.0)),
+    ],
+)
+def test_parse_clip(text: str, clip: tuple[float, float | None]) -> None:
+    assert parse_clip(text) == clip
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        URL,
+        f"{URL}?t=0",
+        # The end must come after the start
+        f"{URL} 4:05-1:30",
+        # Numbers in a comment are not times
+        f"{URL} посмотри 2 раза",
+        f"{URL} top 10",
+        f"{URL} 1 2 3",
+    ],
+)
+def test_parse_clip_without_clip(text: str) -> None:
+    assert parse_clip(text) is None
+
+
+@pytest.mark.parametrize(
+    "text", [f"{URL}\n1:30-2:00", f"{URL}\t1:30 2:00", f"  {URL}\n\n 1:30 - 2:00\n"]
+)
+def test_parse_clip_after_any_whitespace(text: str) -> None:
+    assert parse_clip(text) == (90.0, 120.0)
+
+
+def test_parse_clip_comment_keeps_url_start() -> None:
+    assert parse_clip(f"{URL}?t=90 глянь 3 минуты") == (90.0, None)
@@ -0,0 +1,77 @@
+"""Tests for the event loop watchdog."""
+
+import asyncio
+import sys
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+from loguru import logger
+
+from services.metrics import LOOP_BLOCKS, LOOP_LAG, SYNC_IO_CALLS
+from services.watchdog import LoopWatchdog, _caller
+
+
+@pytest.fixture
+def warnings() -> Iterator[list[str]]:
+    messages: list[str] = []
+    sink = logger.add(messages.append, level="WARNING", format="{message}")
+    yield messages
+    logger.remove(sink)
+
+
+async def test_loop_lag_is_measured() -> None:
+    watchdog = LoopWatchdog(interval=0.01, block_threshold=10)
+    watchdog.start()
+    try:
+        await asyncio.sleep(0.05)
+    finally:
+        watchdog.stop()
+    assert 0 <= LOOP_LAG.get() < 1
+
+
+async def test_blocked_loop_logs_the_stack(warnings: list[str]) -> None:
+    blocks = LOOP_BLOCKS.get()
+    watchdog = LoopWatchdog(interval=0.01, block_threshold=0.05)
+    watchdog.start()
+    try:
+        await asyncio.sleep(0.03)
+        time.sleep(0.3)  # noqa: ASYNC251 - the blocking call under test
+        await asyncio.sleep(0.05)
+    finally:
+        watchdog.stop()
+
+    blocked = [m for m in warnings if m.startswith("Event loop blocked for")]
+    assert len(blocked) == 1
+    assert "test_blocked_loop_logs_the_stack" in blocked[0]
+    assert any(m.startswith("Event loop was blocked for") for m in warnings)
+    assert LOOP_BLOCKS.get() == blocks + 1
+
+
+async def test_debug_mode_reports_sync_io_once_per_call_site(
+    tmp_path: Path, warnings: list[str]
+) -> None:
+    path = tmp_path / "file.txt"
+    path.write_text("x")
+    calls = SYNC_IO_CALLS.get(event="open")
+    watchdog = LoopWatchdog(interval=0.01, block_threshold=10, debug=True)
+    watchdog.start()
+    try:
+        for _ in range(3):
+            with open(path) as file:  # noqa: ASYNC230 - the blocking call under test
+                file.read()
+    finally:
+        watchdog.stop()
+
+    reported = [m for m in warnings if m.startswith("Blocking call open")]
+    assert len(reported) == 1
+    assert __file__ in reported[0]
+    assert SYNC_IO_CALLS.get(event="open") == calls + 1
+    assert not asyncio.get_running_loop().get_debug()
+
+
+def test_caller_skips_the_standard_library() -> None:
+    site = _caller(sys._getframe())
+    assert site is not None
+    assert site[0] == __file__
@@ -0,0 +1,109 @@
+"""Tests for the pool of reusable YoutubeDL instances."""
+
+from typing import Any
+
+import pytest
+import yt_dlp
+
+from services.ydl_pool import YoutubeDLPool, profile_key
+
+OPTS: dict[str, Any] = {"quiet": True, "no_warnings": True, "outtmpl": "base.%(ext)s"}
+
+
+class Factory:
+    """Creates real instances (no network needed) and remembers them."""
+
+    def __init__(self) -> None:
+        self.created: list[yt_dlp.YoutubeDL] = []
+
+    def __call__(self, ydl_opts: dict[str, Any]) -> yt_dlp.YoutubeDL:
+        ydl = yt_dlp.YoutubeDL(ydl_opts)
+        self.created.append(ydl)
+        return ydl
+
+
+def make_pool(max_idle: int = 2, max_uses: int = 100, max_age: float = 600) -> YoutubeDLPool:
+    return YoutubeDLPool(Factory(), max_idle=max_idle, max_uses=max_uses, max_age=max_age)
+
+
+def created(pool: YoutubeDLPool) -> list[yt_dlp.YoutubeDL]:
+    assert isinstance(pool.factory, Factory)
+    return pool.factory.created
+
+
+def test_instance_is_reused_for_the_same_profile() -> None:
+    pool = make_pool()
+    with pool.acquire(OPTS) as first:
+        pass
+    with pool.acquire(dict(OPTS)) as second:
+        assert second is first
+    with pool.acquire({**OPTS, "socket_timeout": 5}) as other:
+        assert other is not first
+
+    assert len(created(pool)) == 2
+    assert pool.idle_count() == 2
+
+
+def test_profile_key_ignores_order() -> None:
+    assert profile_key({"a": 1, "b": [1, 2]}) == profile_key({"b": [1, 2], "a": 1})
+
+
+def test_overlay_is_reverted_on_return() -> None:
+    pool = make_pool()
+
+    def hook(status: dict[str, Any]) -> None:
+        pass
+
+    with pool.acquire(OPTS, outtmpl="job.%(ext)s", format="140", progress_hooks=[hook]) as ydl:
+        assert ydl.params["outtmpl"]["default"] == "job.%(ext)s"
+        assert ydl.params["format"] == "140"
+        assert hook in ydl._progress_hooks
+
+    with pool.acquire(OPTS) as ydl:
+        assert ydl.params["outtmpl"]["default"] == "base.%(ext)s"
+        assert "format" not in ydl.params
+        assert hook not in ydl._progress_hooks
+
+
+def test_per_profile_options_cannot_be_overlaid() -> None:
+    pool = make_pool()
+    with pytest.raises(ValueError), pool.acquire(OPTS, cookiefile="cookies.txt"):
+        pass
+
+
+def test_caller_options_are_not_modified() -> None:
+    opts = {**OPTS, "http_headers": {"User-Agent": "test"}}
+    with make_pool().acquire(opts):
+        pass
+    assert opts == {**OPTS, "http_headers": {"User-Agent": "test"}}
+
+
+def test_worn_out_instances_are_replaced() -> None:
+    pool = make_pool(max_uses=2)
+    for _ in range(3):
+        with pool.acquire(OPTS):
+            pass
+    assert len(created(pool)) == 2
+
+
+def test_idle_instances_are_capped() -> None:
+    pool = make_pool(max_idle=1)
+    with pool.acquire(OPTS), pool.acquire(OPTS):
+        pass
+    assert pool.idle_count() == 1
+
+    pool.clear()
+    assert pool.idle_count() == 0
+
+
+def test_instance_is_dropped_after_an_unexpected_error() -> None:
+    pool = make_pool()
+    with pytest.raises(RuntimeError), pool.acquire(OPTS):
+        raise RuntimeError("broken state")
+    with pytest.raises(yt_dlp.utils.DownloadError), pool.acquire(OPTS):
+        raise yt_dlp.utils.DownloadError("video unavailable")
+
+    # The RuntimeError instance was closed, the DownloadError one went back
+    assert pool.idle_count() == 1
+    with pool.acquire(OPTS) as ydl:
+        assert ydl is created(pool)[1]